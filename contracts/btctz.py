@@ -1,5 +1,11 @@
+import json
+import os
+
 import smartpy as sp
 
+CONTRACT_METADATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "contract_metadata.json")
+"""TZIP-16 contract metadata, the off-chain views are generated from AdministrableFA2"""
+
 class FA2ErrorMessage:
     """Static enum used for the FA2 related errors, using the `FA2_` prefix"""
     PREFIX = "FA2_"
@@ -13,6 +19,21 @@ class FA2ErrorMessage:
     """This error is thrown if neither token owner nor permitted operators are trying to transfer an amount"""
     NOT_ADMIN = "{}NOT_ADMIN".format(PREFIX)
     TOKEN_PAUSED = "{}TOKEN_PAUSED".format(PREFIX)
+    TOKEN_NOT_PAUSABLE = "{}TOKEN_NOT_PAUSABLE".format(PREFIX)
+    """This error is thrown if a token id has no bit in the pause bitset, see AdministrableFA2.PAUSABLE_TOKEN_IDS"""
+    REDEMPTION_UNDEFINED = "{}REDEMPTION_UNDEFINED".format(PREFIX)
+    """This error is thrown if settle_redemptions does not start at the head of the queue, settles no redemption or names one that is not in the queue"""
+    INVALID_AMOUNT = "{}INVALID_AMOUNT".format(PREFIX)
+    """This error is thrown if request_redemption redeems no token"""
+    ESCROW_BALANCE = "{}ESCROW_BALANCE".format(PREFIX)
+    """This error is thrown if import_balances sets the balance of the contract itself, its ledger entry holds the tokens of the queued redemptions"""
+    MISSIGNED = "MISSIGNED"
+    """TZIP-17 error thrown if a permit signature does not match its public key, nonce, expiry and parameter hash"""
+    EXPIRED_PERMIT = "EXPIRED_PERMIT"
+    """TZIP-17 error thrown if a permit is submitted or used after its expiry"""
+    COMPACT_CODES = {NOT_ADMIN: 1, TOKEN_PAUSED: 2, TOKEN_NOT_PAUSABLE: 3, REDEMPTION_UNDEFINED: 4, INVALID_AMOUNT: 5, ESCROW_BALANCE: 6}
+    """Numeric codes of the non-standard errors in contracts built with compact_errors, published in the TZIP-16 errors of the contract metadata.
+    The errors defined by TZIP-12 and TZIP-17 are not listed, they fail with their string in every build"""
 
 class TokenMetadata:
     """Token metadata object as per FA2 standard"""
@@ -102,6 +123,37 @@ class UpdateOperator():
         """
         return sp.TList(UpdateOperator.get_type())
 
+class OwnerOperatorUpdates():
+    """Operator updates of one owner for update_operators_bulk, a missing token_id grants or revokes the operator on all tokens of the owner"""
+    def get_grant_type():
+        """Returns the type of a single operator grant
+
+        Returns:
+            sp.TRecord: operator and optional token id, with layout
+        """
+        return sp.TRecord(operator=sp.TAddress, token_id=sp.TOption(sp.TNat)).layout(("operator", "token_id"))
+
+    def get_type():
+        """Returns the type of the updates of one owner
+
+        Returns:
+            sp.TRecord: owner and list of add_operator or remove_operator grants, with layout
+        """
+        return sp.TRecord(
+            owner=sp.TAddress,
+            updates=sp.TList(sp.TVariant(
+                add_operator=OwnerOperatorUpdates.get_grant_type(),
+                remove_operator=OwnerOperatorUpdates.get_grant_type()))
+        ).layout(("owner", "updates"))
+
+    def get_batch_type():
+        """Returns a list type containing the updates of several owners
+
+        Returns:
+            sp.TList: list type containing owner operator updates
+        """
+        return sp.TList(OwnerOperatorUpdates.get_type())
+
 class BalanceOf:
     """Balance of object as per FA2 standard"""
     def get_response_type():
@@ -183,6 +235,28 @@ class OperatorKey:
         """
         return sp.set_type_expr(sp.record(token_id=token_id, owner=owner, operator=operator), OperatorKey.get_type())
 
+class OwnerOperatorKey:
+    """Key of an operator allowed to transfer every token of an owner"""
+    def get_type():
+        """Returns a single owner operator key type, with layout
+
+        Returns:
+            sp.TRecord: single owner operator key type, with layout
+        """
+        return sp.TRecord(owner=sp.TAddress, operator=sp.TAddress).layout(("owner", "operator"))
+
+    def make(owner, operator):
+        """Creates a typed owner operator key
+
+        Args:
+            owner (sp.address): owner address
+            operator (sp.address): operator
+
+        Returns:
+            sp.record: typed owner operator key
+        """
+        return sp.set_type_expr(sp.record(owner=owner, operator=operator), OwnerOperatorKey.get_type())
+
 class RecipientTokenAmount:
     """Helper type used whenever amount, recipient and token id needs to be defined
     """
@@ -215,6 +289,299 @@ class RecipientTokenAmount:
         """
         return sp.set_type_expr(sp.record(owner=owner, token_id=token_id, token_amount=token_amount), RecipientTokenAmount.get_type())
 
+class HolderBalance:
+    """Helper type of the bulk ledger import, the balance a holder has after the import
+    """
+    def get_type():
+        """Get the holder balance type
+
+        Returns:
+            sp.TRecord: record of owner and balance
+        """
+        return sp.TRecord(owner=sp.TAddress, balance=sp.TNat).layout(("owner", "balance"))
+
+    def get_batch_type():
+        """Get a list of the holder balance type
+
+        Returns:
+            sp.TList: the holder balance list type
+        """
+        return sp.TList(HolderBalance.get_type())
+
+    def make(owner, balance):
+        """Creates a typed holder balance
+
+        Args:
+            owner (sp.address): owner
+            balance (sp.nat): balance after the import
+
+        Returns:
+            sp.record: typed holder balance
+        """
+        return sp.set_type_expr(sp.record(owner=owner, balance=balance), HolderBalance.get_type())
+
+class TokenPause:
+    """Helper type of pause_token and pause_tokens, the pause flag a token gets
+    """
+    def get_type():
+        """Get the token pause type
+
+        Returns:
+            sp.TRecord: record of pause and token_id
+        """
+        return sp.TRecord(pause=sp.TBool, token_id=sp.TNat).layout(("pause", "token_id"))
+
+    def get_batch_type():
+        """Get a list of the token pause type
+
+        Returns:
+            sp.TList: the token pause list type
+        """
+        return sp.TList(TokenPause.get_type())
+
+    def make(token_id, pause):
+        """Creates a typed token pause
+
+        Args:
+            token_id (sp.nat): token id
+            pause (sp.bool): whether transfers and operator updates of the token are paused
+
+        Returns:
+            sp.record: typed token pause
+        """
+        return sp.set_type_expr(sp.record(pause=pause, token_id=token_id), TokenPause.get_type())
+
+class Redemption:
+    """Helper type of the redemption queue, tokens of owner locked until a custodian sends their BTC to btc_address
+    """
+    def get_type():
+        """Get the redemption type
+
+        Returns:
+            sp.TRecord: record of owner, token_id, amount and btc_address
+        """
+        return sp.TRecord(owner=sp.TAddress, token_id=sp.TNat, amount=sp.TNat, btc_address=sp.TString).layout(
+            ("owner", ("token_id", ("amount", "btc_address"))))
+
+    def make(owner, token_id, amount, btc_address):
+        """Creates a typed redemption
+
+        Args:
+            owner (sp.address): owner of the redeemed tokens
+            token_id (sp.nat): token id
+            amount (sp.nat): amount redeemed
+            btc_address (sp.string): BTC address the custodian pays
+
+        Returns:
+            sp.record: typed redemption
+        """
+        return sp.set_type_expr(sp.record(owner=owner, token_id=token_id, amount=amount, btc_address=btc_address), Redemption.get_type())
+
+class Checkpoint:
+    """Helper type of the balance checkpoints, the balance a ledger entry had at the end of a level.
+    The checkpoints of a ledger entry are numbered from 0 in increasing level order, its head holds their count and the level of the last one
+    """
+    def get_type():
+        """Get the checkpoint type
+
+        Returns:
+            sp.TRecord: record of level and balance
+        """
+        return sp.TRecord(level=sp.TNat, balance=sp.TNat).layout(("level", "balance"))
+
+    def get_key_type(ledger_key_type):
+        """Get the type of the checkpoint keys
+
+        Args:
+            ledger_key_type (sp.TType): type of the ledger keys
+
+        Returns:
+            sp.TPair: pair of ledger key and checkpoint index
+        """
+        return sp.TPair(ledger_key_type, sp.TNat)
+
+    def get_head_type():
+        """Get the checkpoint head type
+
+        Returns:
+            sp.TRecord: record of count and level of the last checkpoint
+        """
+        return sp.TRecord(count=sp.TNat, level=sp.TNat).layout(("count", "level"))
+
+    def get_request_type():
+        """Get the parameter type of the balance_at view
+
+        Returns:
+            sp.TRecord: record of owner, token_id and level
+        """
+        return sp.TRecord(owner=sp.TAddress, token_id=sp.TNat, level=sp.TNat).layout(("owner", ("token_id", "level")))
+
+    def make(level, balance):
+        """Creates a typed checkpoint
+
+        Args:
+            level (sp.nat): level of the checkpoint
+            balance (sp.nat): balance at the end of the level
+
+        Returns:
+            sp.record: typed checkpoint
+        """
+        return sp.set_type_expr(sp.record(level=level, balance=balance), Checkpoint.get_type())
+
+    def make_head(count, level):
+        """Creates a typed checkpoint head
+
+        Args:
+            count (sp.nat): number of checkpoints
+            level (sp.nat): level of the last checkpoint
+
+        Returns:
+            sp.record: typed checkpoint head
+        """
+        return sp.set_type_expr(sp.record(count=count, level=level), Checkpoint.get_head_type())
+
+class Permit:
+    """TZIP-17 permit: a signed approval of a transfer item, submitted by anyone on behalf of the signer"""
+    def get_type():
+        """Returns a single permit type, with layout
+
+        Returns:
+            sp.TRecord: single permit type, with layout
+        """
+        return sp.TRecord(
+            public_key=sp.TKey,
+            signature=sp.TSignature,
+            expiry=sp.TTimestamp,
+            params_hash=sp.TBytes).layout(("public_key", ("signature", ("expiry", "params_hash"))))
+
+    def get_batch_type():
+        """Returns a list type containing permit types
+
+        Returns:
+            sp.TList: list type containing permit types
+        """
+        return sp.TList(Permit.get_type())
+
+    def get_signed_type():
+        """Returns the type of the packed bytes signed by the permit signer: ((chain_id, contract), (nonce, (expiry, params_hash)))
+
+        Returns:
+            sp.TPair: signed payload type
+        """
+        return sp.TPair(sp.TPair(sp.TChainId, sp.TAddress), sp.TPair(sp.TNat, sp.TPair(sp.TTimestamp, sp.TBytes)))
+
+    def params_hash(transfer):
+        """Returns the parameter hash of a transfer item, the blake2b of its packed value
+
+        Args:
+            transfer (Transfer): the transfer item
+
+        Returns:
+            sp.bytes: the parameter hash
+        """
+        return sp.blake2b(sp.pack(sp.set_type_expr(transfer, Transfer.get_type())))
+
+class PermitKey:
+    """Key of a stored permit: the signer and the parameter hash of the permitted transfer item"""
+    def get_type():
+        """Returns a single permit key type, with layout
+
+        Returns:
+            sp.TRecord: single permit key type, with layout
+        """
+        return sp.TRecord(owner=sp.TAddress, params_hash=sp.TBytes).layout(("owner", "params_hash"))
+
+    def make(owner, params_hash):
+        """Creates a typed permit key
+
+        Args:
+            owner (sp.address): address of the signer
+            params_hash (sp.bytes): parameter hash of the transfer item
+
+        Returns:
+            sp.record: typed permit key
+        """
+        return sp.set_type_expr(sp.record(owner=owner, params_hash=params_hash), PermitKey.get_type())
+
+class CachedBalance:
+    """Call-local copy of a ledger balance, used to coalesce the ledger writes of a batch into a single write per ledger key"""
+    def get_type():
+        """Returns the cached balance type, holding the balance read from the ledger and the balance after the updates of the current call
+
+        Returns:
+            sp.TRecord: cached balance type, with layout
+        """
+        return sp.TRecord(initial=sp.TNat, balance=sp.TNat).layout(("initial", "balance"))
+
+    def get_cache_type():
+        """Returns the type of the call-local balance cache
+
+        Returns:
+            sp.TMap: map type from ledger key to cached balance
+        """
+        return sp.TMap(LedgerKey.get_type(), CachedBalance.get_type())
+
+class Event:
+    """Tags and payload types of the events emitted by contracts built with events, see BaseFA2.emit_event.
+    A call emits one event per tag holding every item of the call, so the cost is one EMIT per call rather than one per item
+    """
+    TRANSFER = "transfer"
+    MINT = "mint"
+    BURN = "burn"
+    PAUSE = "pause"
+    IMPORT_BALANCES = "import_balances"
+    REDEMPTION = "redemption"
+    SETTLE_REDEMPTIONS = "settle_redemptions"
+
+    def get_transfer_type():
+        """Returns the payload type of transfer events, the transfer batch of the call, so a transfer keeps its sender and receiver pairing
+
+        Returns:
+            sp.TList: the transfer batch type
+        """
+        return Transfer.get_batch_type()
+
+    def get_supply_type():
+        """Returns the payload type of mint and burn events, the amounts minted or burned by the call
+
+        Returns:
+            sp.TList: the recipient token amount list type
+        """
+        return RecipientTokenAmount.get_batch_type()
+
+    def get_pause_type():
+        """Returns the payload type of pause events, the pause flags set by the call
+
+        Returns:
+            sp.TList: the token pause list type
+        """
+        return TokenPause.get_batch_type()
+
+    def get_import_balances_type():
+        """Returns the payload type of import_balances events
+
+        Returns:
+            sp.TRecord: record of balances and token_id, the parameter of import_balances
+        """
+        return sp.TRecord(balances=HolderBalance.get_batch_type(), token_id=sp.TNat).layout(("balances", "token_id"))
+
+    def get_redemption_type():
+        """Returns the payload type of redemption events, a request queued by request_redemption
+
+        Returns:
+            sp.TRecord: record of redemption_id and redemption
+        """
+        return sp.TRecord(redemption_id=sp.TNat, redemption=Redemption.get_type()).layout(("redemption_id", "redemption"))
+
+    def get_settle_redemptions_type():
+        """Returns the payload type of settle_redemptions events, the range of redemptions settled by the call
+
+        Returns:
+            sp.TRecord: record of first_redemption_id, count and refunds
+        """
+        return sp.TRecord(first_redemption_id=sp.TNat, count=sp.TNat, refunds=sp.TSet(sp.TNat)).layout(
+            ("first_redemption_id", ("count", "refunds")))
+
 class BaseFA2(sp.Contract):
     """Base FA2 contract, which implements the required entry points"""
 
@@ -224,51 +591,129 @@ class BaseFA2(sp.Contract):
         Returns:
             dict: initial storage of the contract
         """
-        return dict(
+        storage = dict(
             ledger=sp.big_map(tkey=LedgerKey.get_type(), tvalue=sp.TNat),
             token_metadata=sp.big_map(
                 tkey=sp.TNat, tvalue=TokenMetadata.get_type()),
             total_supply=sp.big_map(tkey=sp.TNat, tvalue=sp.TNat),
-            operators=sp.big_map(tkey=OperatorKey.get_type(), tvalue=sp.TUnit)
+            operators=sp.big_map(tkey=OperatorKey.get_type(), tvalue=sp.TUnit),
+            all_tokens_operators=sp.big_map(tkey=OwnerOperatorKey.get_type(), tvalue=sp.TUnit),
+            all_tokens=sp.set(t=sp.TNat)
         )
+        if self.checkpoints:
+            storage['checkpoints'] = sp.big_map(tkey=Checkpoint.get_key_type(LedgerKey.get_type()), tvalue=Checkpoint.get_type())
+            storage['checkpoint_heads'] = sp.big_map(tkey=LedgerKey.get_type(), tvalue=Checkpoint.get_head_type())
 
-    def __init__(self):
-        """Has no constructor parameters, initializes the storage
+        return storage
+
+    def __init__(self, compact_errors=False, events=True, lazy_admin=True, checkpoints=False):
+        """Initializes the storage
+
+        The holder entrypoints, transfer, update_operators, update_operators_bulk, balance_of and permit, are marked lazify=False.
+        With lazy_admin every other entrypoint is stored in a big_map and only loaded by the calls to it, so the holder calls
+        do not deserialize and typecheck the administration code.
+
+        Args:
+            compact_errors (bool, optional): fail with the numeric FA2ErrorMessage.COMPACT_CODES instead of the strings of the non-standard errors. Defaults to False.
+            events (bool, optional): emit an Event from transfer, mint, burn, import_balances, pause_token, pause_tokens, request_redemption
+                and settle_redemptions. Defaults to True.
+            lazy_admin (bool, optional): store the administration entrypoints lazily. Defaults to True.
+            checkpoints (bool, optional): record a Checkpoint of every ledger write and add the balance_at view. Defaults to False.
         """
+        self.compact_errors = compact_errors
+        self.events = events
+        self.checkpoints = checkpoints
+        if lazy_admin:
+            self.add_flag("lazy-entry-points")
+        if checkpoints:
+            self.balance_at = sp.onchain_view(name="balance_at")(BaseFA2.balance_at_view)
         self.init(**self.get_init_storage())
 
-    @sp.entry_point
+    def error(self, message):
+        """Returns the value to fail with for an error message: the message, or its numeric code in contracts built with compact_errors
+
+        Args:
+            message (str): a FA2ErrorMessage
+
+        Returns:
+            str or sp.nat: failure value
+        """
+        if self.compact_errors and message in FA2ErrorMessage.COMPACT_CODES:
+            return sp.nat(FA2ErrorMessage.COMPACT_CODES[message])
+        return message
+
+    def emit_event(self, tag, payload, payload_type):
+        """Emits a typed contract event, in contracts built with events
+
+        Args:
+            tag (str): an Event tag
+            payload: event payload
+            payload_type (sp.TType): type of the payload, published with the event
+        """
+        if self.events:
+            sp.emit(sp.set_type_expr(payload, payload_type), tag=tag, with_type=True)
+
+    @sp.entry_point(lazify=False)
     def transfer(self, transfers):
         """entrypoint to perform one or multiple transfers. Compatible with FA2 standard
         Pre: storage.ledger[LedgerKey(transfer._from, transfer.txs.token_id)] >= transfer.txs.token_amount
-        Pre: sp.sender == transfer._from || storage.operators.contains(OperatorKey(transfer._from, sp.sender, transfer.txs.token_id))
+        Pre: sp.sender == transfer._from || storage.all_tokens_operators.contains(OwnerOperatorKey(transfer._from, sp.sender)) || storage.operators.contains(OperatorKey(transfer._from, sp.sender, transfer.txs.token_id)) || verify_transfer_permit(transfer)
         Post: storage.ledger[LedgerKey(transfer._from, transfer.txs.token_id)] -= transfer.txs.token_amount
         Post: storage.ledger[LedgerKey(transfer.txs.to_, transfer.txs.token_id)] += transfer.txs.token_amount
+        Post: emit Event.TRANSFER(transfers)
+
+        The balance changes are accumulated in a call-local balance cache and every touched ledger key is written at most once at the end of the call.
 
         Args:
             transfers (sp.list(Transfer)): batch transfer type
         """
         sp.set_type(transfers, Transfer.get_batch_type())
+
+        # (from_, token_id) pairs that already passed the pause and operator checks during this call
+        authorized_ledger_keys = sp.local("authorized_ledger_keys", sp.set(t=LedgerKey.get_type()))
+        # owners of which the sender is an all tokens operator, their other tokens need no further lookup
+        authorized_owners = sp.local("authorized_owners", sp.set(t=sp.TAddress))
+        balances = self.make_balance_cache()
+        paused = self.load_pause_state()
         with sp.for_('transfer', transfers) as transfer:
+            # set once the permit of this transfer item was consumed, a permit only authorizes the item it was signed for
+            permitted = sp.local("permitted", False)
             with sp.for_('tx', transfer.txs) as tx:
-                sp.verify(~self.is_paused(tx.token_id), message=FA2ErrorMessage.TOKEN_PAUSED)
-
                 from_user_ledger_key = sp.local("from_user_ledger_key", LedgerKey.make(tx.token_id, transfer.from_))
                 to_user_ledger_key = sp.local("to_user_ledger_key", LedgerKey.make(tx.token_id, tx.to_))
-                operator_key = OperatorKey.make(tx.token_id, transfer.from_, sp.sender)
+                is_authorized = sp.local("is_authorized", authorized_ledger_keys.value.contains(from_user_ledger_key.value))
+
+                with sp.if_(~is_authorized.value):
+                    sp.verify(~self.is_paused(tx.token_id, paused), message=self.error(FA2ErrorMessage.TOKEN_PAUSED))
 
-                sp.verify(self.data.ledger.get(from_user_ledger_key.value, sp.nat(0)) >= tx.amount, message=FA2ErrorMessage.INSUFFICIENT_BALANCE)
-                sp.verify((sp.sender == transfer.from_) | self.data.operators.contains(operator_key), message=FA2ErrorMessage.NOT_OWNER)
                 with sp.if_(tx.amount>0):
-                    self.data.ledger[from_user_ledger_key.value] = sp.as_nat(
-                        self.data.ledger[from_user_ledger_key.value] - tx.amount)
-                    self.data.ledger[to_user_ledger_key.value] = self.data.ledger.get(
-                        to_user_ledger_key.value, 0) + tx.amount
+                    self.load_balance(balances, from_user_ledger_key.value)
+                    sp.verify(balances.value[from_user_ledger_key.value].balance >= tx.amount, message=self.error(FA2ErrorMessage.INSUFFICIENT_BALANCE))
+
+                with sp.if_(~is_authorized.value):
+                    with sp.if_((sp.sender == transfer.from_) | authorized_owners.value.contains(transfer.from_)):
+                        authorized_ledger_keys.value.add(from_user_ledger_key.value)
+                    with sp.else_():
+                        with sp.if_(self.data.all_tokens_operators.contains(OwnerOperatorKey.make(transfer.from_, sp.sender))):
+                            authorized_owners.value.add(transfer.from_)
+                            authorized_ledger_keys.value.add(from_user_ledger_key.value)
+                        with sp.else_():
+                            operator_key = OperatorKey.make(tx.token_id, transfer.from_, sp.sender)
+                            with sp.if_(self.data.operators.contains(operator_key)):
+                                authorized_ledger_keys.value.add(from_user_ledger_key.value)
+                            with sp.else_():
+                                self.verify_transfer_permit(transfer, permitted)
 
-                    with sp.if_(self.data.ledger[from_user_ledger_key.value]==sp.nat(0)):
-                        del self.data.ledger[from_user_ledger_key.value]
+                with sp.if_(tx.amount>0):
+                    balances.value[from_user_ledger_key.value].balance = sp.as_nat(
+                        balances.value[from_user_ledger_key.value].balance - tx.amount)
+                    self.load_balance(balances, to_user_ledger_key.value)
+                    balances.value[to_user_ledger_key.value].balance += tx.amount
 
-    @sp.entry_point
+        self.flush_balances(balances)
+        self.emit_event(Event.TRANSFER, transfers, Event.get_transfer_type())
+
+    @sp.entry_point(lazify=False)
     def update_operators(self, update_operators):
         """As per FA2 standard, allows a token owner to set an operator who will be allowed to perform transfers on their behalf
 
@@ -282,22 +727,57 @@ class BaseFA2(sp.Contract):
         """
         sp.set_type(update_operators, UpdateOperator.get_batch_type())
 
+        paused = self.load_pause_state()
         with sp.for_('update_operator', update_operators) as update_operator:
             with update_operator.match_cases() as argument:
                 with argument.match("add_operator") as update:
-                    sp.verify(update.owner == sp.sender, message=FA2ErrorMessage.NOT_OWNER)
-                    sp.verify(~self.is_paused(update.token_id), message=FA2ErrorMessage.TOKEN_PAUSED)
+                    sp.verify(update.owner == sp.sender, message=self.error(FA2ErrorMessage.NOT_OWNER))
+                    sp.verify(~self.is_paused(update.token_id, paused), message=self.error(FA2ErrorMessage.TOKEN_PAUSED))
 
                     operator_key = OperatorKey.make(update.token_id, update.owner, update.operator)
                     self.data.operators[operator_key] = sp.unit
                 with argument.match("remove_operator") as update:
-                    sp.verify(update.owner == sp.sender, message=FA2ErrorMessage.NOT_OWNER)
-                    sp.verify(~self.is_paused(update.token_id), message=FA2ErrorMessage.TOKEN_PAUSED)
+                    sp.verify(update.owner == sp.sender, message=self.error(FA2ErrorMessage.NOT_OWNER))
+                    sp.verify(~self.is_paused(update.token_id, paused), message=self.error(FA2ErrorMessage.TOKEN_PAUSED))
 
                     operator_key = OperatorKey.make(update.token_id, update.owner, update.operator)
                     del self.data.operators[operator_key]
 
-    @sp.entry_point
+    @sp.entry_point(lazify=False)
+    def update_operators_bulk(self, owner_updates):
+        """Adds and removes operators of several owners in one call, the owner is checked once for all of its updates.
+        A grant without token_id covers every token of the owner with a single all_tokens_operators entry, it is not tied to a token and is not subject to pause
+        Pre: owner_update.owner == sp.sender
+        Pre: ~is_paused(grant.token_id) for grants with a token_id
+        Post: set storage.all_tokens_operators[OwnerOperatorKey(owner_update.owner, grant.operator)] for grants without token_id
+        Post: set storage.operators[OperatorKey(owner_update.owner, grant.operator, grant.token_id)] for grants with a token_id
+
+        Args:
+            owner_updates (sp.list(OwnerOperatorUpdates)): operator updates grouped by owner
+        """
+        sp.set_type(owner_updates, OwnerOperatorUpdates.get_batch_type())
+
+        paused = self.load_pause_state()
+        with sp.for_('owner_update', owner_updates) as owner_update:
+            sp.verify(owner_update.owner == sp.sender, message=self.error(FA2ErrorMessage.NOT_OWNER))
+            with sp.for_('update', owner_update.updates) as update:
+                with update.match_cases() as argument:
+                    with argument.match("add_operator") as grant:
+                        with grant.token_id.match_cases() as token_id_option:
+                            with token_id_option.match("None"):
+                                self.data.all_tokens_operators[OwnerOperatorKey.make(owner_update.owner, grant.operator)] = sp.unit
+                            with token_id_option.match("Some") as token_id:
+                                sp.verify(~self.is_paused(token_id, paused), message=self.error(FA2ErrorMessage.TOKEN_PAUSED))
+                                self.data.operators[OperatorKey.make(token_id, owner_update.owner, grant.operator)] = sp.unit
+                    with argument.match("remove_operator") as grant:
+                        with grant.token_id.match_cases() as token_id_option:
+                            with token_id_option.match("None"):
+                                del self.data.all_tokens_operators[OwnerOperatorKey.make(owner_update.owner, grant.operator)]
+                            with token_id_option.match("Some") as token_id:
+                                sp.verify(~self.is_paused(token_id, paused), message=self.error(FA2ErrorMessage.TOKEN_PAUSED))
+                                del self.data.operators[OperatorKey.make(token_id, owner_update.owner, grant.operator)]
+
+    @sp.entry_point(lazify=False)
     def balance_of(self, balance_of_request):
         """This entrypoint as per FA2 standard, takes balance_of requests and responds on the provided callback contract.
 
@@ -309,82 +789,329 @@ class BaseFA2(sp.Contract):
         responses = sp.local("responses", sp.set_type_expr(
             sp.list([]), BalanceOf.get_response_type()))
         with sp.for_('request', balance_of_request.requests) as request:
-            sp.verify(self.data.token_metadata.contains(
-                request.token_id), message=FA2ErrorMessage.TOKEN_UNDEFINED)
-            responses.value.push(sp.record(request=request, balance=self.data.ledger.get(
-                LedgerKey.make(request.token_id, request.owner), 0)))
+            self.verify_token_defined(request.token_id)
+            responses.value.push(sp.record(request=request, balance=self.ledger_balance(LedgerKey.make(request.token_id, request.owner))))
 
         sp.transfer(responses.value, sp.mutez(0), balance_of_request.callback)
 
-    def is_paused(self, token_id):
-        return sp.bool(False)
+    @sp.onchain_view()
+    def get_balance(self, ledger_key):
+        """On-chain view returning the balance of a ledger key, synchronous alternative to balance_of without callback
+        Pre: storage.token_metadata.contains(ledger_key.token_id)
 
-class AdministrableMixin():
-    """Mixin used to compose andministrable functionality of a contract. Still requires the inheriting contract to define the appropriate storage.
-    """
+        Args:
+            ledger_key (LedgerKey): the ledger key to look up
+        """
+        sp.set_type(ledger_key, LedgerKey.get_type())
+        self.verify_token_defined(ledger_key.token_id)
+        sp.result(self.ledger_balance(ledger_key))
 
-    @sp.sub_entry_point
-    def verify_is_admin(self, token_id):
-        """Sub entrypoint which verifies if a sender is in the set of admins
-        Pre: storage.administrators.contains(LedgerKey(sp.sender, token_id))
+    @sp.onchain_view()
+    def get_balances(self, requests):
+        """On-chain view returning the balances of several ledger keys, as balance_of responses in the order of the requests
+        Pre: storage.token_metadata.contains(request.token_id) for every request
 
         Args:
-            token_id (sp.nat): token id to check for admin
+            requests (sp.list(LedgerKey)): the ledger keys to look up
         """
-        administrator_ledger_key = LedgerKey.make(token_id, sp.sender)
-        sp.verify(self.data.administrators.contains(administrator_ledger_key), message=FA2ErrorMessage.NOT_ADMIN)
-
-    @sp.entry_point
-    def set_administrator(self, token_id, administrator_to_set):
-        """Only an existing admin can call this entrypoint. If the sender is correct the new admin is set
-        Pre: verify_is_admin(token_id)
-        Post: storage.administrators[LedgerKey(administrator_to_set, token_id)] = sp.unit
+        sp.set_type(requests, sp.TList(LedgerKey.get_type()))
+        responses = sp.local("responses", sp.set_type_expr(sp.list([]), BalanceOf.get_response_type()))
+        with sp.for_('request', requests) as request:
+            self.verify_token_defined(request.token_id)
+            responses.value.push(sp.record(request=request, balance=self.ledger_balance(request)))
+        sp.result(responses.value.rev())
+
+    @sp.onchain_view()
+    def total_supply(self, token_id):
+        """On-chain view returning the total supply of a token
+        Pre: storage.token_metadata.contains(token_id)
 
         Args:
             token_id (sp.nat): token id
-            administrator_to_set (sp.address): the administrator that should be set
         """
         sp.set_type(token_id, sp.TNat)
-        sp.set_type(administrator_to_set, sp.TAddress)
-        self.verify_is_admin(token_id)
+        self.verify_token_defined(token_id)
+        sp.result(self.token_total_supply(token_id))
 
-        administrator_ledger_key = LedgerKey.make(token_id, administrator_to_set)
-        self.data.administrators[administrator_ledger_key] = sp.unit
-
-    @sp.entry_point
-    def remove_administrator(self, token_id, administrator_to_remove):
-        """Only an existing admin can call this entrypoint. This removes a administrator entry entirely from the map (even the executing admin if requested)
-        Pre: verify_is_admin(token_id)
-        Post: del storage.administrators[LedgerKey(administrator_to_set, token_id)]
+    @sp.onchain_view()
+    def is_operator(self, operator_key):
+        """On-chain view returning whether operator may transfer the token_id balance of owner, as token operator or all tokens operator
 
         Args:
-            token_id (sp.nat): token id
-            administrator_to_remove (sp.address): the administrator that should be removed
+            operator_key (OperatorKey): owner, operator and token id
         """
-        sp.set_type(token_id, sp.TNat)
-        sp.set_type(administrator_to_remove, sp.TAddress)
-        self.verify_is_admin(token_id)
+        sp.set_type(operator_key, OperatorKey.get_type())
+        sp.result(self.has_operator(operator_key))
 
-        administrator_to_remove_key = LedgerKey.make(
-            token_id, administrator_to_remove)
-        del self.data.administrators[administrator_to_remove_key]
+    def balance_at_view(self, request):
+        """On-chain view balance_at, returning the balance owner had in token_id at the end of level, added by __init__ in contracts built with checkpoints.
+        The checkpoints of the ledger entry are binary searched for the last one at or before level. A level at or after the last checkpoint skips the
+        search, the head only gives its count and level, so the balance is still read from that last checkpoint
+        Pre: storage.token_metadata.contains(request.token_id)
 
-    @sp.entry_point
-    def execute(self, execution_payload):
-        """Only an admin for token_id 0 can call this entrypoint. It executes in the name of the contract the lambda stored in the execution payload.
-        This is used for upgradeability/migrations.
-        Pre: verify_is_admin(0)
-        Post: push execution_payload on execution stack
+        Args:
+            request (Checkpoint.get_request_type()): owner, token id and level
+        """
+        sp.set_type(request, Checkpoint.get_request_type())
+        self.verify_token_defined(request.token_id)
+        ledger_key = sp.local("ledger_key", self.ledger_entry_key(LedgerKey.make(request.token_id, request.owner)))
+        head = sp.local("head", self.data.checkpoint_heads.get(ledger_key.value, Checkpoint.make_head(sp.nat(0), sp.nat(0))))
+        # number of checkpoints at or before level, found in [low, high]
+        low = sp.local("low", sp.nat(0))
+        high = sp.local("high", head.value.count)
+        with sp.if_(head.value.level <= request.level):
+            low.value = head.value.count
+        with sp.while_(low.value < high.value):
+            middle = sp.local("middle", (low.value + high.value) // 2)
+            with sp.if_(self.data.checkpoints[sp.pair(ledger_key.value, middle.value)].level <= request.level):
+                low.value = middle.value + 1
+            with sp.else_():
+                high.value = middle.value
+        balance = sp.local("balance", sp.nat(0))
+        with sp.if_(low.value > 0):
+            balance.value = self.data.checkpoints[sp.pair(ledger_key.value, sp.as_nat(low.value - 1))].balance
+        sp.result(balance.value)
+
+    @sp.offchain_view(pure=True, name="get_balance")
+    def get_balance_offchain(self, ledger_key):
+        """TZIP-16 off-chain view returning the balance of a ledger key, see get_balance
 
         Args:
-            execution_payload (sp.TLambda(sp.TUnit, sp.TList(sp.TOperation))): the lambda to execute
+            ledger_key (LedgerKey): the ledger key to look up
         """
-        sp.set_type(execution_payload, sp.TLambda(sp.TUnit, sp.TList(sp.TOperation)))
-        self.verify_is_admin(sp.nat(0))
-        sp.add_operations(execution_payload(sp.unit).rev())
+        sp.set_type(ledger_key, LedgerKey.get_type())
+        self.verify_token_defined(ledger_key.token_id)
+        sp.result(self.ledger_balance(ledger_key))
+
+    @sp.offchain_view(pure=True, name="total_supply")
+    def total_supply_offchain(self, token_id):
+        """TZIP-16 off-chain view returning the total supply of a token, see total_supply
+
+        Args:
+            token_id (sp.nat): token id
+        """
+        sp.set_type(token_id, sp.TNat)
+        self.verify_token_defined(token_id)
+        sp.result(self.token_total_supply(token_id))
+
+    @sp.offchain_view(pure=True, name="is_operator")
+    def is_operator_offchain(self, operator_key):
+        """TZIP-16 off-chain view returning whether operator may transfer the token_id balance of owner, see is_operator
+
+        Args:
+            operator_key (OperatorKey): owner, operator and token id
+        """
+        sp.set_type(operator_key, OperatorKey.get_type())
+        sp.result(self.has_operator(operator_key))
+
+    @sp.offchain_view(pure=True)
+    def all_tokens(self):
+        """TZIP-16 off-chain view returning the ids of the tokens with metadata, in increasing order"""
+        sp.result(self.data.all_tokens.elements())
+
+    def verify_token_defined(self, token_id):
+        """Fails with TOKEN_UNDEFINED if the token has no metadata
+
+        Args:
+            token_id (sp.nat): token id
+        """
+        sp.verify(self.data.token_metadata.contains(token_id), message=self.error(FA2ErrorMessage.TOKEN_UNDEFINED))
+
+    def ledger_entry_key(self, ledger_key):
+        """Returns the key of the ledger entry of a ledger key, the key of the balance cache and of the checkpoints
+
+        Args:
+            ledger_key (LedgerKey): owner and token id
+
+        Returns:
+            LedgerKey: the ledger key
+        """
+        return ledger_key
+
+    def ledger_balance(self, ledger_key):
+        """Returns the ledger balance of a ledger key, 0 if it has none
+
+        Args:
+            ledger_key (LedgerKey): owner and token id
+
+        Returns:
+            sp.TNat: the balance
+        """
+        return self.data.ledger.get(ledger_key, sp.nat(0))
+
+    def token_total_supply(self, token_id):
+        """Returns the total supply of a defined token
+
+        Args:
+            token_id (sp.nat): token id
+
+        Returns:
+            sp.TNat: the total supply
+        """
+        return self.data.total_supply[token_id]
+
+    def has_operator(self, operator_key):
+        """Returns whether operator_key is set in operators, or its owner and operator in all_tokens_operators
+
+        Args:
+            operator_key (OperatorKey): owner, operator and token id
+
+        Returns:
+            sp.TBool: whether the operator may transfer the token
+        """
+        return self.data.operators.contains(operator_key) | self.data.all_tokens_operators.contains(
+            OwnerOperatorKey.make(operator_key.owner, operator_key.operator))
+
+    def make_balance_cache(self):
+        """Creates an empty call-local balance cache, see load_balance and flush_balances
+
+        Returns:
+            sp.local: map from ledger key to cached balance
+        """
+        return sp.local("balances", sp.set_type_expr(sp.map(), CachedBalance.get_cache_type()))
+
+    def load_balance(self, balances, ledger_key):
+        """Reads the ledger balance of ledger_key into the balance cache, unless it was already read during this call
+
+        Args:
+            balances (sp.local): the balance cache
+            ledger_key (LedgerKey): the ledger key to read
+        """
+        with sp.if_(~balances.value.contains(ledger_key)):
+            ledger_balance = sp.local("ledger_balance", self.data.ledger.get(ledger_key, sp.nat(0)))
+            balances.value[ledger_key] = sp.record(initial=ledger_balance.value, balance=ledger_balance.value)
+
+    def flush_balances(self, balances):
+        """Writes every changed balance of the balance cache to the ledger, zero balances are removed from the ledger
+        Post: storage.ledger[ledger_key] = balances[ledger_key].balance if balances[ledger_key].balance != balances[ledger_key].initial
+
+        Args:
+            balances (sp.local): the balance cache
+        """
+        with sp.for_('cached_balance', balances.value.items()) as cached_balance:
+            with sp.if_(cached_balance.value.balance != cached_balance.value.initial):
+                with sp.if_(cached_balance.value.balance == sp.nat(0)):
+                    del self.data.ledger[cached_balance.key]
+                with sp.else_():
+                    self.data.ledger[cached_balance.key] = cached_balance.value.balance
+                self.write_checkpoint(cached_balance.key, cached_balance.value.balance)
+
+    def write_checkpoint(self, ledger_key, balance):
+        """Records the balance of a ledger entry at the current level, in contracts built with checkpoints.
+        The head tells whether the last checkpoint is already at this level, it is then overwritten so an entry gets at most one checkpoint per level
+        Post: storage.checkpoints[(ledger_key, index)] = Checkpoint(sp.level, balance), index the last checkpoint if it is at sp.level or else a new one
+
+        Args:
+            ledger_key: key of the ledger entry
+            balance (sp.nat): balance of the entry after the write
+        """
+        if self.checkpoints:
+            head = sp.local("checkpoint_head", self.data.checkpoint_heads.get(ledger_key, Checkpoint.make_head(sp.nat(0), sp.nat(0))))
+            with sp.if_((head.value.count == 0) | (head.value.level != sp.level)):
+                self.data.checkpoint_heads[ledger_key] = Checkpoint.make_head(head.value.count + 1, sp.level)
+                self.data.checkpoints[sp.pair(ledger_key, head.value.count)] = Checkpoint.make(sp.level, balance)
+            with sp.else_():
+                self.data.checkpoints[sp.pair(ledger_key, sp.as_nat(head.value.count - 1))] = Checkpoint.make(sp.level, balance)
+
+    def verify_transfer_permit(self, transfer, permitted):
+        """Called when the sender of a transfer item is neither its owner nor an operator, fails with NOT_OWNER.
+        Contracts supporting permits accept the item if a permit was submitted for it
+
+        Args:
+            transfer (Transfer): the transfer item
+            permitted (sp.local): whether the permit of the transfer item was already consumed
+        """
+        sp.failwith(self.error(FA2ErrorMessage.NOT_OWNER))
+
+    def load_pause_state(self):
+        """Reads the pause state of every token once, before the loop of an entrypoint checks the pause of its items
+
+        Returns:
+            the pause state passed to is_paused, None in contracts that cannot be paused
+        """
+        return None
+
+    def is_paused(self, token_id, pause_state=None):
+        """Returns whether transfers and operator updates of a token are paused
+
+        Args:
+            token_id (sp.nat): token id
+            pause_state (optional): pause state returned by load_pause_state. Defaults to the storage.
+        """
+        return sp.bool(False)
+
+class AdministrableMixin():
+    """Mixin used to compose andministrable functionality of a contract. Still requires the inheriting contract to define the appropriate storage.
+    """
+
+    @sp.sub_entry_point
+    def verify_is_admin(self, token_id):
+        """Sub entrypoint which verifies if a sender is in the set of admins
+        Pre: storage.administrators.contains(LedgerKey(sp.sender, token_id))
+
+        Args:
+            token_id (sp.nat): token id to check for admin
+        """
+        administrator_ledger_key = LedgerKey.make(token_id, sp.sender)
+        sp.verify(self.data.administrators.contains(administrator_ledger_key), message=self.error(FA2ErrorMessage.NOT_ADMIN))
+
+    @sp.entry_point
+    def set_administrator(self, token_id, administrator_to_set):
+        """Only an existing admin can call this entrypoint. If the sender is correct the new admin is set
+        Pre: verify_is_admin(token_id)
+        Post: storage.administrators[LedgerKey(administrator_to_set, token_id)] = sp.unit
+
+        Args:
+            token_id (sp.nat): token id
+            administrator_to_set (sp.address): the administrator that should be set
+        """
+        sp.set_type(token_id, sp.TNat)
+        sp.set_type(administrator_to_set, sp.TAddress)
+        self.verify_is_admin(token_id)
+
+        administrator_ledger_key = LedgerKey.make(token_id, administrator_to_set)
+        self.data.administrators[administrator_ledger_key] = sp.unit
+
+    @sp.entry_point
+    def remove_administrator(self, token_id, administrator_to_remove):
+        """Only an existing admin can call this entrypoint. This removes a administrator entry entirely from the map (even the executing admin if requested)
+        Pre: verify_is_admin(token_id)
+        Post: del storage.administrators[LedgerKey(administrator_to_set, token_id)]
+
+        Args:
+            token_id (sp.nat): token id
+            administrator_to_remove (sp.address): the administrator that should be removed
+        """
+        sp.set_type(token_id, sp.TNat)
+        sp.set_type(administrator_to_remove, sp.TAddress)
+        self.verify_is_admin(token_id)
+
+        administrator_to_remove_key = LedgerKey.make(
+            token_id, administrator_to_remove)
+        del self.data.administrators[administrator_to_remove_key]
+
+    @sp.entry_point
+    def execute(self, execution_payload):
+        """Only an admin for token_id 0 can call this entrypoint. It executes in the name of the contract the lambda stored in the execution payload.
+        This is used for upgradeability/migrations.
+        Pre: verify_is_admin(0)
+        Post: push execution_payload on execution stack
+
+        Args:
+            execution_payload (sp.TLambda(sp.TUnit, sp.TList(sp.TOperation))): the lambda to execute
+        """
+        sp.set_type(execution_payload, sp.TLambda(sp.TUnit, sp.TList(sp.TOperation)))
+        self.verify_is_admin(sp.nat(0))
+        sp.add_operations(execution_payload(sp.unit).rev())
 
 class AdministrableFA2(BaseFA2, AdministrableMixin):
-    """FA2 Contract with administrators per token"""
+    """FA2 Contract with administrators per token.
+    The pause flags of the tokens are the bits of the paused nat, bit token_id set when the token is paused, so a call reads them all at once.
+    Redeemed tokens wait in the redemptions queue, ids next_settlement_id to next_redemption_id - 1, their balance held by the contract
+    address until a custodian settles them
+    """
+    PAUSABLE_TOKEN_IDS = 256
+    """Token ids below this have a pause bit, the largest shift of LSL and LSR"""
 
     def get_init_storage(self):
         """Returns the initial storage of the contract used for inheritance of smartpy contracts
@@ -394,22 +1121,55 @@ class AdministrableFA2(BaseFA2, AdministrableMixin):
         """
         storage = super().get_init_storage()
         storage['administrators'] = sp.big_map(l=self.administrators, tkey=LedgerKey.get_type(), tvalue=sp.TUnit)
-        storage['pause'] = sp.big_map(l=self.pause, tkey=sp.TNat, tvalue=sp.TBool)
+        storage['paused'] = sp.nat(0)
         storage['metadata'] = sp.big_map(l=self.metadata, tkey=sp.TString, tvalue=sp.TBytes)
+        storage['permits'] = sp.big_map(tkey=PermitKey.get_type(), tvalue=sp.TTimestamp)
+        storage['permit_nonces'] = sp.big_map(tkey=sp.TAddress, tvalue=sp.TNat)
+        storage['redemptions'] = sp.big_map(tkey=sp.TNat, tvalue=Redemption.get_type())
+        storage['next_redemption_id'] = sp.nat(0)
+        storage['next_settlement_id'] = sp.nat(0)
 
         return storage
 
-    def __init__(self, administrators={}, metadata):
+    def __init__(self, administrators={}, metadata={}, compact_errors=False, events=True, lazy_admin=True, checkpoints=False):
         """The storage can be initialized with a list of administrators
 
         Args:
             administrators (dict, optional): the initial list of administrator to allow. Defaults to {}.
+            metadata (dict, optional): the contract metadata big_map. Defaults to {}.
+            compact_errors (bool, optional): see BaseFA2. Defaults to False.
+            events (bool, optional): see BaseFA2. Defaults to True.
+            lazy_admin (bool, optional): see BaseFA2. Defaults to True.
+            checkpoints (bool, optional): see BaseFA2. Defaults to False.
         """
         self.administrators = administrators
-        self.pause = {}
         self.metadata = metadata
         self.add_flag("initial-cast")
-        super().__init__()
+        super().__init__(compact_errors, events, lazy_admin, checkpoints)
+        self.init_metadata("contract_metadata", self.get_contract_metadata())
+
+    def get_contract_metadata(self):
+        """Returns the TZIP-16 contract metadata: contracts/contract_metadata.json with the off-chain views of this contract.
+        The compiled metadata is merged back into contracts/contract_metadata.json by tools/metadata.py
+
+        Returns:
+            dict: contract metadata
+        """
+        with open(CONTRACT_METADATA_PATH) as metadata_file:
+            contract_metadata = json.load(metadata_file)
+        contract_metadata["views"] = [
+            self.get_balance_offchain,
+            self.total_supply_offchain,
+            self.is_operator_offchain,
+            self.all_tokens,
+            self.is_paused_offchain]
+        if self.compact_errors:
+            contract_metadata["errors"] = [
+                {"error": {"int": str(code)}, "expansion": {"string": message}, "languages": ["en"]}
+                for message, code in sorted(FA2ErrorMessage.COMPACT_CODES.items(), key=lambda item: item[1])]
+        else:
+            contract_metadata.pop("errors", None)
+        return contract_metadata
 
     @sp.entry_point
     def set_token_metadata(self, token_metadata):
@@ -418,6 +1178,7 @@ class AdministrableFA2(BaseFA2, AdministrableMixin):
         Post: storage.token_metadata[token_metadata.id] = token_metadata
         Post: storage.administrator[LedgerKey(sp.sender, token_metadata.id)] = sp.unit
         Post: storage.total_supply[token_metadata.id] = 0
+        Post: storage.all_tokens.add(token_metadata.id)
 
         Args:
             token_metadata (TokenMetadata): the token metadata to set
@@ -429,6 +1190,7 @@ class AdministrableFA2(BaseFA2, AdministrableMixin):
             self.data.token_metadata[token_metadata.token_id] = token_metadata
             self.data.administrators[LedgerKey.make(token_metadata.token_id, sp.sender)] = sp.unit
             self.data.total_supply[token_metadata.token_id] = 0
+            self.data.all_tokens.add(token_metadata.token_id)
 
     @sp.entry_point
     def mint(self, recipient_token_amount):
@@ -436,19 +1198,22 @@ class AdministrableFA2(BaseFA2, AdministrableMixin):
         Pre: verify_is_admin(recipient_token_amount.token_id)
         Post: storage.ledger[LedgerKey(recipient_token_amount.owner, recipient_token_amount.token_id)] += recipient_token_amount.token_amount
         Post: storage.total_supply[recipient_token_amount.token_id] += recipient_token_amount.token_amount
+        Post: emit Event.MINT([recipient_token_amount])
 
         Args:
             recipient_token_amount (RecipientTokenAmount): a record that has owner, token_amount and token_id
         """
         sp.set_type(recipient_token_amount, RecipientTokenAmount.get_type())
 
-        sp.verify(self.data.token_metadata.contains(recipient_token_amount.token_id), message=FA2ErrorMessage.TOKEN_UNDEFINED)
+        sp.verify(self.data.token_metadata.contains(recipient_token_amount.token_id), message=self.error(FA2ErrorMessage.TOKEN_UNDEFINED))
         self.verify_is_admin(recipient_token_amount.token_id)
 
         owner_ledger_key = LedgerKey.make(recipient_token_amount.token_id, recipient_token_amount.owner)
         self.data.ledger[owner_ledger_key] = self.data.ledger.get(
             owner_ledger_key, 0) + recipient_token_amount.token_amount
+        self.write_checkpoint(owner_ledger_key, self.data.ledger[owner_ledger_key])
         self.data.total_supply[recipient_token_amount.token_id] +=  recipient_token_amount.token_amount
+        self.emit_event(Event.MINT, sp.list([recipient_token_amount]), Event.get_supply_type())
 
     @sp.entry_point
     def burn(self, recipient_token_amount):
@@ -457,6 +1222,7 @@ class AdministrableFA2(BaseFA2, AdministrableMixin):
         Pre: storage.ledger[LedgerKey(recipient_token_amount.owner, recipient_token_amount.token_id)] >= recipient_token_amount.token_amount
         Post: storage.ledger[LedgerKey(recipient_token_amount.owner, recipient_token_amount.token_id)] -= recipient_token_amount.token_amount
         Post: storage.total_supply[recipient_token_amount.token_id] -= recipient_token_amount.token_amount
+        Post: emit Event.BURN([recipient_token_amount])
 
         Args:
             recipient_token_amount (RecipientTokenAmount): a record that has owner, token_amount and token_id
@@ -467,25 +1233,870 @@ class AdministrableFA2(BaseFA2, AdministrableMixin):
         self.data.ledger[owner_ledger_key] = sp.as_nat(
             self.data.ledger.get(owner_ledger_key, 0) - recipient_token_amount.token_amount)
         self.data.total_supply[recipient_token_amount.token_id] =  sp.as_nat(self.data.total_supply[recipient_token_amount.token_id]-recipient_token_amount.token_amount)
+        self.write_checkpoint(owner_ledger_key, self.data.ledger[owner_ledger_key])
         with sp.if_(self.data.ledger.get(owner_ledger_key, sp.nat(0)) == sp.nat(0)):
             del self.data.ledger[owner_ledger_key]
+        self.emit_event(Event.BURN, sp.list([recipient_token_amount]), Event.get_supply_type())
+
+    @sp.entry_point
+    def mint_batch(self, recipient_token_amounts):
+        """Batched version of mint, the admin rights are checked once per distinct token id and the total supply is written once per token id at the end of the call
+        Pre: verify_is_admin(recipient_token_amount.token_id) for every distinct token id
+        Post: storage.ledger[LedgerKey(recipient_token_amount.owner, recipient_token_amount.token_id)] += recipient_token_amount.token_amount
+        Post: storage.total_supply[token_id] += sum of the token_amount minted for token_id
+        Post: emit Event.MINT(recipient_token_amounts)
+
+        Args:
+            recipient_token_amounts (sp.list(RecipientTokenAmount)): a list of records that have owner, token_amount and token_id
+        """
+        sp.set_type(recipient_token_amounts, RecipientTokenAmount.get_batch_type())
+
+        supply_deltas = sp.local("supply_deltas", sp.map(tkey=sp.TNat, tvalue=sp.TNat))
+        balances = self.make_balance_cache()
+        with sp.for_('recipient_token_amount', recipient_token_amounts) as recipient_token_amount:
+            with sp.if_(~supply_deltas.value.contains(recipient_token_amount.token_id)):
+                sp.verify(self.data.token_metadata.contains(recipient_token_amount.token_id), message=self.error(FA2ErrorMessage.TOKEN_UNDEFINED))
+                self.verify_is_admin(recipient_token_amount.token_id)
+                supply_deltas.value[recipient_token_amount.token_id] = sp.nat(0)
+
+            owner_ledger_key = sp.local("owner_ledger_key", LedgerKey.make(recipient_token_amount.token_id, recipient_token_amount.owner))
+            self.load_balance(balances, owner_ledger_key.value)
+            balances.value[owner_ledger_key.value].balance += recipient_token_amount.token_amount
+            supply_deltas.value[recipient_token_amount.token_id] += recipient_token_amount.token_amount
+
+        self.flush_balances(balances)
+        with sp.for_('supply_delta', supply_deltas.value.items()) as supply_delta:
+            self.data.total_supply[supply_delta.key] += supply_delta.value
+        self.emit_event(Event.MINT, recipient_token_amounts, Event.get_supply_type())
+
+    @sp.entry_point
+    def burn_batch(self, recipient_token_amounts):
+        """Batched version of burn, the admin rights are checked once per distinct token id and the total supply is written once per token id at the end of the call
+        Pre: verify_is_admin(recipient_token_amount.token_id) for every distinct token id
+        Pre: storage.ledger[LedgerKey(recipient_token_amount.owner, recipient_token_amount.token_id)] >= recipient_token_amount.token_amount
+        Post: storage.ledger[LedgerKey(recipient_token_amount.owner, recipient_token_amount.token_id)] -= recipient_token_amount.token_amount
+        Post: storage.total_supply[token_id] -= sum of the token_amount burned for token_id
+        Post: emit Event.BURN(recipient_token_amounts)
+
+        Args:
+            recipient_token_amounts (sp.list(RecipientTokenAmount)): a list of records that have owner, token_amount and token_id
+        """
+        sp.set_type(recipient_token_amounts, RecipientTokenAmount.get_batch_type())
+
+        supply_deltas = sp.local("supply_deltas", sp.map(tkey=sp.TNat, tvalue=sp.TNat))
+        balances = self.make_balance_cache()
+        with sp.for_('recipient_token_amount', recipient_token_amounts) as recipient_token_amount:
+            with sp.if_(~supply_deltas.value.contains(recipient_token_amount.token_id)):
+                self.verify_is_admin(recipient_token_amount.token_id)
+                supply_deltas.value[recipient_token_amount.token_id] = sp.nat(0)
+
+            owner_ledger_key = sp.local("owner_ledger_key", LedgerKey.make(recipient_token_amount.token_id, recipient_token_amount.owner))
+            self.load_balance(balances, owner_ledger_key.value)
+            balances.value[owner_ledger_key.value].balance = sp.as_nat(
+                balances.value[owner_ledger_key.value].balance - recipient_token_amount.token_amount)
+            supply_deltas.value[recipient_token_amount.token_id] += recipient_token_amount.token_amount
+
+        self.flush_balances(balances)
+        with sp.for_('supply_delta', supply_deltas.value.items()) as supply_delta:
+            self.data.total_supply[supply_delta.key] = sp.as_nat(self.data.total_supply[supply_delta.key] - supply_delta.value)
+        self.emit_event(Event.BURN, recipient_token_amounts, Event.get_supply_type())
+
+    @sp.entry_point
+    def import_balances(self, token_id, balances):
+        """Bulk ledger migration, only a token administrator can do this. The balances are set rather than added, so an import that is
+        replayed after it was applied leaves the storage unchanged, and the total supply is written once at the end of the call.
+        The pause of the token is not checked, transfers stay paused while a migration runs
+        Pre: storage.token_metadata.contains(token_id)
+        Pre: verify_is_admin(token_id)
+        Pre: holder_balance.owner != sp.self_address
+        Post: storage.ledger[LedgerKey(holder_balance.owner, token_id)] = holder_balance.balance, the entries set to 0 are removed
+        Post: storage.total_supply[token_id] += sum of the balances imported - sum of the balances they replace
+        Post: emit Event.IMPORT_BALANCES(balances, token_id)
+
+        Args:
+            token_id (sp.nat): token id of the imported balances
+            balances (sp.list(HolderBalance)): the balance of every imported holder
+        """
+        sp.set_type(token_id, sp.TNat)
+        sp.set_type(balances, HolderBalance.get_batch_type())
+
+        self.verify_token_defined(token_id)
+        self.verify_is_admin(token_id)
+        imported = sp.local("imported", sp.nat(0))
+        replaced = sp.local("replaced", sp.nat(0))
+        with sp.for_('holder_balance', balances) as holder_balance:
+            sp.verify(holder_balance.owner != sp.self_address, message=self.error(FA2ErrorMessage.ESCROW_BALANCE))
+            owner_ledger_key = sp.local("owner_ledger_key", LedgerKey.make(token_id, holder_balance.owner))
+            replaced.value += self.data.ledger.get(owner_ledger_key.value, sp.nat(0))
+            with sp.if_(holder_balance.balance == sp.nat(0)):
+                del self.data.ledger[owner_ledger_key.value]
+            with sp.else_():
+                self.data.ledger[owner_ledger_key.value] = holder_balance.balance
+            self.write_checkpoint(owner_ledger_key.value, holder_balance.balance)
+            imported.value += holder_balance.balance
+
+        self.data.total_supply[token_id] = sp.as_nat(self.data.total_supply[token_id] + imported.value - replaced.value)
+        self.emit_event(Event.IMPORT_BALANCES, sp.record(balances=balances, token_id=token_id), Event.get_import_balances_type())
+
+    @sp.entry_point(lazify=False)
+    def permit(self, permits):
+        """TZIP-17 entrypoint storing signed permits, anyone can submit them on behalf of the signers.
+        The signer signs Permit.get_signed_type: the chain id, this contract, their next nonce, the expiry and the parameter hash of a transfer item
+        Pre: sp.now <= permit.expiry
+        Pre: sp.check_signature(permit.public_key, permit.signature, sp.pack(((sp.chain_id, sp.self_address), (storage.permit_nonces[signer], (permit.expiry, permit.params_hash)))))
+        Post: storage.permit_nonces[signer] += 1
+        Post: storage.permits[PermitKey(signer, permit.params_hash)] = permit.expiry
+
+        Args:
+            permits (sp.list(Permit)): the permits, the nonces of a signer with several permits are used in list order
+        """
+        sp.set_type(permits, Permit.get_batch_type())
+
+        with sp.for_('permit', permits) as permit:
+            sp.verify(sp.now <= permit.expiry, message=self.error(FA2ErrorMessage.EXPIRED_PERMIT))
+            signer = sp.local("signer", sp.to_address(sp.implicit_account(sp.hash_key(permit.public_key))))
+            nonce = sp.local("nonce", self.data.permit_nonces.get(signer.value, sp.nat(0)))
+            signed = sp.pack(sp.set_type_expr(
+                sp.pair(sp.pair(sp.chain_id, sp.self_address), sp.pair(nonce.value, sp.pair(permit.expiry, permit.params_hash))),
+                Permit.get_signed_type()))
+            sp.verify(sp.check_signature(permit.public_key, permit.signature, signed), message=self.error(FA2ErrorMessage.MISSIGNED))
+            self.data.permit_nonces[signer.value] = nonce.value + 1
+            self.data.permits[PermitKey.make(signer.value, permit.params_hash)] = permit.expiry
+
+    def verify_transfer_permit(self, transfer, permitted):
+        """Consumes the permit of a transfer item, the first time the item needs it
+        Pre: storage.permits.contains(PermitKey(transfer.from_, Permit.params_hash(transfer)))
+        Pre: sp.now <= storage.permits[PermitKey(transfer.from_, Permit.params_hash(transfer))]
+        Post: del storage.permits[PermitKey(transfer.from_, Permit.params_hash(transfer))]
+
+        Args:
+            transfer (Transfer): the transfer item
+            permitted (sp.local): whether the permit of the transfer item was already consumed
+        """
+        with sp.if_(~permitted.value):
+            permit_key = sp.local("permit_key", PermitKey.make(transfer.from_, Permit.params_hash(transfer)))
+            sp.verify(self.data.permits.contains(permit_key.value), message=self.error(FA2ErrorMessage.NOT_OWNER))
+            sp.verify(sp.now <= self.data.permits[permit_key.value], message=self.error(FA2ErrorMessage.EXPIRED_PERMIT))
+            del self.data.permits[permit_key.value]
+            permitted.value = True
+
+    @sp.entry_point
+    def request_redemption(self, token_id, amount, btc_address):
+        """Queues a redemption of tokens of the sender for BTC. The tokens move to the ledger entry of the contract, where they stay until settle_redemptions burns or refunds them
+        Pre: storage.token_metadata.contains(token_id)
+        Pre: ~is_paused(token_id)
+        Pre: amount > 0
+        Pre: storage.ledger[LedgerKey(sp.sender, token_id)] >= amount
+        Post: storage.ledger[LedgerKey(sp.sender, token_id)] -= amount
+        Post: storage.ledger[LedgerKey(sp.self_address, token_id)] += amount
+        Post: storage.redemptions[storage.next_redemption_id] = Redemption(sp.sender, token_id, amount, btc_address)
+        Post: storage.next_redemption_id += 1
+        Post: emit Event.REDEMPTION(redemption_id, redemption)
+
+        Args:
+            token_id (sp.nat): token id
+            amount (sp.nat): amount redeemed
+            btc_address (sp.string): BTC address the custodian pays
+        """
+        sp.set_type(token_id, sp.TNat)
+        sp.set_type(amount, sp.TNat)
+        sp.set_type(btc_address, sp.TString)
+
+        self.verify_token_defined(token_id)
+        sp.verify(~self.is_paused(token_id), message=self.error(FA2ErrorMessage.TOKEN_PAUSED))
+        sp.verify(amount > 0, message=self.error(FA2ErrorMessage.INVALID_AMOUNT))
+        balances = self.make_balance_cache()
+        owner_ledger_key = sp.local("owner_ledger_key", LedgerKey.make(token_id, sp.sender))
+        self.load_balance(balances, owner_ledger_key.value)
+        sp.verify(balances.value[owner_ledger_key.value].balance >= amount, message=self.error(FA2ErrorMessage.INSUFFICIENT_BALANCE))
+        balances.value[owner_ledger_key.value].balance = sp.as_nat(balances.value[owner_ledger_key.value].balance - amount)
+        escrow_ledger_key = sp.local("escrow_ledger_key", LedgerKey.make(token_id, sp.self_address))
+        self.load_balance(balances, escrow_ledger_key.value)
+        balances.value[escrow_ledger_key.value].balance += amount
+        self.flush_balances(balances)
+        redemption = Redemption.make(sp.sender, token_id, amount, btc_address)
+        self.data.redemptions[self.data.next_redemption_id] = redemption
+        self.emit_event(Event.REDEMPTION, sp.record(redemption_id=self.data.next_redemption_id, redemption=redemption), Event.get_redemption_type())
+        self.data.next_redemption_id += 1
+
+    @sp.entry_point
+    def settle_redemptions(self, first_redemption_id, count, refunds):
+        """Settles count redemptions from the head of the queue, in request order: the refunded ones go back to their owner, the others are burned.
+        The head is passed explicitly, so a settlement sent twice fails instead of settling the next redemptions.
+        The admin rights are checked once per distinct token id, and every ledger key and total supply is written once at the end of the call
+        Pre: first_redemption_id == storage.next_settlement_id
+        Pre: 0 < count && first_redemption_id + count <= storage.next_redemption_id
+        Pre: first_redemption_id <= refund < first_redemption_id + count for every refund
+        Pre: verify_is_admin(redemption.token_id) for every distinct token id of the settled redemptions
+        Post: storage.ledger[LedgerKey(sp.self_address, token_id)] -= sum of the amounts settled for token_id
+        Post: storage.ledger[LedgerKey(redemption.owner, redemption.token_id)] += redemption.amount for the refunded redemptions
+        Post: storage.total_supply[token_id] -= sum of the amounts burned for token_id
+        Post: del storage.redemptions[redemption_id] for the settled redemptions
+        Post: storage.next_settlement_id += count
+        Post: emit Event.SETTLE_REDEMPTIONS(first_redemption_id, count, refunds)
+
+        Args:
+            first_redemption_id (sp.nat): id of the head of the queue
+            count (sp.nat): number of redemptions to settle
+            refunds (sp.set(sp.nat)): ids of the settled redemptions that are refunded instead of burned
+        """
+        sp.set_type(first_redemption_id, sp.TNat)
+        sp.set_type(count, sp.TNat)
+        sp.set_type(refunds, sp.TSet(sp.TNat))
+
+        end_redemption_id = sp.local("end_redemption_id", first_redemption_id + count)
+        sp.verify((first_redemption_id == self.data.next_settlement_id) & (count > 0) & (end_redemption_id.value <= self.data.next_redemption_id),
+                  message=self.error(FA2ErrorMessage.REDEMPTION_UNDEFINED))
+        with sp.for_('refund', refunds.elements()) as refund:
+            sp.verify((refund >= first_redemption_id) & (refund < end_redemption_id.value), message=self.error(FA2ErrorMessage.REDEMPTION_UNDEFINED))
+
+        supply_deltas = sp.local("supply_deltas", sp.map(tkey=sp.TNat, tvalue=sp.TNat))
+        balances = self.make_balance_cache()
+        with sp.for_('redemption_id', sp.range(first_redemption_id, end_redemption_id.value)) as redemption_id:
+            redemption = sp.local("redemption", self.data.redemptions[redemption_id])
+            del self.data.redemptions[redemption_id]
+            with sp.if_(~supply_deltas.value.contains(redemption.value.token_id)):
+                self.verify_is_admin(redemption.value.token_id)
+                supply_deltas.value[redemption.value.token_id] = sp.nat(0)
+            escrow_ledger_key = sp.local("escrow_ledger_key", LedgerKey.make(redemption.value.token_id, sp.self_address))
+            self.load_balance(balances, escrow_ledger_key.value)
+            balances.value[escrow_ledger_key.value].balance = sp.as_nat(balances.value[escrow_ledger_key.value].balance - redemption.value.amount)
+            with sp.if_(refunds.contains(redemption_id)):
+                owner_ledger_key = sp.local("owner_ledger_key", LedgerKey.make(redemption.value.token_id, redemption.value.owner))
+                self.load_balance(balances, owner_ledger_key.value)
+                balances.value[owner_ledger_key.value].balance += redemption.value.amount
+            with sp.else_():
+                supply_deltas.value[redemption.value.token_id] += redemption.value.amount
+
+        self.flush_balances(balances)
+        with sp.for_('supply_delta', supply_deltas.value.items()) as supply_delta:
+            self.data.total_supply[supply_delta.key] = sp.as_nat(self.data.total_supply[supply_delta.key] - supply_delta.value)
+        self.data.next_settlement_id = end_redemption_id.value
+        self.emit_event(Event.SETTLE_REDEMPTIONS, sp.record(first_redemption_id=first_redemption_id, count=count, refunds=refunds),
+                        Event.get_settle_redemptions_type())
 
     @sp.entry_point
     def pause_token(self, token_id, pause):
+        """Pauses or unpauses transfers and operator updates of a token, only a token administrator can do this
+        Pre: storage.token_metadata.contains(token_id)
+        Pre: verify_is_admin(token_id)
+        Pre: token_id < PAUSABLE_TOKEN_IDS
+        Post: bit token_id of storage.paused = pause
+        Post: emit Event.PAUSE([TokenPause(token_id, pause)])
+
+        Args:
+            token_id (sp.nat): token id
+            pause (sp.bool): whether the token is paused
+        """
         sp.set_type(token_id, sp.TNat)
         sp.set_type(pause, sp.TBool)
 
-        sp.verify(self.data.token_metadata.contains(token_id), message=FA2ErrorMessage.TOKEN_UNDEFINED)
+        sp.verify(self.data.token_metadata.contains(token_id), message=self.error(FA2ErrorMessage.TOKEN_UNDEFINED))
         self.verify_is_admin(token_id)
-        self.data.pause[token_id] = pause
+        sp.verify(token_id < AdministrableFA2.PAUSABLE_TOKEN_IDS, message=self.error(FA2ErrorMessage.TOKEN_NOT_PAUSABLE))
+        paused = self.load_pause_state()
+        self.write_pause(paused, token_id, pause)
+        self.data.paused = paused.value
+        self.emit_event(Event.PAUSE, sp.list([TokenPause.make(token_id, pause)]), Event.get_pause_type())
+
+    @sp.entry_point
+    def pause_tokens(self, token_pauses):
+        """Batched version of pause_token, the checks are done once per distinct token id and the pause bitset is written once at the end of the call
+        Pre: storage.token_metadata.contains(token_pause.token_id) && verify_is_admin(token_pause.token_id) for every distinct token id
+        Pre: token_pause.token_id < PAUSABLE_TOKEN_IDS
+        Post: bit token_pause.token_id of storage.paused = token_pause.pause, the last item of a token id wins
+        Post: emit Event.PAUSE(token_pauses)
+
+        Args:
+            token_pauses (sp.list(TokenPause)): the pause flag of every token to update
+        """
+        sp.set_type(token_pauses, TokenPause.get_batch_type())
+
+        checked = sp.local("checked", sp.set(t=sp.TNat))
+        paused = self.load_pause_state()
+        with sp.for_('token_pause', token_pauses) as token_pause:
+            with sp.if_(~checked.value.contains(token_pause.token_id)):
+                sp.verify(self.data.token_metadata.contains(token_pause.token_id), message=self.error(FA2ErrorMessage.TOKEN_UNDEFINED))
+                self.verify_is_admin(token_pause.token_id)
+                sp.verify(token_pause.token_id < AdministrableFA2.PAUSABLE_TOKEN_IDS, message=self.error(FA2ErrorMessage.TOKEN_NOT_PAUSABLE))
+                checked.value.add(token_pause.token_id)
+            self.write_pause(paused, token_pause.token_id, token_pause.pause)
+        self.data.paused = paused.value
+        self.emit_event(Event.PAUSE, token_pauses, Event.get_pause_type())
+
+    @sp.onchain_view(name="is_paused")
+    def is_paused_view(self, token_id):
+        """On-chain view returning whether transfers and operator updates of a token are paused
+
+        Args:
+            token_id (sp.nat): token id
+        """
+        sp.set_type(token_id, sp.TNat)
+        sp.result(self.is_paused(token_id))
+
+    @sp.offchain_view(pure=True, name="is_paused")
+    def is_paused_offchain(self, token_id):
+        """TZIP-16 off-chain view returning whether transfers and operator updates of a token are paused, see is_paused_view
+
+        Args:
+            token_id (sp.nat): token id
+        """
+        sp.set_type(token_id, sp.TNat)
+        sp.result(self.is_paused(token_id))
 
-    def is_paused(self, token_id):
+    def load_pause_state(self):
+        return sp.local("paused", self.data.paused)
+
+    def is_paused(self, token_id, pause_state=None):
+        """Tests the bit of token_id in the pause bitset, the shift is capped at PAUSABLE_TOKEN_IDS so that larger token ids read as not paused
+        instead of failing
+
+        Args:
+            token_id (sp.nat): token id
+            pause_state (sp.local, optional): pause bitset returned by load_pause_state. Defaults to the storage.
+        """
         sp.set_type(token_id, sp.TNat)
+        paused = self.data.paused if pause_state is None else pause_state.value
+        return ((paused >> sp.min(token_id, sp.nat(AdministrableFA2.PAUSABLE_TOKEN_IDS))) & sp.nat(1)) == sp.nat(1)
+
+    def write_pause(self, paused, token_id, pause):
+        """Sets or clears the bit of token_id in a pause bitset
+
+        Args:
+            paused (sp.local): the pause bitset
+            token_id (sp.nat): token id, below PAUSABLE_TOKEN_IDS
+            pause (sp.bool): whether the token is paused
+        """
+        mask = sp.nat(1) << token_id
+        with sp.if_(pause):
+            paused.value = paused.value | mask
+        with sp.else_():
+            paused.value = paused.value ^ (paused.value & mask)
+
+class SingleAssetFA2(AdministrableFA2):
+    """AdministrableFA2 specialised to the single token id 0, with the same entrypoints and views.
+    The ledger is keyed by owner and the operators by (owner, operator), the total supply, pause flag and administrators are plain storage values.
+    Every other token id fails with TOKEN_UNDEFINED, and an operator always covers the whole balance of its owner
+    """
+    TOKEN_ID = 0
+
+    def get_init_storage(self):
+        """Returns the initial storage of the contract used for inheritance of smartpy contracts
+
+        Returns:
+            dict: initial storage of the contract
+        """
+        storage = dict(
+            ledger=sp.big_map(tkey=sp.TAddress, tvalue=sp.TNat),
+            token_metadata=sp.big_map(tkey=sp.TNat, tvalue=TokenMetadata.get_type()),
+            total_supply=sp.nat(0),
+            operators=sp.big_map(tkey=OwnerOperatorKey.get_type(), tvalue=sp.TUnit),
+            administrators=sp.set(l=self.administrators, t=sp.TAddress),
+            paused=sp.bool(False),
+            metadata=sp.big_map(l=self.metadata, tkey=sp.TString, tvalue=sp.TBytes),
+            permits=sp.big_map(tkey=PermitKey.get_type(), tvalue=sp.TTimestamp),
+            permit_nonces=sp.big_map(tkey=sp.TAddress, tvalue=sp.TNat),
+            redemptions=sp.big_map(tkey=sp.TNat, tvalue=Redemption.get_type()),
+            next_redemption_id=sp.nat(0),
+            next_settlement_id=sp.nat(0)
+        )
+        if self.checkpoints:
+            storage['checkpoints'] = sp.big_map(tkey=Checkpoint.get_key_type(sp.TAddress), tvalue=Checkpoint.get_type())
+            storage['checkpoint_heads'] = sp.big_map(tkey=sp.TAddress, tvalue=Checkpoint.get_head_type())
+
+        return storage
 
-        sp.if ~self.data.pause.contains(token_id):
-            return sp.bool(False)
+    def __init__(self, administrators=[], metadata={}, compact_errors=False, events=True, lazy_admin=True, checkpoints=False):
+        """The storage can be initialized with a list of administrators
+
+        Args:
+            administrators (list, optional): the addresses of the initial administrators. Defaults to [].
+            metadata (dict, optional): the contract metadata big_map. Defaults to {}.
+            compact_errors (bool, optional): see BaseFA2. Defaults to False.
+            events (bool, optional): see BaseFA2. Defaults to True.
+            lazy_admin (bool, optional): see BaseFA2. Defaults to True.
+            checkpoints (bool, optional): see BaseFA2, the checkpoints are keyed by owner. Defaults to False.
+        """
+        super().__init__(administrators, metadata, compact_errors, events, lazy_admin, checkpoints)
+
+    def verify_token_defined(self, token_id):
+        sp.verify(token_id == SingleAssetFA2.TOKEN_ID, message=self.error(FA2ErrorMessage.TOKEN_UNDEFINED))
+
+    def ledger_entry_key(self, ledger_key):
+        return ledger_key.owner
+
+    def ledger_balance(self, ledger_key):
+        return self.data.ledger.get(ledger_key.owner, sp.nat(0))
+
+    def token_total_supply(self, token_id):
+        return self.data.total_supply
+
+    def has_operator(self, operator_key):
+        # every operator is an all tokens operator, as in BaseFA2.has_operator the token id is not checked
+        return self.data.operators.contains(OwnerOperatorKey.make(operator_key.owner, operator_key.operator))
+
+    def make_balance_cache(self):
+        """Creates an empty call-local balance cache keyed by owner, see load_balance and flush_balances
+
+        Returns:
+            sp.local: map from owner to cached balance
+        """
+        return sp.local("balances", sp.map(tkey=sp.TAddress, tvalue=CachedBalance.get_type()))
+
+    def verify_is_admin(self, token_id):
+        """Verifies that the sender is an administrator, only token id 0 has administrators
+        Pre: token_id == 0 && storage.administrators.contains(sp.sender)
+
+        Args:
+            token_id (sp.nat): token id to check for admin
+        """
+        sp.verify((token_id == SingleAssetFA2.TOKEN_ID) & self.data.administrators.contains(sp.sender), message=self.error(FA2ErrorMessage.NOT_ADMIN))
+
+    def is_paused(self, token_id, pause_state=None):
+        return self.data.paused if pause_state is None else pause_state.value
+
+    @sp.entry_point(lazify=False)
+    def transfer(self, transfers):
+        """entrypoint to perform one or multiple transfers. Compatible with FA2 standard
+        Pre: transfer.txs.token_id == 0
+        Pre: storage.ledger[transfer._from] >= transfer.txs.token_amount
+        Pre: sp.sender == transfer._from || storage.operators.contains(OwnerOperatorKey(transfer._from, sp.sender)) || verify_transfer_permit(transfer)
+        Post: storage.ledger[transfer._from] -= transfer.txs.token_amount
+        Post: storage.ledger[transfer.txs.to_] += transfer.txs.token_amount
+        Post: emit Event.TRANSFER(transfers)
+
+        Args:
+            transfers (sp.list(Transfer)): batch transfer type
+        """
+        sp.set_type(transfers, Transfer.get_batch_type())
+
+        # owners that already passed the operator check during this call
+        authorized_owners = sp.local("authorized_owners", sp.set(t=sp.TAddress))
+        balances = self.make_balance_cache()
+        paused = self.load_pause_state()
+        with sp.for_('transfer', transfers) as transfer:
+            permitted = sp.local("permitted", False)
+            with sp.for_('tx', transfer.txs) as tx:
+                self.verify_token_defined(tx.token_id)
+                sp.verify(~self.is_paused(tx.token_id, paused), message=self.error(FA2ErrorMessage.TOKEN_PAUSED))
+
+                with sp.if_(tx.amount>0):
+                    self.load_balance(balances, transfer.from_)
+                    sp.verify(balances.value[transfer.from_].balance >= tx.amount, message=self.error(FA2ErrorMessage.INSUFFICIENT_BALANCE))
+
+                with sp.if_(~authorized_owners.value.contains(transfer.from_)):
+                    with sp.if_(sp.sender == transfer.from_):
+                        authorized_owners.value.add(transfer.from_)
+                    with sp.else_():
+                        with sp.if_(self.data.operators.contains(OwnerOperatorKey.make(transfer.from_, sp.sender))):
+                            authorized_owners.value.add(transfer.from_)
+                        with sp.else_():
+                            self.verify_transfer_permit(transfer, permitted)
+
+                with sp.if_(tx.amount>0):
+                    balances.value[transfer.from_].balance = sp.as_nat(balances.value[transfer.from_].balance - tx.amount)
+                    self.load_balance(balances, tx.to_)
+                    balances.value[tx.to_].balance += tx.amount
 
-        return self.data.pause[token_id]
+        self.flush_balances(balances)
+        self.emit_event(Event.TRANSFER, transfers, Event.get_transfer_type())
+
+    @sp.entry_point(lazify=False)
+    def update_operators(self, update_operators):
+        """As per FA2 standard, allows a token owner to set an operator who will be allowed to perform transfers on their behalf
+
+        Pre: update_operator.owner == sp.sender && update_operator.token_id == 0
+        Post: set storage.operators[OwnerOperatorKey(update_operator.add_operator.owner, update_operator.add_operator.operator)]
+        Post: del storage.operators[OwnerOperatorKey(update_operator.remove_operator.owner, update_operator.remove_operator.operator)]
+
+        Args:
+            update_operators (sp.list(UpdateOperator)): batch update operator type
+        """
+        sp.set_type(update_operators, UpdateOperator.get_batch_type())
+
+        paused = self.load_pause_state()
+        with sp.for_('update_operator', update_operators) as update_operator:
+            with update_operator.match_cases() as argument:
+                with argument.match("add_operator") as update:
+                    sp.verify(update.owner == sp.sender, message=self.error(FA2ErrorMessage.NOT_OWNER))
+                    self.verify_token_defined(update.token_id)
+                    sp.verify(~self.is_paused(update.token_id, paused), message=self.error(FA2ErrorMessage.TOKEN_PAUSED))
+                    self.data.operators[OwnerOperatorKey.make(update.owner, update.operator)] = sp.unit
+                with argument.match("remove_operator") as update:
+                    sp.verify(update.owner == sp.sender, message=self.error(FA2ErrorMessage.NOT_OWNER))
+                    self.verify_token_defined(update.token_id)
+                    sp.verify(~self.is_paused(update.token_id, paused), message=self.error(FA2ErrorMessage.TOKEN_PAUSED))
+                    del self.data.operators[OwnerOperatorKey.make(update.owner, update.operator)]
+
+    @sp.entry_point(lazify=False)
+    def update_operators_bulk(self, owner_updates):
+        """Adds and removes operators of several owners in one call, see BaseFA2.update_operators_bulk. Grants with and without token_id set the same entry
+        Pre: owner_update.owner == sp.sender
+        Pre: grant.token_id is None || (grant.token_id == 0 && ~storage.paused)
+        Post: set storage.operators[OwnerOperatorKey(owner_update.owner, grant.operator)]
+
+        Args:
+            owner_updates (sp.list(OwnerOperatorUpdates)): operator updates grouped by owner
+        """
+        sp.set_type(owner_updates, OwnerOperatorUpdates.get_batch_type())
+
+        paused = self.load_pause_state()
+        with sp.for_('owner_update', owner_updates) as owner_update:
+            sp.verify(owner_update.owner == sp.sender, message=self.error(FA2ErrorMessage.NOT_OWNER))
+            with sp.for_('update', owner_update.updates) as update:
+                with update.match_cases() as argument:
+                    with argument.match("add_operator") as grant:
+                        self.verify_grant(grant, paused)
+                        self.data.operators[OwnerOperatorKey.make(owner_update.owner, grant.operator)] = sp.unit
+                    with argument.match("remove_operator") as grant:
+                        self.verify_grant(grant, paused)
+                        del self.data.operators[OwnerOperatorKey.make(owner_update.owner, grant.operator)]
+
+    def verify_grant(self, grant, pause_state):
+        """Checks the token of an operator grant, grants without token_id are not subject to pause
+
+        Args:
+            grant (OwnerOperatorUpdates.get_grant_type()): operator and optional token id
+            pause_state (sp.local): pause flag returned by load_pause_state
+        """
+        with sp.if_(grant.token_id.is_some()):
+            self.verify_token_defined(grant.token_id.open_some())
+            sp.verify(~self.is_paused(grant.token_id.open_some(), pause_state), message=self.error(FA2ErrorMessage.TOKEN_PAUSED))
+
+    @sp.offchain_view(pure=True)
+    def all_tokens(self):
+        """TZIP-16 off-chain view returning the ids of the tokens with metadata"""
+        tokens = sp.local("tokens", sp.list(t=sp.TNat))
+        with sp.if_(self.data.token_metadata.contains(SingleAssetFA2.TOKEN_ID)):
+            tokens.value.push(sp.nat(SingleAssetFA2.TOKEN_ID))
+        sp.result(tokens.value)
+
+    @sp.entry_point
+    def set_administrator(self, token_id, administrator_to_set):
+        """Only an existing admin can call this entrypoint. If the sender is correct the new admin is set
+        Pre: verify_is_admin(token_id)
+        Post: storage.administrators.add(administrator_to_set)
+
+        Args:
+            token_id (sp.nat): token id, 0
+            administrator_to_set (sp.address): the administrator that should be set
+        """
+        sp.set_type(token_id, sp.TNat)
+        sp.set_type(administrator_to_set, sp.TAddress)
+        self.verify_is_admin(token_id)
+        self.data.administrators.add(administrator_to_set)
+
+    @sp.entry_point
+    def remove_administrator(self, token_id, administrator_to_remove):
+        """Only an existing admin can call this entrypoint. This removes an administrator (even the executing admin if requested)
+        Pre: verify_is_admin(token_id)
+        Post: storage.administrators.remove(administrator_to_remove)
+
+        Args:
+            token_id (sp.nat): token id, 0
+            administrator_to_remove (sp.address): the administrator that should be removed
+        """
+        sp.set_type(token_id, sp.TNat)
+        sp.set_type(administrator_to_remove, sp.TAddress)
+        self.verify_is_admin(token_id)
+        self.data.administrators.remove(administrator_to_remove)
+
+    @sp.entry_point
+    def set_token_metadata(self, token_metadata):
+        """Only an admin can call this entrypoint. It sets the token_metadata of token 0 if it was not already previously set
+        Pre: verify_is_admin(0)
+        Pre: token_metadata.token_id == 0
+        Post: storage.token_metadata[0] = token_metadata
+
+        Args:
+            token_metadata (TokenMetadata): the token metadata to set
+        """
+        sp.set_type(token_metadata, TokenMetadata.get_type())
+
+        self.verify_is_admin(sp.nat(0))
+        self.verify_token_defined(token_metadata.token_id)
+        with sp.if_(~self.data.token_metadata.contains(token_metadata.token_id)):
+            self.data.token_metadata[token_metadata.token_id] = token_metadata
+
+    @sp.entry_point
+    def mint(self, recipient_token_amount):
+        """Allows to mint new tokens to the specified recipient address, only an administrator can do this
+        Pre: verify_is_admin(recipient_token_amount.token_id)
+        Post: storage.ledger[recipient_token_amount.owner] += recipient_token_amount.token_amount
+        Post: storage.total_supply += recipient_token_amount.token_amount
+        Post: emit Event.MINT([recipient_token_amount])
+
+        Args:
+            recipient_token_amount (RecipientTokenAmount): a record that has owner, token_amount and token_id
+        """
+        sp.set_type(recipient_token_amount, RecipientTokenAmount.get_type())
+
+        self.verify_token_defined(recipient_token_amount.token_id)
+        self.verify_is_admin(recipient_token_amount.token_id)
+        self.data.ledger[recipient_token_amount.owner] = self.data.ledger.get(recipient_token_amount.owner, 0) + recipient_token_amount.token_amount
+        self.write_checkpoint(recipient_token_amount.owner, self.data.ledger[recipient_token_amount.owner])
+        self.data.total_supply += recipient_token_amount.token_amount
+        self.emit_event(Event.MINT, sp.list([recipient_token_amount]), Event.get_supply_type())
+
+    @sp.entry_point
+    def burn(self, recipient_token_amount):
+        """Allows to burn tokens of the specified address, only an administrator can do this
+        Pre: verify_is_admin(recipient_token_amount.token_id)
+        Pre: storage.ledger[recipient_token_amount.owner] >= recipient_token_amount.token_amount
+        Post: storage.ledger[recipient_token_amount.owner] -= recipient_token_amount.token_amount
+        Post: storage.total_supply -= recipient_token_amount.token_amount
+        Post: emit Event.BURN([recipient_token_amount])
+
+        Args:
+            recipient_token_amount (RecipientTokenAmount): a record that has owner, token_amount and token_id
+        """
+        sp.set_type(recipient_token_amount, RecipientTokenAmount.get_type())
+        self.verify_is_admin(recipient_token_amount.token_id)
+        balance = sp.local("balance", sp.as_nat(self.data.ledger.get(recipient_token_amount.owner, 0) - recipient_token_amount.token_amount))
+        self.data.total_supply = sp.as_nat(self.data.total_supply - recipient_token_amount.token_amount)
+        with sp.if_(balance.value == sp.nat(0)):
+            del self.data.ledger[recipient_token_amount.owner]
+        with sp.else_():
+            self.data.ledger[recipient_token_amount.owner] = balance.value
+        self.write_checkpoint(recipient_token_amount.owner, balance.value)
+        self.emit_event(Event.BURN, sp.list([recipient_token_amount]), Event.get_supply_type())
+
+    @sp.entry_point
+    def mint_batch(self, recipient_token_amounts):
+        """Batched version of mint, the admin rights are checked once and the total supply is written once at the end of the call
+        Pre: verify_is_admin(0) && recipient_token_amount.token_id == 0
+        Post: storage.ledger[recipient_token_amount.owner] += recipient_token_amount.token_amount
+        Post: storage.total_supply += sum of the token_amount
+        Post: emit Event.MINT(recipient_token_amounts)
+
+        Args:
+            recipient_token_amounts (sp.list(RecipientTokenAmount)): a list of records that have owner, token_amount and token_id
+        """
+        sp.set_type(recipient_token_amounts, RecipientTokenAmount.get_batch_type())
+
+        self.verify_is_admin(sp.nat(SingleAssetFA2.TOKEN_ID))
+        supply_delta = sp.local("supply_delta", sp.nat(0))
+        balances = self.make_balance_cache()
+        with sp.for_('recipient_token_amount', recipient_token_amounts) as recipient_token_amount:
+            self.verify_token_defined(recipient_token_amount.token_id)
+            self.load_balance(balances, recipient_token_amount.owner)
+            balances.value[recipient_token_amount.owner].balance += recipient_token_amount.token_amount
+            supply_delta.value += recipient_token_amount.token_amount
+
+        self.flush_balances(balances)
+        self.data.total_supply += supply_delta.value
+        self.emit_event(Event.MINT, recipient_token_amounts, Event.get_supply_type())
+
+    @sp.entry_point
+    def burn_batch(self, recipient_token_amounts):
+        """Batched version of burn, the admin rights are checked once and the total supply is written once at the end of the call
+        Pre: verify_is_admin(0) && recipient_token_amount.token_id == 0
+        Pre: storage.ledger[recipient_token_amount.owner] >= recipient_token_amount.token_amount
+        Post: storage.ledger[recipient_token_amount.owner] -= recipient_token_amount.token_amount
+        Post: storage.total_supply -= sum of the token_amount
+        Post: emit Event.BURN(recipient_token_amounts)
+
+        Args:
+            recipient_token_amounts (sp.list(RecipientTokenAmount)): a list of records that have owner, token_amount and token_id
+        """
+        sp.set_type(recipient_token_amounts, RecipientTokenAmount.get_batch_type())
+
+        self.verify_is_admin(sp.nat(SingleAssetFA2.TOKEN_ID))
+        supply_delta = sp.local("supply_delta", sp.nat(0))
+        balances = self.make_balance_cache()
+        with sp.for_('recipient_token_amount', recipient_token_amounts) as recipient_token_amount:
+            self.verify_token_defined(recipient_token_amount.token_id)
+            self.load_balance(balances, recipient_token_amount.owner)
+            balances.value[recipient_token_amount.owner].balance = sp.as_nat(
+                balances.value[recipient_token_amount.owner].balance - recipient_token_amount.token_amount)
+            supply_delta.value += recipient_token_amount.token_amount
+
+        self.flush_balances(balances)
+        self.data.total_supply = sp.as_nat(self.data.total_supply - supply_delta.value)
+        self.emit_event(Event.BURN, recipient_token_amounts, Event.get_supply_type())
+
+    @sp.entry_point
+    def import_balances(self, token_id, balances):
+        """Bulk ledger migration of the single asset, see AdministrableFA2.import_balances
+        Pre: token_id == 0
+        Pre: verify_is_admin(0)
+        Pre: holder_balance.owner != sp.self_address
+        Post: storage.ledger[holder_balance.owner] = holder_balance.balance, the entries set to 0 are removed
+        Post: storage.total_supply += sum of the balances imported - sum of the balances they replace
+        Post: emit Event.IMPORT_BALANCES(balances, token_id)
+
+        Args:
+            token_id (sp.nat): token id of the imported balances
+            balances (sp.list(HolderBalance)): the balance of every imported holder
+        """
+        sp.set_type(token_id, sp.TNat)
+        sp.set_type(balances, HolderBalance.get_batch_type())
+
+        self.verify_token_defined(token_id)
+        self.verify_is_admin(token_id)
+        imported = sp.local("imported", sp.nat(0))
+        replaced = sp.local("replaced", sp.nat(0))
+        with sp.for_('holder_balance', balances) as holder_balance:
+            sp.verify(holder_balance.owner != sp.self_address, message=self.error(FA2ErrorMessage.ESCROW_BALANCE))
+            replaced.value += self.data.ledger.get(holder_balance.owner, sp.nat(0))
+            with sp.if_(holder_balance.balance == sp.nat(0)):
+                del self.data.ledger[holder_balance.owner]
+            with sp.else_():
+                self.data.ledger[holder_balance.owner] = holder_balance.balance
+            self.write_checkpoint(holder_balance.owner, holder_balance.balance)
+            imported.value += holder_balance.balance
+
+        self.data.total_supply = sp.as_nat(self.data.total_supply + imported.value - replaced.value)
+        self.emit_event(Event.IMPORT_BALANCES, sp.record(balances=balances, token_id=token_id), Event.get_import_balances_type())
+
+    @sp.entry_point
+    def request_redemption(self, token_id, amount, btc_address):
+        """Queues a redemption of the single asset for BTC, see AdministrableFA2.request_redemption
+        Pre: token_id == 0
+        Pre: ~storage.paused
+        Pre: amount > 0
+        Pre: storage.ledger[sp.sender] >= amount
+        Post: storage.ledger[sp.sender] -= amount
+        Post: storage.ledger[sp.self_address] += amount
+        Post: storage.redemptions[storage.next_redemption_id] = Redemption(sp.sender, token_id, amount, btc_address)
+        Post: storage.next_redemption_id += 1
+        Post: emit Event.REDEMPTION(redemption_id, redemption)
+
+        Args:
+            token_id (sp.nat): token id
+            amount (sp.nat): amount redeemed
+            btc_address (sp.string): BTC address the custodian pays
+        """
+        sp.set_type(token_id, sp.TNat)
+        sp.set_type(amount, sp.TNat)
+        sp.set_type(btc_address, sp.TString)
+
+        self.verify_token_defined(token_id)
+        sp.verify(~self.is_paused(token_id), message=self.error(FA2ErrorMessage.TOKEN_PAUSED))
+        sp.verify(amount > 0, message=self.error(FA2ErrorMessage.INVALID_AMOUNT))
+        balances = self.make_balance_cache()
+        self.load_balance(balances, sp.sender)
+        sp.verify(balances.value[sp.sender].balance >= amount, message=self.error(FA2ErrorMessage.INSUFFICIENT_BALANCE))
+        balances.value[sp.sender].balance = sp.as_nat(balances.value[sp.sender].balance - amount)
+        self.load_balance(balances, sp.self_address)
+        balances.value[sp.self_address].balance += amount
+        self.flush_balances(balances)
+        redemption = Redemption.make(sp.sender, token_id, amount, btc_address)
+        self.data.redemptions[self.data.next_redemption_id] = redemption
+        self.emit_event(Event.REDEMPTION, sp.record(redemption_id=self.data.next_redemption_id, redemption=redemption), Event.get_redemption_type())
+        self.data.next_redemption_id += 1
+
+    @sp.entry_point
+    def settle_redemptions(self, first_redemption_id, count, refunds):
+        """Settles count redemptions from the head of the queue, see AdministrableFA2.settle_redemptions. The admin rights are checked once
+        Pre: first_redemption_id == storage.next_settlement_id
+        Pre: 0 < count && first_redemption_id + count <= storage.next_redemption_id
+        Pre: first_redemption_id <= refund < first_redemption_id + count for every refund
+        Pre: verify_is_admin(0)
+        Post: storage.ledger[sp.self_address] -= sum of the amounts settled
+        Post: storage.ledger[redemption.owner] += redemption.amount for the refunded redemptions
+        Post: storage.total_supply -= sum of the amounts burned
+        Post: del storage.redemptions[redemption_id] for the settled redemptions
+        Post: storage.next_settlement_id += count
+        Post: emit Event.SETTLE_REDEMPTIONS(first_redemption_id, count, refunds)
+
+        Args:
+            first_redemption_id (sp.nat): id of the head of the queue
+            count (sp.nat): number of redemptions to settle
+            refunds (sp.set(sp.nat)): ids of the settled redemptions that are refunded instead of burned
+        """
+        sp.set_type(first_redemption_id, sp.TNat)
+        sp.set_type(count, sp.TNat)
+        sp.set_type(refunds, sp.TSet(sp.TNat))
+
+        end_redemption_id = sp.local("end_redemption_id", first_redemption_id + count)
+        sp.verify((first_redemption_id == self.data.next_settlement_id) & (count > 0) & (end_redemption_id.value <= self.data.next_redemption_id),
+                  message=self.error(FA2ErrorMessage.REDEMPTION_UNDEFINED))
+        with sp.for_('refund', refunds.elements()) as refund:
+            sp.verify((refund >= first_redemption_id) & (refund < end_redemption_id.value), message=self.error(FA2ErrorMessage.REDEMPTION_UNDEFINED))
+        self.verify_is_admin(sp.nat(0))
+
+        burned = sp.local("burned", sp.nat(0))
+        settled = sp.local("settled", sp.nat(0))
+        balances = self.make_balance_cache()
+        with sp.for_('redemption_id', sp.range(first_redemption_id, end_redemption_id.value)) as redemption_id:
+            redemption = sp.local("redemption", self.data.redemptions[redemption_id])
+            del self.data.redemptions[redemption_id]
+            settled.value += redemption.value.amount
+            with sp.if_(refunds.contains(redemption_id)):
+                self.load_balance(balances, redemption.value.owner)
+                balances.value[redemption.value.owner].balance += redemption.value.amount
+            with sp.else_():
+                burned.value += redemption.value.amount
+
+        self.load_balance(balances, sp.self_address)
+        balances.value[sp.self_address].balance = sp.as_nat(balances.value[sp.self_address].balance - settled.value)
+        self.flush_balances(balances)
+        self.data.total_supply = sp.as_nat(self.data.total_supply - burned.value)
+        self.data.next_settlement_id = end_redemption_id.value
+        self.emit_event(Event.SETTLE_REDEMPTIONS, sp.record(first_redemption_id=first_redemption_id, count=count, refunds=refunds),
+                        Event.get_settle_redemptions_type())
+
+    @sp.entry_point
+    def pause_token(self, token_id, pause):
+        """Pauses or unpauses transfers and operator updates of the single asset
+        Pre: token_id == 0
+        Pre: verify_is_admin(0)
+        Post: storage.paused = pause
+        Post: emit Event.PAUSE([TokenPause(token_id, pause)])
+
+        Args:
+            token_id (sp.nat): token id
+            pause (sp.bool): whether the token is paused
+        """
+        sp.set_type(token_id, sp.TNat)
+        sp.set_type(pause, sp.TBool)
+
+        self.verify_token_defined(token_id)
+        self.verify_is_admin(token_id)
+        self.data.paused = pause
+        self.emit_event(Event.PAUSE, sp.list([TokenPause.make(token_id, pause)]), Event.get_pause_type())
+
+    @sp.entry_point
+    def pause_tokens(self, token_pauses):
+        """Batched version of pause_token, the single asset has one pause flag which gets the pause of the last item
+        Pre: token_pause.token_id == 0
+        Pre: verify_is_admin(0)
+        Post: storage.paused = last token_pause.pause
+        Post: emit Event.PAUSE(token_pauses)
+
+        Args:
+            token_pauses (sp.list(TokenPause)): the pause flag of every token to update
+        """
+        sp.set_type(token_pauses, TokenPause.get_batch_type())
+
+        self.verify_is_admin(sp.nat(0))
+        paused = self.load_pause_state()
+        with sp.for_('token_pause', token_pauses) as token_pause:
+            self.verify_token_defined(token_pause.token_id)
+            paused.value = token_pause.pause
+        self.data.paused = paused.value
+        self.emit_event(Event.PAUSE, token_pauses, Event.get_pause_type())
+
+    @sp.onchain_view(name="is_paused")
+    def is_paused_view(self, token_id):
+        """On-chain view returning whether transfers and operator updates are paused, for every token id
+
+        Args:
+            token_id (sp.nat): token id
+        """
+        sp.set_type(token_id, sp.TNat)
+        sp.result(self.data.paused)
+
+    @sp.offchain_view(pure=True, name="is_paused")
+    def is_paused_offchain(self, token_id):
+        """TZIP-16 off-chain view returning whether transfers and operator updates are paused, see is_paused_view
+
+        Args:
+            token_id (sp.nat): token id
+        """
+        sp.set_type(token_id, sp.TNat)
+        sp.result(self.data.paused)
 
 @sp.add_test("FA2 Token Tests")
 def test():
@@ -537,17 +2148,85 @@ def test():
     scenario.h3("Cindy fails to burn")
     scenario += token.burn(RecipientTokenAmount.make(bob.address, 0, 500)).run(sender=cindy, valid=False)
 
+    scenario.h2("Batch Mint")
+
+    scenario.h3("Admin mints 10 token 0 to Alice and twice 10 token 0 to Robert in one call")
+    scenario += token.mint_batch([
+        RecipientTokenAmount.make(alice.address, 0, 10),
+        RecipientTokenAmount.make(bob.address, 0, 10),
+        RecipientTokenAmount.make(bob.address, 0, 10)]).run(sender=admin)
+    scenario.verify(token.data.ledger[LedgerKey.make(0, alice.address)] == 1010)
+    scenario.verify(token.data.ledger[LedgerKey.make(0, bob.address)] == 520)
+    scenario.verify(token.data.total_supply[0] == 1530)
+
+    scenario.h3("Cindy fails to batch mint")
+    scenario += token.mint_batch([RecipientTokenAmount.make(cindy.address, 0, 10)]).run(sender=cindy, valid=False)
+
+    scenario.h3("Admin fails to batch mint token 1")
+    scenario += token.mint_batch([
+        RecipientTokenAmount.make(alice.address, 0, 10),
+        RecipientTokenAmount.make(bob.address, 1, 10)]).run(sender=admin, valid=False)
+
+    scenario.h2("Batch Burn")
+
+    scenario.h3("Admin burns 10 token 0 from Alice and twice 10 token 0 from Robert in one call")
+    scenario += token.burn_batch([
+        RecipientTokenAmount.make(alice.address, 0, 10),
+        RecipientTokenAmount.make(bob.address, 0, 10),
+        RecipientTokenAmount.make(bob.address, 0, 10)]).run(sender=admin)
+    scenario.verify(token.data.ledger[LedgerKey.make(0, alice.address)] == 1000)
+    scenario.verify(token.data.ledger[LedgerKey.make(0, bob.address)] == 500)
+    scenario.verify(token.data.total_supply[0] == 1500)
+
+    scenario.h3("Cindy fails to batch burn")
+    scenario += token.burn_batch([RecipientTokenAmount.make(bob.address, 0, 10)]).run(sender=cindy, valid=False)
+
+    scenario.h3("Admin fails to batch burn more than the balance of Cindy")
+    scenario += token.burn_batch([RecipientTokenAmount.make(cindy.address, 0, 10)]).run(sender=admin, valid=False)
+
     scenario.h2("Transfer")
 
     scenario.h3("Alice transfers 1 of token 0 to Robert")
     transfer0 = sp.record(to_=bob.address, token_id=sp.nat(0), amount=sp.nat(1))
     scenario += token.transfer([sp.record(from_=alice.address, txs=[transfer0])]).run(sender=alice)
 
+    scenario.h3("Alice transfers 1 of token 0 twice to Robert and twice to Cindy in one batch")
+    transfer1 = sp.record(to_=cindy.address, token_id=sp.nat(0), amount=sp.nat(1))
+    scenario += token.transfer([sp.record(from_=alice.address, txs=[transfer0, transfer1, transfer0, transfer1])]).run(sender=alice)
+    scenario.verify(token.data.ledger[LedgerKey.make(0, alice.address)] == 995)
+    scenario.verify(token.data.ledger[LedgerKey.make(0, bob.address)] == 503)
+    scenario.verify(token.data.ledger[LedgerKey.make(0, cindy.address)] == 2)
+
+    scenario.h3("Cindy fails to transfer more than her balance in one batch")
+    transfer2 = sp.record(to_=bob.address, token_id=sp.nat(0), amount=sp.nat(2))
+    scenario += token.transfer([sp.record(from_=cindy.address, txs=[transfer2, transfer2])]).run(sender=cindy, valid=False)
+
+    scenario.h3("Cindy transfers her whole balance to herself and then to Robert")
+    scenario += token.transfer([sp.record(from_=cindy.address, txs=[
+        sp.record(to_=cindy.address, token_id=sp.nat(0), amount=sp.nat(2)), transfer2])]).run(sender=cindy)
+    scenario.verify(~token.data.ledger.contains(LedgerKey.make(0, cindy.address)))
+    scenario.verify(token.data.ledger[LedgerKey.make(0, bob.address)] == 505)
+
+    scenario.h3("Robert fails to pull token 0 from Alice without being an operator")
+    scenario += token.transfer([sp.record(from_=alice.address, txs=[transfer0])]).run(sender=bob, valid=False)
+
     scenario.h2("Operators")
     scenario.h3("Alice adds Robert as operator for token 0")
+    operator_update0 = sp.variant("add_operator", sp.record(owner=alice.address, operator=bob.address, token_id=sp.nat(0)))
+    scenario += token.update_operators([operator_update0]).run(sender=alice)
+
     scenario.h3("Robert pulls 500 of token 0 from Alice")
+    transfer3 = sp.record(to_=bob.address, token_id=sp.nat(0), amount=sp.nat(500))
+    scenario += token.transfer([sp.record(from_=alice.address, txs=[transfer3])]).run(sender=bob)
+    scenario.verify(token.data.ledger[LedgerKey.make(0, alice.address)] == 495)
+
     scenario.h3("Cindy fails to pull 500 of token 0 from Alice")
+    transfer4 = sp.record(to_=cindy.address, token_id=sp.nat(0), amount=sp.nat(500))
+    scenario += token.transfer([sp.record(from_=alice.address, txs=[transfer4])]).run(sender=cindy, valid=False)
+
     scenario.h3("Cindy fails to set operator on Alice")
+    operator_update3 = sp.variant("add_operator", sp.record(owner=alice.address, operator=cindy.address, token_id=sp.nat(0)))
+    scenario += token.update_operators([operator_update3]).run(sender=cindy, valid=False)
 
     scenario.h3("Admin fails to set operator on Alice")
     operator_update4 = sp.variant("add_operator", sp.record(owner=alice.address, operator=admin.address, token_id=sp.nat(0)))
@@ -559,3 +2238,560 @@ def test():
     scenario += token.pause_token(token_id=sp.nat(0), pause=True).run(sender=admin)
 
     scenario.h3("Alice fails to transfer token 0 balance")
+    scenario += token.transfer([sp.record(from_=alice.address, txs=[transfer0])]).run(sender=alice, valid=False)
+
+    scenario.h3("Robert fails to pull token 0 from Alice")
+    scenario += token.transfer([sp.record(from_=alice.address, txs=[transfer0])]).run(sender=bob, valid=False)
+
+    scenario.h3("Alice fails to remove Robert as operator for token 0")
+    operator_update5 = sp.variant("remove_operator", sp.record(owner=alice.address, operator=bob.address, token_id=sp.nat(0)))
+    scenario += token.update_operators([operator_update5]).run(sender=alice, valid=False)
+
+    scenario.h3("Admin unpauses token 0")
+    scenario += token.pause_token(token_id=sp.nat(0), pause=False).run(sender=admin)
+
+    scenario.h3("Alice transfers token 0 again")
+    scenario += token.transfer([sp.record(from_=alice.address, txs=[transfer0])]).run(sender=alice)
+
+    scenario.h3("Alice removes Robert as operator for token 0")
+    scenario += token.update_operators([operator_update5]).run(sender=alice)
+    scenario.verify(~token.data.operators.contains(OperatorKey.make(0, alice.address, bob.address)))
+
+    scenario.h2("Views")
+
+    scenario.h3("Balances")
+    scenario.verify(token.get_balance(LedgerKey.make(0, alice.address)) == 494)
+    scenario.verify(token.get_balance(LedgerKey.make(0, cindy.address)) == 0)
+    scenario.verify_equal(token.get_balances([LedgerKey.make(0, alice.address), LedgerKey.make(0, bob.address)]), [
+        sp.record(request=LedgerKey.make(0, alice.address), balance=494),
+        sp.record(request=LedgerKey.make(0, bob.address), balance=1006)])
+
+    scenario.h3("Total supply")
+    scenario.verify(token.total_supply(0) == 1500)
+
+    scenario.h3("All tokens")
+    scenario.verify_equal(token.all_tokens(), [0])
+
+    scenario.h3("Operators")
+    scenario.verify(~token.is_operator(OperatorKey.make(0, alice.address, bob.address)))
+    scenario += token.update_operators([operator_update0]).run(sender=alice)
+    scenario.verify(token.is_operator(OperatorKey.make(0, alice.address, bob.address)))
+
+    scenario.h3("Pause")
+    scenario.verify(~token.is_paused_view(0))
+    scenario += token.pause_token(token_id=sp.nat(0), pause=True).run(sender=admin)
+    scenario.verify(token.is_paused_view(0))
+    scenario += token.pause_tokens([TokenPause.make(0, False)]).run(sender=alice, valid=False)
+    scenario += token.pause_tokens([TokenPause.make(0, False), TokenPause.make(0, True)]).run(sender=admin)
+    scenario.verify(token.is_paused_view(0))
+
+    scenario.h2("Permits")
+    scenario += token.pause_token(token_id=sp.nat(0), pause=False).run(sender=admin)
+    chain_id = sp.chain_id_cst("0x9caecab9")
+
+    def make_permit(signer, nonce, expiry, transfer):
+        params_hash = sp.blake2b(sp.pack(transfer))
+        signed = sp.pack(sp.set_type_expr(
+            sp.pair(sp.pair(chain_id, token.address), sp.pair(sp.nat(nonce), sp.pair(expiry, params_hash))), Permit.get_signed_type()))
+        return sp.record(public_key=signer.public_key, signature=sp.make_signature(signer.secret_key, signed, message_format="Raw"),
+                         expiry=expiry, params_hash=params_hash)
+
+    permit_transfer = Transfer.item(alice.address, [sp.record(to_=cindy.address, token_id=sp.nat(0), amount=sp.nat(4))])
+    other_transfer = Transfer.item(alice.address, [sp.record(to_=cindy.address, token_id=sp.nat(0), amount=sp.nat(5))])
+
+    scenario.h3("Robert submits a permit of Alice for 4 token 0 to Cindy")
+    scenario += token.permit([make_permit(alice, 0, sp.timestamp(100), permit_transfer)]).run(sender=bob, now=sp.timestamp(50), chain_id=chain_id)
+    scenario.verify(token.data.permit_nonces[alice.address] == 1)
+
+    scenario.h3("Robert fails to transfer another amount with the permit")
+    scenario += token.transfer([other_transfer]).run(sender=bob, now=sp.timestamp(60), chain_id=chain_id, valid=False, exception=FA2ErrorMessage.NOT_OWNER)
+
+    scenario.h3("Robert transfers 4 token 0 from Alice to Cindy with the permit")
+    scenario += token.transfer([permit_transfer]).run(sender=bob, now=sp.timestamp(60), chain_id=chain_id)
+    scenario.verify(token.data.ledger[LedgerKey.make(0, cindy.address)] == 4)
+    scenario.verify(~token.data.permits.contains(PermitKey.make(alice.address, sp.blake2b(sp.pack(permit_transfer)))))
+
+    scenario.h3("Robert fails to replay the consumed permit")
+    scenario += token.transfer([permit_transfer]).run(sender=bob, now=sp.timestamp(60), chain_id=chain_id, valid=False, exception=FA2ErrorMessage.NOT_OWNER)
+
+    scenario.h3("Robert fails to resubmit the permit with the used nonce")
+    scenario += token.permit([make_permit(alice, 0, sp.timestamp(100), permit_transfer)]).run(sender=bob, now=sp.timestamp(60), chain_id=chain_id, valid=False, exception=FA2ErrorMessage.MISSIGNED)
+
+    scenario.h3("Robert fails to submit a permit of Alice signed by Cindy")
+    forged_permit = make_permit(cindy, 1, sp.timestamp(100), permit_transfer)
+    forged_permit = sp.record(public_key=alice.public_key, signature=forged_permit.signature, expiry=forged_permit.expiry, params_hash=forged_permit.params_hash)
+    scenario += token.permit([forged_permit]).run(sender=bob, now=sp.timestamp(60), chain_id=chain_id, valid=False, exception=FA2ErrorMessage.MISSIGNED)
+
+    scenario.h3("Robert fails to submit an expired permit")
+    scenario += token.permit([make_permit(alice, 1, sp.timestamp(100), permit_transfer)]).run(sender=bob, now=sp.timestamp(101), chain_id=chain_id, valid=False, exception=FA2ErrorMessage.EXPIRED_PERMIT)
+
+    scenario.h3("Robert fails to use a permit after its expiry")
+    scenario += token.permit([make_permit(alice, 1, sp.timestamp(100), permit_transfer)]).run(sender=bob, now=sp.timestamp(90), chain_id=chain_id)
+    scenario += token.transfer([permit_transfer]).run(sender=bob, now=sp.timestamp(101), chain_id=chain_id, valid=False, exception=FA2ErrorMessage.EXPIRED_PERMIT)
+
+    scenario.h2("All Tokens Operators")
+    scenario += token.set_token_metadata(sp.record(token_id=sp.nat(1), token_info=token_info)).run(sender=admin)
+    scenario += token.mint(RecipientTokenAmount.make(alice.address, 1, 10)).run(sender=admin)
+
+    scenario.h3("Robert fails to update the operators of Alice")
+    all_tokens_grant = sp.record(operator=cindy.address, token_id=sp.none)
+    scenario += token.update_operators_bulk([sp.record(owner=alice.address, updates=[sp.variant("add_operator", all_tokens_grant)])]).run(
+        sender=bob, valid=False, exception=FA2ErrorMessage.NOT_OWNER)
+
+    scenario.h3("Alice adds Cindy as operator of all her tokens and removes Robert as operator for token 0 in one call")
+    scenario += token.update_operators_bulk([sp.record(owner=alice.address, updates=[
+        sp.variant("add_operator", all_tokens_grant),
+        sp.variant("remove_operator", sp.record(operator=bob.address, token_id=sp.some(sp.nat(0))))])]).run(sender=alice)
+    scenario.verify(token.data.all_tokens_operators.contains(OwnerOperatorKey.make(alice.address, cindy.address)))
+    scenario.verify(~token.data.operators.contains(OperatorKey.make(0, alice.address, bob.address)))
+    scenario.verify(token.is_operator(OperatorKey.make(1, alice.address, cindy.address)))
+
+    scenario.h3("Cindy pulls token 0 and token 1 from Alice")
+    scenario += token.transfer([Transfer.item(alice.address, [
+        sp.record(to_=cindy.address, token_id=sp.nat(0), amount=sp.nat(1)),
+        sp.record(to_=cindy.address, token_id=sp.nat(1), amount=sp.nat(2))])]).run(sender=cindy)
+    scenario.verify(token.data.ledger[LedgerKey.make(1, cindy.address)] == 2)
+
+    scenario.h3("Robert fails to pull token 0 from Alice")
+    scenario += token.transfer([Transfer.item(alice.address, [transfer0])]).run(sender=bob, valid=False, exception=FA2ErrorMessage.NOT_OWNER)
+
+    scenario.h3("Alice removes Cindy as operator of all her tokens")
+    scenario += token.update_operators_bulk([sp.record(owner=alice.address, updates=[sp.variant("remove_operator", all_tokens_grant)])]).run(sender=alice)
+    scenario.verify(~token.is_operator(OperatorKey.make(1, alice.address, cindy.address)))
+    scenario += token.transfer([Transfer.item(alice.address, [transfer1])]).run(sender=cindy, valid=False, exception=FA2ErrorMessage.NOT_OWNER)
+
+    scenario.h2("Redemptions")
+    btc_address = sp.string("bc1qar0srrr7xfkvy5l643lydnw9re59gtzzwf5mdq")
+
+    scenario.h3("Cindy queues both her token 1 for redemption, in two requests")
+    scenario += token.request_redemption(token_id=sp.nat(1), amount=sp.nat(1), btc_address=btc_address).run(sender=cindy)
+    scenario += token.request_redemption(token_id=sp.nat(1), amount=sp.nat(1), btc_address=btc_address).run(sender=cindy)
+    scenario += token.request_redemption(token_id=sp.nat(1), amount=sp.nat(1), btc_address=btc_address).run(
+        sender=cindy, valid=False, exception=FA2ErrorMessage.INSUFFICIENT_BALANCE)
+    scenario.verify(~token.data.ledger.contains(LedgerKey.make(1, cindy.address)))
+    scenario.verify(token.data.ledger[LedgerKey.make(1, token.address)] == 2)
+    scenario.verify(token.data.next_redemption_id == 2)
+    scenario += token.request_redemption(token_id=sp.nat(1), amount=sp.nat(0), btc_address=btc_address).run(
+        sender=cindy, valid=False, exception=FA2ErrorMessage.INVALID_AMOUNT)
+
+    scenario.h3("Admin fails to import a balance over the escrowed tokens")
+    scenario += token.import_balances(token_id=sp.nat(1), balances=[HolderBalance.make(token.address, sp.nat(0))]).run(
+        sender=admin, valid=False, exception=FA2ErrorMessage.ESCROW_BALANCE)
+    scenario.verify(token.data.ledger[LedgerKey.make(1, token.address)] == 2)
+
+    scenario.h3("Only a token administrator settles redemptions")
+    scenario += token.settle_redemptions(first_redemption_id=sp.nat(0), count=sp.nat(1), refunds=sp.set(t=sp.TNat)).run(
+        sender=cindy, valid=False, exception=FA2ErrorMessage.NOT_ADMIN)
+    scenario += token.settle_redemptions(first_redemption_id=sp.nat(0), count=sp.nat(3), refunds=sp.set(t=sp.TNat)).run(
+        sender=admin, valid=False, exception=FA2ErrorMessage.REDEMPTION_UNDEFINED)
+
+    scenario.h3("The custodian burns the first redemption and refunds the second in one call")
+    total_supply = scenario.compute(token.total_supply(1))
+    scenario += token.settle_redemptions(first_redemption_id=sp.nat(0), count=sp.nat(2), refunds=sp.set([sp.nat(1)])).run(sender=admin)
+    scenario.verify(token.total_supply(1) == sp.as_nat(total_supply - 1))
+    scenario.verify(token.data.ledger[LedgerKey.make(1, cindy.address)] == 1)
+    scenario.verify(~token.data.ledger.contains(LedgerKey.make(1, token.address)))
+    scenario.verify(~token.data.redemptions.contains(0) & ~token.data.redemptions.contains(1))
+    scenario.verify(token.data.next_settlement_id == 2)
+    scenario += token.settle_redemptions(first_redemption_id=sp.nat(0), count=sp.nat(2), refunds=sp.set(t=sp.TNat)).run(
+        sender=admin, valid=False, exception=FA2ErrorMessage.REDEMPTION_UNDEFINED)
+
+@sp.add_test("FA2 Compact Errors")
+def compact_errors_test():
+    scenario = sp.test_scenario()
+    scenario.h1("FA2 Compact Errors")
+
+    admin = sp.test_account("Administrator")
+    alice = sp.test_account("Alice")
+    metadata = { "" : sp.utils.bytes_of_string("ipfs://QmPCcZe6mH6qcx9jrkH3khBe9MGbjUggaP9rL5Pme8NQWh") }
+    token = AdministrableFA2({ LedgerKey.make(0, admin.address): sp.unit }, metadata, compact_errors=True)
+    scenario += token
+    token_metadata = sp.record(token_id=sp.nat(0), token_info=sp.map(tkey=sp.TString, tvalue=sp.TBytes))
+    scenario += token.set_token_metadata(token_metadata).run(sender=admin)
+    scenario += token.mint(RecipientTokenAmount.make(alice.address, 0, 10)).run(sender=admin)
+
+    scenario.h2("Non-standard errors fail with their code")
+    scenario += token.mint(RecipientTokenAmount.make(alice.address, 0, 10)).run(
+        sender=alice, valid=False, exception=sp.nat(FA2ErrorMessage.COMPACT_CODES[FA2ErrorMessage.NOT_ADMIN]))
+    scenario += token.pause_token(token_id=sp.nat(0), pause=True).run(sender=admin)
+    transfer = sp.record(from_=alice.address, txs=[sp.record(to_=admin.address, token_id=sp.nat(0), amount=sp.nat(1))])
+    scenario += token.transfer([transfer]).run(
+        sender=alice, valid=False, exception=sp.nat(FA2ErrorMessage.COMPACT_CODES[FA2ErrorMessage.TOKEN_PAUSED]))
+    scenario += token.pause_token(token_id=sp.nat(0), pause=False).run(sender=admin)
+
+    scenario.h2("FA2 errors keep their string")
+    overdraft = sp.record(from_=alice.address, txs=[sp.record(to_=admin.address, token_id=sp.nat(0), amount=sp.nat(11))])
+    scenario += token.transfer([overdraft]).run(sender=alice, valid=False, exception=FA2ErrorMessage.INSUFFICIENT_BALANCE)
+    scenario += token.transfer([transfer]).run(sender=admin, valid=False, exception=FA2ErrorMessage.NOT_OWNER)
+
+@sp.add_test("FA2 Balance Checkpoints")
+def checkpoints_test():
+    scenario = sp.test_scenario()
+    scenario.h1("FA2 Balance Checkpoints")
+
+    admin = sp.test_account("Administrator")
+    alice = sp.test_account("Alice")
+    bob = sp.test_account("Robert")
+
+    def balance_at(token, owner, level):
+        return token.balance_at(sp.record(owner=owner.address, token_id=sp.nat(0), level=sp.nat(level)))
+
+    for single_asset in (False, True):
+        scenario.h2("SingleAssetFA2" if single_asset else "AdministrableFA2")
+        token = make_benchmark_token(admin.address, single_asset=single_asset, checkpoints=True)
+        scenario += token
+        scenario += token.set_token_metadata(make_benchmark_token_metadata()).run(sender=admin)
+        alice_key = alice.address if single_asset else LedgerKey.make(0, alice.address)
+
+        scenario.h3("Mint, two transfers in the same level and a burn")
+        scenario += token.mint(RecipientTokenAmount.make(alice.address, 0, 100)).run(sender=admin, level=10)
+        scenario += token.transfer([Transfer.item(alice.address, [sp.record(to_=bob.address, token_id=sp.nat(0), amount=sp.nat(30))])]).run(
+            sender=alice, level=20)
+        scenario += token.transfer([Transfer.item(alice.address, [sp.record(to_=bob.address, token_id=sp.nat(0), amount=sp.nat(10))])]).run(
+            sender=alice, level=20)
+        scenario += token.burn(RecipientTokenAmount.make(alice.address, 0, 60)).run(sender=admin, level=30)
+
+        scenario.h3("The writes of one level share a checkpoint")
+        scenario.verify(token.data.checkpoint_heads[alice_key].count == 3)
+        scenario.verify(token.data.checkpoint_heads[alice_key].level == 30)
+
+        scenario.h3("balance_at returns the balance at the end of a level")
+        scenario.verify(balance_at(token, alice, 9) == 0)
+        scenario.verify(balance_at(token, alice, 10) == 100)
+        scenario.verify(balance_at(token, alice, 19) == 100)
+        scenario.verify(balance_at(token, alice, 20) == 60)
+        scenario.verify(balance_at(token, alice, 29) == 60)
+        scenario.verify(balance_at(token, alice, 30) == 0)
+        scenario.verify(balance_at(token, bob, 19) == 0)
+        scenario.verify(balance_at(token, bob, 1000) == 40)
+
+@sp.add_test("FA2 Single Asset Tests")
+def single_asset_test():
+    """Behaviour specific to SingleAssetFA2, the common behaviour is covered by the shared test vectors"""
+    scenario = sp.test_scenario()
+    scenario.h1("FA2 Single Asset Tests")
+
+    admin = sp.test_account("Administrator")
+    alice = sp.test_account("Alice")
+    bob = sp.test_account("Robert")
+    metadata = { "" : sp.utils.bytes_of_string("ipfs://QmPCcZe6mH6qcx9jrkH3khBe9MGbjUggaP9rL5Pme8NQWh") }
+    token = SingleAssetFA2([admin.address], metadata)
+    scenario += token
+
+    scenario.h2("Only token 0 exists")
+    scenario.verify_equal(token.all_tokens(), [])
+    scenario += token.set_token_metadata(make_benchmark_token_metadata()).run(sender=admin)
+    scenario.verify_equal(token.all_tokens(), [0])
+    token1_metadata = sp.record(token_id=sp.nat(1), token_info=sp.map(tkey=sp.TString, tvalue=sp.TBytes))
+    scenario += token.set_token_metadata(token1_metadata).run(sender=admin, valid=False, exception=FA2ErrorMessage.TOKEN_UNDEFINED)
+    scenario += token.mint(RecipientTokenAmount.make(alice.address, 0, 10)).run(sender=admin)
+    token1_transfer = Transfer.item(alice.address, [sp.record(to_=bob.address, token_id=sp.nat(1), amount=sp.nat(0))])
+    scenario += token.transfer([token1_transfer]).run(sender=alice, valid=False, exception=FA2ErrorMessage.TOKEN_UNDEFINED)
+    scenario += token.set_administrator(token_id=sp.nat(1), administrator_to_set=bob.address).run(
+        sender=admin, valid=False, exception=FA2ErrorMessage.NOT_ADMIN)
+
+    scenario.h2("Plain storage values")
+    scenario.verify(token.data.ledger[alice.address] == 10)
+    scenario.verify(token.data.total_supply == 10)
+    scenario += token.pause_token(token_id=sp.nat(0), pause=True).run(sender=admin)
+    scenario.verify(token.data.paused)
+    scenario += token.pause_token(token_id=sp.nat(0), pause=False).run(sender=admin)
+    scenario += token.burn(RecipientTokenAmount.make(alice.address, 0, 10)).run(sender=admin)
+    scenario.verify(~token.data.ledger.contains(alice.address))
+    scenario.verify(token.data.total_supply == 0)
+
+    scenario.h2("Operators cover the whole balance")
+    operator_update = sp.variant("add_operator", sp.record(owner=alice.address, operator=bob.address, token_id=sp.nat(0)))
+    scenario += token.update_operators([operator_update]).run(sender=alice)
+    scenario.verify(token.data.operators.contains(OwnerOperatorKey.make(alice.address, bob.address)))
+    scenario.verify(token.is_operator(OperatorKey.make(0, alice.address, bob.address)))
+
+BENCHMARK_BATCH_SIZES = [1, 10, 100, 500]
+"""Batch sizes used by the benchmark scenarios, tools/benchmark.py measures the same sizes against the compiled contract"""
+
+BENCHMARK_ADMINISTRATOR = "tz1KqTpEZ7Yob7QbPE4Hy4Wo8fHG8LhKxZSx"
+"""Address of bootstrap1 in the octez mockup, set as administrator of the contract compiled for the benchmarks"""
+
+class BalanceOfCallback(sp.Contract):
+    """Minimal balance_of callback contract, used by the benchmark scenarios"""
+    def __init__(self):
+        self.init(responses=sp.set_type_expr(sp.list([]), BalanceOf.get_response_type()))
+
+    @sp.entry_point
+    def receive_balances(self, responses):
+        sp.set_type(responses, BalanceOf.get_response_type())
+        self.data.responses = responses
+
+def make_benchmark_token(administrator, compact_errors=False, single_asset=False, events=True, lazy_admin=True, checkpoints=False):
+    """Creates the token used by the benchmark scenarios and the benchmark compilation targets
+
+    Args:
+        administrator (sp.address): the administrator of token 0
+        compact_errors (bool, optional): see BaseFA2. Defaults to False.
+        single_asset (bool, optional): create a SingleAssetFA2 instead of an AdministrableFA2. Defaults to False.
+        events (bool, optional): see BaseFA2. Defaults to True.
+        lazy_admin (bool, optional): see BaseFA2. Defaults to True.
+        checkpoints (bool, optional): see BaseFA2. Defaults to False.
+
+    Returns:
+        AdministrableFA2: the token contract
+    """
+    metadata = { "" : sp.utils.bytes_of_string("ipfs://QmPCcZe6mH6qcx9jrkH3khBe9MGbjUggaP9rL5Pme8NQWh") }
+    if single_asset:
+        return SingleAssetFA2([administrator], metadata, compact_errors, events, lazy_admin, checkpoints)
+    return AdministrableFA2({ LedgerKey.make(0, administrator): sp.unit }, metadata, compact_errors, events, lazy_admin, checkpoints)
+
+def make_benchmark_token_metadata():
+    """Returns the token 0 metadata used by the benchmark scenarios
+
+    Returns:
+        sp.record: typed token metadata
+    """
+    token_info = sp.map({
+        "" : sp.utils.bytes_of_string("ipfs://QmQMWgwv1BnFG46JVhwFyiSwudPaaNRh3nFqvT9Wab3qLV"),
+        "symbol": sp.utils.bytes_of_string("BTCtz"),
+        "name": sp.utils.bytes_of_string("BitcoinTez"),
+        "decimals": sp.utils.bytes_of_string("8")
+        }, tkey = sp.TString, tvalue = sp.TBytes)
+    return sp.set_type_expr(sp.record(token_id=sp.nat(0), token_info=token_info), TokenMetadata.get_type())
+
+@sp.add_test("FA2 Benchmark Scenarios")
+def benchmark_test():
+    """Runs every entrypoint at the benchmark batch sizes. The gas, storage and big_map diff figures of the same calls are recorded by tools/benchmark.py"""
+    scenario = sp.test_scenario()
+    scenario.h1("FA2 Benchmark Scenarios")
+    scenario.table_of_contents()
+
+    admin = sp.test_account("Administrator")
+    holders = [sp.test_account("Holder {}".format(index)) for index in range(max(BENCHMARK_BATCH_SIZES))]
+
+    for single_asset, batch_size in [(single_asset, batch_size) for single_asset in (False, True) for batch_size in BENCHMARK_BATCH_SIZES]:
+        scenario.h2("{} batch size {}".format("SingleAssetFA2" if single_asset else "AdministrableFA2", batch_size))
+        batch = holders[:batch_size]
+
+        token = make_benchmark_token(admin.address, single_asset=single_asset)
+        scenario += token
+        callback = BalanceOfCallback()
+        scenario += callback
+
+        scenario.h3("set_token_metadata")
+        scenario += token.set_token_metadata(make_benchmark_token_metadata()).run(sender=admin)
+
+        scenario.h3("mint")
+        scenario += token.mint(RecipientTokenAmount.make(admin.address, 0, 1000 * batch_size)).run(sender=admin)
+
+        scenario.h3("mint_batch")
+        scenario += token.mint_batch([RecipientTokenAmount.make(holder.address, 0, 100) for holder in batch]).run(sender=admin)
+
+        scenario.h3("transfer")
+        txs = [sp.record(to_=holder.address, token_id=sp.nat(0), amount=sp.nat(1)) for holder in batch]
+        scenario += token.transfer([sp.record(from_=admin.address, txs=txs)]).run(sender=admin)
+        scenario.verify(token.get_balance(LedgerKey.make(0, admin.address)) == 999 * batch_size)
+
+        scenario.h3("import_balances")
+        scenario += token.import_balances(token_id=sp.nat(0), balances=[HolderBalance.make(holder.address, 101) for holder in batch]).run(sender=admin)
+        scenario.verify(token.total_supply(0) == 1100 * batch_size)
+
+        scenario.h3("update_operators")
+        operator_updates = [sp.variant("add_operator", sp.record(owner=admin.address, operator=holder.address, token_id=sp.nat(0))) for holder in batch]
+        scenario += token.update_operators(operator_updates).run(sender=admin)
+
+        scenario.h3("update_operators_bulk")
+        all_tokens_grants = [sp.variant("add_operator", sp.record(operator=holder.address, token_id=sp.none)) for holder in batch]
+        scenario += token.update_operators_bulk([sp.record(owner=admin.address, updates=all_tokens_grants)]).run(sender=admin)
+
+        scenario.h3("balance_of")
+        requests = [LedgerKey.make(0, holder.address) for holder in batch]
+        callback_entrypoint = sp.contract(BalanceOf.get_response_type(), callback.address, entry_point="receive_balances").open_some()
+        scenario += token.balance_of(sp.record(requests=requests, callback=callback_entrypoint)).run(sender=admin)
+
+        scenario.h3("burn_batch")
+        scenario += token.burn_batch([RecipientTokenAmount.make(holder.address, 0, 101) for holder in batch]).run(sender=admin)
+        scenario.verify(token.total_supply(0) == 999 * batch_size)
+
+        scenario.h3("burn")
+        scenario += token.burn(RecipientTokenAmount.make(admin.address, 0, 999 * batch_size)).run(sender=admin)
+
+        scenario.h3("pause_tokens")
+        scenario += token.pause_tokens([TokenPause.make(0, index < batch_size - 1) for index in range(batch_size)]).run(sender=admin)
+        scenario.verify(~token.is_paused_view(0))
+
+        scenario.h3("pause_token")
+        scenario += token.pause_token(token_id=sp.nat(0), pause=True).run(sender=admin)
+        scenario += token.pause_token(token_id=sp.nat(0), pause=False).run(sender=admin)
+
+        scenario.h3("set_administrator")
+        scenario += token.set_administrator(token_id=sp.nat(0), administrator_to_set=batch[0].address).run(sender=admin)
+
+        scenario.h3("remove_administrator")
+        scenario += token.remove_administrator(token_id=sp.nat(0), administrator_to_remove=batch[0].address).run(sender=admin)
+
+TEST_VECTORS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fa2_test_vectors.json")
+"""Test vectors shared with the pure-Python model in tools/simulator.py"""
+
+def vector_params(entrypoint, params):
+    """Converts the JSON parameter of a test vector step to the typed SmartPy parameter of the entrypoint
+
+    Args:
+        entrypoint (str): entrypoint name
+        params: JSON parameter, with the field names of the SmartPy records
+
+    Returns:
+        tuple: positional and keyword arguments of the entrypoint call
+    """
+    def recipient_token_amount(item):
+        return RecipientTokenAmount.make(sp.address(item["owner"]), sp.nat(item["token_id"]), sp.nat(item["token_amount"]))
+
+    if entrypoint == "transfer":
+        return [[Transfer.item(sp.address(transfer["from_"]), [
+            sp.record(to_=sp.address(tx["to_"]), token_id=sp.nat(tx["token_id"]), amount=sp.nat(tx["amount"])) for tx in transfer["txs"]])
+            for transfer in params]], {}
+    if entrypoint == "update_operators":
+        return [[sp.variant(kind, sp.record(owner=sp.address(update["owner"]), operator=sp.address(update["operator"]), token_id=sp.nat(update["token_id"])))
+            for update_operator in params for kind, update in update_operator.items()]], {}
+    if entrypoint == "update_operators_bulk":
+        def grant(item):
+            token_id = sp.none if item["token_id"] is None else sp.some(sp.nat(item["token_id"]))
+            return sp.record(operator=sp.address(item["operator"]), token_id=token_id)
+        return [[sp.record(owner=sp.address(owner_update["owner"]), updates=[sp.variant(kind, grant(item))
+            for update in owner_update["updates"] for kind, item in update.items()]) for owner_update in params]], {}
+    if entrypoint in ("mint", "burn"):
+        return [recipient_token_amount(params)], {}
+    if entrypoint in ("mint_batch", "burn_batch"):
+        return [[recipient_token_amount(item) for item in params]], {}
+    if entrypoint == "set_token_metadata":
+        token_info = sp.map({key: sp.bytes("0x" + value) for key, value in params["token_info"].items()}, tkey=sp.TString, tvalue=sp.TBytes)
+        return [sp.record(token_id=sp.nat(params["token_id"]), token_info=token_info)], {}
+    if entrypoint == "pause_token":
+        return [], dict(token_id=sp.nat(params["token_id"]), pause=sp.bool(params["pause"]))
+    if entrypoint == "pause_tokens":
+        return [[TokenPause.make(sp.nat(item["token_id"]), sp.bool(item["pause"])) for item in params]], {}
+    if entrypoint == "request_redemption":
+        return [], dict(token_id=sp.nat(params["token_id"]), amount=sp.nat(params["amount"]), btc_address=sp.string(params["btc_address"]))
+    if entrypoint == "settle_redemptions":
+        return [], dict(first_redemption_id=sp.nat(params["first_redemption_id"]), count=sp.nat(params["count"]), refunds=sp.set([sp.nat(refund) for refund in params["refunds"]], t=sp.TNat))
+    if entrypoint == "set_administrator":
+        return [], dict(token_id=sp.nat(params["token_id"]), administrator_to_set=sp.address(params["administrator_to_set"]))
+    if entrypoint == "remove_administrator":
+        return [], dict(token_id=sp.nat(params["token_id"]), administrator_to_remove=sp.address(params["administrator_to_remove"]))
+    if entrypoint == "import_balances":
+        return [], dict(token_id=sp.nat(params["token_id"]), balances=[HolderBalance.make(sp.address(item["owner"]), sp.nat(item["balance"])) for item in params["balances"]])
+    raise Exception("No test vector conversion for entrypoint {}".format(entrypoint))
+
+def vector_view(token, view, params, result):
+    """Converts an expected view of the test vectors to the view call on token and its typed expected result
+
+    Args:
+        token (AdministrableFA2): the token contract
+        view (str): view name
+        params: JSON parameter, with the field names of the SmartPy records
+        result: JSON result
+
+    Returns:
+        tuple: view call expression and expected result
+    """
+    def ledger_key(item):
+        return LedgerKey.make(sp.nat(item["token_id"]), sp.address(item["owner"]))
+
+    if view == "get_balance":
+        return token.get_balance(ledger_key(params)), sp.nat(result)
+    if view == "get_balances":
+        return token.get_balances([ledger_key(item) for item in params]), [
+            sp.record(request=ledger_key(request), balance=sp.nat(balance)) for request, balance in result]
+    if view == "total_supply":
+        return token.total_supply(sp.nat(params)), sp.nat(result)
+    if view == "is_operator":
+        return token.is_operator(OperatorKey.make(sp.nat(params["token_id"]), sp.address(params["owner"]), sp.address(params["operator"]))), sp.bool(result)
+    if view == "is_paused":
+        return token.is_paused_view(sp.nat(params)), sp.bool(result)
+    raise Exception("No test vector conversion for view {}".format(view))
+
+def run_vector_steps(scenario, token, vectors):
+    """Runs the steps of the test vectors against token
+
+    Args:
+        scenario (sp.test_scenario): the scenario
+        token (AdministrableFA2): the token contract
+        vectors (dict): content of contracts/fa2_test_vectors.json
+    """
+    for step in vectors["steps"]:
+        scenario.h3(step["description"])
+        args, kwargs = vector_params(step["entrypoint"], step["params"])
+        call = getattr(token, step["entrypoint"])(*args, **kwargs)
+        if step.get("valid", True):
+            scenario += call.run(sender=sp.address(step["sender"]))
+        elif "exception" in step:
+            scenario += call.run(sender=sp.address(step["sender"]), valid=False, exception=step["exception"])
+        else:
+            scenario += call.run(sender=sp.address(step["sender"]), valid=False)
+
+def verify_vector_views(scenario, token, expected):
+    """Checks the expected views of the test vectors against token
+
+    Args:
+        scenario (sp.test_scenario): the scenario
+        token (AdministrableFA2): the token contract
+        expected (dict): expected state of the test vectors
+    """
+    for expected_view in expected.get("views", []):
+        view_call, view_result = vector_view(token, expected_view["view"], expected_view["params"], expected_view["result"])
+        scenario.verify_equal(view_call, view_result)
+
+@sp.add_test("FA2 Shared Test Vectors")
+def vectors_test():
+    """Runs the steps of contracts/fa2_test_vectors.json, tools/simulator.py checks the same steps and expectations"""
+    with open(TEST_VECTORS_PATH) as vectors_file:
+        vectors = json.load(vectors_file)
+
+    scenario = sp.test_scenario()
+    scenario.h1("FA2 Shared Test Vectors")
+    scenario.table_of_contents()
+
+    metadata = { "" : sp.utils.bytes_of_string("ipfs://QmPCcZe6mH6qcx9jrkH3khBe9MGbjUggaP9rL5Pme8NQWh") }
+    administrators = { LedgerKey.make(sp.nat(token_id), sp.address(address)): sp.unit for address, token_id in vectors["administrators"] }
+    token = AdministrableFA2(administrators, metadata)
+    scenario += token
+    run_vector_steps(scenario, token, vectors)
+
+    scenario.h2("Expected storage")
+    expected = vectors["expected"]
+    for owner, token_id, amount in expected["ledger"]:
+        scenario.verify(token.data.ledger[LedgerKey.make(sp.nat(token_id), sp.address(owner))] == amount)
+    for token_id, amount in expected["total_supply"].items():
+        scenario.verify(token.data.total_supply[sp.nat(int(token_id))] == amount)
+    for owner, operator, token_id in expected["operators"]:
+        scenario.verify(token.data.operators.contains(OperatorKey.make(sp.nat(token_id), sp.address(owner), sp.address(operator))))
+    for owner, operator in expected.get("all_tokens_operators", []):
+        scenario.verify(token.data.all_tokens_operators.contains(OwnerOperatorKey.make(sp.address(owner), sp.address(operator))))
+    verify_vector_views(scenario, token, expected)
+
+@sp.add_test("FA2 Single Asset Shared Test Vectors")
+def single_asset_vectors_test():
+    """Runs the test vectors against SingleAssetFA2, which only uses token id 0 and must give the same results"""
+    with open(TEST_VECTORS_PATH) as vectors_file:
+        vectors = json.load(vectors_file)
+
+    scenario = sp.test_scenario()
+    scenario.h1("FA2 Single Asset Shared Test Vectors")
+    scenario.table_of_contents()
+
+    metadata = { "" : sp.utils.bytes_of_string("ipfs://QmPCcZe6mH6qcx9jrkH3khBe9MGbjUggaP9rL5Pme8NQWh") }
+    token = SingleAssetFA2([sp.address(address) for address, token_id in vectors["administrators"] if token_id == SingleAssetFA2.TOKEN_ID], metadata)
+    scenario += token
+    run_vector_steps(scenario, token, vectors)
+
+    scenario.h2("Expected storage")
+    expected = vectors["expected"]
+    for owner, token_id, amount in expected["ledger"]:
+        scenario.verify(token.data.ledger[sp.address(owner)] == amount)
+    scenario.verify(token.data.total_supply == expected["total_supply"][str(SingleAssetFA2.TOKEN_ID)])
+    for owner, operator in [(owner, operator) for owner, operator, token_id in expected["operators"]] + expected.get("all_tokens_operators", []):
+        scenario.verify(token.data.operators.contains(OwnerOperatorKey.make(sp.address(owner), sp.address(operator))))
+    verify_vector_views(scenario, token, expected)
+
+sp.add_compilation_target("btctz_benchmark", make_benchmark_token(sp.address(BENCHMARK_ADMINISTRATOR)))
+sp.add_compilation_target("btctz_benchmark_compact", make_benchmark_token(sp.address(BENCHMARK_ADMINISTRATOR), compact_errors=True))
+sp.add_compilation_target("btctz_benchmark_no_events", make_benchmark_token(sp.address(BENCHMARK_ADMINISTRATOR), events=False))
+sp.add_compilation_target("btctz_benchmark_eager", make_benchmark_token(sp.address(BENCHMARK_ADMINISTRATOR), lazy_admin=False))
+sp.add_compilation_target("btctz_single_asset_benchmark", make_benchmark_token(sp.address(BENCHMARK_ADMINISTRATOR), single_asset=True))
+sp.add_compilation_target("btctz_benchmark_checkpoints", make_benchmark_token(sp.address(BENCHMARK_ADMINISTRATOR), checkpoints=True))
@@ -0,0 +1,50 @@
+"""Checks the offline size report of tools/benchmark.py and its comparison"""
+import json
+import os
+
+from tools import benchmark
+from tools.micheline import binary, unbinary
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, "contracts", "btctz.micheline")
+
+def write_json(path, value):
+    with open(path, "w") as json_file:
+        json.dump(value, json_file)
+    return str(path)
+
+def test_size_of_the_compiled_contract(tmp_path):
+    storage = write_json(tmp_path / "storage.json", {"prim": "Pair", "args": [{"int": "0"}, {"string": "btctz"}]})
+    report = benchmark.size(SCRIPT, storage, str(tmp_path / "size.json"))
+    with open(SCRIPT) as script_file:
+        script = json.load(script_file)
+    encoded = binary(script)
+    assert unbinary(encoded)[0] == script
+    assert report["code_size"] == len(encoded)
+    # Pair tag and prim, int tag and zarith 0, string tag, length and "btctz"
+    assert report["script_size"] == len(encoded) + 2 + 2 + 1 + 4 + 5
+    with open(tmp_path / "size.json") as report_file:
+        assert json.load(report_file) == report
+
+def test_compare_size_reports(tmp_path):
+    with open(SCRIPT) as script_file:
+        script = json.load(script_file)
+    smaller = write_json(tmp_path / "smaller.json", [section for section in script if section["prim"] != "code"]
+                         + [{"prim": "code", "args": [[]]}])
+    rows = benchmark.compare(benchmark.size(SCRIPT), benchmark.size(smaller))
+    assert [(row["metric"], row["regression"]) for row in rows] == [("code_size", True)]
+    assert rows[0]["delta"] == rows[0]["current"] - rows[0]["baseline"] > 0
+    assert not any(row["regression"] for row in benchmark.compare(benchmark.size(smaller), benchmark.size(SCRIPT)))
+
+def test_hot_path_comparison():
+    """--hot-path keeps the sizes and the holder entrypoints, the administration entrypoints are left out"""
+    def report(code_size, gas):
+        results = [dict(case=entrypoint, entrypoint=entrypoint, batch_size=1, ledger_size=0, consumed_gas=gas,
+                        storage_size_diff=0, big_map_diffs=1) for entrypoint in ("transfer", "mint")]
+        return dict(code_size=code_size, results=results)
+
+    rows = benchmark.compare(report(3000, 100), report(5000, 150), entrypoints=benchmark.HOT_PATH_ENTRYPOINTS)
+    assert [(row["case"], row["metric"], row["delta"]) for row in rows] == [
+        ("code", "code_size", -2000), ("transfer", "consumed_gas", -50), ("transfer", "storage_size_diff", 0),
+        ("transfer", "big_map_diffs", 0)]
+    assert not any(row["regression"] for row in rows)
@@ -0,0 +1,133 @@
+"""Drives tools/client.py against the mock node of tools/mock_rpc.py, baking blocks by hand"""
+import asyncio
+import copy
+
+import pytest
+
+from tools import ed25519
+from tools.client import AsyncRpc, OperationError, OperationsClient
+from tools.mock_rpc import MockChain, serve
+from tools.simulator import FA2Simulator
+
+KEYS = [ed25519.SigningKey.from_passphrase("minter {}".format(index)) for index in range(2)]
+HOLDERS = [ed25519.SigningKey.from_passphrase("holder {}".format(index)).address for index in range(6)]
+
+@pytest.fixture
+def chain():
+    simulator = FA2Simulator([(key.address, 0) for key in KEYS])
+    simulator.apply(KEYS[0].address, "set_token_metadata", dict(token_id=0, token_info={}))
+    chain = MockChain.genesis()
+    for key in KEYS:
+        chain.add_account(key.public_key)
+    chain.contracts[simulator.address] = simulator
+    return chain
+
+@pytest.fixture
+def url(chain):
+    server = serve(chain)
+    yield "http://127.0.0.1:{}".format(server.server_port)
+    server.shutdown()
+
+def token(chain):
+    return next(iter(chain.contracts.values()))
+
+def run(chain, url, scenario, keys=KEYS, **options):
+    """Runs scenario(client) with a client of the token of chain, served at url"""
+    async def main():
+        rpc = AsyncRpc(url, 2)
+        try:
+            async with OperationsClient(rpc, token(chain).address, keys, poll_interval=0.01, **options) as client:
+                return await asyncio.wait_for(scenario(client), 10)
+        finally:
+            await rpc.close()
+    return asyncio.run(main())
+
+async def wait_for(predicate):
+    while not predicate():
+        await asyncio.sleep(0.01)
+
+async def bake_until(chain, future):
+    """Bakes a block every few polls of the client until future is done, returns its result"""
+    while not future.done():
+        chain.bake()
+        await asyncio.sleep(0.05)
+    return future.result()
+
+def sources(chain):
+    return sorted((operation["contents"][0]["source"], [int(content["counter"]) for content in operation["contents"]])
+                  for operation in chain.mempool)
+
+def test_counters_are_pipelined_across_accounts(chain, url):
+    """Each idle account takes the next calls, and an account sends its next group once the previous one is included"""
+    async def scenario(client):
+        calls = [client.mint(holder, index + 1) for index, holder in enumerate(HOLDERS)]
+        await wait_for(lambda: len(chain.mempool) == 2)
+        assert sources(chain) == sorted([(KEYS[0].address, [1, 2]), (KEYS[1].address, [1, 2])])
+        chain.bake()
+        await wait_for(lambda: len(chain.mempool) == 1)
+        assert sources(chain) == [(KEYS[0].address, [3, 4])]
+        receipts = [await bake_until(chain, call.confirmed) for call in calls]
+        return client, receipts
+
+    client, receipts = run(chain, url, scenario, max_calls_per_group=2)
+    assert [receipt["level"] for receipt in receipts] == [2, 2, 2, 2, 3, 3]
+    assert len({receipt["operation"] for receipt in receipts}) == 3
+    assert [account.counter for account in client.accounts] == [4, 2]
+    assert [chain.accounts[key.address]["counter"] for key in KEYS] == [4, 2]
+    assert [token(chain).get_balance(dict(owner=holder, token_id=0)) for holder in HOLDERS] == [1, 2, 3, 4, 5, 6]
+
+def test_a_call_failing_in_simulation_is_rejected_alone(chain, url):
+    """The failing call is dropped and the rest of its group is simulated again and injected"""
+    async def scenario(client):
+        calls = [client.mint(HOLDERS[0], 10), client.burn(HOLDERS[1], 1), client.mint(HOLDERS[2], 20)]
+        await wait_for(lambda: len(chain.mempool) == 1)
+        assert sources(chain) == [(KEYS[0].address, [1, 2])]
+        with pytest.raises(OperationError, match="burn failed in simulation"):
+            await calls[1].included
+        return [await bake_until(chain, call.confirmed) for call in (calls[0], calls[2])]
+
+    first, last = run(chain, url, scenario, keys=KEYS[:1])
+    assert first == last
+    assert token(chain).get_total_supply(0) == 30
+
+def test_a_group_not_included_within_the_ttl_fails_and_the_counter_is_read_again(chain, url):
+    async def scenario(client):
+        dropped = client.mint(HOLDERS[0], 1)
+        await wait_for(lambda: len(chain.mempool) == 1)
+        # the node drops the group, the blocks go on without it
+        chain.mempool.clear()
+        with pytest.raises(OperationError, match="was not included in 3 blocks"):
+            await bake_until(chain, dropped.included)
+        await wait_for(lambda: client.accounts[0].counter is not None)
+        resent = client.mint(HOLDERS[1], 2)
+        await wait_for(lambda: len(chain.mempool) == 1)
+        assert sources(chain) == [(KEYS[0].address, [1])]
+        return await bake_until(chain, resent.confirmed)
+
+    run(chain, url, scenario, keys=KEYS[:1], operations_ttl=3)
+    assert token(chain).get_balance(dict(owner=HOLDERS[0], token_id=0)) == 0
+    assert token(chain).get_balance(dict(owner=HOLDERS[1], token_id=0)) == 2
+
+def test_a_group_reorganised_out_is_confirmed_in_its_new_block(chain, url):
+    """The block including the group is replaced and the group is included again one level higher"""
+    async def scenario(client):
+        call = client.mint(HOLDERS[0], 5)
+        await wait_for(lambda: len(chain.mempool) == 1)
+        operation = chain.mempool[0]
+        contracts, accounts = copy.deepcopy(chain.contracts), copy.deepcopy(chain.accounts)
+        chain.bake()
+        first = await call.included
+
+        # a competing branch takes the level of the block, and includes the group in its next block
+        chain.reorg(first["level"] - 1, [])
+        chain.contracts, chain.accounts = contracts, accounts
+        chain.bake()
+        chain.mempool.append(operation)
+        chain.bake()
+        return first, await bake_until(chain, call.confirmed)
+
+    first, confirmed = run(chain, url, scenario, keys=KEYS[:1], confirmations=3)
+    assert confirmed["operation"] == first["operation"]
+    assert confirmed["level"] == first["level"] + 1
+    assert confirmed["block"] == chain.blocks[confirmed["level"] - 1]["hash"] != first["block"]
+    assert token(chain).get_balance(dict(owner=HOLDERS[0], token_id=0)) == 5
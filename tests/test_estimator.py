@@ -0,0 +1,53 @@
+"""Fits tools/estimator.py on synthetic benchmark reports and checks its held-out error and --max-error gate"""
+import json
+
+import pytest
+
+from tools import estimator
+from tools.estimator import Estimator, samples_from_report
+
+def gas(batch_size, new_keys):
+    return 1500 + 120 * batch_size + 900 * new_keys
+
+def make_report(noisy_index=None, noise=0.2):
+    """Report of transfer cases with an exactly linear gas, except the case at noisy_index"""
+    cases = [(case, batch_size, batch_size if case == "transfer_new_keys" else 0)
+             for batch_size in range(1, 6) for case in ("transfer_existing_keys", "transfer_new_keys")]
+    results = []
+    for index, (case, batch_size, new_keys) in enumerate(cases):
+        consumed_gas = gas(batch_size, new_keys) * (1 + noise if index == noisy_index else 1)
+        results.append(dict(case=case, entrypoint="transfer", batch_size=batch_size, ledger_size=0, new_keys=new_keys,
+                            consumed_gas=consumed_gas, paid_storage_size_diff=67 * new_keys))
+    results.append(dict(case="origination", entrypoint=None, batch_size=0, ledger_size=0, consumed_gas=5000, paid_storage_size_diff=9000))
+    return dict(results=results)
+
+def test_fit_of_an_exact_model():
+    samples = samples_from_report(make_report())
+    assert len(samples) == 10
+    fitted, report = Estimator.fit(samples)
+    assert report["transfer"]["samples"] == 8
+    assert report["transfer"]["held_out"] == 2
+    assert report["transfer"]["gas_error"] == pytest.approx(0, abs=1e-4)
+    gas_limit, storage_limit = fitted.models["transfer"].limits(dict(txs=20, new_keys=5))
+    assert gas_limit == pytest.approx(gas(20, 5), rel=1e-4)
+    assert storage_limit == pytest.approx(67 * 5, abs=1)
+
+def test_fit_reports_the_held_out_error():
+    """The 5th sample is held out, its 20% excess is the reported gas error and the gas margin"""
+    fitted, report = Estimator.fit(samples_from_report(make_report(noisy_index=4)))
+    assert report["transfer"]["gas_error"] == pytest.approx(0.2 / 1.2, rel=1e-3)
+    assert report["transfer"]["gas_margin"] == pytest.approx(0.2, rel=1e-3)
+    gas_limit, _ = fitted.models["transfer"].limits(dict(txs=3, new_keys=0))
+    assert gas_limit >= gas(3, 0) * 1.2
+
+@pytest.mark.parametrize("noisy_index, max_error, status", [(None, 0.05, 0), (4, 0.05, 1), (4, 0.2, 0)])
+def test_fit_fails_above_max_error(tmp_path, capsys, noisy_index, max_error, status):
+    report_path = tmp_path / "bench.json"
+    report_path.write_text(json.dumps(make_report(noisy_index)))
+    models_path = tmp_path / "estimator.json"
+    assert estimator.main(["fit", str(models_path), "--report", str(report_path), "--max-error", str(max_error)]) == status
+    line = capsys.readouterr().out.rstrip("\n")
+    assert line.startswith("!" if status else " ")
+    assert "gas_error=" in line
+    # the models are saved even when the gate fails, so that they can be inspected
+    assert set(Estimator.load(str(models_path)).models) == {"transfer"}
@@ -0,0 +1,99 @@
+"""Follows a chain of tools/mock_rpc.py with tools/indexer.py, through a reorganisation and big_map discovery"""
+import pytest
+
+from tools.indexer import LedgerIndex, RpcSource, replay, sync
+from tools.micheline import LEDGER_KEY, encode, t
+from tools.mock_rpc import MockChain, make_block, make_block_hash, serve
+
+LEDGER = 12
+TOTAL_SUPPLY = 14
+BIG_MAPS = {"ledger": LEDGER, "total_supply": TOTAL_SUPPLY}
+ALICE = "tz1KqTpEZ7Yob7QbPE4Hy4Wo8fHG8LhKxZSx"
+BOB = "tz2BFTyPeYRzxd5aiBchbXN3WCZhx7BqbMBq"
+CAROL = "tz3WXYtyDUNL91qfiCJtVUX746QpNv5i5ve5"
+
+def ledger_diff(owner, balance, token_id=0):
+    return (LEDGER, encode(LEDGER_KEY, (owner, token_id)), None if balance is None else encode(t("nat"), balance))
+
+def supply_diff(amount, token_id=0):
+    return (TOTAL_SUPPLY, encode(t("nat"), token_id), encode(t("nat"), amount))
+
+def extend(blocks, diffs_per_block, branch=""):
+    """Returns blocks followed by one block per diffs list"""
+    blocks = list(blocks)
+    for diffs in diffs_per_block:
+        blocks.append(make_block(blocks[-1]["header"]["level"] + 1, blocks[-1]["hash"], diffs, branch))
+    return blocks
+
+def state(index):
+    return dict(
+        ledger=index.connection.execute("SELECT owner, token_id, balance FROM ledger ORDER BY owner, token_id").fetchall(),
+        total_supply=index.connection.execute("SELECT token_id, amount FROM total_supply ORDER BY token_id").fetchall(),
+        checkpoint=index.checkpoint())
+
+@pytest.fixture
+def chain():
+    return MockChain(extend([make_block(0, make_block_hash("genesis"))], [
+        [ledger_diff(ALICE, 100), supply_diff(100)],
+        [ledger_diff(ALICE, 60), ledger_diff(BOB, 40)],
+        [ledger_diff(BOB, 10), ledger_diff(CAROL, 30)],
+        [ledger_diff(CAROL, None), ledger_diff(ALICE, 90)],
+    ]))
+
+@pytest.fixture
+def source(chain):
+    server = serve(chain)
+    yield RpcSource("http://127.0.0.1:{}".format(server.server_port))
+    server.shutdown()
+
+def test_reorg_matches_a_fresh_replay(chain, source):
+    """After a fork below the indexed head, the store equals a replay of the winning branch from genesis"""
+    index = LedgerIndex(":memory:", BIG_MAPS)
+    assert sync(index, source) == 4
+    assert index.balance(CAROL) == 0
+    assert index.balance(ALICE) == 90
+    losing = state(index)
+
+    winning = extend(chain.blocks[:3], [
+        [ledger_diff(BOB, 15), ledger_diff(ALICE, 75), supply_diff(90)],
+        [ledger_diff(CAROL, 5), ledger_diff(ALICE, 70)],
+        [ledger_diff(BOB, None), ledger_diff(CAROL, 20)],
+    ], branch="fork")
+    chain.reorg(2, winning[3:])
+    assert sync(index, source) == 5
+
+    fresh = LedgerIndex(":memory:", BIG_MAPS)
+    replay(fresh, chain.blocks, head_level=5)
+    assert state(index) == state(fresh)
+    assert state(index) != losing
+    assert [index.balance(owner) for owner in (ALICE, BOB, CAROL)] == [70, 0, 20]
+    assert index.total_supply() == 90
+
+def test_reorg_to_a_shorter_branch(chain, source):
+    """A competing branch below the indexed level rolls the store back before the head is followed again"""
+    index = LedgerIndex(":memory:", BIG_MAPS)
+    sync(index, source)
+    chain.reorg(1, extend(chain.blocks[:2], [[ledger_diff(BOB, 1)]], branch="fork")[2:])
+    assert sync(index, source) == 2
+
+    fresh = LedgerIndex(":memory:", BIG_MAPS)
+    replay(fresh, chain.blocks, head_level=2)
+    assert state(index) == state(fresh)
+    assert [index.balance(owner) for owner in (ALICE, BOB, CAROL)] == [100, 1, 0]
+
+def test_big_map_ids_from_the_deployed_script(chain, source):
+    """The ids are read against the storage type of the deployed script, not a local build"""
+    contract = "KT1RJ6PbjHpwc3M5rw5s2Nbmefwbuwbdxton"
+    storage_type = t("pair", t("address", annot="administrator"),
+                     t("pair", t("big_map", LEDGER_KEY, t("nat"), annot="ledger"),
+                       t("pair", t("nat", annot="paused"), t("big_map", t("nat"), t("nat"), annot="total_supply"))))
+    chain.scripts[contract] = [
+        {"prim": "parameter", "args": [t("unit")]},
+        {"prim": "storage", "args": [storage_type]},
+        {"prim": "code", "args": [[]]},
+    ]
+    chain.storages[contract] = {"prim": "Pair", "args": [{"string": ALICE}, {"int": str(LEDGER)}, {"int": "0"}, {"int": str(TOTAL_SUPPLY)}]}
+    assert source.contract_big_maps(contract) == BIG_MAPS
+
+    del chain.scripts[contract]
+    assert source.contract_big_maps(contract, storage_type) == BIG_MAPS
@@ -0,0 +1,95 @@
+"""Checks the view merge, the --check mode, the error decoding and the view scripts of tools/metadata.py on a hand-written compiled metadata"""
+import json
+import os
+
+import pytest
+
+from tools import metadata
+from tools.micheline import t
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+GET_BALANCE = {
+    "name": "get_balance",
+    "pure": True,
+    "implementations": [{"michelsonStorageView": {
+        "parameter": t("pair", t("address", annot="owner"), t("nat", annot="token_id")),
+        "returnType": t("nat"),
+        "code": [{"prim": "DROP"}, {"prim": "PUSH", "args": [t("nat"), {"int": "0"}]}],
+    }}],
+}
+ALL_TOKENS = {
+    "name": "all_tokens",
+    "pure": True,
+    "implementations": [{"michelsonStorageView": {
+        "returnType": t("list", t("nat")),
+        "code": [{"prim": "DROP"}, {"prim": "NIL", "args": [t("nat")]}],
+    }}],
+}
+ERRORS = [{"error": {"int": "1"}, "expansion": {"string": "FA2_NOT_ADMIN"}, "languages": ["en"]},
+          {"error": {"int": "2"}, "expansion": {"string": "FA2_TOKEN_PAUSED"}, "languages": ["en"]}]
+COMPILED = {"name": "compiled", "version": "1.0", "views": [GET_BALANCE, ALL_TOKENS], "errors": ERRORS}
+
+def write_json(path, value):
+    with open(path, "w") as json_file:
+        json.dump(value, json_file, indent=4)
+    return str(path)
+
+@pytest.fixture
+def paths(tmp_path):
+    """A compilation output holding COMPILED, and a copy of the committed contract metadata"""
+    compiled_directory = tmp_path / "output" / "btctz_benchmark"
+    compiled_directory.mkdir(parents=True)
+    write_json(compiled_directory / "step_000_cont_0_metadata.contract_metadata.json", COMPILED)
+    with open(os.path.join(ROOT, "contracts", "contract_metadata.json")) as metadata_file:
+        contract_metadata = json.load(metadata_file)
+    return str(tmp_path / "output"), write_json(tmp_path / "contract_metadata.json", contract_metadata), contract_metadata
+
+def test_merge_views_keeps_the_other_fields():
+    contract_metadata = {"name": "BTCtz", "version": "2.0", "views": [ALL_TOKENS], "errors": ERRORS}
+    assert metadata.merge_views(contract_metadata, COMPILED) == {"name": "BTCtz", "version": "2.0", "views": [GET_BALANCE, ALL_TOKENS], "errors": ERRORS}
+    # a build without compact_errors drops the error table
+    assert metadata.merge_views(contract_metadata, {"views": [ALL_TOKENS]}) == {"name": "BTCtz", "version": "2.0", "views": [ALL_TOKENS]}
+    assert contract_metadata["views"] == [ALL_TOKENS]
+
+def test_sync_and_check(paths):
+    output, metadata_path, contract_metadata = paths
+    assert metadata.find_compiled_metadata(output).endswith("step_000_cont_0_metadata.contract_metadata.json")
+    with open(metadata_path) as metadata_file:
+        stale = metadata_file.read()
+
+    assert metadata.main(["sync", output, "--metadata", metadata_path, "--check"]) == 1
+    with open(metadata_path) as metadata_file:
+        assert metadata_file.read() == stale
+    assert metadata.main(["sync", output, "--metadata", metadata_path]) == 0
+    with open(metadata_path) as metadata_file:
+        assert json.load(metadata_file) == dict(contract_metadata, views=COMPILED["views"], errors=ERRORS)
+    assert metadata.main(["sync", output, "--metadata", metadata_path, "--check"]) == 0
+    assert not metadata.sync(output, metadata_path)
+
+def test_find_compiled_metadata_in_an_output_without_metadata(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        metadata.find_compiled_metadata(str(tmp_path))
+
+def test_decode_error():
+    contract_metadata = {"errors": ERRORS}
+    assert metadata.decode_error(contract_metadata, {"int": "2"}) == "FA2_TOKEN_PAUSED"
+    assert metadata.decode_error(contract_metadata, {"string": "FA2_NOT_OWNER"}) == "FA2_NOT_OWNER"
+    assert metadata.decode_error(contract_metadata, {"int": "7"}) is None
+    assert metadata.decode_error({}, {"int": "1"}) is None
+
+def test_view_script():
+    storage_type = t("pair", t("big_map", t("address"), t("nat"), annot="ledger"), t("bool", annot="paused"))
+    implementation = metadata.find_view(COMPILED, "get_balance")
+    parameter, storage, code = metadata.view_script(implementation, storage_type)
+    assert parameter == {"prim": "parameter", "args": [t("pair", implementation["parameter"], storage_type)]}
+    assert storage == {"prim": "storage", "args": [t("option", t("nat"))]}
+    assert code["args"][0][:2] == [{"prim": "CAR"}, implementation["code"]]
+    assert code["args"][0][2:] == [{"prim": "SOME"}, {"prim": "NIL", "args": [t("operation")]}, {"prim": "PAIR"}]
+
+    # a view without parameter receives the storage alone
+    parameter, _, code = metadata.view_script(metadata.find_view(COMPILED, "all_tokens"), storage_type)
+    assert parameter == {"prim": "parameter", "args": [storage_type]}
+    assert code["args"][0][:2] == [{"prim": "CAR"}, ALL_TOKENS["implementations"][0]["michelsonStorageView"]["code"]]
+    with pytest.raises(KeyError):
+        metadata.find_view(COMPILED, "balance_at")
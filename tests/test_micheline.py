@@ -0,0 +1,68 @@
+"""Checks tools/micheline.py against PACK bytes and expr hashes computed independently, see tests/micheline_vectors.json"""
+import json
+import os
+
+import pytest
+
+from tools import micheline
+from tools.micheline import LEDGER_KEY, OPERATOR_KEY, t
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+with open(os.path.join(ROOT, "tests", "micheline_vectors.json")) as vectors_file:
+    VECTORS = json.load(vectors_file)["vectors"]
+
+with open(os.path.join(ROOT, "contracts", "btctz.micheline")) as script_file:
+    SCRIPT_BIG_MAPS = micheline.script_big_maps(json.load(script_file))
+
+TYPES = {
+    "nat": t("nat"),
+    "string": t("string"),
+    "address": t("address"),
+    "ledger": LEDGER_KEY,
+    "operators": OPERATOR_KEY,
+}
+
+def vector_value(vector):
+    return tuple(vector["value"]) if isinstance(vector["value"], list) else vector["value"]
+
+def vectors_of(*types):
+    return [vector for vector in VECTORS if vector["type"] in types]
+
+@pytest.mark.parametrize("vector", VECTORS, ids=lambda vector: "{}-{}".format(vector["type"], vector["value"]))
+def test_pack_and_key_hash(vector):
+    type_node = TYPES[vector["type"]]
+    packed = micheline.pack(type_node, vector_value(vector))
+    assert packed.hex() == vector["packed"]
+    assert micheline.pack(type_node, micheline.unpack(type_node, packed)) == packed
+    assert micheline.key_hash(type_node, vector_value(vector)) == vector["key_hash"]
+
+@pytest.mark.parametrize("big_map", ["ledger", "operators"])
+def test_key_types_of_the_compiled_contract(big_map):
+    """The key types read from contracts/btctz.micheline hash like the codec types, annotations do not change the PACK bytes"""
+    key_type = SCRIPT_BIG_MAPS[big_map][0]
+    for vector in vectors_of(big_map):
+        assert micheline.key_hash(key_type, vector_value(vector)) == vector["key_hash"]
+
+def test_ledger_and_operator_key_hash_fast_paths():
+    for vector in vectors_of("ledger"):
+        assert micheline.ledger_key_hash(*vector["value"]) == vector["key_hash"]
+    for vector in vectors_of("operators"):
+        assert micheline.operator_key_hash(*vector["value"]) == vector["key_hash"]
+
+@pytest.mark.parametrize("processes", [None, 2])
+def test_ledger_key_hashes(processes):
+    """The serial and the process pool paths return the hashes in the order of the owners, across chunk boundaries"""
+    ledger_vectors = [vector for vector in vectors_of("ledger") if vector["value"][1] == 0]
+    owners = [vector["value"][0] for vector in ledger_vectors] * 3
+    expected = [vector["key_hash"] for vector in ledger_vectors] * 3
+    assert micheline.ledger_key_hashes(owners, 0, processes=processes, chunk_size=2) == expected
+
+@pytest.mark.parametrize("processes", [None, 2])
+def test_ledger_key_hashes_raw(processes):
+    """The raw digests are the expr hashes before base58 encoding"""
+    ledger_vectors = [vector for vector in vectors_of("ledger") if vector["value"][1] == 0]
+    owners = [vector["value"][0] for vector in ledger_vectors]
+    digests = micheline.ledger_key_hashes(owners, 0, raw=True, processes=processes, chunk_size=1)
+    assert [micheline.b58encode_check(micheline.PREFIXES["expr"] + digest) for digest in digests] == [
+        vector["key_hash"] for vector in ledger_vectors]
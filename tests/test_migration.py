@@ -0,0 +1,145 @@
+"""Checks the chunks of tools/migration.py against the operation limits, and resumed runs against the mock node"""
+import asyncio
+
+import pytest
+
+from tools import ed25519, migration
+from tools.client import BRANCH_SIZE, SIGNATURE_SIZE, AsyncRpc, forge_transaction
+from tools.micheline import ENTRYPOINT_TYPES, decode, encode
+from tools.mock_rpc import MockChain, serve
+from tools.simulator import FA2Simulator
+
+CONTRACT = "KT1RJ6PbjHpwc3M5rw5s2Nbmefwbuwbdxton"
+ADMINISTRATOR = ed25519.SigningKey.from_passphrase("migration administrator")
+HOLDERS = [ed25519.SigningKey.from_passphrase("holder {}".format(index)).address for index in range(300)]
+BALANCES = {holder: (index * 7919) % 10 ** (1 + index % 12) + 1 for index, holder in enumerate(HOLDERS)}
+
+def forged_size(chunk, token_id=0):
+    """Forged size of the operation sending a chunk, with its planned limits"""
+    content = {"source": ADMINISTRATOR.address, "fee": "100000", "counter": "1000", "gas_limit": str(chunk["gas_limit"]),
+               "storage_limit": str(chunk["storage_limit"]), "amount": "0", "destination": CONTRACT,
+               "parameters": {"entrypoint": "import_balances", "value": encode(ENTRYPOINT_TYPES["import_balances"], dict(
+                   token_id=token_id, balances=[dict(owner=owner, balance=balance) for owner, balance in chunk["balances"]]))}}
+    return len(forge_transaction(content)) + BRANCH_SIZE + SIGNATURE_SIZE
+
+@pytest.mark.parametrize("limits", [
+    dict(max_size=2000),
+    dict(max_gas=60000),
+    dict(max_storage=3000),
+    dict(max_size=4000, max_gas=90000, max_storage=5000),
+], ids=["size", "gas", "storage", "all"])
+def test_plan_stays_under_the_limits(limits):
+    limits = dict(dict(max_gas=migration.HARD_GAS_LIMIT_PER_OPERATION, max_storage=migration.HARD_STORAGE_LIMIT_PER_OPERATION,
+                       max_size=migration.MAX_OPERATION_DATA_LENGTH), **limits)
+    migration_plan = migration.plan(BALANCES, **limits)
+    chunks = migration_plan["chunks"]
+    assert len(chunks) > 1
+    for chunk in chunks:
+        assert chunk["gas_limit"] <= limits["max_gas"]
+        assert chunk["storage_limit"] <= limits["max_storage"]
+        assert forged_size(chunk) <= chunk["size"] <= limits["max_size"]
+    # chunks are filled greedily, the first holder of the next chunk would not fit in the previous one
+    for chunk, following in zip(chunks, chunks[1:]):
+        grown = migration.plan(dict(chunk["balances"] + following["balances"][:1]), **limits)
+        assert len(grown["chunks"]) == 2
+    assert [tuple(item) for chunk in chunks for item in chunk["balances"]] == sorted(BALANCES.items())
+    assert migration_plan["total"] == sum(BALANCES.values())
+    assert migration.plan(dict(reversed(list(BALANCES.items()))), **limits) == migration_plan
+
+def test_plan_refuses_a_holder_larger_than_an_operation():
+    with pytest.raises(ValueError, match="does not fit"):
+        migration.plan(BALANCES, max_gas=migration.DEFAULT_COSTS["gas_base"])
+
+class RefusingToken:
+    """Token model failing the imports of refused owners, standing for a chunk failing on chain"""
+
+    def __init__(self, token, refused=()):
+        self.token = token
+        self.refused = set(refused)
+        self.address = token.address
+
+    @property
+    def events(self):
+        return self.token.events
+
+    def apply(self, sender, entrypoint, params):
+        if entrypoint == "import_balances" and any(item["owner"] in self.refused for item in params["balances"]):
+            raise ValueError("import refused")
+        return self.token.apply(sender, entrypoint, params)
+
+@pytest.fixture
+def chain():
+    token = FA2Simulator([(ADMINISTRATOR.address, 0)])
+    token.apply(ADMINISTRATOR.address, "set_token_metadata", dict(token_id=0, token_info={}))
+    chain = MockChain.genesis()
+    chain.add_account(ADMINISTRATOR.public_key)
+    chain.contracts[token.address] = RefusingToken(token)
+    return chain
+
+@pytest.fixture
+def url(chain):
+    server = serve(chain, block_time=0.05)
+    yield "http://127.0.0.1:{}".format(server.server_port)
+    server.shutdown()
+
+def imported(chain, first_level):
+    """Owners of the import_balances calls included from first_level, by call"""
+    return [[item["owner"] for item in decode(ENTRYPOINT_TYPES["import_balances"], content["parameters"]["value"])["balances"]]
+            for block in chain.blocks if block["header"]["level"] >= first_level
+            for operation in block["operations"][3] for content in operation["contents"]
+            if content["metadata"]["operation_result"]["status"] == "applied"]
+
+def test_resumed_run_sends_only_the_unapplied_chunks(chain, url, tmp_path):
+    balances = dict(list(BALANCES.items())[:12])
+    migration_plan = migration.plan(balances, max_gas=migration.DEFAULT_COSTS["gas_base"] + 4 * migration.DEFAULT_COSTS["gas_per_holder"])
+    chunks = migration_plan["chunks"]
+    assert [len(chunk["balances"]) for chunk in chunks] == [4, 4, 4]
+    path = str(tmp_path / "plan.json")
+    migration.save_plan(migration_plan, path)
+
+    def token():
+        return chain.contracts[CONTRACT]
+
+    def lookup(owner, token_id):
+        return token().token.ledger.get((owner, token_id), 0)
+
+    def run(**options):
+        async def send():
+            rpc = AsyncRpc(url)
+            try:
+                return await asyncio.wait_for(migration.run(migration.load_plan(path), path, rpc, CONTRACT, [ADMINISTRATOR],
+                                                            poll_interval=0.01, confirmations=1, **options), 20)
+            finally:
+                await rpc.close()
+        first_level = chain.blocks[-1]["header"]["level"] + 1
+        counts = asyncio.run(send())
+        return counts, imported(chain, first_level)
+
+    token().refused = {chunks[1]["balances"][0][0]}
+    counts, calls = run()
+    assert counts == {migration.APPLIED: 2, migration.FAILED: 1}
+    assert sorted(calls) == sorted([[owner for owner, _ in chunks[index]["balances"]] for index in (0, 2)])
+    saved = migration.load_plan(path)
+    assert [chunk["status"] for chunk in saved["chunks"]] == [migration.APPLIED, migration.FAILED, migration.APPLIED]
+    applied_supply = token().token.total_supply[0]
+
+    # the confirmation of the last chunk is lost, as after a crash before the plan was written
+    saved["chunks"][2].update(status=migration.PENDING, operation=None)
+    migration.save_plan(saved, path)
+    token().refused = set()
+    counts, calls = run()
+    assert counts == {migration.APPLIED: 3}
+    assert sorted(calls) == sorted([[owner for owner, _ in chunks[index]["balances"]] for index in (1, 2)])
+    chunk_1_supply = sum(balance for _, balance in chunks[1]["balances"])
+    assert token().token.total_supply[0] == applied_supply + chunk_1_supply == sum(balances.values())
+    assert migration.verify(migration.load_plan(path), lookup) == []
+
+    # a plan whose chunks are all held by the new ledger sends nothing
+    saved = migration.load_plan(path)
+    for chunk in saved["chunks"]:
+        chunk["status"] = migration.PENDING
+    migration.save_plan(saved, path)
+    counts, calls = run(balance=lookup)
+    assert counts == {migration.APPLIED: 3}
+    assert calls == []
+    assert token().token.total_supply[0] == sum(balances.values())
@@ -0,0 +1,147 @@
+"""Checks the permit packing of tools/permits.py against tests/permit_vectors.json, and the queue of its Relayer"""
+import json
+import os
+
+import pytest
+
+from tools import ed25519
+from tools.micheline import PERMIT, TRANSFER, decode, t
+from tools.permits import EXPIRED_PERMIT, MISSIGNED, PermitError, Relayer, params_hash, sign_permit, signed_bytes
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+with open(os.path.join(ROOT, "tests", "permit_vectors.json")) as vectors_file:
+    VECTORS = json.load(vectors_file)
+
+CHAIN_ID = "NetXdQprcVkpaWU"
+CONTRACT = "KT1RJ6PbjHpwc3M5rw5s2Nbmefwbuwbdxton"
+RECEIVER = "tz3WXYtyDUNL91qfiCJtVUX746QpNv5i5ve5"
+NOW = 1700000000
+EXPIRY = NOW + 3600
+ALICE = ed25519.SigningKey.from_passphrase("alice")
+BOB = ed25519.SigningKey.from_passphrase("bob")
+
+def permit(key, nonce, amount=1, expiry=EXPIRY, chain_id=CHAIN_ID):
+    transfer = dict(from_=key.address, txs=[dict(to_=RECEIVER, token_id=0, amount=amount)])
+    return sign_permit(key, chain_id, CONTRACT, nonce, expiry, transfer)
+
+def nonces(batch):
+    return [(item["transfer"]["from_"], item["nonce"]) for item in batch]
+
+def test_vector_key():
+    assert ALICE.address == VECTORS["owner"]
+    assert ALICE.public_key == VECTORS["public_key"]
+
+@pytest.mark.parametrize("vector", VECTORS["vectors"], ids=lambda vector: "{}-{}".format(vector["chain_id"], vector["nonce"]))
+def test_signed_bytes_and_params_hash(vector):
+    permit_params_hash = params_hash(vector["transfer"])
+    assert permit_params_hash.hex() == vector["params_hash"]
+    message = signed_bytes(vector["chain_id"], vector["contract"], vector["nonce"], vector["expiry"], permit_params_hash)
+    assert message.hex() == vector["signed_bytes"]
+    signed = sign_permit(ALICE, vector["chain_id"], vector["contract"], vector["nonce"], vector["expiry"], vector["transfer"])
+    assert signed["signature"] == vector["signature"]
+    assert ed25519.verify_encoded(VECTORS["public_key"], message, vector["signature"])
+
+def test_submit_checks_like_the_permit_entrypoint():
+    relayer = Relayer(CHAIN_ID, CONTRACT, nonces={ALICE.address: 1})
+    assert relayer.submit(permit(ALICE, 1), NOW) == ALICE.address
+
+    foreign = dict(permit(ALICE, 2), public_key=BOB.public_key)
+    tampered = permit(ALICE, 2)
+    tampered["transfer"] = dict(tampered["transfer"], txs=[dict(to_=RECEIVER, token_id=0, amount=2)])
+    rejected = [
+        (foreign, MISSIGNED),
+        (tampered, MISSIGNED),
+        (permit(ALICE, 2, expiry=NOW + 60), EXPIRED_PERMIT),
+        (permit(ALICE, 0), MISSIGNED),
+        (permit(ALICE, 2, chain_id="NetXnHfVqm9iesp"), MISSIGNED),
+    ]
+    for item, code in rejected:
+        with pytest.raises(PermitError) as error:
+            relayer.submit(item, NOW)
+        assert error.value.code == code
+    assert list(relayer.pending[ALICE.address]) == [1]
+
+def test_take_batch_stops_at_nonce_gaps_and_expired_permits():
+    relayer = Relayer(CHAIN_ID, CONTRACT)
+    for nonce in (0, 1, 3):
+        relayer.submit(permit(ALICE, nonce), NOW)
+    for nonce, expiry in ((0, EXPIRY), (1, NOW + 200), (2, EXPIRY)):
+        relayer.submit(permit(BOB, nonce, expiry=expiry), NOW)
+
+    batch = relayer.take_batch(NOW + 100)
+    assert nonces(batch) == [(ALICE.address, 0), (ALICE.address, 1), (BOB.address, 0)]
+    # the expired permit of bob was dropped, the permits after a gap stay queued
+    assert list(relayer.pending[ALICE.address]) == [3]
+    assert list(relayer.pending[BOB.address]) == [2]
+
+    relayer.confirm(batch)
+    assert relayer.nonces == {ALICE.address: 2, BOB.address: 1}
+    assert relayer.take_batch(NOW + 100) == []
+
+def test_take_batch_limit_and_release():
+    relayer = Relayer(CHAIN_ID, CONTRACT)
+    for nonce in range(3):
+        relayer.submit(permit(ALICE, nonce), NOW)
+    relayer.submit(permit(BOB, 0), NOW)
+
+    batch = relayer.take_batch(NOW, max_permits=2)
+    assert nonces(batch) == [(ALICE.address, 0), (ALICE.address, 1)]
+    relayer.release(batch)
+    assert nonces(relayer.take_batch(NOW)) == [(ALICE.address, 0), (ALICE.address, 1), (ALICE.address, 2), (BOB.address, 0)]
+
+def test_release_evicts_the_failed_owners():
+    relayer = Relayer(CHAIN_ID, CONTRACT)
+    relayer.submit(permit(ALICE, 0), NOW)
+    relayer.submit(permit(BOB, 0), NOW)
+    relayer.release(relayer.take_batch(NOW), failed=[BOB.address])
+    assert nonces(relayer.failed) == [(BOB.address, 0)]
+    assert nonces(relayer.take_batch(NOW)) == [(ALICE.address, 0)]
+
+def test_calls_per_owner():
+    relayer = Relayer(CHAIN_ID, CONTRACT)
+    for key, nonce in ((ALICE, 0), (ALICE, 1), (BOB, 0)):
+        relayer.submit(permit(key, nonce, amount=nonce + 1), NOW)
+    calls = relayer.calls(relayer.take_batch(NOW))
+    assert [(owner, entrypoint) for owner, entrypoint, _ in calls] == [
+        (ALICE.address, "permit"), (ALICE.address, "transfer"), (BOB.address, "permit"), (BOB.address, "transfer")]
+    stored = decode(t("list", PERMIT), calls[0][2])
+    assert [item["params_hash"] for item in stored] == [params_hash(permit(ALICE, nonce, amount=nonce + 1)["transfer"]) for nonce in (0, 1)]
+    assert [transfer["txs"][0]["amount"] for transfer in decode(t("list", TRANSFER), calls[1][2])] == [1, 2]
+
+def test_simulate_evicts_the_owner_of_a_failing_call():
+    """A failure of bob fails the group, bob is evicted and the group of alice and carol applies"""
+    carol = ed25519.SigningKey.from_passphrase("carol")
+    relayer = Relayer(CHAIN_ID, CONTRACT)
+    for key in (ALICE, BOB, carol):
+        relayer.submit(permit(key, 0), NOW)
+    rounds = []
+
+    def run(calls):
+        rounds.append([owner for owner, _, _ in calls])
+        failing = next((index for index, (owner, entrypoint, _) in enumerate(calls)
+                        if owner == BOB.address and entrypoint == "transfer"), None)
+        statuses = ["applied"] * len(calls) if failing is None else (
+            ["backtracked"] * failing + ["failed"] + ["skipped"] * (len(calls) - failing - 1))
+        contents = [{"metadata": {"operation_result": {"status": status}}} for status in statuses]
+        if failing is not None:
+            contents[failing]["metadata"]["operation_result"]["errors"] = [{"id": "FA2_INSUFFICIENT_BALANCE"}]
+        return contents
+
+    batch, calls = relayer.simulate(relayer.take_batch(NOW), run)
+    assert nonces(batch) == [(ALICE.address, 0), (carol.address, 0)]
+    assert [owner for owner, _, _ in calls] == [ALICE.address, ALICE.address, carol.address, carol.address]
+    assert len(rounds) == 2
+    assert nonces(relayer.failed) == [(BOB.address, 0)]
+    assert relayer.failed[0]["error"] == [{"id": "FA2_INSUFFICIENT_BALANCE"}]
+    assert relayer.pending == {}
+
+def test_simulate_with_every_owner_failing():
+    relayer = Relayer(CHAIN_ID, CONTRACT)
+    relayer.submit(permit(ALICE, 0), NOW)
+
+    def run(calls):
+        return [{"metadata": {"operation_result": {"status": "failed"}}} for _ in calls]
+
+    assert relayer.simulate(relayer.take_batch(NOW), run) == ([], [])
+    assert nonces(relayer.failed) == [(ALICE.address, 0)]
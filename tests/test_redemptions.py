@@ -0,0 +1,202 @@
+"""Checks the batches of tools/redemptions.py against the operation limits, and the custodian worker against the mock node"""
+import asyncio
+import itertools
+import json
+import time
+
+import pytest
+
+from tools import ed25519, redemptions
+from tools.client import BRANCH_SIZE, SIGNATURE_SIZE, AsyncRpc, forge_transaction
+from tools.indexer import iter_events
+from tools.micheline import ENTRYPOINT_TYPES, encode
+from tools.migration import HARD_GAS_LIMIT_PER_OPERATION, HARD_STORAGE_LIMIT_PER_OPERATION, MAX_OPERATION_DATA_LENGTH
+from tools.mock_rpc import MockChain, serve
+from tools.redemptions import PAID, REFUND, SENDING, RedemptionQueue
+from tools.simulator import FA2Simulator
+
+CONTRACT = "KT1RJ6PbjHpwc3M5rw5s2Nbmefwbuwbdxton"
+ADMINISTRATOR = ed25519.SigningKey.from_passphrase("custodian")
+ALICE = ed25519.SigningKey.from_passphrase("alice")
+BOB = ed25519.SigningKey.from_passphrase("bob")
+BTC_ADDRESS = "bc1qar0srrr7xfkvy5l643lydnw9re59gtzzwf5mdq"
+INVALID_BTC_ADDRESS = "not a btc address"
+
+def make_queue(first, count, level=1):
+    pending = {redemption_id: dict(owner=ALICE.address, token_id=0, amount=redemption_id + 1, btc_address=BTC_ADDRESS, level=level)
+               for redemption_id in range(first, first + count)}
+    return RedemptionQueue(CONTRACT, level, first, pending)
+
+def forged_size(batch):
+    """Forged size of the operation settling a batch, with its planned limits"""
+    content = {"source": ADMINISTRATOR.address, "fee": "100000", "counter": "1000", "gas_limit": str(batch["gas_limit"]),
+               "storage_limit": str(batch["storage_limit"]), "amount": "0", "destination": CONTRACT,
+               "parameters": {"entrypoint": "settle_redemptions", "value": encode(ENTRYPOINT_TYPES["settle_redemptions"], dict(
+                   first_redemption_id=batch["first_redemption_id"], count=batch["count"], refunds=batch["refunds"]))}}
+    return len(forge_transaction(content)) + BRANCH_SIZE + SIGNATURE_SIZE
+
+QUEUE = make_queue(7, 2000)
+REFUNDS = set(range(7, 2007, 3))
+SINGLE_SIZE = redemptions.plan_batches(make_queue(7, 1))[0]["size"]
+
+@pytest.mark.parametrize("limits", [
+    dict(),
+    dict(max_gas=60000),
+    dict(max_storage=1000),
+    dict(max_size=SINGLE_SIZE + 40),
+    dict(max_batch=64),
+], ids=["hard", "gas", "storage", "size", "max_batch"])
+def test_batches_stay_under_the_limits(limits):
+    batches = redemptions.plan_batches(QUEUE, REFUNDS, **limits)
+    limits = dict(dict(max_gas=HARD_GAS_LIMIT_PER_OPERATION, max_storage=HARD_STORAGE_LIMIT_PER_OPERATION, max_size=MAX_OPERATION_DATA_LENGTH,
+                       max_batch=None), **limits)
+    assert len(batches) > 1
+    for batch in batches:
+        assert batch["gas_limit"] <= min(limits["max_gas"], HARD_GAS_LIMIT_PER_OPERATION)
+        assert batch["storage_limit"] <= min(limits["max_storage"], HARD_STORAGE_LIMIT_PER_OPERATION)
+        assert forged_size(batch) <= batch["size"] <= min(limits["max_size"], MAX_OPERATION_DATA_LENGTH)
+        assert limits["max_batch"] is None or batch["count"] <= limits["max_batch"]
+        settled = range(batch["first_redemption_id"], batch["first_redemption_id"] + batch["count"])
+        assert batch["refunds"] == [redemption_id for redemption_id in settled if redemption_id in REFUNDS]
+    # batches follow each other from the head of the queue, and the next redemption would not fit in the previous batch
+    assert [batch["first_redemption_id"] for batch in batches] == list(itertools.accumulate([7] + [batch["count"] for batch in batches[:-1]]))
+    assert sum(batch["count"] for batch in batches) == 2000
+    for batch in batches[:-1]:
+        grown = make_queue(batch["first_redemption_id"], batch["count"] + 1)
+        assert len(redemptions.plan_batches(grown, REFUNDS, **{name: value for name, value in limits.items() if value is not None})) == 2
+
+def test_plan_refuses_a_redemption_larger_than_an_operation():
+    costs = redemptions.DEFAULT_COSTS
+    with pytest.raises(ValueError, match="does not fit"):
+        redemptions.plan_batches(QUEUE, max_gas=costs["gas_base"] + costs["gas_per_redemption"] - 1)
+    assert redemptions.plan_batches(RedemptionQueue(CONTRACT)) == []
+
+@pytest.fixture
+def chain():
+    token = FA2Simulator([(ADMINISTRATOR.address, 0)], address=CONTRACT)
+    token.apply(ADMINISTRATOR.address, "set_token_metadata", dict(token_id=0, token_info={}))
+    for holder in (ALICE, BOB):
+        token.apply(ADMINISTRATOR.address, "mint", dict(owner=holder.address, token_id=0, token_amount=100))
+    chain = MockChain.genesis()
+    for key in (ADMINISTRATOR, ALICE, BOB):
+        chain.add_account(key.public_key)
+    chain.contracts[CONTRACT] = token
+    return chain
+
+@pytest.fixture
+def url(chain):
+    server = serve(chain, block_time=0.05)
+    yield "http://127.0.0.1:{}".format(server.server_port)
+    server.shutdown()
+
+def request_redemptions(chain, requests):
+    """Has holders call request_redemption, each (key, amount, btc_address) in its own operation, and waits for their inclusion"""
+    with chain.lock:
+        for index, (key, amount, btc_address) in enumerate(requests):
+            content = {"kind": "transaction", "source": key.address, "fee": "1000", "counter": "0", "gas_limit": "10000", "storage_limit": "0",
+                       "amount": "0", "destination": CONTRACT, "parameters": {"entrypoint": "request_redemption", "value": encode(
+                           ENTRYPOINT_TYPES["request_redemption"], dict(token_id=0, amount=amount, btc_address=btc_address))}}
+            chain.mempool.append(dict(hash="request {} at {}".format(index, len(chain.blocks)), branch=chain.blocks[-1]["hash"], contents=[content]))
+    wait_for(lambda: not chain.mempool)
+
+def wait_for(predicate):
+    while not predicate():
+        time.sleep(0.01)
+
+class Crash(Exception):
+    """Stands for the worker process dying during a payout"""
+
+class Payout:
+    """Payout callable recording its calls, refunding invalid BTC addresses and crashing on the redemptions of crash_on"""
+
+    def __init__(self, crash_on=()):
+        self.paid = []
+        self.crash_on = set(crash_on)
+
+    def __call__(self, redemption_id, redemption):
+        if redemption_id in self.crash_on:
+            raise Crash
+        self.paid.append(redemption_id)
+        return redemption["btc_address"] != INVALID_BTC_ADDRESS
+
+def run(url, path, pay, **options):
+    """One pass of the worker, which reads its state file as a restarted worker does"""
+    async def settle():
+        rpc = AsyncRpc(url)
+        try:
+            state = redemptions.load_state(path, CONTRACT, 1)
+            return await asyncio.wait_for(redemptions.settle(state, path, rpc, [ADMINISTRATOR], pay, confirmations=1, poll_interval=0.01, **options), 20)
+        finally:
+            await rpc.close()
+    return asyncio.run(settle())
+
+def load(path):
+    with open(path) as state_file:
+        return json.load(state_file)
+
+def settlements(chain):
+    """(first_redemption_id, count, refunds) of the settle_redemptions events on chain"""
+    queue_events = [event for block in chain.blocks for event in iter_events(block, CONTRACT)]
+    return [(event["payload"]["first_redemption_id"], event["payload"]["count"], sorted(event["payload"]["refunds"]))
+            for event in queue_events if event["tag"] == "settle_redemptions"]
+
+def test_restarted_worker_pays_once_and_settles_refunds(chain, url, tmp_path):
+    path = str(tmp_path / "state.json")
+    request_redemptions(chain, [(ALICE, 10, BTC_ADDRESS), (BOB, 20, INVALID_BTC_ADDRESS), (ALICE, 30, BTC_ADDRESS), (BOB, 5, BTC_ADDRESS)])
+    queue = RedemptionQueue(CONTRACT)
+    for block in list(chain.blocks):
+        queue.apply_block(block)
+    assert [(redemption_id, redemption["owner"], redemption["amount"]) for redemption_id, redemption in queue.head()] == [
+        (0, ALICE.address, 10), (1, BOB.address, 20), (2, ALICE.address, 30), (3, BOB.address, 5)]
+    assert queue.next_settlement_id == 0
+
+    # every redemption is paid, the batch is held back until min_batch redemptions are queued
+    pay = Payout()
+    assert run(url, path, pay, min_batch=10) == 0
+    assert pay.paid == [0, 1, 2, 3]
+    assert load(path)["payouts"] == {"0": PAID, "1": REFUND, "2": PAID, "3": PAID}
+    assert settlements(chain) == []
+
+    # a restart pays nothing again, the held back batch waits until its oldest redemption is max_wait blocks old
+    assert run(url, path, pay, min_batch=10, max_wait=10 ** 6) == 0
+    oldest = load(path)["queue"]["pending"]["0"]["level"]
+    assert run(url, path, pay, min_batch=10, max_wait=chain.blocks[-1]["header"]["level"] - oldest, max_batch=3) == 4
+    assert pay.paid == [0, 1, 2, 3]
+    assert settlements(chain) == [(0, 3, [1]), (3, 1, [])]
+    token = chain.contracts[CONTRACT]
+    assert token.get_total_supply(0) == 200 - 10 - 30 - 5
+    assert token.get_balance(dict(owner=BOB.address, token_id=0)) == 100 - 5
+    assert token.get_balance(dict(owner=CONTRACT, token_id=0)) == 0
+
+    state = load(path)
+    assert state["payouts"] == {} and state["queue"]["pending"] == {}
+    assert [settlement["refunds"] for settlement in state["settlements"]] == [[1], []]
+    # the next pass reads the settlement events, the queue is empty and nothing is sent
+    assert run(url, path, pay) == 0
+    assert load(path)["queue"]["next_settlement_id"] == 4
+    assert settlements(chain) == [(0, 3, [1]), (3, 1, [])]
+
+def test_interrupted_payout_stops_the_worker(chain, url, tmp_path):
+    path = str(tmp_path / "state.json")
+    request_redemptions(chain, [(ALICE, 10, BTC_ADDRESS), (BOB, 20, BTC_ADDRESS), (ALICE, 30, BTC_ADDRESS)])
+    with pytest.raises(Crash):
+        run(url, path, Payout(crash_on=[1]))
+    assert load(path)["payouts"] == {"0": PAID, "1": SENDING}
+
+    # the BTC of redemption 1 may have been sent, the worker neither pays it again nor pays or settles past it
+    pay = Payout()
+    for _ in range(2):
+        with pytest.raises(RuntimeError, match="payout of redemption 1 was interrupted"):
+            run(url, path, pay)
+    assert pay.paid == []
+    assert load(path)["payouts"] == {"0": PAID, "1": SENDING}
+    assert settlements(chain) == []
+
+    # once the operator records that it was paid, the worker pays the rest and settles the whole queue
+    state = load(path)
+    state["payouts"]["1"] = PAID
+    redemptions.save_state(state, path)
+    assert run(url, path, pay) == 3
+    assert pay.paid == [2]
+    assert settlements(chain) == [(0, 3, [])]
+    assert chain.contracts[CONTRACT].get_total_supply(0) == 200 - 60
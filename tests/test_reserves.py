@@ -0,0 +1,111 @@
+"""Checks the reconciliation of tools/reserves.py on hand-built snapshots, with the NumPy passes and with the pure Python fallback"""
+import random
+
+import pytest
+
+from tools import reserves
+from tools.reserves import AddressTable, Snapshot, delta, reconcile, reserve_at
+
+HOLDERS = ["tz1holder{}".format(index) for index in range(8)]
+
+@pytest.fixture(params=["numpy", "python"])
+def backend(request, monkeypatch):
+    """Runs a test with the NumPy passes, skipped when NumPy is not installed, and with the pure Python ones"""
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(reserves, "numpy", None)
+    return request.param
+
+def snapshot(table, level, balances, total_supply=None):
+    """Snapshot of a dict of balance by address, total_supply defaults to the ledger sum"""
+    by_index = {table.index(owner): balance for owner, balance in balances.items()}
+    return Snapshot.from_balances(table, level, by_index, sum(balances.values()) if total_supply is None else total_supply)
+
+def test_reconcile_flags_total_supply_and_reserve_mismatches(backend):
+    table = AddressTable()
+    snapshots = [
+        snapshot(table, 10, {HOLDERS[0]: 60, HOLDERS[1]: 40}),
+        snapshot(table, 20, {HOLDERS[0]: 60, HOLDERS[1]: 40}, total_supply=101),
+        snapshot(table, 30, {HOLDERS[0]: 50, HOLDERS[1]: 40, HOLDERS[2]: 13}),
+        snapshot(table, 40, {HOLDERS[0]: 50, HOLDERS[1]: 40, HOLDERS[2]: 13}),
+    ]
+    reserve_figures = [(0, 100), (25, 101), (35, 100)]
+    reports = list(reconcile(snapshots, reserve_figures, top=2, tolerance=1))
+    assert [report["reserve"] for report in reports] == [100, 100, 101, 100]
+    assert [report["mismatches"] for report in reports] == [
+        [],
+        [dict(check="total_supply", expected=101, found=100)],
+        [dict(check="reserve", expected=101, found=103)],
+        [dict(check="reserve", expected=100, found=103)],
+    ]
+    assert [report["ledger_total"] for report in reports] == [100, 100, 103, 103]
+    assert reports[0]["changes"] is None
+    assert reports[2]["changes"] == dict(changed=2, net=3, gained_holders=1, lost_holders=0)
+    assert reports[2]["top"] == [(HOLDERS[0], 50), (HOLDERS[1], 40)]
+
+    # without reserve figures only the total supply is checked
+    assert [report["reserve"] for report in reconcile(snapshots)] == [None] * 4
+    assert [bool(report["mismatches"]) for report in reconcile(snapshots)] == [False, True, False, False]
+
+def test_reserve_at():
+    figures = [(5, 10), (15, 20)]
+    assert [reserve_at(figures, level) for level in (4, 5, 14, 15, 100)] == [None, 10, 10, 20, 20]
+    # an undated snapshot, the current state of an indexer store, takes the last figure
+    assert reserve_at(figures, None) == 20
+
+def test_delta_and_holders(backend):
+    table = AddressTable()
+    old = snapshot(table, 1, {HOLDERS[0]: 5, HOLDERS[1]: 7, HOLDERS[2]: 0, HOLDERS[3]: 2})
+    new = snapshot(table, 2, {HOLDERS[0]: 5, HOLDERS[1]: 3, HOLDERS[2]: 4, HOLDERS[4]: 9})
+    assert (old.holders(), new.holders()) == (3, 4)
+    changes = delta(old, new)
+    assert list(changes.changes()) == [(HOLDERS[1], 7, 3), (HOLDERS[2], 0, 4), (HOLDERS[3], 2, 0), (HOLDERS[4], 0, 9)]
+    assert changes.summary() == dict(changed=4, net=7, gained_holders=2, lost_holders=1)
+    assert delta(new, new).summary() == dict(changed=0, net=0, gained_holders=0, lost_holders=0)
+
+def test_top_orders_ties_by_owner_index(backend):
+    """Equal balances come in the order their owners entered the AddressTable, also when the tie straddles the cut"""
+    table = AddressTable()
+    for holder in HOLDERS:
+        table.index(holder)
+    # inserted in reverse so that the ledger order differs from the table order
+    ledger = snapshot(table, 1, dict(reversed(list(zip(HOLDERS, [3, 9, 3, 1, 9, 3, 0, 3])))))
+    assert ledger.top(1) == [(HOLDERS[1], 9)]
+    assert ledger.top(3) == [(HOLDERS[1], 9), (HOLDERS[4], 9), (HOLDERS[0], 3)]
+    assert ledger.top(5) == [(HOLDERS[1], 9), (HOLDERS[4], 9), (HOLDERS[0], 3), (HOLDERS[2], 3), (HOLDERS[5], 3)]
+    assert [holder for holder, _ in ledger.top(100)] == [HOLDERS[index] for index in (1, 4, 0, 2, 5, 7, 3, 6)]
+    assert ledger.top(0) == []
+
+def test_ledger_total_beyond_int64(backend):
+    table = AddressTable()
+    large = {HOLDERS[0]: 2 ** 63 - 1, HOLDERS[1]: 2 ** 63 - 1, HOLDERS[2]: 2 ** 70}
+    ledger = snapshot(table, 1, large)
+    assert ledger.ledger_total() == sum(large.values())
+    assert ledger.top(1) == [(HOLDERS[2], 2 ** 70)]
+    assert next(reconcile([ledger]))["mismatches"] == []
+
+def random_snapshots(seed):
+    """Snapshots of a random walk of the ledger, with many equal balances, and one snapshot beyond int64"""
+    generator = random.Random(seed)
+    table = AddressTable()
+    owners = ["tz1owner{}".format(index) for index in range(300)]
+    balances = {}
+    snapshots = []
+    for level in range(1, 21):
+        for owner in generator.sample(owners, 40):
+            balances[owner] = generator.choice([0, 0, 1, 5, 5, 100, generator.randrange(10 ** 6)])
+        supply = sum(balances.values()) + (1 if level % 7 == 0 else 0)
+        snapshots.append(snapshot(table, level, {owner: balance for owner, balance in balances.items() if balance}, supply))
+    balances[owners[0]] = 2 ** 64
+    snapshots.append(snapshot(table, 21, balances))
+    return snapshots
+
+def test_numpy_and_python_passes_agree(monkeypatch):
+    pytest.importorskip("numpy")
+    reserve_figures = [(0, 10 ** 7), (10, sum(range(10 ** 3)))]
+    vectorized = list(reconcile(random_snapshots(1), reserve_figures, top=25))
+    monkeypatch.setattr(reserves, "numpy", None)
+    fallback = list(reconcile(random_snapshots(1), reserve_figures, top=25))
+    assert vectorized == fallback
+    assert sum(bool(report["mismatches"]) for report in fallback) > 0
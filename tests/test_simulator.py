@@ -0,0 +1,38 @@
+"""Runs the reference model of tools/simulator.py against the shared test vectors of contracts/fa2_test_vectors.json, and replays streams"""
+import os
+
+import pytest
+
+from tools.simulator import FA2Simulator, check_vectors, load_vectors, replay
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VECTORS = load_vectors(os.path.join(ROOT, "contracts", "fa2_test_vectors.json"))
+ADMINISTRATOR = "tz1KqTpEZ7Yob7QbPE4Hy4Wo8fHG8LhKxZSx"
+HOLDER = "tz1b7tUupMgCNw2cCLpKTkSD1NZzB5TkP2sv"
+
+@pytest.mark.parametrize("checkpoints", [False, True], ids=["default", "checkpoints"])
+def test_shared_vectors(checkpoints):
+    assert check_vectors(VECTORS, checkpoints) == []
+
+def test_replay_keeps_only_the_events_of_the_last_operation():
+    simulator = FA2Simulator([(ADMINISTRATOR, 0)])
+    simulator.apply(ADMINISTRATOR, "set_token_metadata", dict(token_id=0, token_info={}))
+    simulator.apply(ADMINISTRATOR, "mint", dict(owner=ADMINISTRATOR, token_id=0, token_amount=10003))
+    transfer = dict(from_=ADMINISTRATOR, txs=[dict(to_=HOLDER, token_id=0, amount=1)])
+    overdraft = dict(from_=HOLDER, txs=[dict(to_=ADMINISTRATOR, token_id=0, amount=10001)])
+    event_counts = []
+
+    def operations(count):
+        for _ in range(count):
+            yield dict(sender=ADMINISTRATOR, entrypoint="transfer", params=[transfer])
+            event_counts.append(len(simulator.events))
+
+    assert replay(simulator, operations(10000)) == dict(applied=10000, failed=0, errors={})
+    assert max(event_counts) == 1
+    assert simulator.events == [("transfer", [transfer])]
+    # a failed operation emits nothing, the events of the transfers before it are discarded
+    assert replay(simulator, iter([dict(sender=HOLDER, entrypoint="transfer", params=[overdraft])])) == dict(
+        applied=0, failed=1, errors={"FA2_INSUFFICIENT_BALANCE": 1})
+    assert simulator.events == []
+    assert replay(simulator, operations(3))["applied"] == 3
+    assert simulator.get_balance(dict(owner=HOLDER, token_id=0)) == 10003
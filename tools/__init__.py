@@ -0,0 +1 @@
+"""Off-chain tooling for the BTCtz contract defined in contracts/btctz.py"""
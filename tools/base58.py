@@ -0,0 +1,139 @@
+"""Base58check encoding of Tezos hashes, addresses and keys"""
+import hashlib
+
+ALPHABET = "123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz"
+
+PREFIXES = {
+    "tz1": bytes([6, 161, 159]),
+    "tz2": bytes([6, 161, 161]),
+    "tz3": bytes([6, 161, 164]),
+    "KT1": bytes([2, 90, 121]),
+    "expr": bytes([13, 44, 64, 27]),
+    "edsk": bytes([13, 15, 58, 7]),
+    "edpk": bytes([13, 15, 37, 217]),
+    "sppk": bytes([3, 254, 226, 86]),
+    "p2pk": bytes([3, 178, 139, 127]),
+    "edsig": bytes([9, 245, 205, 134, 18]),
+    "spsig1": bytes([13, 115, 101, 19, 63]),
+    "p2sig": bytes([54, 240, 44, 52]),
+    "sig": bytes([4, 130, 43]),
+    "B": bytes([1, 52]),
+    "o": bytes([5, 116]),
+    "Net": bytes([87, 82, 0]),
+}
+"""Base58 prefixes of the Tezos encodings used by the tools, by their human readable prefix"""
+
+_INDEXES = {character: index for index, character in enumerate(ALPHABET)}
+_CHUNK_DIGITS = 10
+_CHUNK = 58 ** _CHUNK_DIGITS
+
+def b58encode(data):
+    """Encodes bytes to base58
+
+    Args:
+        data (bytes): data to encode
+
+    Returns:
+        str: base58 string
+    """
+    number = int.from_bytes(data, "big")
+    encoded = []
+    # big int divisions are done 10 digits at a time, the digits of each chunk with machine sized ints
+    while number > 0:
+        number, chunk = divmod(number, _CHUNK)
+        for _ in range(_CHUNK_DIGITS):
+            chunk, remainder = divmod(chunk, 58)
+            encoded.append(ALPHABET[remainder])
+    while encoded and encoded[-1] == ALPHABET[0]:
+        encoded.pop()
+    leading_zeros = len(data) - len(data.lstrip(b"\0"))
+    return ALPHABET[0] * leading_zeros + "".join(reversed(encoded))
+
+def b58decode(text):
+    """Decodes a base58 string
+
+    Args:
+        text (str): base58 string
+
+    Raises:
+        ValueError: if the string contains a character outside of the base58 alphabet
+
+    Returns:
+        bytes: decoded data
+    """
+    number = 0
+    indexes = _INDEXES
+    try:
+        for start in range(0, len(text), _CHUNK_DIGITS):
+            chunk = 0
+            characters = text[start:start + _CHUNK_DIGITS]
+            for character in characters:
+                chunk = chunk * 58 + indexes[character]
+            number = number * 58 ** len(characters) + chunk
+    except KeyError as error:
+        raise ValueError("invalid base58 character {!r}".format(error.args[0]))
+    leading_zeros = len(text) - len(text.lstrip(ALPHABET[0]))
+    body = number.to_bytes((number.bit_length() + 7) // 8, "big")
+    return b"\0" * leading_zeros + body
+
+def _checksum(data):
+    return hashlib.sha256(hashlib.sha256(data).digest()).digest()[:4]
+
+def b58encode_check(data):
+    """Encodes bytes to base58 with a 4 bytes double sha256 checksum
+
+    Args:
+        data (bytes): data to encode
+
+    Returns:
+        str: base58check string
+    """
+    return b58encode(data + _checksum(data))
+
+def b58decode_check(text):
+    """Decodes a base58check string and verifies its checksum
+
+    Args:
+        text (str): base58check string
+
+    Raises:
+        ValueError: if the checksum does not match
+
+    Returns:
+        bytes: decoded data, without checksum
+    """
+    decoded = b58decode(text)
+    data, checksum = decoded[:-4], decoded[-4:]
+    if _checksum(data) != checksum:
+        raise ValueError("invalid base58check checksum for {!r}".format(text))
+    return data
+
+def encode_prefixed(prefix, payload):
+    """Encodes a payload with its Tezos prefix, e.g. a 20 bytes public key hash as tz1 address
+
+    Args:
+        prefix (str): human readable prefix, a key of PREFIXES
+        payload (bytes): raw payload
+
+    Returns:
+        str: base58check string starting with prefix
+    """
+    return b58encode_check(PREFIXES[prefix] + payload)
+
+def decode_prefixed(prefix, text):
+    """Decodes a base58check string and strips its Tezos prefix
+
+    Args:
+        prefix (str): human readable prefix, a key of PREFIXES
+        text (str): base58check string
+
+    Raises:
+        ValueError: if the string does not start with the expected prefix
+
+    Returns:
+        bytes: raw payload
+    """
+    data = b58decode_check(text)
+    if not data.startswith(PREFIXES[prefix]):
+        raise ValueError("{!r} is not a {} encoded value".format(text, prefix))
+    return data[len(PREFIXES[prefix]):]
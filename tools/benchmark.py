@@ -0,0 +1,472 @@
+"""Gas and storage benchmarks of the BTCtz contract entrypoints.
+
+The contract compiled by the `btctz_benchmark` SmartPy compilation target is originated in a persistent
+octez-client mockup, every entrypoint is called at the batch sizes of the `FA2 Benchmark Scenarios` test and
+over ledgers of growing size, and the figures of each operation receipt are written to a JSON report:
+
+    python -m tools.benchmark run --contract btctz_benchmark/step_000_cont_0_contract.tz \\
+        --storage btctz_benchmark/step_000_cont_0_storage.tz --output bench.json
+    python -m tools.benchmark compare bench.json baseline.json --tolerance 0.01
+
+`size` measures the binary size of the code and initial storage of a compiled target from its Micheline JSON output,
+without octez-client, into a report that `compare` reads like the others:
+
+    python -m tools.benchmark size --contract btctz_benchmark/step_000_cont_0_contract.json \
+        --storage btctz_benchmark/step_000_cont_0_storage.json --output size.json
+
+Comparing the report of a variant build, e.g. `btctz_benchmark_compact`, `btctz_benchmark_eager`,
+`btctz_benchmark_no_events`, `btctz_benchmark_checkpoints` or `btctz_single_asset_benchmark`, against the report of `btctz_benchmark` lists its gas
+and size savings as negative deltas, and its extra costs as positive ones, the size of the code every call deserializes included. The cases only use token id 0 and the FA2 parameter types, so they run unchanged against every variant.
+"""
+import argparse
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+
+from .base58 import encode_prefixed
+from .micheline import binary
+
+BATCH_SIZES = [1, 10, 100, 500]
+"""Default batch sizes, same as BENCHMARK_BATCH_SIZES in contracts/btctz.py"""
+
+LEDGER_SIZES = [0, 1000, 10000]
+"""Default number of holders minted before the entrypoints are measured"""
+
+ADMINISTRATOR_ALIAS = "bootstrap1"
+ADMINISTRATOR = "tz1KqTpEZ7Yob7QbPE4Hy4Wo8fHG8LhKxZSx"
+"""bootstrap1 of the mockup, administrator of the btctz_benchmark compilation target"""
+
+TOKEN_ID = 0
+POPULATE_CHUNK_SIZE = 200
+METRICS = ["consumed_gas", "storage_size_diff", "big_map_diffs"]
+"""Report figures compared against the baseline"""
+
+SIZE_METRICS = ["code_size", "script_size"]
+"""Contract figures compared against the baseline, before the cases"""
+
+HOT_PATH_ENTRYPOINTS = ["transfer", "balance_of", "update_operators", "update_operators_bulk"]
+"""Entrypoints called by holders, compared alone with `compare --hot-path`"""
+
+CALLBACK_CODE = """parameter (list (pair (pair (address %owner) (nat %token_id)) (nat %balance)));
+storage unit;
+code { CDR ; NIL operation ; PAIR }
+"""
+"""balance_of callback contract, it drops the responses so that only the token side is measured"""
+
+class Prim:
+    """Michelson primitive application, e.g. Prim("Left", value)"""
+    def __init__(self, name, *args):
+        self.name = name
+        self.args = args
+
+def michelson(value):
+    """Formats a python value as Michelson expression, as accepted by the --arg of octez-client
+
+    bool -> True/False, int -> int, str -> string, bytes -> bytes, tuple -> right comb of Pair,
+    list -> sequence, dict -> map literal and Prim -> primitive application.
+
+    Args:
+        value: python value
+
+    Returns:
+        str: Michelson expression
+    """
+    if isinstance(value, bool):
+        return "True" if value else "False"
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, str):
+        return json.dumps(value)
+    if isinstance(value, bytes):
+        return "0x" + value.hex()
+    if isinstance(value, tuple):
+        if len(value) > 2:
+            value = (value[0], value[1:])
+        return "(Pair {} {})".format(michelson(value[0]), michelson(value[1]))
+    if isinstance(value, list):
+        return "{ " + " ; ".join(michelson(item) for item in value) + " }"
+    if isinstance(value, dict):
+        return "{ " + " ; ".join("Elt {} {}".format(michelson(key), michelson(item)) for key, item in sorted(value.items())) + " }"
+    if isinstance(value, Prim):
+        if not value.args:
+            return value.name
+        return "({} {})".format(value.name, " ".join(michelson(arg) for arg in value.args))
+    raise TypeError("cannot format {!r} as Michelson".format(value))
+
+def make_address(namespace, index):
+    """Deterministic tz1 address used for generated holders, recipients and operators
+
+    Args:
+        namespace (str): name of the address family
+        index (int): index in the family
+
+    Returns:
+        str: tz1 address
+    """
+    digest = hashlib.blake2b("{}/{}".format(namespace, index).encode(), digest_size=20).digest()
+    return encode_prefixed("tz1", digest)
+
+def make_addresses(namespace, count, offset=0):
+    return [make_address(namespace, index) for index in range(offset, offset + count)]
+
+def recipient_token_amount(owner, amount):
+    return (owner, TOKEN_ID, amount)
+
+def operator_param(owner, operator):
+    return (owner, operator, TOKEN_ID)
+
+_CONSUMED_GAS = re.compile(r"^\s*Consumed gas: ([\d.]+)", re.MULTILINE)
+_STORAGE_SIZE = re.compile(r"^\s*Storage size: (\d+) bytes", re.MULTILINE)
+_PAID_STORAGE = re.compile(r"^\s*Paid storage size diff: (\d+) bytes", re.MULTILINE)
+_BIG_MAP_DIFF = re.compile(r"^\s*(Set|Unset) map\(", re.MULTILINE)
+_EVENT_GAS = re.compile(r"^\s*Internal Event:.*?Consumed gas: ([\d.]+)", re.MULTILINE | re.DOTALL)
+_ORIGINATED = re.compile(r"New contract (KT1\w+) originated")
+
+def parse_receipt(output):
+    """Extracts the benchmark figures from the receipt printed by octez-client
+
+    Args:
+        output (str): octez-client output of a transfer
+
+    Returns:
+        dict: consumed_gas (sum over the operation and its internal operations), storage_size of the called
+        contract, paid_storage_size_diff, big_map_diffs (number of Set/Unset big_map updates), and the number of
+        contract events with the gas of their internal operations
+    """
+    storage_sizes = _STORAGE_SIZE.findall(output)
+    event_gas = _EVENT_GAS.findall(output)
+    return dict(
+        consumed_gas=round(sum(float(gas) for gas in _CONSUMED_GAS.findall(output)), 3),
+        storage_size=int(storage_sizes[0]) if storage_sizes else None,
+        paid_storage_size_diff=sum(int(size) for size in _PAID_STORAGE.findall(output)),
+        big_map_diffs=len(_BIG_MAP_DIFF.findall(output)),
+        events=len(event_gas),
+        event_gas=round(sum(float(gas) for gas in event_gas), 3),
+    )
+
+class Mockup:
+    """Persistent octez-client mockup holding one originated token contract"""
+
+    def __init__(self, base_dir, client="octez-client", protocol=None):
+        self.base_dir = base_dir
+        self.client = client
+        self.protocol = protocol
+        self.storage_size = None
+        self.origination = None
+
+    def run(self, *args):
+        """Runs an octez-client command against the mockup
+
+        Raises:
+            RuntimeError: if the command fails, with the client output
+
+        Returns:
+            str: the client output
+        """
+        command = [self.client, "--base-dir", self.base_dir, "--mode", "mockup"]
+        if self.protocol:
+            command += ["--protocol", self.protocol]
+        completed = subprocess.run(command + list(args), stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True)
+        if completed.returncode != 0:
+            raise RuntimeError(completed.stdout)
+        return completed.stdout
+
+    def create(self):
+        self.run("create", "mockup")
+
+    def code_size(self, code):
+        """Returns the size in bytes of the binary encoding of a Michelson script, what each call deserializes"""
+        output = self.run("convert", "script", code, "from", "michelson", "to", "binary").strip()
+        return len(output[2:] if output.startswith("0x") else output) // 2
+
+    def originate(self, alias, code, storage):
+        """Originates a contract from the administrator account, the storage size of the originated contract becomes the reference of storage_size_diff
+
+        Args:
+            alias (str): alias of the contract in the mockup
+            code (str): path of the Michelson code
+            storage (str): initial storage, as Michelson expression
+
+        Returns:
+            str: the KT1 address, the receipt figures are kept in origination
+        """
+        output = self.run("originate", "contract", alias, "transferring", "0", "from", ADMINISTRATOR_ALIAS,
+                          "running", code, "--init", storage, "--burn-cap", "1000", "--force")
+        self.origination = parse_receipt(output)
+        self.storage_size = self.origination["storage_size"]
+        return _ORIGINATED.search(output).group(1)
+
+    def call(self, contract, entrypoint, argument):
+        """Calls an entrypoint from the administrator account and measures the operation
+
+        Args:
+            contract (str): contract alias or address
+            entrypoint (str): entrypoint name
+            argument: python value of the parameter, see michelson
+
+        Returns:
+            dict: figures of parse_receipt plus storage_size_diff, the change of the contract storage size
+        """
+        output = self.run("transfer", "0", "from", ADMINISTRATOR_ALIAS, "to", contract, "--entrypoint", entrypoint,
+                          "--arg", michelson(argument), "--burn-cap", "1000")
+        receipt = parse_receipt(output)
+        if self.storage_size is not None and receipt["storage_size"] is not None:
+            receipt["storage_size_diff"] = receipt["storage_size"] - self.storage_size
+        else:
+            receipt["storage_size_diff"] = receipt["paid_storage_size_diff"]
+        if receipt["storage_size"] is not None:
+            self.storage_size = receipt["storage_size"]
+        return receipt
+
+def make_cases(batch_size, ledger_size, callback):
+    """Returns the benchmark cases of one batch size, in execution order. The cases leave the ledger at the size they found it,
+    apart from the administrator balance
+
+    Args:
+        batch_size (int): number of items per batch entrypoint call
+        ledger_size (int): number of holders in the ledger, used to name fresh addresses
+        callback (str): address of the balance_of callback contract
+
+    Returns:
+        list: tuples (case, entrypoint, argument, new_keys)
+    """
+    recipients = make_addresses("recipient-{}".format(ledger_size), batch_size)
+    fresh = make_addresses("fresh-{}".format(ledger_size), batch_size)
+    operators = make_addresses("operator", batch_size)
+    return [
+        ("mint_batch", "mint_batch", [recipient_token_amount(recipient, 100) for recipient in recipients], batch_size),
+        ("transfer_existing_keys", "transfer", [(ADMINISTRATOR, [(recipient, TOKEN_ID, 1) for recipient in recipients])], 0),
+        ("import_balances", "import_balances", ([(recipient, 101) for recipient in recipients], TOKEN_ID), 0),
+        ("transfer_new_keys", "transfer", [(ADMINISTRATOR, [(recipient, TOKEN_ID, 1) for recipient in fresh])], batch_size),
+        ("add_operators", "update_operators", [Prim("Left", operator_param(ADMINISTRATOR, operator)) for operator in operators], 0),
+        ("remove_operators", "update_operators", [Prim("Right", operator_param(ADMINISTRATOR, operator)) for operator in operators], 0),
+        ("add_all_tokens_operators", "update_operators_bulk", [(ADMINISTRATOR, [Prim("Left", (operator, Prim("None"))) for operator in operators])], 0),
+        ("remove_all_tokens_operators", "update_operators_bulk", [(ADMINISTRATOR, [Prim("Right", (operator, Prim("None"))) for operator in operators])], 0),
+        ("balance_of", "balance_of", ([(recipient, TOKEN_ID) for recipient in recipients], callback), 0),
+        ("burn_batch", "burn_batch", [recipient_token_amount(recipient, 101) for recipient in recipients]
+            + [recipient_token_amount(recipient, 1) for recipient in fresh], 0),
+        ("pause_tokens", "pause_tokens", [(index < batch_size - 1, TOKEN_ID) for index in range(batch_size)], 0),
+    ]
+
+def make_single_cases():
+    """Returns the cases of the entrypoints that are not batched, measured once per ledger size
+
+    Returns:
+        list: tuples (case, entrypoint, argument, new_keys)
+    """
+    administrator = make_address("administrator", 0)
+    return [
+        ("mint", "mint", recipient_token_amount(ADMINISTRATOR, 10 ** 12), 1),
+        ("burn", "burn", recipient_token_amount(ADMINISTRATOR, 1), 0),
+        ("pause", "pause_token", (True, TOKEN_ID), 0),
+        ("unpause", "pause_token", (False, TOKEN_ID), 0),
+        ("set_administrator", "set_administrator", (administrator, TOKEN_ID), 0),
+        ("remove_administrator", "remove_administrator", (administrator, TOKEN_ID), 0),
+    ]
+
+def token_metadata_argument():
+    return (TOKEN_ID, {
+        "": b"ipfs://QmQMWgwv1BnFG46JVhwFyiSwudPaaNRh3nFqvT9Wab3qLV",
+        "symbol": b"BTCtz",
+        "name": b"BitcoinTez",
+        "decimals": b"8",
+    })
+
+def populate(mockup, ledger_size, chunk_size=POPULATE_CHUNK_SIZE):
+    """Mints 1 token to ledger_size generated holders, in mint_batch chunks that are not measured"""
+    for offset in range(0, ledger_size, chunk_size):
+        holders = make_addresses("holder", min(chunk_size, ledger_size - offset), offset)
+        mockup.call("btctz", "mint_batch", [recipient_token_amount(holder, 1) for holder in holders])
+
+def run_ledger_size(mockup, code, storage, ledger_size, batch_sizes):
+    """Originates a fresh token, fills its ledger and measures every case
+
+    Returns:
+        list: one result dict per case and batch size
+    """
+    mockup.create()
+    with tempfile.NamedTemporaryFile("w", suffix=".tz", delete=False) as callback_code:
+        callback_code.write(CALLBACK_CODE)
+    try:
+        callback = mockup.originate("callback", callback_code.name, "Unit")
+    finally:
+        os.unlink(callback_code.name)
+    mockup.originate("btctz", code, storage)
+
+    # the storage size at origination is the code size plus the initial storage, it drives the origination burn
+    results = [dict(case="origination", entrypoint=None, batch_size=1, ledger_size=ledger_size, new_keys=0,
+                    storage_size_diff=mockup.origination["storage_size"], **mockup.origination)]
+
+    def measure(case, entrypoint, argument, new_keys, batch_size):
+        result = dict(case=case, entrypoint=entrypoint, batch_size=batch_size, ledger_size=ledger_size, new_keys=new_keys)
+        try:
+            result.update(mockup.call("btctz", entrypoint, argument))
+        except RuntimeError as error:
+            result["error"] = str(error).strip().splitlines()[-1] if str(error).strip() else "failed"
+        results.append(result)
+
+    measure("set_token_metadata", "set_token_metadata", token_metadata_argument(), 1, 1)
+    single_cases = make_single_cases()
+    measure(*single_cases[0], 1)
+    populate(mockup, ledger_size)
+    for batch_size in batch_sizes:
+        for case in make_cases(batch_size, ledger_size, callback):
+            measure(*case, batch_size)
+    for case in single_cases[1:]:
+        measure(*case, 1)
+    return results
+
+def run(code, storage, output, batch_sizes=BATCH_SIZES, ledger_sizes=LEDGER_SIZES, client="octez-client", protocol=None):
+    """Runs the benchmark for every ledger size and writes the report
+
+    Args:
+        code (str): path of the compiled contract
+        storage (str): path of the compiled initial storage, or a Michelson expression
+        output (str): path of the JSON report
+        batch_sizes (list, optional): batch sizes. Defaults to BATCH_SIZES.
+        ledger_sizes (list, optional): ledger sizes. Defaults to LEDGER_SIZES.
+        client (str, optional): octez-client executable. Defaults to "octez-client".
+        protocol (str, optional): mockup protocol hash. Defaults to the client default.
+
+    Returns:
+        dict: the report
+    """
+    if os.path.exists(storage):
+        with open(storage) as storage_file:
+            storage = storage_file.read().strip()
+    with open(code, "rb") as code_file:
+        code_hash = hashlib.sha256(code_file.read()).hexdigest()
+
+    results = []
+    code_size = None
+    for ledger_size in ledger_sizes:
+        with tempfile.TemporaryDirectory(prefix="btctz-bench-") as base_dir:
+            mockup = Mockup(base_dir, client, protocol)
+            results += run_ledger_size(mockup, code, storage, ledger_size, batch_sizes)
+            if code_size is None:
+                code_size = mockup.code_size(code)
+
+    report = dict(contract=os.path.basename(code), code_sha256=code_hash, code_size=code_size, protocol=protocol,
+                  batch_sizes=list(batch_sizes), ledger_sizes=list(ledger_sizes), results=results)
+    with open(output, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    return report
+
+def size(code, storage=None, output=None):
+    """Measures a compiled contract without octez-client
+
+    Args:
+        code (str): path of the compiled contract as Micheline JSON, e.g. step_000_cont_0_contract.json
+        storage (str, optional): path of the compiled initial storage as Micheline JSON. Defaults to None.
+        output (str, optional): path of the JSON report. Defaults to None, no report is written.
+
+    Returns:
+        dict: report without cases, with code_size, the binary size of the code every call deserializes, and with a
+        storage script_size, the code and initial storage paid for by the origination, big_map contents excluded
+    """
+    with open(code, "rb") as code_file:
+        content = code_file.read()
+    code_size = len(binary(json.loads(content)))
+    script_size = None
+    if storage is not None:
+        with open(storage) as storage_file:
+            script_size = code_size + len(binary(json.load(storage_file)))
+    report = dict(contract=os.path.basename(code), code_sha256=hashlib.sha256(content).hexdigest(), code_size=code_size,
+                  script_size=script_size, results=[])
+    if output is not None:
+        with open(output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+    return report
+
+def result_key(result):
+    return (result["case"], result["batch_size"], result["ledger_size"])
+
+def compare(report, baseline, tolerance=0.0, entrypoints=None):
+    """Compares the figures of a report against a baseline report
+
+    Args:
+        report (dict): the new report
+        baseline (dict): the saved baseline report
+        tolerance (float, optional): relative increase allowed before a figure counts as regression. Defaults to 0.
+        entrypoints (list, optional): only compare the cases calling these entrypoints, e.g. HOT_PATH_ENTRYPOINTS. Defaults to every case.
+
+    Returns:
+        list: one dict per case and metric present in both reports, with baseline, current, delta and regression flag,
+        preceded by the SIZE_METRICS both reports have.
+        Cases that fail in the report but not in the baseline are returned with the error and flagged as regression.
+    """
+    baseline_results = {result_key(result): result for result in baseline["results"]}
+    rows = []
+    for metric in SIZE_METRICS:
+        if report.get(metric) is None or baseline.get(metric) is None:
+            continue
+        before, after = baseline[metric], report[metric]
+        rows.append(dict(case="code", batch_size="-", ledger_size="-", metric=metric, baseline=before, current=after,
+                         delta=after - before, regression=after > before + abs(before) * tolerance))
+    for result in report["results"]:
+        previous = baseline_results.get(result_key(result))
+        if previous is None or (entrypoints is not None and result.get("entrypoint") not in entrypoints):
+            continue
+        if "error" in result or "error" in previous:
+            rows.append(dict(case=result["case"], batch_size=result["batch_size"], ledger_size=result["ledger_size"],
+                             metric="error", baseline=previous.get("error"), current=result.get("error"), delta=None,
+                             regression="error" in result and "error" not in previous))
+            continue
+        for metric in METRICS:
+            before, after = previous[metric], result[metric]
+            rows.append(dict(case=result["case"], batch_size=result["batch_size"], ledger_size=result["ledger_size"],
+                             metric=metric, baseline=before, current=after, delta=round(after - before, 3),
+                             regression=after > before + abs(before) * tolerance))
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+
+    run_parser = commands.add_parser("run", help="measure the compiled contract in an octez-client mockup")
+    run_parser.add_argument("--contract", required=True, help="compiled contract (.tz)")
+    run_parser.add_argument("--storage", required=True, help="compiled initial storage (.tz) or Michelson expression")
+    run_parser.add_argument("--output", required=True, help="path of the JSON report")
+    run_parser.add_argument("--batch-sizes", default=",".join(map(str, BATCH_SIZES)))
+    run_parser.add_argument("--ledger-sizes", default=",".join(map(str, LEDGER_SIZES)))
+    run_parser.add_argument("--client", default="octez-client")
+    run_parser.add_argument("--protocol", default=None)
+
+    size_parser = commands.add_parser("size", help="measure the code and storage size of a compiled contract without octez-client")
+    size_parser.add_argument("--contract", required=True, help="compiled contract (.json)")
+    size_parser.add_argument("--storage", help="compiled initial storage (.json)")
+    size_parser.add_argument("--output", help="path of the JSON report")
+
+    compare_parser = commands.add_parser("compare", help="compare a report against a baseline report")
+    compare_parser.add_argument("report")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("--tolerance", type=float, default=0.0, help="allowed relative increase, e.g. 0.01")
+    compare_parser.add_argument("--hot-path", action="store_true", help="only compare the cases of HOT_PATH_ENTRYPOINTS")
+
+    arguments = parser.parse_args(argv)
+    if arguments.command == "run":
+        run(arguments.contract, arguments.storage, arguments.output,
+            [int(size) for size in arguments.batch_sizes.split(",")],
+            [int(size) for size in arguments.ledger_sizes.split(",")],
+            arguments.client, arguments.protocol)
+        return 0
+    if arguments.command == "size":
+        report = size(arguments.contract, arguments.storage, arguments.output)
+        print("code_size {code_size} script_size {script_size}".format(**report))
+        return 0
+
+    with open(arguments.report) as report_file, open(arguments.baseline) as baseline_file:
+        rows = compare(json.load(report_file), json.load(baseline_file), arguments.tolerance,
+                       HOT_PATH_ENTRYPOINTS if arguments.hot_path else None)
+    for row in rows:
+        print("{flag} {case:<24} batch={batch_size:<4} ledger={ledger_size:<6} {metric:<18} {baseline} -> {current} ({delta})".format(
+            flag="!" if row["regression"] else " ", **row))
+    return 1 if any(row["regression"] for row in rows) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,751 @@
+"""Asyncio operations client for the BTCtz entrypoints, replacing the one operation per block flows of src/index.ts.
+
+src/index.ts reads the counter, sends one operation and waits seven blocks before the next call. This client:
+
+- keeps a pool of keep-alive RPC connections shared by every task,
+- forges and signs transactions locally and tracks the counter of each signing account itself, the counter is only
+  read back from the node at start and after a failed injection,
+- packs many entrypoint calls into one operation group, the simulated gas of run_operation, or the gas predicted
+  by tools/estimator.py, decides where a group ends,
+- injects the next group of an account as soon as its previous group is included, instead of after its confirmations,
+- follows the head with a single task for every group in flight, resolving the inclusion and confirmation futures
+  of the calls concurrently.
+
+A node keeps at most one manager operation per source in its mempool, so the groups of one account follow each
+other block by block. More groups per block come from more signing accounts, each with the administrator rights the
+calls need. Only revealed Ed25519 (tz1) accounts can sign.
+
+    python -m tools.client mint recipients.csv --rpc http://127.0.0.1:8732 --contract KT1... --secret-key edsk...
+    python -m tools.client mint recipients.csv --mock --accounts 4
+
+recipients.csv holds one `address,amount` line per recipient. `--mock` runs the calls against tools/mock_rpc.py
+serving the reference model of tools/simulator.py, which is also how the client is tested without a node.
+"""
+import argparse
+import asyncio
+import collections
+import csv
+import hashlib
+import json
+import math
+import ssl
+import struct
+import sys
+import time
+import urllib.parse
+
+from . import ed25519
+from .base58 import decode_prefixed, encode_prefixed
+from .micheline import ENTRYPOINT_TYPES, address_bytes, binary, decode_address, encode, unbinary
+
+class RpcError(Exception):
+    """Non 200 answer of the node, body is the decoded error list when the node sent JSON"""
+
+    def __init__(self, status, body):
+        super().__init__("RPC error {}: {}".format(status, body))
+        self.status = status
+        self.body = body
+
+class OperationError(Exception):
+    """Raised for the calls of a failed operation group, errors are the errors reported by the node"""
+
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or []
+
+TRANSACTION_TAG = 0x6C
+WATERMARK = b"\x03"
+"""Watermark of manager operations, prepended to the forged bytes before signing"""
+
+ZERO_SIGNATURE = encode_prefixed("edsig", bytes(64))
+"""Signature of simulated operations, run_operation does not check it"""
+
+SIGNATURE_SIZE = 64
+BRANCH_SIZE = 32
+
+_IMPLICIT_PREFIXES = ["tz1", "tz2", "tz3"]
+_ENTRYPOINT_CODES = {"default": 0, "root": 1, "do": 2, "set_delegate": 3, "remove_delegate": 4}
+_ENTRYPOINT_NAMES = {code: name for name, code in _ENTRYPOINT_CODES.items()}
+
+def forge_nat(value):
+    """Unsigned zarith encoding of the amounts, counters and limits of an operation"""
+    data = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            data.append(byte | 0x80)
+        else:
+            data.append(byte)
+            return bytes(data)
+
+def read_nat(data, offset):
+    value = shift = 0
+    while True:
+        byte = data[offset]
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        offset += 1
+        if not byte & 0x80:
+            return value, offset
+
+def forge_transaction(content):
+    """Forges the content of a transaction
+
+    Args:
+        content (dict): transaction in the JSON format of the RPC, with source, fee, counter, gas_limit,
+            storage_limit, amount, destination and optional parameters (entrypoint and Micheline value)
+
+    Returns:
+        bytes: binary content, tag included
+    """
+    source = content["source"]
+    data = bytearray([TRANSACTION_TAG])
+    data += bytes([_IMPLICIT_PREFIXES.index(source[:3])]) + decode_prefixed(source[:3], source)
+    for field in ("fee", "counter", "gas_limit", "storage_limit", "amount"):
+        data += forge_nat(int(content[field]))
+    data += address_bytes(content["destination"])
+    parameters = content.get("parameters")
+    if parameters is None:
+        data.append(0x00)
+        return bytes(data)
+    entrypoint = parameters["entrypoint"]
+    data.append(0xFF)
+    if entrypoint in _ENTRYPOINT_CODES:
+        data.append(_ENTRYPOINT_CODES[entrypoint])
+    else:
+        data += b"\xff" + bytes([len(entrypoint)]) + entrypoint.encode()
+    value = binary(parameters["value"])
+    data += struct.pack(">I", len(value)) + value
+    return bytes(data)
+
+def forge_operation(branch, contents):
+    """Forges an operation group of transactions, the bytes to sign
+
+    Args:
+        branch (str): B... hash of the block the operation is anchored on
+        contents (list): transactions, see forge_transaction
+
+    Returns:
+        bytes: forged operation, without signature
+    """
+    return decode_prefixed("B", branch) + b"".join(forge_transaction(content) for content in contents)
+
+def unforge_operation(data):
+    """Inverse of forge_operation followed by a signature, as received by the injection RPC
+
+    Raises:
+        ValueError: on contents other than transactions or trailing bytes
+
+    Returns:
+        tuple: branch (str), transactions (list) and signature (bytes)
+    """
+    branch = encode_prefixed("B", data[:BRANCH_SIZE])
+    end = len(data) - SIGNATURE_SIZE
+    offset = BRANCH_SIZE
+    contents = []
+    while offset < end:
+        if data[offset] != TRANSACTION_TAG:
+            raise ValueError("unsupported operation tag {:#x}".format(data[offset]))
+        content = {"kind": "transaction", "source": encode_prefixed(_IMPLICIT_PREFIXES[data[offset + 1]], data[offset + 2:offset + 22])}
+        offset += 22
+        for field in ("fee", "counter", "gas_limit", "storage_limit", "amount"):
+            value, offset = read_nat(data, offset)
+            content[field] = str(value)
+        content["destination"] = decode_address(data[offset:offset + 22])
+        offset += 22
+        has_parameters = data[offset]
+        offset += 1
+        if has_parameters:
+            code = data[offset]
+            offset += 1
+            if code == 0xFF:
+                size = data[offset]
+                entrypoint = data[offset + 1:offset + 1 + size].decode()
+                offset += 1 + size
+            else:
+                entrypoint = _ENTRYPOINT_NAMES[code]
+            size, = struct.unpack_from(">I", data, offset)
+            offset += 4
+            value, value_end = unbinary(data, offset)
+            if value_end != offset + size:
+                raise ValueError("parameters of {} bytes hold {} bytes of Micheline".format(size, value_end - offset))
+            offset = value_end
+            content["parameters"] = {"entrypoint": entrypoint, "value": value}
+        contents.append(content)
+    if offset != end:
+        raise ValueError("trailing bytes before the signature")
+    return branch, contents, data[end:]
+
+def operation_hash(signed):
+    """Returns the o... hash of a signed operation"""
+    return encode_prefixed("o", hashlib.blake2b(signed, digest_size=32).digest())
+
+def minimal_fee(gas_limit, size, minimal_fees=100, nanotez_per_gas=100, nanotez_per_byte=1000):
+    """Returns the smallest fee in mutez the default filter of the mempool accepts, for one operation
+
+    Args:
+        gas_limit (int): gas limit of the operation
+        size (int): forged size of the signed operation in bytes
+        minimal_fees (int, optional): base fee in mutez. Defaults to 100.
+        nanotez_per_gas (int, optional): fee per gas unit. Defaults to 100.
+        nanotez_per_byte (int, optional): fee per byte. Defaults to 1000.
+    """
+    return minimal_fees + math.ceil((gas_limit * nanotez_per_gas + size * nanotez_per_byte) / 1000)
+
+class AsyncRpc:
+    """Pool of keep-alive HTTP/1.1 connections to a node, shared by the tasks of one event loop"""
+
+    def __init__(self, url, size=4, timeout=30.0):
+        """
+        Args:
+            url (str): node RPC url, e.g. http://127.0.0.1:8732
+            size (int, optional): maximum number of concurrent connections. Defaults to 4.
+            timeout (float, optional): seconds before a request is abandoned. Defaults to 30.
+        """
+        parsed = urllib.parse.urlsplit(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        self.ssl = ssl.create_default_context() if parsed.scheme == "https" else None
+        self.prefix = parsed.path.rstrip("/")
+        self.timeout = timeout
+        self.requests = 0
+        self._idle = []
+        self._slots = asyncio.Semaphore(size)
+
+    async def get(self, path):
+        return await self.request("GET", path)
+
+    async def post(self, path, body):
+        return await self.request("POST", path, body)
+
+    async def request(self, method, path, body=None):
+        """Sends a request on an idle connection, or a new one
+
+        A kept-alive connection closed by the node is retried once on a fresh connection.
+
+        Raises:
+            RpcError: if the node does not answer 200
+
+        Returns:
+            decoded JSON answer
+        """
+        payload = None if body is None else json.dumps(body).encode()
+        async with self._slots:
+            while True:
+                reused = bool(self._idle)
+                connection = self._idle.pop() if reused else None
+                try:
+                    if connection is None:
+                        connection = await asyncio.wait_for(asyncio.open_connection(self.host, self.port, ssl=self.ssl), self.timeout)
+                    status, content, keep_alive = await asyncio.wait_for(self._exchange(connection, method, path, payload), self.timeout)
+                except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    if connection is not None:
+                        connection[1].close()
+                    if reused:
+                        continue
+                    raise
+                break
+        self.requests += 1
+        if keep_alive:
+            self._idle.append(connection)
+        else:
+            connection[1].close()
+        try:
+            decoded = json.loads(content) if content else None
+        except ValueError:
+            decoded = content.decode(errors="replace")
+        if status != 200:
+            raise RpcError(status, decoded)
+        return decoded
+
+    async def _exchange(self, connection, method, path, payload):
+        reader, writer = connection
+        lines = ["{} {}{} HTTP/1.1".format(method, self.prefix, path), "Host: {}:{}".format(self.host, self.port), "Accept: application/json"]
+        if payload is not None:
+            lines += ["Content-Type: application/json", "Content-Length: {}".format(len(payload))]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + (payload or b""))
+        await writer.drain()
+        status_line = await reader.readline()
+        if not status_line:
+            raise asyncio.IncompleteReadError(b"", None)
+        status = int(status_line.split()[1])
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        keep_alive = headers.get("connection", "").lower() != "close"
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            chunks = []
+            while True:
+                size = int((await reader.readline()).split(b";")[0], 16)
+                chunk = await reader.readexactly(size + 2)
+                if not size:
+                    break
+                chunks.append(chunk[:-2])
+            content = b"".join(chunks)
+        elif "content-length" in headers:
+            content = await reader.readexactly(int(headers["content-length"]))
+        else:
+            content = await reader.read()
+            keep_alive = False
+        return status, content, keep_alive
+
+    async def close(self):
+        while self._idle:
+            writer = self._idle.pop()[1]
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+class Account:
+    """Signing account of the client, with its locally tracked counter"""
+
+    def __init__(self, signing_key):
+        """
+        Args:
+            signing_key (ed25519.SigningKey): key of a revealed tz1 account
+        """
+        self.key = signing_key
+        self.address = signing_key.address
+        self.counter = None
+        self.busy = False
+
+    async def sync(self, rpc):
+        """Reads the counter of the account back from the node
+
+        Raises:
+            OperationError: if the account is not revealed
+        """
+        path = "/chains/main/blocks/head/context/contracts/{}/".format(self.address)
+        manager_key, counter = await asyncio.gather(rpc.get(path + "manager_key"), rpc.get(path + "counter"))
+        if manager_key is None:
+            raise OperationError("{} is not revealed".format(self.address))
+        self.counter = int(counter)
+
+class Call:
+    """Entrypoint call queued in the client
+
+    Attributes:
+        included (asyncio.Future): resolves to dict(operation, level, block) once the group of the call is included, or
+            raises OperationError if it failed
+        confirmed (asyncio.Future): resolves to the same dict once the block has the requested confirmations
+    """
+
+    def __init__(self, entrypoint, params, value, amount, loop):
+        self.entrypoint = entrypoint
+        self.params = params
+        self.value = value
+        self.amount = amount
+        self.included = loop.create_future()
+        self.confirmed = loop.create_future()
+
+    def fail(self, error):
+        for future in (self.included, self.confirmed):
+            if not future.done():
+                future.set_exception(error)
+        # callers await one of the two futures, the error is marked as retrieved on both
+        self.included.exception()
+        self.confirmed.exception()
+
+class Group:
+    """Operation group injected by the client and waiting for its inclusion"""
+
+    def __init__(self, operation, account, calls, branch_level):
+        self.operation = operation
+        self.account = account
+        self.calls = calls
+        self.branch_level = branch_level
+        self.level = None
+        self.block = None
+
+class OperationsClient:
+    """Batches entrypoint calls of one contract into operation groups signed by a pool of accounts
+
+    Calls are queued with submit or the entrypoint helpers and sent in submission order: each idle account takes
+    the next calls of the queue, at most max_calls_per_group, and fewer when their simulated gas exceeds
+    max_group_gas. A call failing in simulation is rejected alone, the rest of its group is simulated again.
+
+        async with OperationsClient(AsyncRpc(url), contract, [key]) as client:
+            calls = [client.mint(owner, amount) for owner, amount in recipients]
+            await asyncio.gather(*(call.confirmed for call in calls))
+    """
+
+    def __init__(self, rpc, contract, signing_keys, confirmations=2, max_calls_per_group=50, max_group_gas=1040000,
+                 operations_ttl=120, poll_interval=1.0, gas_margin=100, storage_margin=0, fees=None, estimator=None, is_new_key=None):
+        """
+        Args:
+            rpc (AsyncRpc): node connection pool
+            contract (str): KT1 address of the token
+            signing_keys (list): ed25519.SigningKey of the accounts signing the calls
+            confirmations (int, optional): blocks, the including block counted, after which a call is confirmed. Defaults to 2.
+            max_calls_per_group (int, optional): calls packed in one operation group. Defaults to 50.
+            max_group_gas (int, optional): gas limit of one operation group, the hard gas limit per operation. Defaults to 1040000.
+            operations_ttl (int, optional): blocks after its branch block after which a group that was not included is given up,
+                as the node refuses it. Defaults to 120.
+            poll_interval (float, optional): seconds between two reads of the head. Defaults to 1.
+            gas_margin (int, optional): gas added to the simulated gas of each call. Defaults to 100.
+            storage_margin (int, optional): bytes added to the simulated storage of each call. Defaults to 0.
+            fees (dict, optional): minimal_fee arguments of the mempool filter of the node. Defaults to the octez defaults.
+            estimator (tools.estimator.Estimator, optional): sets the limits of the groups whose entrypoints it models
+                instead of run_operation. A call that would fail then fails its whole group on chain. Defaults to None.
+            is_new_key (callable, optional): ledger key lookup of the estimator, see tools.estimator.features. Defaults to None.
+        """
+        self.rpc = rpc
+        self.contract = contract
+        self.accounts = [Account(key) for key in signing_keys]
+        self.confirmations = confirmations
+        self.max_calls_per_group = max_calls_per_group
+        self.max_group_gas = max_group_gas
+        self.operations_ttl = operations_ttl
+        self.poll_interval = poll_interval
+        self.gas_margin = gas_margin
+        self.storage_margin = storage_margin
+        self.fees = dict(fees or {})
+        self.estimator = estimator
+        self.is_new_key = is_new_key
+        self.chain_id = None
+        self.head_level = None
+        self.groups = {}
+        self._queue = collections.deque()
+        self._wakeup = None
+        self._tasks = []
+        self._sending = set()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def start(self):
+        """Reads the chain id, the head and the counters, then starts the batching and head following tasks"""
+        self._wakeup = asyncio.Event()
+        self.chain_id, header = await asyncio.gather(self.rpc.get("/chains/main/chain_id"), self.rpc.get("/chains/main/blocks/head/header"))
+        self.head_level = header["level"]
+        await asyncio.gather(*(account.sync(self.rpc) for account in self.accounts))
+        self._tasks = [asyncio.ensure_future(self._batch()), asyncio.ensure_future(self._follow(self.head_level))]
+
+    async def close(self):
+        """Stops the tasks, the calls still queued or in flight are left unresolved"""
+        for task in self._tasks + list(self._sending):
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._sending, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, entrypoint, value, amount=0):
+        """Queues an entrypoint call
+
+        Args:
+            entrypoint (str): entrypoint name, a key of tools.micheline.ENTRYPOINT_TYPES
+            value: python value of the parameter, see tools.micheline.encode
+            amount (int, optional): mutez sent with the call. Defaults to 0.
+
+        Returns:
+            Call: the queued call
+        """
+        call = Call(entrypoint, value, encode(ENTRYPOINT_TYPES[entrypoint], value), amount, asyncio.get_event_loop())
+        self._queue.append(call)
+        self._wakeup.set()
+        return call
+
+    def mint(self, owner, amount, token_id=0):
+        return self.submit("mint", dict(owner=owner, token_id=token_id, token_amount=amount))
+
+    def mint_batch(self, recipients, token_id=0):
+        """Queues one mint_batch call for (owner, amount) pairs"""
+        return self.submit("mint_batch", [dict(owner=owner, token_id=token_id, token_amount=amount) for owner, amount in recipients])
+
+    def burn(self, owner, amount, token_id=0):
+        return self.submit("burn", dict(owner=owner, token_id=token_id, token_amount=amount))
+
+    def import_balances(self, balances, token_id=0):
+        """Queues one import_balances call for (owner, balance) pairs"""
+        return self.submit("import_balances", dict(token_id=token_id, balances=[dict(owner=owner, balance=balance) for owner, balance in balances]))
+
+    def transfer(self, from_, txs):
+        """Queues a transfer from one owner, txs being (to_, token_id, amount) triples"""
+        return self.submit("transfer", [dict(from_=from_, txs=[dict(to_=to_, token_id=token_id, amount=amount) for to_, token_id, amount in txs])])
+
+    def set_administrator(self, administrator, token_id=0):
+        return self.submit("set_administrator", dict(administrator_to_set=administrator, token_id=token_id))
+
+    def remove_administrator(self, administrator, token_id=0):
+        return self.submit("remove_administrator", dict(administrator_to_remove=administrator, token_id=token_id))
+
+    def pause_token(self, pause, token_id=0):
+        return self.submit("pause_token", dict(pause=pause, token_id=token_id))
+
+    def pause_tokens(self, token_pauses):
+        """Queues one pause_tokens call, token_pauses being (token_id, pause) pairs"""
+        return self.submit("pause_tokens", [dict(pause=pause, token_id=token_id) for token_id, pause in token_pauses])
+
+    def request_redemption(self, amount, btc_address, token_id=0):
+        return self.submit("request_redemption", dict(amount=amount, btc_address=btc_address, token_id=token_id))
+
+    def settle_redemptions(self, first_redemption_id, count, refunds=()):
+        """Queues one settle_redemptions call of count redemptions from the head of the queue, refunds being the ids returned to their owner"""
+        return self.submit("settle_redemptions", dict(first_redemption_id=first_redemption_id, count=count, refunds=sorted(refunds)))
+
+    async def _batch(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            for account in self.accounts:
+                if not self._queue:
+                    break
+                if account.busy or account.counter is None:
+                    continue
+                calls = [self._queue.popleft() for _ in range(min(self.max_calls_per_group, len(self._queue)))]
+                account.busy = True
+                task = asyncio.ensure_future(self._send(account, calls))
+                self._sending.add(task)
+                task.add_done_callback(self._sending.discard)
+
+    def _content(self, account, call, counter, gas_limit, storage_limit, fee=0):
+        return {
+            "kind": "transaction",
+            "source": account.address,
+            "fee": str(fee),
+            "counter": str(counter),
+            "gas_limit": str(gas_limit),
+            "storage_limit": str(storage_limit),
+            "amount": str(call.amount),
+            "destination": self.contract,
+            "parameters": {"entrypoint": call.entrypoint, "value": call.value},
+        }
+
+    async def _simulate(self, account, branch, calls):
+        """Simulates calls until none fails, returns the calls kept and their gas and storage limits"""
+        while calls:
+            gas_limit = self.max_group_gas // len(calls)
+            contents = [self._content(account, call, account.counter + 1 + index, gas_limit, 60000) for index, call in enumerate(calls)]
+            result = await self.rpc.post("/chains/main/blocks/head/helpers/scripts/run_operation", {
+                "operation": {"branch": branch, "contents": contents, "signature": ZERO_SIGNATURE},
+                "chain_id": self.chain_id,
+            })
+            kept, limits = [], []
+            for call, content in zip(calls, result["contents"]):
+                operation_result = content["metadata"]["operation_result"]
+                if operation_result["status"] == "failed":
+                    call.fail(OperationError("{} failed in simulation".format(call.entrypoint), operation_result.get("errors")))
+                    continue
+                # the calls before a failed one are backtracked and the ones after it skipped, they are simulated again
+                kept.append(call)
+                limits.append((math.ceil(int(operation_result.get("consumed_milligas", "0")) / 1000) + self.gas_margin,
+                               int(operation_result.get("paid_storage_size_diff", "0")) + self.storage_margin))
+            if len(kept) == len(calls):
+                return kept, limits
+            calls = kept
+        return [], []
+
+    async def _send(self, account, calls):
+        operation = None
+        try:
+            branch_header = await self.rpc.get("/chains/main/blocks/head~2/header")
+            branch = branch_header["hash"]
+            if self.estimator is not None and all(call.entrypoint in self.estimator.models for call in calls):
+                limits = [self.estimator.limits(call.entrypoint, call.params, self.is_new_key) for call in calls]
+            else:
+                calls, limits = await self._simulate(account, branch, calls)
+            total_gas = 0
+            for index, (gas_limit, _) in enumerate(limits):
+                total_gas += gas_limit
+                if total_gas > self.max_group_gas and index:
+                    # the calls that do not fit go back to the front of the queue, in order
+                    self._queue.extendleft(reversed(calls[index:]))
+                    calls, limits = calls[:index], limits[:index]
+                    break
+            if not calls:
+                account.busy = False
+                return
+            contents = []
+            for index, (call, (gas_limit, storage_limit)) in enumerate(zip(calls, limits)):
+                content = self._content(account, call, account.counter + 1 + index, gas_limit, storage_limit)
+                # the fee of the first content covers the branch and the signature, plus a few bytes for the fee itself
+                size = len(forge_transaction(content)) + 4 + (BRANCH_SIZE + SIGNATURE_SIZE if not index else 0)
+                content["fee"] = str(minimal_fee(gas_limit, size, **self.fees))
+                contents.append(content)
+            forged = forge_operation(branch, contents)
+            signed = forged + ed25519.sign(account.key.seed, WATERMARK + forged)
+            operation = operation_hash(signed)
+            # the group may be included before the node answers, the head follower must already know it
+            account.counter += len(contents)
+            self.groups[operation] = Group(operation, account, calls, branch_header["level"])
+            injected = await self.rpc.post("/injection/operation", signed.hex())
+            if injected != operation:
+                raise OperationError("node injected {} instead of {}".format(injected, operation))
+        except Exception as error:
+            if isinstance(error, asyncio.CancelledError):
+                raise
+            self.groups.pop(operation, None)
+            for call in calls:
+                call.fail(error if isinstance(error, OperationError) else OperationError(str(error)))
+            account.busy = False
+            account.counter = None
+            await self._resync(account)
+        finally:
+            self._wakeup.set()
+
+    async def _resync(self, account):
+        while account.counter is None:
+            try:
+                await account.sync(self.rpc)
+            except (OSError, RpcError, asyncio.TimeoutError):
+                await asyncio.sleep(self.poll_interval)
+        self._wakeup.set()
+
+    async def _follow(self, level):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                header = await self.rpc.get("/chains/main/blocks/head/header")
+                while level < header["level"]:
+                    block, operations = await asyncio.gather(self.rpc.get("/chains/main/blocks/{}/hash".format(level + 1)),
+                                                             self.rpc.get("/chains/main/blocks/{}/operations/3".format(level + 1)))
+                    level += 1
+                    for operation in operations:
+                        group = self.groups.get(operation["hash"])
+                        if group is not None and group.level is None:
+                            self._include(group, level, block, operation)
+                self.head_level = header["level"]
+                level = await self._confirm(min(level, header["level"]))
+            except (OSError, RpcError, asyncio.TimeoutError):
+                continue
+
+    def _include(self, group, level, block, operation):
+        group.level = level
+        group.block = block
+        group.account.busy = False
+        self._wakeup.set()
+        results = [content["metadata"]["operation_result"] for content in operation["contents"]]
+        if all(result["status"] == "applied" for result in results):
+            receipt = dict(operation=group.operation, level=level, block=block)
+            for call in group.calls:
+                if not call.included.done():
+                    call.included.set_result(receipt)
+            return
+        errors = [error for result in results for error in result.get("errors", [])]
+        for call in group.calls:
+            call.fail(OperationError("operation {} failed in block {}".format(group.operation, block), errors))
+        del self.groups[group.operation]
+
+    async def _confirm(self, level):
+        """Resolves the confirmed futures and gives up expired groups, returns the level to follow the head from
+
+        A group whose block was replaced by a reorganisation waits for its inclusion again, from its former level.
+        """
+        for group in list(self.groups.values()):
+            if group.level is None:
+                if self.head_level - group.branch_level > self.operations_ttl:
+                    del self.groups[group.operation]
+                    for call in group.calls:
+                        call.fail(OperationError("operation {} was not included in {} blocks".format(group.operation, self.operations_ttl)))
+                    group.account.busy = False
+                    group.account.counter = None
+                    asyncio.ensure_future(self._resync(group.account))
+                continue
+            if self.head_level - group.level + 1 < self.confirmations:
+                continue
+            if await self.rpc.get("/chains/main/blocks/{}/hash".format(group.level)) != group.block:
+                level = min(level, group.level - 1)
+                group.level = group.block = None
+                continue
+            del self.groups[group.operation]
+            receipt = dict(operation=group.operation, level=group.level, block=group.block)
+            for call in group.calls:
+                if not call.confirmed.done():
+                    call.confirmed.set_result(receipt)
+        return level
+
+def read_recipients(path):
+    """Reads address,amount lines"""
+    with open(path, newline="") as recipients_file:
+        return [(row[0].strip(), int(row[1])) for row in csv.reader(recipients_file) if row and not row[0].startswith("#")]
+
+async def mint(rpc, contract, signing_keys, recipients, batch_size=100, token_id=0, **options):
+    """Mints to many recipients with mint_batch calls of batch_size recipients
+
+    Returns:
+        dict: calls, failed calls, operation groups, blocks spanned and seconds until the last confirmation
+    """
+    started = time.monotonic()
+    async with OperationsClient(rpc, contract, signing_keys, **options) as client:
+        first_level = client.head_level
+        calls = [client.mint_batch(recipients[start:start + batch_size], token_id) for start in range(0, len(recipients), batch_size)]
+        receipts = await asyncio.gather(*(call.confirmed for call in calls), return_exceptions=True)
+    confirmed = [receipt for receipt in receipts if not isinstance(receipt, Exception)]
+    return dict(
+        calls=len(calls),
+        failed=len(calls) - len(confirmed),
+        groups=len({receipt["operation"] for receipt in confirmed}),
+        blocks=max((receipt["level"] for receipt in confirmed), default=first_level) - first_level,
+        seconds=round(time.monotonic() - started, 3),
+    )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+    mint_parser = commands.add_parser("mint", help="mint to the recipients of a CSV file")
+    mint_parser.add_argument("recipients", help="CSV file of address,amount lines")
+    backend = mint_parser.add_mutually_exclusive_group(required=True)
+    backend.add_argument("--rpc", help="node RPC url")
+    backend.add_argument("--mock", action="store_true", help="run against an in-process mock node serving the reference model")
+    mint_parser.add_argument("--contract", help="KT1 address of the token")
+    mint_parser.add_argument("--secret-key", action="append", default=[], help="edsk key of an administrator, repeat for more accounts")
+    mint_parser.add_argument("--accounts", type=int, default=1, help="administrators generated for --mock. Defaults to 1.")
+    mint_parser.add_argument("--token-id", type=int, default=0)
+    mint_parser.add_argument("--batch-size", type=int, default=100, help="recipients per mint_batch call")
+    mint_parser.add_argument("--calls-per-group", type=int, default=50)
+    mint_parser.add_argument("--confirmations", type=int, default=2)
+    mint_parser.add_argument("--connections", type=int, default=4)
+    arguments = parser.parse_args(argv)
+
+    recipients = read_recipients(arguments.recipients)
+    signing_keys = [ed25519.SigningKey(secret_key) for secret_key in arguments.secret_key]
+    options = dict(batch_size=arguments.batch_size, token_id=arguments.token_id, confirmations=arguments.confirmations,
+                   max_calls_per_group=arguments.calls_per_group)
+    server = None
+    if arguments.mock:
+        from .mock_rpc import MockChain, serve
+        from .simulator import FA2Simulator
+        if not signing_keys:
+            signing_keys = [ed25519.SigningKey.from_passphrase("minter {}".format(index)) for index in range(arguments.accounts)]
+        simulator = FA2Simulator([(key.address, arguments.token_id) for key in signing_keys])
+        simulator.apply(signing_keys[0].address, "set_token_metadata", dict(token_id=arguments.token_id, token_info={}))
+        chain = MockChain.genesis()
+        for key in signing_keys:
+            chain.add_account(key.public_key)
+        chain.contracts[simulator.address] = simulator
+        server = serve(chain, block_time=0.5)
+        url, contract = "http://127.0.0.1:{}".format(server.server_port), simulator.address
+        options["poll_interval"] = 0.1
+    else:
+        if not arguments.contract or not signing_keys:
+            parser.error("--rpc needs --contract and at least one --secret-key")
+        url, contract = arguments.rpc, arguments.contract
+
+    async def run():
+        rpc = AsyncRpc(url, arguments.connections)
+        try:
+            return await mint(rpc, contract, signing_keys, recipients, **options)
+        finally:
+            await rpc.close()
+
+    try:
+        report = asyncio.run(run())
+    finally:
+        if server is not None:
+            server.shutdown()
+    print(json.dumps(report))
+    return 1 if report["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
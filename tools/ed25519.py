@@ -0,0 +1,174 @@
+"""Pure-Python Ed25519 (RFC 8032) with the Tezos conventions: edsk/edpk/edsig encodings and signatures over the
+blake2b-256 digest of the message, as checked by CHECK_SIGNATURE.
+
+The arithmetic is not constant time. It is meant for tests and for verifying permits before relaying them; keys
+holding funds should sign with a wallet.
+"""
+import hashlib
+
+from .base58 import decode_prefixed, encode_prefixed
+
+_P = 2 ** 255 - 19
+_L = 2 ** 252 + 27742317777372353535851937790883648493
+_D = -121665 * pow(121666, _P - 2, _P) % _P
+_SQRT_M1 = pow(2, (_P - 1) // 4, _P)
+
+def _recover_x(y, sign):
+    if y >= _P:
+        return None
+    x2 = (y * y - 1) * pow(_D * y * y + 1, _P - 2, _P)
+    if x2 == 0:
+        return None if sign else 0
+    x = pow(x2, (_P + 3) // 8, _P)
+    if (x * x - x2) % _P != 0:
+        x = x * _SQRT_M1 % _P
+    if (x * x - x2) % _P != 0:
+        return None
+    if (x & 1) != sign:
+        x = _P - x
+    return x
+
+_BASE_Y = 4 * pow(5, _P - 2, _P) % _P
+_BASE = (_recover_x(_BASE_Y, 0), _BASE_Y, 1, _recover_x(_BASE_Y, 0) * _BASE_Y % _P)
+_IDENTITY = (0, 1, 1, 0)
+
+def _add(p, q):
+    # extended homogeneous coordinates, RFC 8032 section 5.1.4
+    a = (p[1] - p[0]) * (q[1] - q[0]) % _P
+    b = (p[1] + p[0]) * (q[1] + q[0]) % _P
+    c = 2 * p[3] * q[3] * _D % _P
+    d = 2 * p[2] * q[2] % _P
+    e, f, g, h = b - a, d - c, d + c, b + a
+    return (e * f % _P, g * h % _P, f * g % _P, e * h % _P)
+
+def _multiply(scalar, point):
+    result = _IDENTITY
+    while scalar:
+        if scalar & 1:
+            result = _add(result, point)
+        point = _add(point, point)
+        scalar >>= 1
+    return result
+
+def _equal(p, q):
+    return (p[0] * q[2] - q[0] * p[2]) % _P == 0 and (p[1] * q[2] - q[1] * p[2]) % _P == 0
+
+def _compress(point):
+    z_inverse = pow(point[2], _P - 2, _P)
+    x, y = point[0] * z_inverse % _P, point[1] * z_inverse % _P
+    return (y | ((x & 1) << 255)).to_bytes(32, "little")
+
+def _decompress(data):
+    if len(data) != 32:
+        return None
+    y = int.from_bytes(data, "little")
+    sign = y >> 255
+    y &= (1 << 255) - 1
+    x = _recover_x(y, sign)
+    if x is None:
+        return None
+    return (x, y, 1, x * y % _P)
+
+def _sha512_int(*parts):
+    return int.from_bytes(hashlib.sha512(b"".join(parts)).digest(), "little")
+
+def _expand(seed):
+    digest = hashlib.sha512(seed).digest()
+    scalar = int.from_bytes(digest[:32], "little")
+    scalar &= (1 << 254) - 8
+    scalar |= 1 << 254
+    return scalar, digest[32:]
+
+def digest(message):
+    """Returns the blake2b-256 digest that Tezos signs for a message"""
+    return hashlib.blake2b(message, digest_size=32).digest()
+
+def public_key(seed):
+    """Returns the 32 bytes public key of a 32 bytes secret seed"""
+    scalar, _ = _expand(seed)
+    return _compress(_multiply(scalar, _BASE))
+
+def sign(seed, message):
+    """Signs the blake2b-256 digest of message, as Tezos does
+
+    Args:
+        seed (bytes): 32 bytes secret seed
+        message (bytes): message, e.g. packed data
+
+    Returns:
+        bytes: 64 bytes signature
+    """
+    scalar, prefix = _expand(seed)
+    encoded_public_key = _compress(_multiply(scalar, _BASE))
+    hashed = digest(message)
+    r = _sha512_int(prefix, hashed) % _L
+    encoded_r = _compress(_multiply(r, _BASE))
+    h = _sha512_int(encoded_r, encoded_public_key, hashed) % _L
+    return encoded_r + ((r + h * scalar) % _L).to_bytes(32, "little")
+
+def verify(encoded_public_key, message, signature):
+    """Checks a signature of the blake2b-256 digest of message, as CHECK_SIGNATURE does
+
+    Args:
+        encoded_public_key (bytes): 32 bytes public key
+        message (bytes): signed message
+        signature (bytes): 64 bytes signature
+
+    Returns:
+        bool: True if the signature is valid
+    """
+    if len(signature) != 64:
+        return False
+    point = _decompress(encoded_public_key)
+    r = _decompress(signature[:32])
+    s = int.from_bytes(signature[32:], "little")
+    if point is None or r is None or s >= _L:
+        return False
+    h = _sha512_int(signature[:32], encoded_public_key, digest(message)) % _L
+    return _equal(_multiply(s, _BASE), _add(r, _multiply(h, point)))
+
+def public_key_hash(encoded_public_key):
+    """Returns the tz1 address of a public key"""
+    return encode_prefixed("tz1", hashlib.blake2b(encoded_public_key, digest_size=20).digest())
+
+class SigningKey:
+    """Ed25519 key pair with the Tezos base58 encodings"""
+
+    def __init__(self, seed):
+        """
+        Args:
+            seed (bytes or str): 32 bytes secret seed, or its edsk base58 encoding
+        """
+        self.seed = decode_prefixed("edsk", seed) if isinstance(seed, str) else bytes(seed)
+        self.public_key_bytes = public_key(self.seed)
+
+    @classmethod
+    def from_passphrase(cls, passphrase):
+        """Deterministic key for tests, the seed is the blake2b of the passphrase"""
+        return cls(hashlib.blake2b(passphrase.encode(), digest_size=32).digest())
+
+    @property
+    def secret_key(self):
+        return encode_prefixed("edsk", self.seed)
+
+    @property
+    def public_key(self):
+        return encode_prefixed("edpk", self.public_key_bytes)
+
+    @property
+    def address(self):
+        return public_key_hash(self.public_key_bytes)
+
+    def sign(self, message):
+        """Returns the edsig signature of message"""
+        return encode_prefixed("edsig", sign(self.seed, message))
+
+def verify_encoded(public_key, message, signature):
+    """Checks an edsig signature against an edpk public key, other curves are not supported
+
+    Raises:
+        ValueError: if the key or signature is not Ed25519
+    """
+    if not public_key.startswith("edpk") or not signature.startswith("edsig"):
+        raise ValueError("only edpk keys and edsig signatures are supported")
+    return verify(decode_prefixed("edpk", public_key), message, decode_prefixed("edsig", signature))
@@ -0,0 +1,384 @@
+"""Offline gas, storage and fee estimator of the BTCtz entrypoints.
+
+The gas and paid storage of a call are modelled per entrypoint as linear functions of the size of its parameter:
+transfers by number of txs and of ledger keys they create, batches by number of items, operator updates by number
+of additions and removals. The models are fitted with least squares on samples taken from:
+
+- the reports of tools/benchmark.py, which measure the cases of the `FA2 Benchmark Scenarios` SmartPy test,
+- recorded receipts, i.e. a chain dump of blocks holding calls to the contract, where the ledger keys a call
+  creates are found from the ledger big_map diffs.
+
+Every few samples of each entrypoint are held out of the fit. The largest relative under-estimate of the gas and
+the largest storage under-estimate found on them become the margins applied to every prediction, and `fit` fails
+when the held-out gas error is above --max-error. The forged size, and so the fee, is computed exactly, with no model.
+
+    python -m tools.estimator fit estimator.json --report bench.json --blocks chain.jsonl --contract KT1... --ledger-big-map 12
+    python -m tools.estimator estimate estimator.json transfer '[{"from_": "tz1...", "txs": [{"to_": "tz1...", "token_id": 0, "amount": 1}]}]'
+
+OperationsClient of tools/client.py takes an Estimator to set the limits of its groups without the run_operation
+round trip.
+"""
+import argparse
+import json
+import math
+import sys
+
+from .client import BRANCH_SIZE, SIGNATURE_SIZE, forge_transaction, minimal_fee
+from .indexer import iter_content_updates, read_blocks
+from .micheline import ENTRYPOINT_TYPES, decode, encode
+
+FEATURES = {
+    "transfer": ["txs", "new_keys"],
+    "mint": ["new_keys"],
+    "burn": [],
+    "mint_batch": ["items", "new_keys"],
+    "burn_batch": ["items"],
+    "import_balances": ["items", "new_keys"],
+    "update_operators": ["adds", "removes"],
+    "update_operators_bulk": ["adds", "removes"],
+    "balance_of": ["requests"],
+    "permit": ["items"],
+    "pause_tokens": ["items"],
+    "settle_redemptions": ["items", "refunds"],
+}
+"""Parameter features of the models, by entrypoint. The other entrypoints are modelled by a constant"""
+
+REPORT_FEATURES = {
+    "mint": lambda result: dict(new_keys=result["new_keys"]),
+    "mint_batch": lambda result: dict(items=result["batch_size"], new_keys=result["new_keys"]),
+    "transfer_existing_keys": lambda result: dict(txs=result["batch_size"], new_keys=result["new_keys"]),
+    "transfer_new_keys": lambda result: dict(txs=result["batch_size"], new_keys=result["new_keys"]),
+    "add_operators": lambda result: dict(adds=result["batch_size"]),
+    "remove_operators": lambda result: dict(removes=result["batch_size"]),
+    "add_all_tokens_operators": lambda result: dict(adds=result["batch_size"]),
+    "remove_all_tokens_operators": lambda result: dict(removes=result["batch_size"]),
+    "balance_of": lambda result: dict(requests=result["batch_size"]),
+    "burn_batch": lambda result: dict(items=2 * result["batch_size"]),
+    "import_balances": lambda result: dict(items=result["batch_size"], new_keys=result["new_keys"]),
+    "pause_tokens": lambda result: dict(items=result["batch_size"]),
+}
+"""Features of the benchmark cases, by case, see tools.benchmark.make_cases. Other cases have no feature"""
+
+def _new_keys(ledger_keys, is_new_key):
+    unique = set(ledger_keys)
+    if is_new_key is None:
+        return len(unique)
+    return sum(1 for ledger_key in unique if is_new_key(ledger_key))
+
+def features(entrypoint, params, is_new_key=None):
+    """Returns the model features of a call
+
+    Args:
+        entrypoint (str): entrypoint name
+        params: python value of the parameter, as decoded by tools.micheline.decode
+        is_new_key (callable, optional): tells whether an (owner, token_id) ledger key is absent from the ledger,
+            e.g. from the indexer. Defaults to None, every credited key counts as new, which over-estimates.
+
+    Returns:
+        dict: feature values
+    """
+    if entrypoint == "transfer":
+        ledger_keys = [(tx["to_"], tx["token_id"]) for transfer in params for tx in transfer["txs"]]
+        return dict(txs=len(ledger_keys), new_keys=_new_keys(ledger_keys, is_new_key))
+    if entrypoint == "mint":
+        return dict(new_keys=_new_keys([(params["owner"], params["token_id"])], is_new_key))
+    if entrypoint == "mint_batch":
+        return dict(items=len(params), new_keys=_new_keys([(item["owner"], item["token_id"]) for item in params], is_new_key))
+    if entrypoint == "import_balances":
+        ledger_keys = [(item["owner"], params["token_id"]) for item in params["balances"] if item["balance"]]
+        return dict(items=len(params["balances"]), new_keys=_new_keys(ledger_keys, is_new_key))
+    if entrypoint in ("burn_batch", "permit", "pause_tokens"):
+        return dict(items=len(params))
+    if entrypoint in ("update_operators", "update_operators_bulk"):
+        updates = params if entrypoint == "update_operators" else [update for item in params for update in item["updates"]]
+        adds = sum(1 for update in updates if "add_operator" in update)
+        return dict(adds=adds, removes=len(updates) - adds)
+    if entrypoint == "balance_of":
+        return dict(requests=len(params["requests"]))
+    if entrypoint == "settle_redemptions":
+        return dict(items=params["count"], refunds=len(params["refunds"]))
+    return {}
+
+def _solve(matrix, vector):
+    """Gauss-Jordan elimination with partial pivoting of a small square system"""
+    size = len(vector)
+    rows = [list(row) + [value] for row, value in zip(matrix, vector)]
+    for column in range(size):
+        pivot = max(range(column, size), key=lambda row: abs(rows[row][column]))
+        rows[column], rows[pivot] = rows[pivot], rows[column]
+        if rows[column][column] == 0:
+            continue
+        for row in range(size):
+            if row != column and rows[row][column]:
+                factor = rows[row][column] / rows[column][column]
+                rows[row] = [value - factor * pivot_value for value, pivot_value in zip(rows[row], rows[column])]
+    return [row[size] / row[index] if row[index] else 0.0 for index, row in enumerate(rows)]
+
+def least_squares(inputs, targets, ridge=1e-6):
+    """Fits targets ~ c0 + c1 * x1 + ... with a small ridge on the slopes, so that constant features get a 0 slope
+
+    Args:
+        inputs (list): feature vectors, without the constant
+        targets (list): observed values
+
+    Returns:
+        list: intercept followed by one coefficient per feature
+    """
+    rows = [[1.0] + [float(value) for value in row] for row in inputs]
+    width = len(rows[0])
+    normal = [[sum(row[i] * row[j] for row in rows) for j in range(width)] for i in range(width)]
+    for index in range(1, width):
+        normal[index][index] += ridge * (normal[index][index] or 1.0)
+    return _solve(normal, [sum(row[i] * target for row, target in zip(rows, targets)) for i in range(width)])
+
+class Model:
+    """Gas and storage model of one entrypoint
+
+    Attributes:
+        features (list): feature names
+        gas (list): intercept and coefficients of the gas
+        storage (list): intercept and coefficients of the paid storage, in bytes
+        gas_margin (float): relative margin added to the predicted gas, the largest held-out under-estimate
+        storage_margin (float): bytes added to the predicted storage, the largest held-out under-estimate
+    """
+
+    def __init__(self, features, gas, storage, gas_margin=0.0, storage_margin=0.0):
+        self.features = features
+        self.gas = gas
+        self.storage = storage
+        self.gas_margin = gas_margin
+        self.storage_margin = storage_margin
+
+    def predict(self, values):
+        """Returns the predicted gas and storage, without margins, of a call with the given feature values"""
+        vector = [values.get(name, 0) for name in self.features]
+        gas = self.gas[0] + sum(coefficient * value for coefficient, value in zip(self.gas[1:], vector))
+        storage = self.storage[0] + sum(coefficient * value for coefficient, value in zip(self.storage[1:], vector))
+        return max(gas, 0.0), max(storage, 0.0)
+
+    def limits(self, values):
+        """Returns the gas and storage limits of a call, margins included"""
+        gas, storage = self.predict(values)
+        return math.ceil(gas * (1 + self.gas_margin)), math.ceil(storage + self.storage_margin)
+
+    @classmethod
+    def fit(cls, feature_names, samples):
+        inputs = [[sample["features"].get(name, 0) for name in feature_names] for sample in samples]
+        return cls(feature_names, least_squares(inputs, [sample["gas"] for sample in samples]),
+                   least_squares(inputs, [sample["storage"] for sample in samples]))
+
+    def errors(self, samples):
+        """Returns the largest relative gas under-estimate, storage under-estimate in bytes and relative gas error"""
+        gas_under = storage_under = gas_error = 0.0
+        for sample in samples:
+            gas, storage = self.predict(sample["features"])
+            if sample["gas"]:
+                gas_error = max(gas_error, abs(sample["gas"] - gas) / sample["gas"])
+            if gas:
+                gas_under = max(gas_under, (sample["gas"] - gas) / gas)
+            storage_under = max(storage_under, sample["storage"] - storage)
+        return gas_under, storage_under, gas_error
+
+    def to_json(self):
+        return dict(features=self.features, gas=self.gas, storage=self.storage, gas_margin=self.gas_margin, storage_margin=self.storage_margin)
+
+def samples_from_report(report):
+    """Returns the samples of a tools.benchmark report, failed cases and the origination are skipped
+
+    Returns:
+        list: dicts with entrypoint, features, gas and storage
+    """
+    samples = []
+    for result in report["results"]:
+        if result.get("entrypoint") is None or "error" in result:
+            continue
+        values = REPORT_FEATURES.get(result["case"], lambda result: {})(result)
+        samples.append(dict(entrypoint=result["entrypoint"], features=values, gas=float(result["consumed_gas"]),
+                            storage=int(result["paid_storage_size_diff"])))
+    return samples
+
+def samples_from_blocks(blocks, contract, ledger_big_map=None, known_keys=()):
+    """Returns the samples of the applied calls to the contract in a stream of blocks
+
+    The ledger keys a call creates are its ledger big_map updates setting a key that is not yet in the ledger.
+    The stream should start at the origination, or known_keys hold the key hashes of the ledger at its start.
+
+    Args:
+        blocks (iterable): blocks in level order
+        contract (str): KT1 address of the token
+        ledger_big_map (int, optional): id of the ledger big_map. Defaults to None, new_keys is then left out.
+        known_keys (iterable, optional): expr... key hashes of the ledger before the first block. Defaults to ().
+
+    Returns:
+        list: dicts with entrypoint, features, gas and storage
+    """
+    ledger = set(known_keys)
+    samples = []
+    for block in blocks:
+        for validation_pass in block.get("operations", []):
+            for operation in validation_pass:
+                for content in operation.get("contents", []):
+                    result = content.get("metadata", {}).get("operation_result", {})
+                    if result.get("status") != "applied":
+                        continue
+                    new_keys = 0
+                    for big_map, update in iter_content_updates(content):
+                        if big_map != ledger_big_map:
+                            continue
+                        key = update.get("key_hash") or json.dumps(update["key"], sort_keys=True)
+                        if "value" in update:
+                            new_keys += key not in ledger
+                            ledger.add(key)
+                        else:
+                            ledger.discard(key)
+                    parameters = content.get("parameters")
+                    if content.get("destination") != contract or parameters is None or parameters["entrypoint"] not in FEATURES:
+                        continue
+                    entrypoint = parameters["entrypoint"]
+                    if entrypoint == "balance_of":
+                        # the callback is not decoded, only the number of requests matters
+                        values = dict(requests=len(parameters["value"]["args"][0]))
+                    else:
+                        values = features(entrypoint, decode(ENTRYPOINT_TYPES[entrypoint], parameters["value"]))
+                    if ledger_big_map is None:
+                        values.pop("new_keys", None)
+                    elif "new_keys" in values:
+                        values["new_keys"] = new_keys
+                    internal = [item.get("result", {}) for item in content["metadata"].get("internal_operation_results", [])]
+                    gas = sum(int(item.get("consumed_milligas", 0)) for item in [result] + internal) / 1000
+                    storage = sum(int(item.get("paid_storage_size_diff", 0)) for item in [result] + internal)
+                    samples.append(dict(entrypoint=entrypoint, features=values, gas=gas, storage=storage))
+    return samples
+
+def split(samples, holdout_every=5):
+    """Splits the samples of one entrypoint, every holdout_every-th sample is held out. Fewer samples than
+    holdout_every are all used for the fit"""
+    if len(samples) < holdout_every:
+        return samples, []
+    held_out = samples[holdout_every - 1::holdout_every]
+    return [sample for index, sample in enumerate(samples) if index % holdout_every != holdout_every - 1], held_out
+
+class Estimator:
+    """Models of the entrypoints, with the fee computation of tools.client"""
+
+    def __init__(self, models, fees=None):
+        """
+        Args:
+            models (dict): Model by entrypoint
+            fees (dict, optional): minimal_fee arguments of the mempool filter of the node. Defaults to the octez defaults.
+        """
+        self.models = models
+        self.fees = dict(fees or {})
+
+    @classmethod
+    def fit(cls, samples, holdout_every=5):
+        """Fits one model per entrypoint and sets its margins from the held-out samples
+
+        Returns:
+            tuple: the Estimator and a report dict by entrypoint with samples, held_out, gas_error (largest held-out
+            relative gas error, None without held-out samples), gas_margin and storage_margin
+        """
+        by_entrypoint = {}
+        for sample in samples:
+            by_entrypoint.setdefault(sample["entrypoint"], []).append(sample)
+        models, report = {}, {}
+        for entrypoint, entrypoint_samples in sorted(by_entrypoint.items()):
+            training, held_out = split(entrypoint_samples, holdout_every)
+            model = Model.fit(FEATURES.get(entrypoint, []), training)
+            gas_under, storage_under, _ = model.errors(training)
+            gas_error = None
+            if held_out:
+                held_gas_under, held_storage_under, gas_error = model.errors(held_out)
+                gas_under, storage_under = max(gas_under, held_gas_under), max(storage_under, held_storage_under)
+            model.gas_margin, model.storage_margin = round(gas_under, 6), round(storage_under, 3)
+            models[entrypoint] = model
+            report[entrypoint] = dict(samples=len(training), held_out=len(held_out), gas_error=gas_error,
+                                      gas_margin=model.gas_margin, storage_margin=model.storage_margin)
+        return cls(models), report
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as model_file:
+            saved = json.load(model_file)
+        return cls({entrypoint: Model(**model) for entrypoint, model in saved["models"].items()}, saved.get("fees"))
+
+    def save(self, path):
+        with open(path, "w") as model_file:
+            json.dump(dict(models={entrypoint: model.to_json() for entrypoint, model in self.models.items()}, fees=self.fees), model_file, indent=2)
+            model_file.write("\n")
+
+    def limits(self, entrypoint, params, is_new_key=None):
+        """Returns the gas and storage limits of a call, see features
+
+        Raises:
+            KeyError: if the entrypoint has no model
+        """
+        return self.models[entrypoint].limits(features(entrypoint, params, is_new_key))
+
+    def estimate(self, content, params, is_new_key=None, alone=True):
+        """Sets the limits and the fee of a transaction content
+
+        Args:
+            content (dict): transaction calling the contract, see tools.client.forge_transaction
+            params: python value of its parameter
+            is_new_key (callable, optional): see features. Defaults to None.
+            alone (bool, optional): the content is the only one of its operation and pays for the branch and signature. Defaults to True.
+
+        Returns:
+            dict: the content with gas_limit, storage_limit and fee
+        """
+        gas_limit, storage_limit = self.limits(content["parameters"]["entrypoint"], params, is_new_key)
+        content = dict(content, gas_limit=str(gas_limit), storage_limit=str(storage_limit), fee="0")
+        size = len(forge_transaction(content)) + 4 + (BRANCH_SIZE + SIGNATURE_SIZE if alone else 0)
+        return dict(content, fee=str(minimal_fee(gas_limit, size, **self.fees)))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+    fit_parser = commands.add_parser("fit", help="fit the models and check them against held-out samples")
+    fit_parser.add_argument("output", help="path of the JSON models")
+    fit_parser.add_argument("--report", action="append", default=[], help="tools.benchmark report, repeat for more")
+    fit_parser.add_argument("--blocks", action="append", default=[], help="chain dump holding receipts, repeat for more")
+    fit_parser.add_argument("--contract", help="KT1 address of the token in the chain dumps")
+    fit_parser.add_argument("--ledger-big-map", type=int, default=None, help="id of the ledger big_map in the chain dumps")
+    fit_parser.add_argument("--holdout-every", type=int, default=5)
+    fit_parser.add_argument("--max-error", type=float, default=0.05, help="largest held-out relative gas error accepted")
+    estimate_parser = commands.add_parser("estimate", help="print the limits and fee of a call")
+    estimate_parser.add_argument("models")
+    estimate_parser.add_argument("entrypoint")
+    estimate_parser.add_argument("parameter", help="JSON value of the parameter")
+    estimate_parser.add_argument("--contract", default="KT1RJ6PbjHpwc3M5rw5s2Nbmefwbuwbdxton")
+    estimate_parser.add_argument("--source", default="tz1KqTpEZ7Yob7QbPE4Hy4Wo8fHG8LhKxZSx")
+    arguments = parser.parse_args(argv)
+
+    if arguments.command == "fit":
+        if arguments.blocks and not arguments.contract:
+            parser.error("--blocks needs --contract")
+        samples = []
+        for path in arguments.report:
+            with open(path) as report_file:
+                samples += samples_from_report(json.load(report_file))
+        for path in arguments.blocks:
+            samples += samples_from_blocks(read_blocks(path), arguments.contract, arguments.ledger_big_map)
+        estimator, report = Estimator.fit(samples, arguments.holdout_every)
+        estimator.save(arguments.output)
+        failed = False
+        for entrypoint, row in report.items():
+            too_large = row["gas_error"] is not None and row["gas_error"] > arguments.max_error
+            failed = failed or too_large
+            print("{flag} {entrypoint:<22} samples={samples:<5} held_out={held_out:<4} gas_error={error} gas_margin={gas_margin} storage_margin={storage_margin}".format(
+                flag="!" if too_large else " ", entrypoint=entrypoint, error="n/a" if row["gas_error"] is None else round(row["gas_error"], 4), **row))
+        return 1 if failed else 0
+
+    estimator = Estimator.load(arguments.models)
+    params = json.loads(arguments.parameter)
+    content = {"kind": "transaction", "source": arguments.source, "fee": "0", "counter": "1", "gas_limit": "0", "storage_limit": "0",
+               "amount": "0", "destination": arguments.contract,
+               "parameters": {"entrypoint": arguments.entrypoint, "value": encode(ENTRYPOINT_TYPES[arguments.entrypoint], params)}}
+    estimated = estimator.estimate(content, params)
+    print(json.dumps({field: int(estimated[field]) for field in ("gas_limit", "storage_limit", "fee")}))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,566 @@
+"""Streaming indexer of the BTCtz big_maps into a local SQLite store.
+
+Blocks are read from a chain dump (a JSONL file or a directory of <level>.json files) or from a node RPC, e.g. the
+stand-in of tools/mock_rpc.py. The ledger, operators, all_tokens_operators, total_supply and pause big_map diffs of applied operations are
+applied incrementally. Recent blocks keep an undo log so a reorganisation can be rolled back, older blocks are
+applied without it so that bulk replay runs at disk speed:
+
+    python -m tools.indexer replay btctz.sqlite chain.jsonl --big-map ledger=12 --big-map operators=13 ...
+    python -m tools.indexer sync btctz.sqlite http://127.0.0.1:8732 --contract KT1...
+    python -m tools.indexer balance btctz.sqlite tz1... 0
+
+Contracts built with events also report every transfer, mint, burn, import and pause as a typed event, which
+`events` streams from a chain dump without any big_map diff reconstruction:
+
+    python -m tools.indexer events chain.jsonl --contract KT1...
+"""
+import argparse
+import http.client
+import json
+import os
+import sqlite3
+import sys
+import urllib.parse
+
+from .micheline import BIG_MAP_KEY_TYPES, BIG_MAP_VALUE_TYPES, EVENT_TYPES, decode
+
+INDEXED_BIG_MAPS = ["ledger", "operators", "all_tokens_operators", "total_supply", "pause"]
+"""Storage fields whose big_map diffs are indexed"""
+
+MAX_REORG_DEPTH = 10
+"""Blocks below head - MAX_REORG_DEPTH are considered final, they are applied without undo log"""
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ledger (owner TEXT NOT NULL, token_id INTEGER NOT NULL, balance TEXT NOT NULL, PRIMARY KEY (owner, token_id)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS operators (owner TEXT NOT NULL, operator TEXT NOT NULL, token_id INTEGER NOT NULL, PRIMARY KEY (owner, operator, token_id)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS all_tokens_operators (owner TEXT NOT NULL, operator TEXT NOT NULL, PRIMARY KEY (owner, operator)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS total_supply (token_id INTEGER PRIMARY KEY, amount TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS pause (token_id INTEGER PRIMARY KEY, paused INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS blocks (level INTEGER PRIMARY KEY, hash TEXT NOT NULL, predecessor TEXT NOT NULL, reversible INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS undo_log (id INTEGER PRIMARY KEY AUTOINCREMENT, level INTEGER NOT NULL, big_map TEXT NOT NULL, key TEXT NOT NULL, previous TEXT);
+CREATE TABLE IF NOT EXISTS big_maps (name TEXT PRIMARY KEY, id INTEGER NOT NULL);
+"""
+
+class ReorgError(Exception):
+    """Raised when a block does not extend the indexed chain"""
+
+def _key_columns(big_map):
+    return {"ledger": ("owner", "token_id"), "operators": ("owner", "operator", "token_id"),
+            "all_tokens_operators": ("owner", "operator"), "total_supply": ("token_id",), "pause": ("token_id",)}[big_map]
+
+def _value_column(big_map):
+    return {"ledger": "balance", "operators": None, "all_tokens_operators": None, "total_supply": "amount", "pause": "paused"}[big_map]
+
+def _key_values(big_map, key):
+    if isinstance(key, dict):
+        return tuple(key[column] for column in _key_columns(big_map))
+    if isinstance(key, tuple):
+        return key
+    return (key,)
+
+def _store_value(big_map, value):
+    """Column value of a decoded big_map value: nats as text since they are unbounded, unit as 1"""
+    if value is None:
+        return None
+    if big_map in ("operators", "all_tokens_operators"):
+        return 1
+    if big_map == "pause":
+        return int(value)
+    return str(value)
+
+class LedgerIndex:
+    """SQLite store of the indexed big_maps, with checkpoint and rollback
+
+    The pause state of AdministrableFA2 is a bitset in the storage, with no big_map diff. When the contract address is
+    known, its pause events are applied to the pause table instead. Contracts that still have a pause big_map are
+    indexed from its diffs.
+    """
+
+    def __init__(self, path, big_maps=None, contract=None):
+        """Opens or creates the store
+
+        Args:
+            path (str): SQLite file, ":memory:" for an in-memory store
+            big_maps (dict, optional): storage field name to big_map id, stored on first use. Defaults to the stored ids.
+            contract (str, optional): KT1 address whose pause events are indexed. Defaults to None, no event is indexed.
+        """
+        self.contract = contract
+        self.connection = sqlite3.connect(path, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript(SCHEMA)
+        if big_maps:
+            self.connection.executemany("INSERT OR REPLACE INTO big_maps (name, id) VALUES (?, ?)", big_maps.items())
+        self.big_map_names = {big_map_id: name for name, big_map_id in self.connection.execute("SELECT name, id FROM big_maps")}
+        self._in_transaction = False
+        self._checkpoint = self._load_checkpoint()
+
+    def close(self):
+        if self._in_transaction:
+            self.commit()
+        self.connection.close()
+
+    def begin(self):
+        if not self._in_transaction:
+            self.connection.execute("BEGIN")
+            self._in_transaction = True
+
+    def commit(self):
+        if self._in_transaction:
+            self.connection.execute("COMMIT")
+            self._in_transaction = False
+
+    def _load_checkpoint(self):
+        row = self.connection.execute("SELECT level, hash FROM blocks ORDER BY level DESC LIMIT 1").fetchone()
+        return tuple(row) if row else (None, None)
+
+    def checkpoint(self):
+        """Returns the last indexed block
+
+        Returns:
+            tuple: (level, hash), (None, None) if no block was indexed
+        """
+        return self._checkpoint
+
+    def block_hash(self, level):
+        row = self.connection.execute("SELECT hash FROM blocks WHERE level = ?", (level,)).fetchone()
+        return row[0] if row else None
+
+    def _select(self, big_map, key_values):
+        columns = _key_columns(big_map)
+        value_column = _value_column(big_map) or "1"
+        where = " AND ".join("{} = ?".format(column) for column in columns)
+        row = self.connection.execute("SELECT {} FROM {} WHERE {}".format(value_column, big_map, where), key_values).fetchone()
+        return row[0] if row else None
+
+    def _write(self, big_map, key_values, value):
+        columns = _key_columns(big_map)
+        if value is None:
+            where = " AND ".join("{} = ?".format(column) for column in columns)
+            self.connection.execute("DELETE FROM {} WHERE {}".format(big_map, where), key_values)
+            return
+        value_column = _value_column(big_map)
+        if value_column is None:
+            self.connection.execute("INSERT OR REPLACE INTO {} ({}) VALUES ({})".format(
+                big_map, ", ".join(columns), ", ".join("?" * len(columns))), key_values)
+        else:
+            self.connection.execute("INSERT OR REPLACE INTO {} ({}, {}) VALUES ({})".format(
+                big_map, ", ".join(columns), value_column, ", ".join("?" * (len(columns) + 1))), key_values + (value,))
+
+    def apply_update(self, level, big_map, key, value, undo=True):
+        """Applies one big_map update
+
+        Args:
+            level (int): level of the block
+            big_map (str): storage field name
+            key: decoded key
+            value: decoded value, None when the key is removed
+            undo (bool, optional): record the previous value for rollback. Defaults to True.
+        """
+        key_values = _key_values(big_map, key)
+        if undo:
+            previous = self._select(big_map, key_values)
+            self.connection.execute("INSERT INTO undo_log (level, big_map, key, previous) VALUES (?, ?, ?, ?)",
+                                    (level, big_map, json.dumps(key_values), None if previous is None else json.dumps(previous)))
+        self._write(big_map, key_values, _store_value(big_map, value))
+
+    def apply_block(self, block, undo=True):
+        """Applies the big_map diffs of a block
+
+        Args:
+            block (dict): block JSON, as returned by /chains/main/blocks/<id>
+            undo (bool, optional): keep an undo log for the block. Defaults to True.
+
+        Raises:
+            ReorgError: if the block predecessor is not the last indexed block
+        """
+        level = block["header"]["level"]
+        last_level, last_hash = self.checkpoint()
+        if last_level is not None and (level != last_level + 1 or block["header"]["predecessor"] != last_hash):
+            raise ReorgError("block {} at level {} does not extend {} at level {}".format(block["hash"], level, last_hash, last_level))
+        self.begin()
+        self.connection.execute("SAVEPOINT block")
+        try:
+            for big_map_id, update in iter_big_map_updates(block):
+                name = self.big_map_names.get(big_map_id)
+                if name not in INDEXED_BIG_MAPS:
+                    continue
+                key = decode(BIG_MAP_KEY_TYPES[name], update["key"])
+                value = None
+                if update.get("value") is not None:
+                    # Unit values decode to None, which stands for a removal here
+                    value = decode(BIG_MAP_VALUE_TYPES[name], update["value"])
+                    value = True if value is None else value
+                self.apply_update(level, name, key, value, undo)
+            if self.contract is not None:
+                for event in iter_events(block, self.contract):
+                    if event["tag"] == "pause":
+                        for token_pause in event["payload"]:
+                            self.apply_update(level, "pause", token_pause["token_id"], token_pause["pause"], undo)
+            self.connection.execute("INSERT INTO blocks (level, hash, predecessor, reversible) VALUES (?, ?, ?, ?)",
+                                    (level, block["hash"], block["header"]["predecessor"], int(undo)))
+        except Exception:
+            self.connection.execute("ROLLBACK TO block")
+            raise
+        finally:
+            self.connection.execute("RELEASE block")
+        self._checkpoint = (level, block["hash"])
+
+    def rollback(self, level):
+        """Reverts every block above level, using the undo log
+
+        Args:
+            level (int): level of the last block to keep
+
+        Raises:
+            ReorgError: if a block above level was applied without undo log
+        """
+        final = self.connection.execute("SELECT MAX(level) FROM blocks WHERE level > ? AND reversible = 0", (level,)).fetchone()[0]
+        if final is not None:
+            raise ReorgError("block at level {} was applied without undo log".format(final))
+        self.begin()
+        rows = self.connection.execute("SELECT big_map, key, previous FROM undo_log WHERE level > ? ORDER BY id DESC", (level,)).fetchall()
+        for big_map, key, previous in rows:
+            stored = None if previous is None else json.loads(previous)
+            self._write(big_map, tuple(json.loads(key)), stored)
+        self.connection.execute("DELETE FROM undo_log WHERE level > ?", (level,))
+        self.connection.execute("DELETE FROM blocks WHERE level > ?", (level,))
+        self.commit()
+        self._checkpoint = self._load_checkpoint()
+
+    def prune_undo_log(self, level):
+        """Drops the undo log of the blocks up to level, which are final"""
+        self.connection.execute("DELETE FROM undo_log WHERE level <= ?", (level,))
+        self.connection.execute("UPDATE blocks SET reversible = 0 WHERE level <= ?", (level,))
+
+    def balance(self, owner, token_id=0):
+        row = self.connection.execute("SELECT balance FROM ledger WHERE owner = ? AND token_id = ?", (owner, token_id)).fetchone()
+        return int(row[0]) if row else 0
+
+    def holders(self, token_id=0):
+        """Yields the (owner, balance) pairs of a token in owner order"""
+        for owner, balance in self.connection.execute("SELECT owner, balance FROM ledger WHERE token_id = ? ORDER BY owner", (token_id,)):
+            yield owner, int(balance)
+
+    def is_operator(self, owner, operator, token_id=0):
+        """Returns whether operator may transfer the token_id balance of owner, as token operator or all tokens operator"""
+        return self.connection.execute(
+            "SELECT 1 FROM operators WHERE owner = ? AND operator = ? AND token_id = ? "
+            "UNION ALL SELECT 1 FROM all_tokens_operators WHERE owner = ? AND operator = ?",
+            (owner, operator, token_id, owner, operator)).fetchone() is not None
+
+    def operators(self, owner):
+        """Returns the (operator, token_id) pairs of an owner, token_id is None for all tokens operators"""
+        return self.connection.execute(
+            "SELECT operator, NULL FROM all_tokens_operators WHERE owner = ? UNION ALL "
+            "SELECT operator, token_id FROM operators WHERE owner = ? ORDER BY 1, 2", (owner, owner)).fetchall()
+
+    def total_supply(self, token_id=0):
+        row = self.connection.execute("SELECT amount FROM total_supply WHERE token_id = ?", (token_id,)).fetchone()
+        return int(row[0]) if row else 0
+
+    def is_paused(self, token_id=0):
+        row = self.connection.execute("SELECT paused FROM pause WHERE token_id = ?", (token_id,)).fetchone()
+        return bool(row[0]) if row else False
+
+def iter_big_map_updates(block):
+    """Yields the big_map updates of the applied operations of a block, internal operations included
+
+    Both the lazy_storage_diff format and the legacy big_map_diff format are read. Allocations with initial
+    updates are yielded as updates, removals and copies of whole big_maps are ignored since the contract never does them.
+
+    Args:
+        block (dict): block JSON
+
+    Yields:
+        tuple: (big_map id, update dict with key and optional value)
+    """
+    for validation_pass in block.get("operations", []):
+        for operation in validation_pass:
+            for content in operation.get("contents", []):
+                yield from iter_content_updates(content)
+
+def iter_content_updates(content):
+    """Yields the big_map updates of one operation content and its internal operations, see iter_big_map_updates"""
+    metadata = content.get("metadata", {})
+    results = [metadata.get("operation_result", {})]
+    results += [internal.get("result", {}) for internal in metadata.get("internal_operation_results", [])]
+    for result in results:
+        if result.get("status") != "applied":
+            continue
+        for diff in result.get("lazy_storage_diff", []):
+            if diff.get("kind") != "big_map" or diff["diff"].get("action") not in ("update", "alloc"):
+                continue
+            for update in diff["diff"].get("updates", []):
+                yield int(diff["id"]), update
+        if "lazy_storage_diff" not in result:
+            for update in result.get("big_map_diff", []):
+                if update.get("action") == "update":
+                    yield int(update["big_map"]), update
+
+def iter_events(block, contract=None):
+    """Yields the contract events of the applied operations of a block, see Event in contracts/btctz.py
+
+    The payload is decoded with the type published with the event, or with the EVENT_TYPES of its tag when the
+    event carries no type. Unlike big_map diffs, the events of a transfer keep the pairing of sender and receiver.
+
+    Args:
+        block (dict): block JSON
+        contract (str, optional): only yield the events of this KT1 address. Defaults to every contract.
+
+    Yields:
+        dict: operation hash, source contract, tag and decoded payload
+    """
+    for validation_pass in block.get("operations", []):
+        for operation in validation_pass:
+            for content in operation.get("contents", []):
+                for internal in content.get("metadata", {}).get("internal_operation_results", []):
+                    if internal.get("kind") != "event" or internal.get("result", {}).get("status") != "applied":
+                        continue
+                    if contract is not None and internal["source"] != contract:
+                        continue
+                    tag = internal.get("tag")
+                    event_type = internal.get("type") or EVENT_TYPES[tag]
+                    yield dict(operation=operation.get("hash"), source=internal["source"], tag=tag,
+                               payload=decode(event_type, internal["payload"]))
+
+def read_blocks(path):
+    """Reads a saved chain dump
+
+    Args:
+        path (str): JSONL file with one block per line, or directory of <level>.json block files
+
+    Yields:
+        dict: blocks in level order
+    """
+    if os.path.isdir(path):
+        names = sorted((name for name in os.listdir(path) if name.endswith(".json")), key=lambda name: int(name.split(".")[0]))
+        for name in names:
+            with open(os.path.join(path, name)) as block_file:
+                yield json.load(block_file)
+        return
+    with open(path) as dump:
+        for line in dump:
+            if line.strip():
+                yield json.loads(line)
+
+def replay(index, blocks, head_level=None, commit_every=1000):
+    """Applies a stream of blocks in bulk, committing every commit_every blocks
+
+    Args:
+        index (LedgerIndex): the store
+        blocks (iterable): blocks in level order
+        head_level (int, optional): chain head, blocks within MAX_REORG_DEPTH of it keep an undo log. Defaults to None, no undo log.
+        commit_every (int, optional): blocks per SQLite transaction. Defaults to 1000.
+
+    Returns:
+        int: number of blocks applied
+    """
+    count = 0
+    for block in blocks:
+        level = block["header"]["level"]
+        index.apply_block(block, undo=head_level is not None and level > head_level - MAX_REORG_DEPTH)
+        count += 1
+        if count % commit_every == 0:
+            index.commit()
+    index.commit()
+    return count
+
+class RpcSource:
+    """Blocks of a node RPC, over one persistent HTTP connection"""
+
+    def __init__(self, url, chain="main"):
+        parsed = urllib.parse.urlparse(url)
+        self.host = parsed.hostname
+        self.port = parsed.port or (443 if parsed.scheme == "https" else 80)
+        self.https = parsed.scheme == "https"
+        self.chain = chain
+        self.connection = None
+
+    def get(self, path):
+        """GETs a JSON RPC path, reconnecting once if the persistent connection was closed by the server"""
+        return self.request("GET", path)
+
+    def post(self, path, body):
+        """POSTs a JSON body to an RPC path"""
+        return self.request("POST", path, body)
+
+    def request(self, method, path, body=None):
+        data = None if body is None else json.dumps(body)
+        headers = {} if body is None else {"Content-Type": "application/json"}
+        for attempt in range(2):
+            if self.connection is None:
+                connection_class = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+                self.connection = connection_class(self.host, self.port, timeout=30)
+            try:
+                self.connection.request(method, path, data, headers)
+                response = self.connection.getresponse()
+                content = response.read()
+            except (http.client.HTTPException, ConnectionError):
+                self.connection.close()
+                self.connection = None
+                if attempt:
+                    raise
+                continue
+            if response.status != 200:
+                raise RuntimeError("{} returned {}: {}".format(path, response.status, content[:200]))
+            return json.loads(content)
+
+    def head_level(self):
+        return self.get("/chains/{}/blocks/head/header".format(self.chain))["level"]
+
+    def block(self, level):
+        return self.get("/chains/{}/blocks/{}".format(self.chain, level))
+
+    def block_hash(self, level):
+        return self.get("/chains/{}/blocks/{}/hash".format(self.chain, level))
+
+    def contract_script(self, contract):
+        """Returns the deployed script of a contract, as a dict with its code sections and its storage value"""
+        return self.get("/chains/{}/blocks/head/context/contracts/{}/script".format(self.chain, contract))
+
+    def contract_big_maps(self, contract, storage_type=None):
+        """Discovers the big_map ids of a contract from its storage
+
+        Args:
+            contract (str): KT1 address
+            storage_type (dict, optional): Micheline storage type of the contract. Defaults to the type of the script
+                deployed at contract, read with its storage in one request.
+
+        Returns:
+            dict: annotated storage field name to big_map id
+        """
+        if storage_type is None:
+            script = self.contract_script(contract)
+            return find_big_map_ids(script_storage_type(script["code"]), script["storage"])
+        storage = self.get("/chains/{}/blocks/head/context/contracts/{}/storage".format(self.chain, contract))
+        return find_big_map_ids(storage_type, storage)
+
+def script_storage_type(code):
+    """Returns the storage type of the parameter, storage and code sections of a compiled contract"""
+    return next(section for section in code if section["prim"] == "storage")["args"][0]
+
+def find_big_map_ids(storage_type, storage):
+    """Returns the ids of the annotated big_maps of a storage value
+
+    Args:
+        storage_type (dict): Micheline storage type
+        storage: Micheline storage value, big_maps are ints
+
+    Returns:
+        dict: field name to big_map id
+    """
+    ids = {}
+
+    def walk(type_node, node):
+        prim = type_node["prim"]
+        if prim == "big_map":
+            annots = [annot[1:] for annot in type_node.get("annots", []) if annot.startswith("%")]
+            if annots:
+                ids[annots[0]] = int(node["int"])
+        elif prim == "pair":
+            args = type_node["args"]
+            values = node if isinstance(node, list) else node["args"]
+            if len(args) > 2:
+                args = [args[0], {"prim": "pair", "args": args[1:]}]
+            if len(values) > 2:
+                values = [values[0], {"prim": "Pair", "args": values[1:]}]
+            for arg, value in zip(args, values):
+                walk(arg, value)
+    walk(storage_type, storage)
+    return ids
+
+def sync(index, source, until=None):
+    """Follows a node: applies new blocks and rolls back to the fork point on reorganisation
+
+    Args:
+        index (LedgerIndex): the store
+        source (RpcSource): the node
+        until (int, optional): stop at this level. Defaults to the current head.
+
+    Returns:
+        int: the last indexed level
+    """
+    head_level = source.head_level() if until is None else until
+    level, _ = index.checkpoint()
+    level = -1 if level is None else level
+    fork_level = find_fork_level(index, source, min(level, head_level))
+    if fork_level < level:
+        index.rollback(fork_level)
+        level = fork_level
+    while level < head_level:
+        block = source.block(level + 1)
+        try:
+            index.apply_block(block, undo=level + 1 > head_level - MAX_REORG_DEPTH)
+        except ReorgError:
+            index.rollback(find_fork_level(index, source, level))
+            level, _ = index.checkpoint()
+            continue
+        index.commit()
+        level += 1
+    index.prune_undo_log(head_level - MAX_REORG_DEPTH)
+    return level
+
+def find_fork_level(index, source, level):
+    """Returns the highest level at which the indexed block is still on the node chain"""
+    while level >= 0 and index.block_hash(level) != source.block_hash(level):
+        level -= 1
+    return level
+
+def parse_big_maps(items):
+    return {name: int(big_map_id) for name, big_map_id in (item.split("=", 1) for item in items)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+    replay_parser = commands.add_parser("replay", help="bulk replay a chain dump")
+    replay_parser.add_argument("database")
+    replay_parser.add_argument("dump")
+    replay_parser.add_argument("--big-map", action="append", default=[], help="name=id, e.g. ledger=12")
+    replay_parser.add_argument("--head-level", type=int, default=None)
+    replay_parser.add_argument("--contract", help="index the pause events of this contract")
+    sync_parser = commands.add_parser("sync", help="follow a node RPC")
+    sync_parser.add_argument("database")
+    sync_parser.add_argument("rpc")
+    sync_parser.add_argument("--big-map", action="append", default=[], help="name=id, e.g. ledger=12")
+    sync_parser.add_argument("--contract", help="discover the big_map ids from the storage of this contract and index its pause events")
+    sync_parser.add_argument("--script", help="compiled contract whose storage type overrides the one of the deployed script")
+    events_parser = commands.add_parser("events", help="print the contract events of a chain dump as JSON lines")
+    events_parser.add_argument("dump")
+    events_parser.add_argument("--contract", help="only print the events of this contract")
+    balance_parser = commands.add_parser("balance", help="look up a balance")
+    balance_parser.add_argument("database")
+    balance_parser.add_argument("owner")
+    balance_parser.add_argument("token_id", type=int, nargs="?", default=0)
+    arguments = parser.parse_args(argv)
+
+    if arguments.command == "balance":
+        print(LedgerIndex(arguments.database).balance(arguments.owner, arguments.token_id))
+        return 0
+    if arguments.command == "events":
+        for block in read_blocks(arguments.dump):
+            for event in iter_events(block, arguments.contract):
+                print(json.dumps(dict(level=block["header"]["level"], **event)))
+        return 0
+    if arguments.command == "replay":
+        index = LedgerIndex(arguments.database, parse_big_maps(arguments.big_map), arguments.contract)
+        print(replay(index, read_blocks(arguments.dump), arguments.head_level), "blocks")
+        index.close()
+        return 0
+
+    source = RpcSource(arguments.rpc)
+    big_maps = parse_big_maps(arguments.big_map)
+    if arguments.contract:
+        storage_type = None
+        if arguments.script:
+            with open(arguments.script) as script_file:
+                storage_type = script_storage_type(json.load(script_file))
+        big_maps.update(source.contract_big_maps(arguments.contract, storage_type))
+    index = LedgerIndex(arguments.database, big_maps, arguments.contract)
+    print("indexed up to level", sync(index, source))
+    index.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,221 @@
+"""TZIP-16 metadata of the BTCtz contract: off-chain views and error codes generated by the SmartPy build, and a local view runner.
+
+AdministrableFA2 declares its off-chain views in contracts/btctz.py, SmartPy compiles them to Michelson storage views
+in the `contract_metadata` metadata file of the compilation output, along with the table of the numeric error codes
+of builds with compact_errors. `sync` merges them into contracts/contract_metadata.json, `--check` fails when the
+committed views are stale:
+
+    python -m tools.metadata sync <output>/btctz_benchmark
+    python -m tools.metadata sync <output>/btctz_benchmark --check
+
+`run` evaluates a view against the storage of an originated contract with the run_code RPC of a node, or of an
+octez-client mockup when no node is at hand:
+
+    python -m tools.metadata run get_balance '{"owner": "tz1...", "token_id": 0}' --contract KT1... --rpc http://127.0.0.1:8732
+    python -m tools.metadata run all_tokens --contract KT1... --mockup-dir /tmp/mockup
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+
+from .benchmark import Mockup
+from .indexer import RpcSource
+from .micheline import MichelineError, decode, encode, t
+
+CONTRACT_METADATA_PATH = os.path.join(os.path.dirname(__file__), "..", "contracts", "contract_metadata.json")
+COMPILED_METADATA_PATTERN = "*metadata.contract_metadata.json"
+"""File name of the metadata compiled by the init_metadata call of AdministrableFA2"""
+
+def find_compiled_metadata(path):
+    """Returns the compiled contract metadata file of a SmartPy compilation output
+
+    Args:
+        path (str): compiled metadata file, or compilation output directory to search
+
+    Raises:
+        FileNotFoundError: if the directory holds no compiled metadata
+
+    Returns:
+        str: path of the compiled metadata file
+    """
+    if os.path.isfile(path):
+        return path
+    matches = sorted(glob.glob(os.path.join(path, "**", COMPILED_METADATA_PATTERN), recursive=True))
+    if not matches:
+        raise FileNotFoundError("no {} in {}".format(COMPILED_METADATA_PATTERN, path))
+    return matches[0]
+
+GENERATED_FIELDS = ["views", "errors"]
+"""Contract metadata fields generated by the build: the off-chain views, and the error codes of builds with compact_errors"""
+
+def merge_views(contract_metadata, compiled_metadata):
+    """Returns contract_metadata with the generated fields of compiled_metadata, every other field is kept"""
+    merged = dict(contract_metadata)
+    for field in GENERATED_FIELDS:
+        if field in compiled_metadata:
+            merged[field] = compiled_metadata[field]
+        else:
+            merged.pop(field, None)
+    return merged
+
+def decode_error(contract_metadata, value):
+    """Expands the failure value of an operation with the TZIP-16 errors of the contract metadata
+
+    Args:
+        contract_metadata (dict): contract metadata
+        value: Micheline failure value, e.g. {"int": "1"} or {"string": "FA2_NOT_OWNER"}
+
+    Returns:
+        str: the error message, the string itself for string failures, None for unknown codes
+    """
+    if "string" in value:
+        return value["string"]
+    for error in contract_metadata.get("errors", []):
+        if error.get("error") == value and "expansion" in error:
+            return error["expansion"].get("string")
+    return None
+
+def sync(compiled_path, metadata_path=CONTRACT_METADATA_PATH, check=False):
+    """Merges the compiled off-chain views and error codes into the contract metadata file
+
+    Args:
+        compiled_path (str): compiled metadata file or compilation output directory
+        metadata_path (str, optional): contract metadata file. Defaults to contracts/contract_metadata.json.
+        check (bool, optional): only report whether the file is up to date. Defaults to False.
+
+    Returns:
+        bool: True if the generated fields of the metadata file differed from the compiled ones
+    """
+    with open(find_compiled_metadata(compiled_path)) as compiled_file:
+        compiled_metadata = json.load(compiled_file)
+    with open(metadata_path) as metadata_file:
+        contract_metadata = json.load(metadata_file)
+    merged = merge_views(contract_metadata, compiled_metadata)
+    changed = merged != contract_metadata
+    if changed and not check:
+        with open(metadata_path, "w") as metadata_file:
+            json.dump(merged, metadata_file, indent=4)
+            metadata_file.write("\n")
+    return changed
+
+def find_view(contract_metadata, name):
+    """Returns the michelsonStorageView implementation of a view of the contract metadata
+
+    Raises:
+        KeyError: if the metadata has no Michelson storage view of that name
+    """
+    for view in contract_metadata.get("views", []):
+        if view["name"] != name:
+            continue
+        for implementation in view["implementations"]:
+            if "michelsonStorageView" in implementation:
+                return implementation["michelsonStorageView"]
+    raise KeyError("no michelsonStorageView {} in the contract metadata".format(name))
+
+def view_script(implementation, storage_type):
+    """Wraps the code of a Michelson storage view in a script whose storage receives the view result
+
+    The view code expects `pair parameter storage` on the stack, or the storage alone for views without parameter.
+
+    Args:
+        implementation (dict): michelsonStorageView of the metadata
+        storage_type (dict): Micheline storage type of the contract
+
+    Returns:
+        list: Micheline script with parameter, storage and code sections
+    """
+    parameter = implementation.get("parameter")
+    input_type = t("pair", parameter, storage_type) if parameter else storage_type
+    code = [{"prim": "CAR"}, implementation["code"], {"prim": "SOME"}, {"prim": "NIL", "args": [t("operation")]}, {"prim": "PAIR"}]
+    return [
+        {"prim": "parameter", "args": [input_type]},
+        {"prim": "storage", "args": [t("option", implementation["returnType"])]},
+        {"prim": "code", "args": [code]},
+    ]
+
+class MockupRpc:
+    """RPC of an octez-client mockup, with the get and post methods of RpcSource"""
+
+    def __init__(self, mockup):
+        self.mockup = mockup
+
+    def get(self, path):
+        return json.loads(self.mockup.run("rpc", "get", path))
+
+    def post(self, path, body):
+        return json.loads(self.mockup.run("rpc", "post", path, "with", json.dumps(body)))
+
+def run_view(rpc, contract_metadata, name, contract, value=None):
+    """Evaluates an off-chain view against the current storage of a contract with the run_code RPC
+
+    Args:
+        rpc (RpcSource or MockupRpc): node or mockup RPC
+        contract_metadata (dict): contract metadata holding the views
+        name (str): view name
+        contract (str): KT1 address of the contract
+        value (optional): python value of the view parameter, see tools.micheline.encode. Defaults to None.
+
+    Raises:
+        RuntimeError: if the view fails, with the node error
+        MichelineError: if the view returns no result
+
+    Returns:
+        python value of the view result
+    """
+    implementation = find_view(contract_metadata, name)
+    script = rpc.get("/chains/main/blocks/head/context/contracts/{}/script".format(contract))
+    storage_type = next(section["args"][0] for section in script["code"] if section["prim"] == "storage")
+    storage = script["storage"]
+    if implementation.get("parameter"):
+        storage = {"prim": "Pair", "args": [encode(implementation["parameter"], value), storage]}
+    result = rpc.post("/chains/main/blocks/head/helpers/scripts/run_code", {
+        "script": view_script(implementation, storage_type),
+        "storage": {"prim": "None"},
+        "input": storage,
+        "amount": "0",
+        "chain_id": rpc.get("/chains/main/chain_id"),
+        "unparsing_mode": "Readable",
+    })
+    returned = result["storage"]
+    if returned.get("prim") != "Some":
+        raise MichelineError("view {} returned no result".format(name))
+    return decode(implementation["returnType"], returned["args"][0])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+    sync_parser = commands.add_parser("sync", help="merge the compiled off-chain views and error codes into the contract metadata")
+    sync_parser.add_argument("compiled", help="compiled metadata file or SmartPy compilation output directory")
+    sync_parser.add_argument("--metadata", default=CONTRACT_METADATA_PATH)
+    sync_parser.add_argument("--check", action="store_true", help="fail if the views are not up to date")
+    run_parser = commands.add_parser("run", help="evaluate an off-chain view")
+    run_parser.add_argument("view")
+    run_parser.add_argument("parameter", nargs="?", default=None, help="JSON value of the view parameter")
+    run_parser.add_argument("--contract", required=True)
+    run_parser.add_argument("--metadata", default=CONTRACT_METADATA_PATH)
+    backend = run_parser.add_mutually_exclusive_group(required=True)
+    backend.add_argument("--rpc", help="node RPC url")
+    backend.add_argument("--mockup-dir", help="octez-client mockup base directory")
+    run_parser.add_argument("--client", default="octez-client")
+    arguments = parser.parse_args(argv)
+
+    if arguments.command == "sync":
+        changed = sync(arguments.compiled, arguments.metadata, arguments.check)
+        if arguments.check and changed:
+            print("{} views are out of date".format(arguments.metadata))
+            return 1
+        print("{} {}".format(arguments.metadata, "updated" if changed else "up to date"))
+        return 0
+
+    with open(arguments.metadata) as metadata_file:
+        contract_metadata = json.load(metadata_file)
+    rpc = RpcSource(arguments.rpc) if arguments.rpc else MockupRpc(Mockup(arguments.mockup_dir, arguments.client))
+    value = None if arguments.parameter is None else json.loads(arguments.parameter)
+    print(json.dumps(run_view(rpc, contract_metadata, arguments.view, arguments.contract, value)))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,733 @@
+"""Micheline JSON and PACK codec for the types of contracts/btctz.py, and big_map key hashes.
+
+Values are converted between python and Micheline following the SmartPy conventions of the contract: annotated
+pairs are records (python dicts keyed by field name), annotated ors are variants (single entry dicts), unannotated
+pairs are tuples. The big_map key hash (the `expr...` id used by the node RPC
+/chains/main/blocks/head/context/big_maps/<id>/<key_hash>) is the blake2b of the PACKed key:
+
+    python -m tools.micheline key-hash ledger tz1KqTpEZ7Yob7QbPE4Hy4Wo8fHG8LhKxZSx 0
+    python -m tools.micheline key-hash operators tz1... tz1... 0
+"""
+import argparse
+import concurrent.futures
+import datetime
+import functools
+import hashlib
+import json
+import struct
+import sys
+
+from .base58 import PREFIXES, b58encode_check, decode_prefixed, encode_prefixed
+
+PRIMITIVES = [
+    "parameter", "storage", "code", "False", "Elt", "Left", "None", "Pair", "Right", "Some", "True", "Unit", "PACK",
+    "UNPACK", "BLAKE2B", "SHA256", "SHA512", "ABS", "ADD", "AMOUNT", "AND", "BALANCE", "CAR", "CDR", "CHECK_SIGNATURE",
+    "COMPARE", "CONCAT", "CONS", "CREATE_ACCOUNT", "CREATE_CONTRACT", "IMPLICIT_ACCOUNT", "DIP", "DROP", "DUP", "EDIV",
+    "EMPTY_MAP", "EMPTY_SET", "EQ", "EXEC", "FAILWITH", "GE", "GET", "GT", "HASH_KEY", "IF", "IF_CONS", "IF_LEFT",
+    "IF_NONE", "INT", "LAMBDA", "LE", "LEFT", "LOOP", "LSL", "LSR", "LT", "MAP", "MEM", "MUL", "NEG", "NEQ", "NIL",
+    "NONE", "NOT", "NOW", "OR", "PAIR", "PUSH", "RIGHT", "SIZE", "SOME", "SOURCE", "SENDER", "SELF", "STEPS_TO_QUOTA",
+    "SUB", "SWAP", "TRANSFER_TOKENS", "SET_DELEGATE", "UNIT", "UPDATE", "XOR", "ITER", "LOOP_LEFT", "ADDRESS",
+    "CONTRACT", "ISNAT", "CAST", "RENAME", "bool", "contract", "int", "key", "key_hash", "lambda", "list", "map",
+    "big_map", "nat", "option", "or", "pair", "set", "signature", "string", "bytes", "mutez", "timestamp", "unit",
+    "operation", "address", "SLICE", "DIG", "DUG", "EMPTY_BIG_MAP", "APPLY", "chain_id", "CHAIN_ID", "LEVEL",
+    "SELF_ADDRESS", "never", "NEVER", "UNPAIR", "VOTING_POWER", "TOTAL_VOTING_POWER", "KECCAK", "SHA3",
+    "PAIRING_CHECK", "bls12_381_g1", "bls12_381_g2", "bls12_381_fr", "sapling_state", "sapling_transaction_deprecated",
+    "SAPLING_EMPTY_STATE", "SAPLING_VERIFY_UPDATE", "ticket", "TICKET_DEPRECATED", "READ_TICKET", "SPLIT_TICKET",
+    "JOIN_TICKETS", "GET_AND_UPDATE", "chest", "chest_key", "OPEN_CHEST", "VIEW", "view", "constant", "SUB_MUTEZ",
+    "tx_rollup_l2_address", "MIN_BLOCK_TIME", "sapling_transaction", "EMIT", "Lambda_rec", "LAMBDA_REC", "TICKET",
+    "BYTES", "NAT",
+]
+"""Michelson primitives, in the order of their binary code"""
+
+PRIMITIVE_CODES = {primitive: code for code, primitive in enumerate(PRIMITIVES)}
+
+def t(prim, *args, annot=None):
+    """Builds a Micheline type expression
+
+    Args:
+        prim (str): type primitive, e.g. "pair"
+        *args (dict): type arguments
+        annot (str, optional): field annotation, without the % prefix. Defaults to None.
+
+    Returns:
+        dict: Micheline JSON type
+    """
+    node = {"prim": prim}
+    if args:
+        node["args"] = list(args)
+    if annot:
+        node["annots"] = ["%" + annot]
+    return node
+
+LEDGER_KEY = t("pair", t("address", annot="owner"), t("nat", annot="token_id"))
+"""LedgerKey.get_type()"""
+
+OPERATOR_KEY = t("pair", t("address", annot="owner"), t("pair", t("address", annot="operator"), t("nat", annot="token_id")))
+"""OperatorKey.get_type()"""
+
+OWNER_OPERATOR_KEY = t("pair", t("address", annot="owner"), t("address", annot="operator"))
+"""OwnerOperatorKey.get_type()"""
+
+RECIPIENT_TOKEN_AMOUNT = t("pair", t("address", annot="owner"), t("pair", t("nat", annot="token_id"), t("nat", annot="token_amount")))
+"""RecipientTokenAmount.get_type()"""
+
+TOKEN_METADATA = t("pair", t("nat", annot="token_id"), t("map", t("string"), t("bytes"), annot="token_info"))
+"""TokenMetadata.get_type()"""
+
+TRANSFER = t("pair", t("address", annot="from_"), t("list", t("pair", t("address", annot="to_"),
+    t("pair", t("nat", annot="token_id"), t("nat", annot="amount"))), annot="txs"))
+"""Transfer.get_type()"""
+
+UPDATE_OPERATOR = t("or", t("pair", t("address", annot="owner"), t("pair", t("address", annot="operator"), t("nat", annot="token_id")), annot="add_operator"),
+    t("pair", t("address", annot="owner"), t("pair", t("address", annot="operator"), t("nat", annot="token_id")), annot="remove_operator"))
+"""UpdateOperator.get_type()"""
+
+OPERATOR_GRANT = t("pair", t("address", annot="operator"), t("option", t("nat"), annot="token_id"))
+"""OwnerOperatorUpdates.get_grant_type()"""
+
+OWNER_OPERATOR_UPDATES = t("pair", t("address", annot="owner"), t("list", t("or", dict(OPERATOR_GRANT, annots=["%add_operator"]),
+    dict(OPERATOR_GRANT, annots=["%remove_operator"])), annot="updates"))
+"""OwnerOperatorUpdates.get_type()"""
+
+HOLDER_BALANCE = t("pair", t("address", annot="owner"), t("nat", annot="balance"))
+"""HolderBalance.get_type()"""
+
+PERMIT = t("pair", t("key", annot="public_key"), t("pair", t("signature", annot="signature"),
+    t("pair", t("timestamp", annot="expiry"), t("bytes", annot="params_hash"))))
+"""Permit.get_type()"""
+
+PERMIT_SIGNED = t("pair", t("pair", t("chain_id"), t("address")), t("pair", t("nat"), t("pair", t("timestamp"), t("bytes"))))
+"""Permit.get_signed_type()"""
+
+PERMIT_KEY = t("pair", t("address", annot="owner"), t("bytes", annot="params_hash"))
+"""PermitKey.get_type()"""
+
+TOKEN_PAUSE = t("pair", t("bool", annot="pause"), t("nat", annot="token_id"))
+"""TokenPause.get_type()"""
+
+REDEMPTION = t("pair", t("address", annot="owner"), t("pair", t("nat", annot="token_id"), t("pair", t("nat", annot="amount"), t("string", annot="btc_address"))))
+"""Redemption.get_type()"""
+
+CHECKPOINT = t("pair", t("nat", annot="level"), t("nat", annot="balance"))
+"""Checkpoint.get_type()"""
+
+CHECKPOINT_HEAD = t("pair", t("nat", annot="count"), t("nat", annot="level"))
+"""Checkpoint.get_head_type()"""
+
+BALANCE_AT_REQUEST = t("pair", t("address", annot="owner"), t("pair", t("nat", annot="token_id"), t("nat", annot="level")))
+"""Checkpoint.get_request_type(), the parameter of the balance_at view"""
+
+ENTRYPOINT_TYPES = {
+    "transfer": t("list", TRANSFER),
+    "update_operators": t("list", UPDATE_OPERATOR),
+    "update_operators_bulk": t("list", OWNER_OPERATOR_UPDATES),
+    "set_administrator": t("pair", t("address", annot="administrator_to_set"), t("nat", annot="token_id")),
+    "remove_administrator": t("pair", t("address", annot="administrator_to_remove"), t("nat", annot="token_id")),
+    "set_token_metadata": TOKEN_METADATA,
+    "mint": RECIPIENT_TOKEN_AMOUNT,
+    "burn": RECIPIENT_TOKEN_AMOUNT,
+    "mint_batch": t("list", RECIPIENT_TOKEN_AMOUNT),
+    "burn_batch": t("list", RECIPIENT_TOKEN_AMOUNT),
+    "import_balances": t("pair", t("list", HOLDER_BALANCE, annot="balances"), t("nat", annot="token_id")),
+    "pause_token": TOKEN_PAUSE,
+    "pause_tokens": t("list", TOKEN_PAUSE),
+    "permit": t("list", PERMIT),
+    "request_redemption": t("pair", t("nat", annot="amount"), t("pair", t("string", annot="btc_address"), t("nat", annot="token_id"))),
+    "settle_redemptions": t("pair", t("nat", annot="count"), t("pair", t("nat", annot="first_redemption_id"), t("set", t("nat"), annot="refunds"))),
+}
+"""Parameter types of the AdministrableFA2 entrypoints that take no contract or lambda, by entrypoint"""
+
+EVENT_TYPES = {
+    "transfer": t("list", TRANSFER),
+    "mint": t("list", RECIPIENT_TOKEN_AMOUNT),
+    "burn": t("list", RECIPIENT_TOKEN_AMOUNT),
+    "pause": t("list", TOKEN_PAUSE),
+    "import_balances": ENTRYPOINT_TYPES["import_balances"],
+    "redemption": t("pair", t("nat", annot="redemption_id"), dict(REDEMPTION, annots=["%redemption"])),
+    "settle_redemptions": t("pair", t("nat", annot="first_redemption_id"), t("pair", t("nat", annot="count"), t("set", t("nat"), annot="refunds"))),
+}
+"""Payload types of the contract events, by tag, see Event in contracts/btctz.py"""
+
+BIG_MAP_KEY_TYPES = {
+    "ledger": LEDGER_KEY,
+    "operators": OPERATOR_KEY,
+    "all_tokens_operators": OWNER_OPERATOR_KEY,
+    "administrators": LEDGER_KEY,
+    "total_supply": t("nat"),
+    "pause": t("nat"),
+    "token_metadata": t("nat"),
+    "metadata": t("string"),
+    "permits": PERMIT_KEY,
+    "permit_nonces": t("address"),
+    "redemptions": t("nat"),
+    "checkpoints": t("pair", LEDGER_KEY, t("nat")),
+    "checkpoint_heads": LEDGER_KEY,
+}
+"""Key types of the big_maps of AdministrableFA2, by storage field, checkpoints and checkpoint_heads only exist in contracts built with checkpoints"""
+
+BIG_MAP_VALUE_TYPES = {
+    "ledger": t("nat"),
+    "operators": t("unit"),
+    "all_tokens_operators": t("unit"),
+    "administrators": t("unit"),
+    "total_supply": t("nat"),
+    "pause": t("bool"),
+    "token_metadata": TOKEN_METADATA,
+    "metadata": t("bytes"),
+    "permits": t("timestamp"),
+    "permit_nonces": t("nat"),
+    "redemptions": REDEMPTION,
+    "checkpoints": CHECKPOINT,
+    "checkpoint_heads": CHECKPOINT_HEAD,
+}
+"""Value types of the big_maps of AdministrableFA2, by storage field"""
+
+class MichelineError(ValueError):
+    """Raised when a value does not match its type or binary data is malformed"""
+
+def annotation(node):
+    """Returns the field annotation of a type node without its % prefix, or None"""
+    for annot in node.get("annots", []):
+        if annot.startswith("%"):
+            return annot[1:]
+    return None
+
+def _pair_args(node):
+    args = node["args"]
+    if len(args) > 2:
+        return [args[0], t("pair", *args[1:])]
+    return args
+
+def record_fields(node):
+    """Returns the leaves of a record type: annotated arguments of nested unannotated pairs, in layout order
+
+    Args:
+        node (dict): a pair type
+
+    Returns:
+        list: (field name, type) tuples, field name is None for unannotated leaves
+    """
+    fields = []
+    for arg in _pair_args(node):
+        if arg["prim"] == "pair" and annotation(arg) is None and _is_record(arg):
+            fields += record_fields(arg)
+        else:
+            fields.append((annotation(arg), arg))
+    return fields
+
+def _is_record(node):
+    return all(name is not None for name, _ in record_fields(node))
+
+def _pair_values(node):
+    """Normalises the comb forms of a pair value (Pair a b c, sequence) to a two argument list"""
+    if isinstance(node, list):
+        args = node
+    elif node.get("prim") == "Pair":
+        args = node["args"]
+    else:
+        raise MichelineError("expected a pair, got {}".format(node))
+    if len(args) > 2:
+        return [args[0], {"prim": "Pair", "args": args[1:]}]
+    return args
+
+def _encode_address(value):
+    address, _, entrypoint = value.partition("%")
+    prefix, payload = address[:3], None
+    if prefix in ("tz1", "tz2", "tz3"):
+        payload = b"\x00" + bytes([["tz1", "tz2", "tz3"].index(prefix)]) + decode_prefixed(prefix, address)
+    elif prefix == "KT1":
+        payload = b"\x01" + decode_prefixed("KT1", address) + b"\x00"
+    else:
+        raise MichelineError("unsupported address {}".format(value))
+    return payload + entrypoint.encode()
+
+@functools.lru_cache(maxsize=65536)
+def address_bytes(address):
+    """Optimized binary form of an address, as used by PACK. Cached, holder addresses repeat a lot in bulk hashing
+
+    Args:
+        address (str): tz1/tz2/tz3/KT1 address, optionally with %entrypoint
+
+    Returns:
+        bytes: 22 bytes address encoding, followed by the entrypoint name if any
+    """
+    return _encode_address(address)
+
+def decode_address(data):
+    """Inverse of address_bytes"""
+    if data[0] == 0:
+        address = encode_prefixed(["tz1", "tz2", "tz3"][data[1]], data[2:22])
+    elif data[0] == 1:
+        address = encode_prefixed("KT1", data[1:21])
+    else:
+        raise MichelineError("invalid address encoding {}".format(data.hex()))
+    if len(data) > 22:
+        address += "%" + data[22:].decode()
+    return address
+
+_KEY_PREFIXES = ["edpk", "sppk", "p2pk"]
+_SIGNATURE_PREFIXES = ["edsig", "spsig1", "p2sig", "sig"]
+
+def _encode_key(value):
+    prefix = value[:4]
+    return bytes([_KEY_PREFIXES.index(prefix)]) + decode_prefixed(prefix, value)
+
+def _decode_key(data):
+    return encode_prefixed(_KEY_PREFIXES[data[0]], data[1:])
+
+def _encode_signature(value):
+    for prefix in _SIGNATURE_PREFIXES:
+        if value.startswith(prefix):
+            return decode_prefixed(prefix, value)
+    raise MichelineError("unsupported signature {}".format(value))
+
+def _encode_timestamp(value):
+    if isinstance(value, int):
+        return value
+    moment = datetime.datetime.strptime(value.replace("Z", "+0000"), "%Y-%m-%dT%H:%M:%S%z")
+    return int(moment.timestamp())
+
+def _decode_timestamp(seconds):
+    return datetime.datetime.fromtimestamp(seconds, datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def encode(type_node, value, optimized=False):
+    """Converts a python value to Micheline JSON
+
+    Args:
+        type_node (dict): Micheline type
+        value: python value, see the module documentation
+        optimized (bool, optional): use the binary forms of addresses, keys, signatures and timestamps, as PACK does. Defaults to False.
+
+    Raises:
+        MichelineError: if the value does not match the type
+
+    Returns:
+        Micheline JSON value
+    """
+    prim = type_node["prim"]
+    if prim in ("nat", "int", "mutez"):
+        if prim != "int" and value < 0:
+            raise MichelineError("{} cannot be negative: {}".format(prim, value))
+        return {"int": str(int(value))}
+    if prim == "string":
+        return {"string": value}
+    if prim in ("bytes", "chain_id") and isinstance(value, (bytes, bytearray)):
+        return {"bytes": bytes(value).hex()}
+    if prim == "bytes":
+        return {"bytes": value[2:] if value.startswith("0x") else value}
+    if prim == "chain_id":
+        return {"bytes": decode_prefixed("Net", value).hex()} if optimized else {"string": value}
+    if prim == "bool":
+        return {"prim": "True" if value else "False"}
+    if prim == "unit":
+        return {"prim": "Unit"}
+    if prim in ("address", "contract"):
+        return {"bytes": address_bytes(value).hex()} if optimized else {"string": value}
+    if prim == "key":
+        return {"bytes": _encode_key(value).hex()} if optimized else {"string": value}
+    if prim == "key_hash":
+        return {"bytes": address_bytes(value)[1:22].hex()} if optimized else {"string": value}
+    if prim == "signature":
+        return {"bytes": _encode_signature(value).hex()} if optimized else {"string": value}
+    if prim == "timestamp":
+        return {"int": str(_encode_timestamp(value))} if optimized else {"string": value if isinstance(value, str) else _decode_timestamp(value)}
+    if prim == "option":
+        return {"prim": "None"} if value is None else {"prim": "Some", "args": [encode(type_node["args"][0], value, optimized)]}
+    if prim == "pair":
+        if isinstance(value, dict):
+            fields = record_fields(type_node)
+            return _encode_record(type_node, {name: value[name] for name, _ in fields}, optimized)
+        left, right = _pair_args(type_node)
+        if len(value) > 2:
+            value = (value[0], tuple(value[1:]))
+        return {"prim": "Pair", "args": [encode(left, value[0], optimized), encode(right, value[1], optimized)]}
+    if prim == "or":
+        left, right = type_node["args"]
+        if isinstance(value, dict):
+            (name, item), = value.items()
+            path = _variant_path(type_node, name)
+            if path is None:
+                raise MichelineError("unknown variant {}".format(name))
+            return _encode_variant(type_node, path, item, optimized)
+        side, item = value
+        return {"prim": side, "args": [encode(left if side == "Left" else right, item, optimized)]}
+    if prim in ("list", "set"):
+        items = sorted(value) if prim == "set" else value
+        return [encode(type_node["args"][0], item, optimized) for item in items]
+    if prim in ("map", "big_map"):
+        if isinstance(value, int):
+            return {"int": str(value)}
+        key_type, value_type = type_node["args"]
+        return [{"prim": "Elt", "args": [encode(key_type, key, optimized), encode(value_type, item, optimized)]} for key, item in sorted(value.items())]
+    if prim == "lambda":
+        return value
+    raise MichelineError("unsupported type {}".format(prim))
+
+def _encode_record(type_node, values, optimized):
+    left, right = _pair_args(type_node)
+    args = []
+    for arg in (left, right):
+        if arg["prim"] == "pair" and annotation(arg) is None and _is_record(arg):
+            args.append(_encode_record(arg, values, optimized))
+        else:
+            args.append(encode(arg, values[annotation(arg)], optimized))
+    return {"prim": "Pair", "args": args}
+
+def _variant_path(type_node, name):
+    for side, arg in zip(("Left", "Right"), type_node["args"]):
+        if annotation(arg) == name:
+            return [side]
+        if arg["prim"] == "or" and annotation(arg) is None:
+            path = _variant_path(arg, name)
+            if path is not None:
+                return [side] + path
+    return None
+
+def _encode_variant(type_node, path, item, optimized):
+    side = path[0]
+    arg = type_node["args"][0 if side == "Left" else 1]
+    inner = encode(arg, item, optimized) if len(path) == 1 else _encode_variant(arg, path[1:], item, optimized)
+    return {"prim": side, "args": [inner]}
+
+def decode(type_node, node):
+    """Converts a Micheline JSON value to python, accepts both the readable and the optimized forms
+
+    Args:
+        type_node (dict): Micheline type
+        node: Micheline JSON value
+
+    Raises:
+        MichelineError: if the value does not match the type
+
+    Returns:
+        python value, see the module documentation
+    """
+    prim = type_node["prim"]
+    if prim in ("nat", "int", "mutez"):
+        return int(node["int"])
+    if prim == "string":
+        return node["string"]
+    if prim == "bytes":
+        return bytes.fromhex(node["bytes"])
+    if prim == "bool":
+        return node["prim"] == "True"
+    if prim == "unit":
+        return None
+    if prim in ("address", "contract"):
+        return node["string"] if "string" in node else decode_address(bytes.fromhex(node["bytes"]))
+    if prim == "key":
+        return node["string"] if "string" in node else _decode_key(bytes.fromhex(node["bytes"]))
+    if prim == "key_hash":
+        return node["string"] if "string" in node else decode_address(b"\x00" + bytes.fromhex(node["bytes"]))
+    if prim == "signature":
+        return node["string"] if "string" in node else encode_prefixed("sig", bytes.fromhex(node["bytes"]))
+    if prim == "chain_id":
+        return node["string"] if "string" in node else encode_prefixed("Net", bytes.fromhex(node["bytes"]))
+    if prim == "timestamp":
+        return node["string"] if "string" in node else _decode_timestamp(int(node["int"]))
+    if prim == "option":
+        return None if node["prim"] == "None" else decode(type_node["args"][0], node["args"][0])
+    if prim == "pair":
+        if _is_record(type_node):
+            return _decode_record(type_node, node, {})
+        left, right = _pair_args(type_node)
+        first, second = _pair_values(node)
+        return (decode(left, first), decode(right, second))
+    if prim == "or":
+        arg = type_node["args"][0 if node["prim"] == "Left" else 1]
+        item = node["args"][0]
+        name = annotation(arg)
+        if name is None and arg["prim"] == "or":
+            return decode(arg, item)
+        if name is None:
+            return (node["prim"], decode(arg, item))
+        return {name: decode(arg, item)}
+    if prim in ("list", "set"):
+        return [decode(type_node["args"][0], item) for item in node]
+    if prim in ("map", "big_map"):
+        if isinstance(node, dict):
+            return int(node["int"])
+        key_type, value_type = type_node["args"]
+        return {_hashable(decode(key_type, elt["args"][0])): decode(value_type, elt["args"][1]) for elt in node}
+    if prim == "lambda":
+        return node
+    raise MichelineError("unsupported type {}".format(prim))
+
+def _hashable(value):
+    if isinstance(value, dict):
+        return tuple(value.values())
+    return value
+
+def _decode_record(type_node, node, values):
+    left, right = _pair_args(type_node)
+    for arg, item in zip((left, right), _pair_values(node)):
+        if arg["prim"] == "pair" and annotation(arg) is None and _is_record(arg):
+            _decode_record(arg, item, values)
+        else:
+            values[annotation(arg)] = decode(arg, item)
+    return values
+
+def _zarith(value):
+    sign = 0x40 if value < 0 else 0
+    value = abs(value)
+    data = bytearray([sign | (value & 0x3F)])
+    value >>= 6
+    while value:
+        data[-1] |= 0x80
+        data.append(value & 0x7F)
+        value >>= 7
+    return bytes(data)
+
+def _read_zarith(data, offset):
+    byte = data[offset]
+    negative = byte & 0x40
+    value = byte & 0x3F
+    shift = 6
+    offset += 1
+    while byte & 0x80:
+        byte = data[offset]
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        offset += 1
+    return (-value if negative else value), offset
+
+def _sized(tag, payload):
+    return bytes([tag]) + struct.pack(">I", len(payload)) + payload
+
+def binary(node):
+    """Encodes an untyped Micheline JSON node to the binary format used by PACK and by operation forging
+
+    Args:
+        node: Micheline JSON node
+
+    Returns:
+        bytes: binary encoding, without the 0x05 PACK prefix
+    """
+    if isinstance(node, list):
+        return _sized(0x02, b"".join(binary(item) for item in node))
+    if "int" in node:
+        return b"\x00" + _zarith(int(node["int"]))
+    if "string" in node:
+        return _sized(0x01, node["string"].encode())
+    if "bytes" in node:
+        return _sized(0x0A, bytes.fromhex(node["bytes"]))
+    args = node.get("args", [])
+    annots = node.get("annots", [])
+    code = bytes([PRIMITIVE_CODES[node["prim"]]])
+    if len(args) < 3:
+        tag = 0x03 + 2 * len(args) + (1 if annots else 0)
+        encoded = bytes([tag]) + code + b"".join(binary(arg) for arg in args)
+        if annots:
+            encoded += struct.pack(">I", len(" ".join(annots))) + " ".join(annots).encode()
+        return encoded
+    encoded = b"\x09" + code + struct.pack(">I", len(b"".join(binary(arg) for arg in args))) + b"".join(binary(arg) for arg in args)
+    return encoded + struct.pack(">I", len(" ".join(annots))) + " ".join(annots).encode()
+
+def unbinary(data, offset=0):
+    """Decodes one binary Micheline node
+
+    Args:
+        data (bytes): binary data
+        offset (int, optional): start of the node. Defaults to 0.
+
+    Raises:
+        MichelineError: on an unknown tag
+
+    Returns:
+        tuple: Micheline JSON node and the offset after it
+    """
+    tag = data[offset]
+    offset += 1
+    if tag == 0x00:
+        value, offset = _read_zarith(data, offset)
+        return {"int": str(value)}, offset
+    if tag in (0x01, 0x02, 0x0A):
+        size, = struct.unpack_from(">I", data, offset)
+        offset += 4
+        end = offset + size
+        if tag == 0x01:
+            return {"string": data[offset:end].decode()}, end
+        if tag == 0x0A:
+            return {"bytes": data[offset:end].hex()}, end
+        items = []
+        while offset < end:
+            item, offset = unbinary(data, offset)
+            items.append(item)
+        return items, end
+    if 0x03 <= tag <= 0x09:
+        node = {"prim": PRIMITIVES[data[offset]]}
+        offset += 1
+        if tag == 0x09:
+            size, = struct.unpack_from(">I", data, offset)
+            offset += 4
+            end = offset + size
+            args = []
+            while offset < end:
+                arg, offset = unbinary(data, offset)
+                args.append(arg)
+            has_annots = True
+        else:
+            args = []
+            for _ in range((tag - 0x03) // 2):
+                arg, offset = unbinary(data, offset)
+                args.append(arg)
+            has_annots = (tag - 0x03) % 2 == 1
+        if args:
+            node["args"] = args
+        if has_annots:
+            size, = struct.unpack_from(">I", data, offset)
+            offset += 4
+            if size:
+                node["annots"] = data[offset:offset + size].decode().split(" ")
+            offset += size
+        return node, offset
+    raise MichelineError("unknown binary Micheline tag {:#x}".format(tag))
+
+def pack(type_node, value):
+    """PACKs a python value as the contract would
+
+    Args:
+        type_node (dict): Micheline type
+        value: python value
+
+    Returns:
+        bytes: 0x05 followed by the binary encoding of the optimized value
+    """
+    return b"\x05" + binary(encode(type_node, value, optimized=True))
+
+def unpack(type_node, data):
+    """Inverse of pack
+
+    Raises:
+        MichelineError: if data is not a PACKed value or has trailing bytes
+
+    Returns:
+        python value
+    """
+    if data[:1] != b"\x05":
+        raise MichelineError("packed data must start with 0x05")
+    node, offset = unbinary(data, 1)
+    if offset != len(data):
+        raise MichelineError("trailing bytes after packed value")
+    return decode(type_node, node)
+
+def script_expr_hash(packed):
+    """Returns the expr... hash of PACKed data, as used for big_map keys and by the node RPC
+
+    Args:
+        packed (bytes): PACKed value
+
+    Returns:
+        str: base58 expr hash
+    """
+    return b58encode_check(PREFIXES["expr"] + hashlib.blake2b(packed, digest_size=32).digest())
+
+def key_hash(type_node, key):
+    """Big_map key hash of a python key
+
+    Args:
+        type_node (dict): key type, e.g. LEDGER_KEY
+        key: python key
+
+    Returns:
+        str: base58 expr hash
+    """
+    return script_expr_hash(pack(type_node, key))
+
+_LEDGER_KEY_PREFIX = b"\x05\x07\x07\x0a\x00\x00\x00\x16"
+_OPERATOR_KEY_PREFIX = b"\x05\x07\x07\x0a\x00\x00\x00\x16"
+_OPERATOR_KEY_INFIX = b"\x07\x07\x0a\x00\x00\x00\x16"
+
+@functools.lru_cache(maxsize=1 << 20)
+def ledger_key_hash(owner, token_id=0):
+    """expr hash of LedgerKey(owner, token_id), built from the packed layout directly. Cached for hot addresses
+
+    Args:
+        owner (str): holder address
+        token_id (int, optional): token id. Defaults to 0.
+
+    Returns:
+        str: base58 expr hash
+    """
+    packed = _LEDGER_KEY_PREFIX + address_bytes(owner) + b"\x00" + _zarith(token_id)
+    return b58encode_check(PREFIXES["expr"] + hashlib.blake2b(packed, digest_size=32).digest())
+
+@functools.lru_cache(maxsize=1 << 16)
+def operator_key_hash(owner, operator, token_id=0):
+    """expr hash of OperatorKey(owner, operator, token_id), built from the packed layout directly. Cached
+
+    Returns:
+        str: base58 expr hash
+    """
+    packed = _OPERATOR_KEY_PREFIX + address_bytes(owner) + _OPERATOR_KEY_INFIX + address_bytes(operator) + b"\x00" + _zarith(token_id)
+    return b58encode_check(PREFIXES["expr"] + hashlib.blake2b(packed, digest_size=32).digest())
+
+def ledger_key_hashes(owners, token_id=0, raw=False, processes=None, chunk_size=50000):
+    """Bulk path of ledger_key_hash for many holders of one token
+
+    Args:
+        owners (iterable): holder addresses
+        token_id (int, optional): token id. Defaults to 0.
+        raw (bool, optional): return the 32 bytes blake2b digests instead of base58 expr hashes, which skips the
+            base58 encoding, the most expensive step. Defaults to False.
+        processes (int, optional): hash chunks of chunk_size holders in that many worker processes. Defaults to None, in process.
+        chunk_size (int, optional): holders per worker task. Defaults to 50000.
+
+    Returns:
+        list: expr hashes (or digests) in the order of owners
+    """
+    if processes:
+        owners = list(owners)
+        chunks = [owners[start:start + chunk_size] for start in range(0, len(owners), chunk_size)]
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            results = executor.map(functools.partial(ledger_key_hashes, token_id=token_id, raw=raw), chunks)
+            return [key_hash for chunk in results for key_hash in chunk]
+    if not raw:
+        return [ledger_key_hash(owner, token_id) for owner in owners]
+    blake2b = hashlib.blake2b
+    suffix = b"\x00" + _zarith(token_id)
+    return [blake2b(_LEDGER_KEY_PREFIX + address_bytes(owner) + suffix, digest_size=32).digest() for owner in owners]
+
+def script_big_maps(script):
+    """Finds the annotated big_maps of a compiled contract storage type
+
+    Args:
+        script (list): Micheline JSON of the contract, e.g. the content of contracts/btctz.micheline
+
+    Returns:
+        dict: storage field name to (key type, value type)
+    """
+    storage = next(section for section in script if section["prim"] == "storage")["args"][0]
+    big_maps = {}
+
+    def walk(node):
+        if node["prim"] == "big_map" and annotation(node):
+            big_maps[annotation(node)] = tuple(node["args"])
+        for arg in node.get("args", []):
+            if isinstance(arg, dict) and "prim" in arg:
+                walk(arg)
+    walk(storage)
+    return big_maps
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+    hash_parser = commands.add_parser("key-hash", help="big_map key hash of a ledger or operators key")
+    hash_parser.add_argument("big_map", choices=["ledger", "operators", "administrators"])
+    hash_parser.add_argument("values", nargs="+", help="key fields in layout order, e.g. owner token_id")
+    pack_parser = commands.add_parser("pack", help="PACK a Micheline JSON value of a Micheline JSON type")
+    pack_parser.add_argument("type")
+    pack_parser.add_argument("value")
+    arguments = parser.parse_args(argv)
+
+    if arguments.command == "key-hash":
+        values = [int(value) if value.isdigit() else value for value in arguments.values]
+        print(key_hash(BIG_MAP_KEY_TYPES[arguments.big_map], tuple(values)))
+    else:
+        type_node = json.loads(arguments.type)
+        print("0x" + pack(type_node, decode(type_node, json.loads(arguments.value))).hex())
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+"""Bulk ledger migration with the import_balances entrypoint: a chunk planner and a resumable runner.
+
+A snapshot of the ledger of the old contract, read from a tools/indexer.py store or from an `address,balance` CSV
+file, is split into chunks of holders, one import_balances call per operation. A chunk grows while its operation
+stays under the protocol limits of one operation: gas, paid storage and forged size. The size is computed exactly,
+the gas and storage with the import_balances model of a tools/estimator.py file when one is given, or with the
+conservative DEFAULT_COSTS otherwise. Holders are taken in address order, so the same snapshot always gives the
+same plan.
+
+The plan is a JSON file recording the state of every chunk, rewritten after each confirmation. import_balances sets
+balances instead of adding them, so running a plan again, after a crash or a failed chunk, only sends the chunks not
+yet confirmed, and a chunk sent twice leaves the ledger unchanged. Transfers of the new token must stay paused until
+the migration is verified, a replayed chunk would otherwise overwrite the balances moved since.
+
+    python -m tools.migration plan plan.json --index old.sqlite --token-id 0 --estimator estimator.json
+    python -m tools.migration run plan.json --rpc http://127.0.0.1:8732 --contract KT1... --secret-key edsk...
+    python -m tools.migration verify plan.json --index new.sqlite
+"""
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import sys
+
+from . import ed25519
+from .client import BRANCH_SIZE, SIGNATURE_SIZE, AsyncRpc, OperationsClient, forge_transaction
+from .indexer import LedgerIndex
+from .micheline import ENTRYPOINT_TYPES, HOLDER_BALANCE, binary, encode
+
+HARD_GAS_LIMIT_PER_OPERATION = 1040000
+HARD_STORAGE_LIMIT_PER_OPERATION = 60000
+MAX_OPERATION_DATA_LENGTH = 32768
+"""Protocol limits of one operation, the defaults of the planner"""
+
+DEFAULT_COSTS = dict(gas_base=10000, gas_per_holder=1500, storage_per_new_key=100)
+"""Cost model used without estimator: gas of the call, gas per imported holder and storage bytes per created ledger key"""
+
+PENDING = "pending"
+APPLIED = "applied"
+FAILED = "failed"
+
+def read_snapshot(path):
+    """Reads address,balance lines, the last line of a holder wins"""
+    with open(path, newline="") as snapshot_file:
+        return {row[0].strip(): int(row[1]) for row in csv.reader(snapshot_file) if row and not row[0].startswith("#")}
+
+def _call_overhead(contract, token_id):
+    """Forged size of an import_balances operation with no holder, fee, counter and limits at their largest encodings"""
+    content = {"source": "tz1KqTpEZ7Yob7QbPE4Hy4Wo8fHG8LhKxZSx", "fee": str(2 ** 35), "counter": str(2 ** 42),
+               "gas_limit": str(HARD_GAS_LIMIT_PER_OPERATION), "storage_limit": str(HARD_STORAGE_LIMIT_PER_OPERATION), "amount": "0",
+               "destination": contract, "parameters": {"entrypoint": "import_balances",
+                                                       "value": encode(ENTRYPOINT_TYPES["import_balances"], dict(token_id=token_id, balances=[]))}}
+    return len(forge_transaction(content)) + BRANCH_SIZE + SIGNATURE_SIZE
+
+def chunk_costs(holders, new_keys, estimator=None, costs=None):
+    """Returns the gas and storage limits of an import of holders entries, new_keys of them creating a ledger key"""
+    if estimator is not None:
+        return estimator.models["import_balances"].limits(dict(items=holders, new_keys=new_keys))
+    costs = dict(DEFAULT_COSTS, **(costs or {}))
+    return costs["gas_base"] + costs["gas_per_holder"] * holders, costs["storage_per_new_key"] * new_keys
+
+def plan(balances, token_id=0, contract="KT1RJ6PbjHpwc3M5rw5s2Nbmefwbuwbdxton", estimator=None, costs=None, is_new_key=None,
+         max_gas=HARD_GAS_LIMIT_PER_OPERATION, max_storage=HARD_STORAGE_LIMIT_PER_OPERATION, max_size=MAX_OPERATION_DATA_LENGTH):
+    """Splits a ledger snapshot into import_balances chunks
+
+    Args:
+        balances (dict): balance by holder address, zero balances are left out
+        token_id (int, optional): token id of the import. Defaults to 0.
+        contract (str, optional): KT1 address of the new token, its length is fixed so any address gives the same plan. Defaults to the mockup address.
+        estimator (tools.estimator.Estimator, optional): gas and storage models, with an import_balances model. Defaults to DEFAULT_COSTS.
+        costs (dict, optional): overrides of DEFAULT_COSTS. Defaults to None.
+        is_new_key (callable, optional): tells whether an (owner, token_id) ledger key is absent from the new ledger. Defaults to every key.
+        max_gas (int, optional): gas limit of one operation. Defaults to HARD_GAS_LIMIT_PER_OPERATION.
+        max_storage (int, optional): storage limit of one operation. Defaults to HARD_STORAGE_LIMIT_PER_OPERATION.
+        max_size (int, optional): forged size limit of one operation. Defaults to MAX_OPERATION_DATA_LENGTH.
+
+    Raises:
+        ValueError: if a single holder does not fit in an operation
+
+    Returns:
+        dict: the plan, with the snapshot digest and totals, and chunks with their holders, limits, size and status
+    """
+    holders = sorted((owner, balance) for owner, balance in balances.items() if balance)
+    digest = hashlib.sha256(json.dumps([token_id, holders]).encode()).hexdigest()
+    overhead = _call_overhead(contract, token_id)
+    chunks = []
+    current, size, new_keys = [], overhead, 0
+
+    def close():
+        gas_limit, storage_limit = chunk_costs(len(current), new_keys, estimator, costs)
+        chunks.append(dict(index=len(chunks), balances=current, gas_limit=gas_limit, storage_limit=storage_limit, size=size,
+                           status=PENDING, operation=None))
+
+    for owner, balance in holders:
+        entry_size = len(binary(encode(HOLDER_BALANCE, dict(owner=owner, balance=balance))))
+        entry_new = 1 if is_new_key is None or is_new_key((owner, token_id)) else 0
+        gas_limit, storage_limit = chunk_costs(len(current) + 1, new_keys + entry_new, estimator, costs)
+        if current and (size + entry_size > max_size or gas_limit > max_gas or storage_limit > max_storage):
+            close()
+            current, size, new_keys = [], overhead, 0
+            gas_limit, storage_limit = chunk_costs(1, entry_new, estimator, costs)
+        if overhead + entry_size > max_size or gas_limit > max_gas or storage_limit > max_storage:
+            raise ValueError("holder {} does not fit in one operation".format(owner))
+        current.append([owner, balance])
+        size += entry_size
+        new_keys += entry_new
+    if current:
+        close()
+    return dict(token_id=token_id, snapshot=digest, holders=len(holders), total=sum(balance for _, balance in holders), chunks=chunks)
+
+def load_plan(path):
+    with open(path) as plan_file:
+        return json.load(plan_file)
+
+def save_plan(migration_plan, path):
+    """Writes the plan atomically, a crash leaves either the previous or the new state"""
+    temporary = path + ".tmp"
+    with open(temporary, "w") as plan_file:
+        json.dump(migration_plan, plan_file, indent=2)
+        plan_file.write("\n")
+    os.replace(temporary, path)
+
+def verify(migration_plan, balance):
+    """Compares the ledger of the new token with the plan
+
+    Args:
+        migration_plan (dict): the plan
+        balance (callable): balance of an owner for the token id of the plan, e.g. LedgerIndex.balance
+
+    Returns:
+        list: (chunk index, owner, expected, found) of the holders whose balance differs
+    """
+    return [(chunk["index"], owner, expected, found)
+            for chunk in migration_plan["chunks"] for owner, expected in chunk["balances"]
+            for found in [balance(owner, migration_plan["token_id"])] if found != expected]
+
+def status(migration_plan):
+    """Returns the number of chunks by status"""
+    counts = {}
+    for chunk in migration_plan["chunks"]:
+        counts[chunk["status"]] = counts.get(chunk["status"], 0) + 1
+    return counts
+
+async def run(migration_plan, path, rpc, contract, signing_keys, balance=None, **options):
+    """Sends the chunks of the plan that are not applied yet and records each confirmation in the plan file
+
+    Args:
+        migration_plan (dict): the plan, updated in place
+        path (str): plan file, rewritten after every chunk
+        rpc (AsyncRpc): node connection pool
+        contract (str): KT1 address of the new token
+        signing_keys (list): ed25519.SigningKey of administrators of the token id
+        balance (callable, optional): balance lookup of the new ledger, chunks it already holds are marked applied
+            without being sent. Defaults to None.
+        **options: OperationsClient options
+
+    Returns:
+        dict: number of chunks by status
+    """
+    pending = [chunk for chunk in migration_plan["chunks"] if chunk["status"] != APPLIED]
+    if balance is not None:
+        for chunk in pending:
+            if all(balance(owner, migration_plan["token_id"]) == expected for owner, expected in chunk["balances"]):
+                chunk["status"] = APPLIED
+        pending = [chunk for chunk in pending if chunk["status"] != APPLIED]
+        save_plan(migration_plan, path)
+
+    async def confirm(chunk, call):
+        try:
+            receipt = await call.confirmed
+            chunk.update(status=APPLIED, operation=receipt["operation"], error=None)
+        except Exception as error:
+            chunk.update(status=FAILED, error=str(error))
+        save_plan(migration_plan, path)
+
+    # each chunk fills the limits of one operation, so groups hold a single call
+    options = dict(options, max_calls_per_group=1)
+    async with OperationsClient(rpc, contract, signing_keys, **options) as client:
+        await asyncio.gather(*(confirm(chunk, client.import_balances([tuple(item) for item in chunk["balances"]], migration_plan["token_id"]))
+                               for chunk in pending))
+    return status(migration_plan)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+    plan_parser = commands.add_parser("plan", help="split a ledger snapshot into import_balances chunks")
+    plan_parser.add_argument("plan", help="path of the plan file")
+    source = plan_parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--csv", help="address,balance snapshot")
+    source.add_argument("--index", help="tools.indexer store of the old contract")
+    plan_parser.add_argument("--token-id", type=int, default=0)
+    plan_parser.add_argument("--estimator", help="tools.estimator models with an import_balances model")
+    plan_parser.add_argument("--max-gas", type=int, default=HARD_GAS_LIMIT_PER_OPERATION)
+    plan_parser.add_argument("--max-storage", type=int, default=HARD_STORAGE_LIMIT_PER_OPERATION)
+    plan_parser.add_argument("--max-size", type=int, default=MAX_OPERATION_DATA_LENGTH)
+    run_parser = commands.add_parser("run", help="send the chunks that are not applied yet")
+    run_parser.add_argument("plan")
+    run_parser.add_argument("--rpc", required=True)
+    run_parser.add_argument("--contract", required=True)
+    run_parser.add_argument("--secret-key", action="append", required=True, help="edsk key of an administrator, repeat for more accounts")
+    run_parser.add_argument("--index", help="tools.indexer store of the new contract, chunks it already holds are not sent")
+    run_parser.add_argument("--confirmations", type=int, default=2)
+    verify_parser = commands.add_parser("verify", help="compare the ledger of the new contract with the plan")
+    verify_parser.add_argument("plan")
+    verify_parser.add_argument("--index", required=True, help="tools.indexer store of the new contract")
+    status_parser = commands.add_parser("status", help="count the chunks by status")
+    status_parser.add_argument("plan")
+    arguments = parser.parse_args(argv)
+
+    if arguments.command == "plan":
+        if arguments.csv:
+            balances = read_snapshot(arguments.csv)
+        else:
+            index = LedgerIndex(arguments.index)
+            balances = dict(index.holders(arguments.token_id))
+            index.close()
+        estimator = None
+        if arguments.estimator:
+            from .estimator import Estimator
+            estimator = Estimator.load(arguments.estimator)
+        migration_plan = plan(balances, arguments.token_id, estimator=estimator, max_gas=arguments.max_gas,
+                              max_storage=arguments.max_storage, max_size=arguments.max_size)
+        save_plan(migration_plan, arguments.plan)
+        print(json.dumps(dict(holders=migration_plan["holders"], total=migration_plan["total"], chunks=len(migration_plan["chunks"]))))
+        return 0
+
+    migration_plan = load_plan(arguments.plan)
+    if arguments.command == "status":
+        print(json.dumps(status(migration_plan)))
+        return 0
+    if arguments.command == "verify":
+        index = LedgerIndex(arguments.index)
+        mismatches = verify(migration_plan, index.balance)
+        index.close()
+        for chunk_index, owner, expected, found in mismatches:
+            print("chunk {} {}: expected {}, found {}".format(chunk_index, owner, expected, found))
+        return 1 if mismatches else 0
+
+    index = LedgerIndex(arguments.index) if arguments.index else None
+
+    async def send():
+        rpc = AsyncRpc(arguments.rpc)
+        try:
+            return await run(migration_plan, arguments.plan, rpc, arguments.contract,
+                             [ed25519.SigningKey(secret_key) for secret_key in arguments.secret_key],
+                             index.balance if index else None, confirmations=arguments.confirmations)
+        finally:
+            await rpc.close()
+
+    counts = asyncio.run(send())
+    print(json.dumps(counts))
+    return 0 if counts.get(APPLIED, 0) == len(migration_plan["chunks"]) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
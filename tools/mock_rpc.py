@@ -0,0 +1,400 @@
+"""Local stand-in for the RPC of a Tezos node, serving a chain held in memory.
+
+It serves the subset of the RPC read by tools/indexer.py, so that indexing and reorganisations can be exercised
+without a node, and the subset used by tools/client.py to simulate, inject and follow operations. Injected
+operations wait in a mempool holding one operation per source, as the node does, until the next bake; their calls
+are applied to the contract models of the chain, e.g. tools.simulator.FA2Simulator, and the contract events a model
+emits are reported as internal event results, as a node reports EMIT:
+
+    python -m tools.mock_rpc chain.jsonl --port 8732 --block-time 1
+
+    GET /chains/main/chain_id
+    GET /chains/main/blocks/<head|head~n|level|hash>[/hash|/header|/operations/3]
+    GET /chains/main/blocks/head/context/contracts/<address>/<script|storage|counter|manager_key>
+    POST /chains/main/blocks/head/helpers/scripts/run_operation
+    POST /injection/operation
+"""
+import argparse
+import copy
+import hashlib
+import http.server
+import json
+import sys
+import threading
+import time
+
+from . import ed25519
+from .base58 import decode_prefixed, encode_prefixed
+from .client import WATERMARK, operation_hash, unforge_operation
+from .indexer import read_blocks
+from .micheline import ENTRYPOINT_TYPES, EVENT_TYPES, binary, decode, encode
+
+def make_block_hash(*parts):
+    """Deterministic block hash of arbitrary parts, used to build synthetic chains"""
+    return encode_prefixed("B", hashlib.blake2b(json.dumps(parts).encode(), digest_size=32).digest())
+
+def make_operation_hash(*parts):
+    return encode_prefixed("o", hashlib.blake2b(json.dumps(parts).encode(), digest_size=32).digest())
+
+def make_block(level, predecessor, diffs=(), branch=""):
+    """Builds a block with one applied transaction carrying the given big_map diffs
+
+    Args:
+        level (int): block level
+        predecessor (str): hash of the previous block
+        diffs (list, optional): (big_map id, Micheline key, Micheline value or None) triples. Defaults to none.
+        branch (str, optional): salt of the block hash, to build competing branches. Defaults to "".
+
+    Returns:
+        dict: block JSON in the format of /chains/main/blocks/<id>
+    """
+    block_hash = make_block_hash(level, predecessor, branch, list(diffs))
+    updates = {}
+    for big_map_id, key, value in diffs:
+        update = {"key": key}
+        if value is not None:
+            update["value"] = value
+        updates.setdefault(big_map_id, []).append(update)
+    operations = []
+    if updates:
+        lazy_storage_diff = [{"kind": "big_map", "id": str(big_map_id), "diff": {"action": "update", "updates": big_map_updates}}
+                             for big_map_id, big_map_updates in updates.items()]
+        operations.append({"hash": make_operation_hash(block_hash), "contents": [{
+            "kind": "transaction",
+            "metadata": {"operation_result": {"status": "applied", "lazy_storage_diff": lazy_storage_diff}},
+        }]})
+    return {"hash": block_hash, "header": {"level": level, "predecessor": predecessor}, "operations": [[], [], [], operations]}
+
+class MockRpcError(Exception):
+    """Refusal of an RPC, answered with status and the body of the error"""
+
+    def __init__(self, status, body):
+        super().__init__(body)
+        self.status = status
+        self.body = body
+
+GAS_PER_CALL = 1000
+GAS_PER_BYTE = 10
+"""Gas model of the contract calls, per call and per byte of parameter"""
+
+def _metadata(result):
+    """Metadata of a content, the internal results of its result are reported beside it as the node does"""
+    result = dict(result)
+    internal = result.pop("internal_operation_results", None)
+    metadata = {"operation_result": result}
+    if internal:
+        metadata["internal_operation_results"] = internal
+    return metadata
+
+def _backtrack(result):
+    internal = [dict(item, result=dict(item["result"], status="backtracked")) for item in result.get("internal_operation_results", [])]
+    result = dict(result, status="backtracked")
+    if internal:
+        result["internal_operation_results"] = internal
+    return result
+
+class MockChain:
+    """Chain of blocks in level order, with the storages and scripts of the contracts
+
+    Attributes:
+        accounts (dict): public key and counter of the revealed implicit accounts, by address
+        contracts (dict): contract models by KT1 address, with an apply(sender, entrypoint, params) method raising on failure
+        mempool (list): injected operations waiting for the next bake
+        scripts (dict): code sections of the contracts by KT1 address, served with their storage as the script of the contract
+    """
+
+    def __init__(self, blocks=(), storages=None, chain_id="NetXdQprcVkpaWU", scripts=None):
+        self.lock = threading.Lock()
+        self.blocks = list(blocks)
+        self.storages = dict(storages or {})
+        self.scripts = dict(scripts or {})
+        self.chain_id = chain_id
+        self.accounts = {}
+        self.contracts = {}
+        self.mempool = []
+
+    @classmethod
+    def genesis(cls, **kwargs):
+        """Returns a chain holding one empty block"""
+        return cls([make_block(1, make_block_hash("genesis"))], **kwargs)
+
+    def add_account(self, public_key, counter=0):
+        """Reveals an Ed25519 account, returns its address"""
+        address = ed25519.public_key_hash(decode_prefixed("edpk", public_key))
+        with self.lock:
+            self.accounts[address] = dict(public_key=public_key, counter=counter)
+        return address
+
+    def append(self, block):
+        with self.lock:
+            self.blocks.append(block)
+
+    def reorg(self, level, blocks):
+        """Replaces the blocks above level by a competing branch"""
+        with self.lock:
+            self.blocks = [block for block in self.blocks if block["header"]["level"] <= level] + list(blocks)
+
+    def block(self, block_id):
+        with self.lock:
+            if not self.blocks:
+                return None
+            if block_id == "head":
+                return self.blocks[-1]
+            if block_id.startswith("head~") and block_id[5:].isdigit():
+                # the first block stands for the ancestors of short chains
+                return self.blocks[max(0, len(self.blocks) - 1 - int(block_id[5:]))]
+            if block_id.isdigit():
+                offset = int(block_id) - self.blocks[0]["header"]["level"]
+                return self.blocks[offset] if 0 <= offset < len(self.blocks) else None
+            return next((block for block in self.blocks if block["hash"] == block_id), None)
+
+    def _check_counters(self, contents):
+        source = contents[0]["source"]
+        account = self.accounts.get(source)
+        if account is None:
+            raise MockRpcError(400, [{"kind": "temporary", "id": "unrevealed_key", "contract": source}])
+        for index, content in enumerate(contents):
+            if content["source"] != source:
+                raise MockRpcError(400, [{"kind": "permanent", "id": "inconsistent_sources"}])
+            if int(content["counter"]) != account["counter"] + 1 + index:
+                raise MockRpcError(400, [{"kind": "temporary", "id": "counter_in_the_past" if int(content["counter"]) <= account["counter"] else "counter_in_the_future",
+                                          "contract": source, "expected": str(account["counter"] + 1 + index), "found": content["counter"]}])
+
+    def _run(self, contents):
+        """Applies the contents of an operation group to copies of the contract models
+
+        A failing content backtracks the contents before it and skips the ones after it.
+
+        Returns:
+            tuple: the operation result of every content, and the updated contract models, None if the group failed
+        """
+        contracts = {}
+        results = []
+        failed = False
+        for content in contents:
+            if failed:
+                results.append({"status": "skipped"})
+                continue
+            parameters = content.get("parameters") or {"entrypoint": "default", "value": {"prim": "Unit"}}
+            consumed = GAS_PER_CALL + GAS_PER_BYTE * len(binary(parameters["value"]))
+            error = None
+            events = []
+            destination = content["destination"]
+            if consumed > int(content["gas_limit"]):
+                error = {"kind": "temporary", "id": "gas_exhausted.operation"}
+            elif destination.startswith("KT1"):
+                if destination not in self.contracts:
+                    error = {"kind": "temporary", "id": "contract.non_existing_contract", "contract": destination}
+                elif parameters["entrypoint"] not in ENTRYPOINT_TYPES:
+                    error = {"kind": "permanent", "id": "michelson_v1.no_such_entrypoint", "entrypoint": parameters["entrypoint"]}
+                else:
+                    if destination not in contracts:
+                        contracts[destination] = copy.deepcopy(self.contracts[destination])
+                        if hasattr(contracts[destination], "level"):
+                            # the group is applied in the next block, the level read by checkpoints
+                            contracts[destination].level = self.blocks[-1]["header"]["level"] + 1
+                    entrypoint = parameters["entrypoint"]
+                    try:
+                        contracts[destination].apply(content["source"], entrypoint, decode(ENTRYPOINT_TYPES[entrypoint], parameters["value"]))
+                        events = getattr(contracts[destination], "events", [])
+                    except Exception as failure:
+                        error = {"kind": "temporary", "id": "michelson_v1.script_rejected",
+                                 "with": {"string": str(getattr(failure, "code", None) or failure)}}
+            if error is None:
+                results.append({"status": "applied", "consumed_milligas": str(consumed * 1000), "paid_storage_size_diff": "0"})
+                if destination.startswith("KT1") and events:
+                    results[-1]["internal_operation_results"] = [
+                        {"kind": "event", "source": destination, "nonce": nonce, "type": EVENT_TYPES[tag], "tag": tag,
+                         "payload": encode(EVENT_TYPES[tag], payload), "result": {"status": "applied", "consumed_milligas": "0"}}
+                        for nonce, (tag, payload) in enumerate(events)]
+            else:
+                failed = True
+                results = [_backtrack(result) for result in results]
+                results.append({"status": "failed", "errors": [error]})
+        return results, None if failed else contracts
+
+    def simulate(self, operation):
+        """run_operation: applies an unsigned operation group to the head without keeping its effects"""
+        with self.lock:
+            self._check_counters(operation["contents"])
+            results, _ = self._run(operation["contents"])
+        return {"contents": [dict(content, metadata=_metadata(result)) for content, result in zip(operation["contents"], results)]}
+
+    def inject(self, signed):
+        """injection/operation: checks a signed operation group and adds it to the mempool
+
+        Raises:
+            MockRpcError: for unknown branches, bad signatures or counters, and sources already in the mempool
+
+        Returns:
+            str: the operation hash
+        """
+        try:
+            branch, contents, signature = unforge_operation(signed)
+        except (ValueError, IndexError, KeyError) as error:
+            raise MockRpcError(400, [{"kind": "permanent", "id": "invalid_binary_format", "msg": str(error)}])
+        if not contents:
+            raise MockRpcError(400, [{"kind": "permanent", "id": "empty_operation"}])
+        if self.block(branch) is None:
+            raise MockRpcError(400, [{"kind": "temporary", "id": "outdated_operation", "branch": branch}])
+        with self.lock:
+            self._check_counters(contents)
+            source = contents[0]["source"]
+            public_key = self.accounts[source]["public_key"]
+            if not ed25519.verify(decode_prefixed("edpk", public_key), WATERMARK + signed[:-len(signature)], signature):
+                raise MockRpcError(400, [{"kind": "temporary", "id": "invalid_signature"}])
+            if any(pending["contents"][0]["source"] == source for pending in self.mempool):
+                raise MockRpcError(400, [{"kind": "temporary", "id": "prevalidation.manager_restriction", "manager": source}])
+            operation = dict(hash=operation_hash(signed), branch=branch, contents=contents, signature=encode_prefixed("edsig", signature))
+            self.mempool.append(operation)
+        return operation["hash"]
+
+    def bake(self):
+        """Includes the mempool in a new block, applying every operation group on its own
+
+        Returns:
+            dict: the new block
+        """
+        with self.lock:
+            operations = []
+            for operation in self.mempool:
+                results, contracts = self._run(operation["contents"])
+                self.accounts[operation["contents"][0]["source"]]["counter"] += len(operation["contents"])
+                if contracts is not None:
+                    self.contracts.update(contracts)
+                contents = [dict(content, metadata=_metadata(result)) for content, result in zip(operation["contents"], results)]
+                operations.append(dict(operation, contents=contents))
+            self.mempool = []
+            head = self.blocks[-1]
+            level = head["header"]["level"] + 1
+            block_hash = make_block_hash(level, head["hash"], [operation["hash"] for operation in operations])
+            block = {"hash": block_hash, "header": {"level": level, "predecessor": head["hash"], "timestamp": int(time.time())},
+                     "operations": [[], [], [], operations]}
+            self.blocks.append(block)
+        return block
+
+class RpcHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    chain = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        parts = self.path.split("?")[0].strip("/").split("/")
+        if parts == ["chains", "main", "chain_id"]:
+            return self.reply(200, self.chain.chain_id)
+        if len(parts) < 4 or parts[:3] != ["chains", "main", "blocks"]:
+            return self.reply(404, {"error": "unknown path " + self.path})
+        if parts[4:5] == ["context"]:
+            if len(parts) == 8 and parts[5] == "contracts" and parts[7] == "storage" and parts[6] in self.chain.storages:
+                return self.reply(200, self.chain.storages[parts[6]])
+            if len(parts) == 8 and parts[5] == "contracts" and parts[7] == "script" and parts[6] in self.chain.scripts:
+                return self.reply(200, {"code": self.chain.scripts[parts[6]], "storage": self.chain.storages.get(parts[6])})
+            if len(parts) == 8 and parts[5] == "contracts" and parts[7] in ("counter", "manager_key"):
+                account = self.chain.accounts.get(parts[6])
+                if parts[7] == "manager_key":
+                    return self.reply(200, account["public_key"] if account else None)
+                return self.reply(200, str(account["counter"] if account else 0))
+            return self.reply(404, {"error": "unknown contract"})
+        block = self.chain.block(parts[3])
+        if block is None:
+            return self.reply(404, {"error": "unknown block " + parts[3]})
+        if len(parts) == 4:
+            return self.reply(200, block)
+        if parts[4:] == ["hash"]:
+            return self.reply(200, block["hash"])
+        if parts[4:] == ["header"]:
+            return self.reply(200, dict(block["header"], hash=block["hash"]))
+        if parts[4:5] == ["operations"] and len(parts) == 6 and parts[5].isdigit() and int(parts[5]) < len(block["operations"]):
+            return self.reply(200, block["operations"][int(parts[5])])
+        return self.reply(404, {"error": "unknown path " + self.path})
+
+    def do_POST(self):
+        path = self.path.split("?")[0].rstrip("/")
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"null")
+            if path == "/chains/main/blocks/head/helpers/scripts/run_operation":
+                return self.reply(200, self.chain.simulate(body["operation"]))
+            if path == "/injection/operation":
+                return self.reply(200, self.chain.inject(bytes.fromhex(body)))
+        except MockRpcError as error:
+            return self.reply(error.status, error.body)
+        except (ValueError, KeyError, TypeError) as error:
+            return self.reply(400, {"error": str(error)})
+        return self.reply(404, {"error": "unknown path " + self.path})
+
+class MockServer(http.server.ThreadingHTTPServer):
+    """Server of serve, shutdown also stops the baker"""
+
+    daemon_threads = True
+    baker_stop = None
+
+    def shutdown(self):
+        if self.baker_stop is not None:
+            self.baker_stop.set()
+        super().shutdown()
+
+def serve(chain, host="127.0.0.1", port=0, block_time=None):
+    """Starts the server in a background thread
+
+    Args:
+        chain (MockChain): chain to serve
+        host (str, optional): listening address. Defaults to "127.0.0.1".
+        port (int, optional): listening port, 0 for any free port. Defaults to 0.
+        block_time (float, optional): seconds between two bakes of the mempool, None to bake only with chain.bake(). Defaults to None.
+
+    Returns:
+        MockServer: the running server, its url is http://host:server.server_port
+    """
+    handler = type("ChainRpcHandler", (RpcHandler,), {"chain": chain})
+    server = MockServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    if block_time:
+        server.baker_stop = threading.Event()
+
+        def bake():
+            while not server.baker_stop.wait(block_time):
+                chain.bake()
+
+        threading.Thread(target=bake, daemon=True).start()
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("dump", help="JSONL chain dump or directory of <level>.json blocks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8732)
+    parser.add_argument("--storage", action="append", default=[], help="address=storage.json")
+    parser.add_argument("--script", action="append", default=[], help="address=script.micheline, the compiled contract")
+    parser.add_argument("--block-time", type=float, default=None, help="seconds between two bakes of the mempool")
+    arguments = parser.parse_args(argv)
+
+    storages = {}
+    for item in arguments.storage:
+        address, path = item.split("=", 1)
+        with open(path) as storage_file:
+            storages[address] = json.load(storage_file)
+    scripts = {}
+    for item in arguments.script:
+        address, path = item.split("=", 1)
+        with open(path) as script_file:
+            scripts[address] = json.load(script_file)
+    server = serve(MockChain(read_blocks(arguments.dump), storages, scripts=scripts), arguments.host, arguments.port, arguments.block_time)
+    print("serving on http://{}:{}".format(arguments.host, server.server_port))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
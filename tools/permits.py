@@ -0,0 +1,282 @@
+"""TZIP-17 permits of AdministrableFA2: signing, packing and a batching relayer.
+
+A holder signs a permit for one transfer item: the packed ((chain_id, contract), (nonce, (expiry, params_hash)))
+where params_hash is the blake2b of the packed item and nonce the next nonce of the holder in the permit_nonces
+big_map. The relayer checks the permits it receives against the same logic as the `permit` entrypoint, and turns the
+pending permits of many holders into one operation group: for every holder, a `permit` call storing its permits
+followed by a `transfer` call consuming them. A holder whose calls fail in simulation is evicted from the group, so one
+bad permit does not hold back the others.
+
+Everything is computed locally, only Ed25519 (edpk) keys can be checked off-chain.
+
+    python -m tools.permits sign edsk... NetXdQprcVkpaWU KT1... 0 2030-01-01T00:00:00Z transfer.json
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import sys
+
+from . import ed25519
+from .base58 import decode_prefixed
+from .micheline import PERMIT, PERMIT_SIGNED, TRANSFER, encode, pack, t
+
+class PermitError(ValueError):
+    """Raised when the relayer refuses a permit, code is the error the contract would fail with"""
+
+    def __init__(self, code, message):
+        super().__init__("{}: {}".format(code, message))
+        self.code = code
+
+MISSIGNED = "MISSIGNED"
+EXPIRED_PERMIT = "EXPIRED_PERMIT"
+
+def params_hash(transfer):
+    """Returns the parameter hash of a transfer item, see Permit.params_hash
+
+    Args:
+        transfer (dict): transfer item with from_ and txs, txs being dicts with to_, token_id and amount
+
+    Returns:
+        bytes: 32 bytes blake2b of the packed item
+    """
+    return hashlib.blake2b(pack(TRANSFER, transfer), digest_size=32).digest()
+
+def signed_bytes(chain_id, contract, nonce, expiry, permit_params_hash):
+    """Returns the bytes signed for a permit, see Permit.get_signed_type
+
+    Args:
+        chain_id (str): Net... chain id
+        contract (str): KT1 address of the token
+        nonce (int): nonce of the signer in the permit_nonces big_map
+        expiry (int or str): expiry, seconds since epoch or RFC 3339 timestamp
+        permit_params_hash (bytes): parameter hash of the transfer item
+
+    Returns:
+        bytes: packed signed payload
+    """
+    return pack(PERMIT_SIGNED, ((chain_id, contract), (nonce, (expiry, permit_params_hash))))
+
+def sign_permit(signing_key, chain_id, contract, nonce, expiry, transfer):
+    """Signs a permit for a transfer item
+
+    Args:
+        signing_key (ed25519.SigningKey): key of the owner of the transfer item
+        chain_id (str): Net... chain id
+        contract (str): KT1 address of the token
+        nonce (int): next nonce of the owner
+        expiry (int): expiry, seconds since epoch
+        transfer (dict): the transfer item
+
+    Returns:
+        dict: signed permit, with the fields of Permit plus nonce and transfer for the relayer
+    """
+    permit_params_hash = params_hash(transfer)
+    signature = signing_key.sign(signed_bytes(chain_id, contract, nonce, expiry, permit_params_hash))
+    return dict(public_key=signing_key.public_key, signature=signature, expiry=expiry, params_hash=permit_params_hash,
+                nonce=nonce, transfer=transfer)
+
+def signer_address(public_key):
+    """Returns the tz1 address of an edpk public key, the address the contract derives with hash_key"""
+    return ed25519.public_key_hash(decode_prefixed("edpk", public_key))
+
+class Relayer:
+    """Collects signed permits and turns them into batched permit and transfer calls
+
+    Permits are queued per owner by nonce. A batch takes, for every owner, the permits following the last
+    confirmed nonce without gap, so that the permit call cannot fail on a nonce. The owners of a batch whose calls
+    fail in simulation are evicted, their permits are moved to failed instead of the queue. Batches are confirmed once
+    included, or released back to the queue when the operation failed.
+
+    Attributes:
+        failed (list): evicted permits, each with the error of its calls
+    """
+
+    def __init__(self, chain_id, contract, nonces=None, expiry_margin=120):
+        """
+        Args:
+            chain_id (str): Net... chain id
+            contract (str): KT1 address of the token
+            nonces (dict, optional): next nonce by owner, as in the permit_nonces big_map. Unknown owners start at 0.
+            expiry_margin (int, optional): seconds a permit must still be valid for when batched, covering the inclusion delay. Defaults to 120.
+        """
+        self.chain_id = chain_id
+        self.contract = contract
+        self.nonces = dict(nonces or {})
+        self.expiry_margin = expiry_margin
+        self.pending = {}
+        self.failed = []
+
+    def submit(self, permit, now):
+        """Checks a signed permit and queues it
+
+        Args:
+            permit (dict): signed permit, see sign_permit
+            now (int): current time, seconds since epoch
+
+        Raises:
+            PermitError: if the permit would fail on-chain
+            ValueError: if the key is not an Ed25519 key
+
+        Returns:
+            str: the owner address
+        """
+        owner = signer_address(permit["public_key"])
+        if permit["transfer"]["from_"] != owner:
+            raise PermitError(MISSIGNED, "permit of {} for a transfer from {}".format(owner, permit["transfer"]["from_"]))
+        if params_hash(permit["transfer"]) != permit["params_hash"]:
+            raise PermitError(MISSIGNED, "params_hash does not match the transfer item")
+        if now + self.expiry_margin > permit["expiry"]:
+            raise PermitError(EXPIRED_PERMIT, "permit expires at {}".format(permit["expiry"]))
+        if permit["nonce"] < self.nonces.get(owner, 0):
+            raise PermitError(MISSIGNED, "nonce {} of {} was already used".format(permit["nonce"], owner))
+        message = signed_bytes(self.chain_id, self.contract, permit["nonce"], permit["expiry"], permit["params_hash"])
+        if not ed25519.verify_encoded(permit["public_key"], message, permit["signature"]):
+            raise PermitError(MISSIGNED, "invalid signature of {}".format(owner))
+        self.pending.setdefault(owner, {})[permit["nonce"]] = permit
+        return owner
+
+    def take_batch(self, now, max_permits=300):
+        """Removes up to max_permits ready permits from the queue, expired ones are dropped
+
+        Args:
+            now (int): current time, seconds since epoch
+            max_permits (int, optional): size limit of the batch, bounded by the operation gas limit. Defaults to 300.
+
+        Returns:
+            list: the permits of the batch, in nonce order per owner
+        """
+        batch = []
+        for owner in list(self.pending):
+            queue = self.pending[owner]
+            nonce = self.nonces.get(owner, 0)
+            while nonce in queue and len(batch) < max_permits:
+                permit = queue.pop(nonce)
+                if now + self.expiry_margin > permit["expiry"]:
+                    # the nonces of the following permits of this owner can no longer be reached
+                    break
+                batch.append(permit)
+                nonce += 1
+            for stale in [stale for stale in queue if stale < nonce]:
+                del queue[stale]
+            if not queue:
+                del self.pending[owner]
+            if len(batch) >= max_permits:
+                break
+        return batch
+
+    def confirm(self, batch):
+        """Records the nonces used by an included batch"""
+        for permit in batch:
+            owner = permit["transfer"]["from_"]
+            self.nonces[owner] = max(self.nonces.get(owner, 0), permit["nonce"] + 1)
+
+    def release(self, batch, failed=()):
+        """Puts the permits of a failed batch back in the queue
+
+        Args:
+            batch (list): permits returned by take_batch
+            failed (iterable, optional): owners whose calls failed, their permits are evicted instead. Defaults to none.
+        """
+        failed = set(failed)
+        batch = self.evict(batch, failed, "operation failed") if failed else batch
+        for permit in batch:
+            self.pending.setdefault(permit["transfer"]["from_"], {})[permit["nonce"]] = permit
+
+    def evict(self, batch, owners, error):
+        """Moves the permits of owners from a batch to failed
+
+        The later permits of an evicted owner stay queued. take_batch reaches them again only once nonces is updated
+        past the evicted nonces.
+
+        Args:
+            batch (list): permits returned by take_batch
+            owners (set): owners to evict
+            error: error of their calls, kept with the failed permits
+
+        Returns:
+            list: the permits of the other owners
+        """
+        kept = []
+        for permit in batch:
+            if permit["transfer"]["from_"] in owners:
+                self.failed.append(dict(permit, error=error))
+            else:
+                kept.append(permit)
+        return kept
+
+    def calls(self, batch):
+        """Returns the parameters of the permit and transfer calls of a batch, to be injected in one operation group
+
+        Every owner gets its own permit call followed by its own transfer call, so that a failing call points at the
+        owner to evict.
+
+        Args:
+            batch (list): permits returned by take_batch
+
+        Returns:
+            list: (owner, entrypoint, Micheline parameter) triples, in batch order of the owners
+        """
+        by_owner = {}
+        for permit in batch:
+            by_owner.setdefault(permit["transfer"]["from_"], []).append(permit)
+        calls = []
+        for owner, permits in by_owner.items():
+            stored = [dict(public_key=permit["public_key"], signature=permit["signature"], expiry=permit["expiry"],
+                           params_hash=permit["params_hash"]) for permit in permits]
+            calls.append((owner, "permit", encode(t("list", PERMIT), stored)))
+            calls.append((owner, "transfer", encode(t("list", TRANSFER), [permit["transfer"] for permit in permits])))
+        return calls
+
+    def simulate(self, batch, run):
+        """Simulates the calls of a batch and evicts the owners whose calls fail, until the group applies
+
+        A failing content fails the whole group, the contents after it are skipped. Each round evicts the owner of the
+        failed content and simulates the rest again, as OperationsClient does for its calls.
+
+        Args:
+            batch (list): permits returned by take_batch
+            run (callable): takes the calls and returns the contents of the run_operation result of their group
+
+        Returns:
+            tuple: (batch, calls) of the owners whose calls apply, both empty when every owner failed
+        """
+        while batch:
+            calls = self.calls(batch)
+            failed = {}
+            for (owner, _, _), content in zip(calls, run(calls)):
+                operation_result = content["metadata"]["operation_result"]
+                if operation_result["status"] == "failed":
+                    failed[owner] = operation_result.get("errors")
+            if not failed:
+                return batch, calls
+            for owner, errors in failed.items():
+                batch = self.evict(batch, {owner}, errors)
+        return [], []
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+    sign_parser = commands.add_parser("sign", help="sign a permit for a transfer item")
+    sign_parser.add_argument("secret_key", help="edsk secret key")
+    sign_parser.add_argument("chain_id")
+    sign_parser.add_argument("contract")
+    sign_parser.add_argument("nonce", type=int)
+    sign_parser.add_argument("expiry", help="RFC 3339 timestamp or seconds since epoch")
+    sign_parser.add_argument("transfer", help="JSON file with the transfer item")
+    arguments = parser.parse_args(argv)
+
+    with open(arguments.transfer) as transfer_file:
+        transfer = json.load(transfer_file)
+    if arguments.expiry.isdigit():
+        expiry = int(arguments.expiry)
+    else:
+        expiry = int(datetime.datetime.fromisoformat(arguments.expiry.replace("Z", "+00:00")).timestamp())
+    permit = sign_permit(ed25519.SigningKey(arguments.secret_key), arguments.chain_id, arguments.contract, arguments.nonce, expiry, transfer)
+    permit["params_hash"] = permit["params_hash"].hex()
+    print(json.dumps(permit, indent=2))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
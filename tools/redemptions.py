@@ -0,0 +1,326 @@
+"""Custodian worker of the redemption queue: follows the queued redemptions, pays their BTC and settles them in batches.
+
+request_redemption locks the tokens of a holder in the queue and emits a redemption event with the BTC address to pay.
+settle_redemptions burns, or refunds, a range of the queue from its head in one call. The worker reads the events
+of the blocks that have enough confirmations, pays every new redemption with a payout callable, and settles the
+paid redemptions in batches. A batch grows while its operation stays under the protocol limits of one operation: gas, with
+the settle_redemptions model of a tools/estimator.py file when one is given or the conservative DEFAULT_COSTS
+otherwise, paid storage and forged size. Settling fewer, larger batches pays the fixed gas and fee of a call once for
+many redemptions, so a batch that does not fill an operation waits for min_batch redemptions, or until its oldest
+redemption is max_wait blocks old.
+
+The BTC side is left to the payout callable, pay(redemption_id, redemption), which returns True once the BTC is sent
+and False to refund the redemption, e.g. for an invalid BTC address. From the command line the payout is an external
+command called with the redemption id, BTC address and amount in satoshis, exiting with 0 once paid and 2 to refund.
+The state file records the queue, and every payout before and after it is made, so a restarted worker never pays a
+redemption twice: a payout interrupted by a crash stops the worker until its state is set to paid or refund by hand.
+
+    python -m tools.redemptions pending chain.jsonl --contract KT1...
+    python -m tools.redemptions run state.json --rpc http://127.0.0.1:8732 --contract KT1... --secret-key edsk... --pay-command ./pay-btc
+"""
+import argparse
+import asyncio
+import inspect
+import json
+import os
+import subprocess
+import sys
+
+from . import ed25519
+from .client import BRANCH_SIZE, SIGNATURE_SIZE, AsyncRpc, OperationsClient, forge_transaction
+from .indexer import iter_events, read_blocks
+from .micheline import ENTRYPOINT_TYPES, binary, encode
+from .migration import HARD_GAS_LIMIT_PER_OPERATION, HARD_STORAGE_LIMIT_PER_OPERATION, MAX_OPERATION_DATA_LENGTH
+
+DEFAULT_COSTS = dict(gas_base=10000, gas_per_redemption=2500, gas_per_refund=1500, storage_per_refund=100)
+"""Cost model used without estimator: gas of the call, gas per settled redemption, gas and storage bytes per refund"""
+
+SENDING = "sending"
+PAID = "paid"
+REFUND = "refund"
+"""Payout states of a redemption, SENDING is recorded before the payout is made"""
+
+PAY_COMMAND_REFUND = 2
+"""Exit status of the payout command asking for a refund"""
+
+class RedemptionQueue:
+    """Redemptions of a contract not settled yet, replayed from its redemption and settle_redemptions events
+
+    Attributes:
+        contract (str): KT1 address of the token
+        level (int): last level read, None before the first block
+        next_settlement_id (int): id of the head of the queue
+        pending (dict): redemption dicts by id, with the level of their request
+    """
+
+    def __init__(self, contract, level=None, next_settlement_id=0, pending=None):
+        self.contract = contract
+        self.level = level
+        self.next_settlement_id = next_settlement_id
+        self.pending = dict(pending or {})
+
+    def apply_block(self, block):
+        """Applies the redemption and settle_redemptions events of a block"""
+        level = block["header"]["level"]
+        for event in iter_events(block, self.contract):
+            if event["tag"] == "redemption":
+                self.pending[event["payload"]["redemption_id"]] = dict(event["payload"]["redemption"], level=level)
+            elif event["tag"] == "settle_redemptions":
+                settlement = event["payload"]
+                for redemption_id in range(settlement["first_redemption_id"], settlement["first_redemption_id"] + settlement["count"]):
+                    self.pending.pop(redemption_id, None)
+                self.next_settlement_id = settlement["first_redemption_id"] + settlement["count"]
+        self.level = level
+
+    def head(self):
+        """Returns the pending (id, redemption) pairs from the head of the queue, in settlement order"""
+        return [(redemption_id, self.pending[redemption_id]) for redemption_id in sorted(self.pending)]
+
+    def to_json(self):
+        return dict(contract=self.contract, level=self.level, next_settlement_id=self.next_settlement_id,
+                    pending={str(redemption_id): redemption for redemption_id, redemption in self.pending.items()})
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data["contract"], data["level"], data["next_settlement_id"],
+                   {int(redemption_id): redemption for redemption_id, redemption in data["pending"].items()})
+
+def _call_overhead(contract):
+    """Forged size of a settle_redemptions operation with no refund, fee, counter, limits, head and count at their largest encodings"""
+    content = {"source": "tz1KqTpEZ7Yob7QbPE4Hy4Wo8fHG8LhKxZSx", "fee": str(2 ** 35), "counter": str(2 ** 42),
+               "gas_limit": str(HARD_GAS_LIMIT_PER_OPERATION), "storage_limit": str(HARD_STORAGE_LIMIT_PER_OPERATION), "amount": "0",
+               "destination": contract, "parameters": {"entrypoint": "settle_redemptions",
+                                                       "value": encode(ENTRYPOINT_TYPES["settle_redemptions"], dict(first_redemption_id=2 ** 32, count=2 ** 32, refunds=[]))}}
+    return len(forge_transaction(content)) + BRANCH_SIZE + SIGNATURE_SIZE
+
+def settle_costs(count, refunds, estimator=None, costs=None):
+    """Returns the gas and storage limits of a settlement of count redemptions, refunds of them refunded"""
+    if estimator is not None:
+        return estimator.models["settle_redemptions"].limits(dict(items=count, refunds=refunds))
+    costs = dict(DEFAULT_COSTS, **(costs or {}))
+    return (costs["gas_base"] + costs["gas_per_redemption"] * count + costs["gas_per_refund"] * refunds,
+            costs["storage_per_refund"] * refunds)
+
+def plan_batches(queue, refunds=(), estimator=None, costs=None, max_batch=None,
+                 max_gas=HARD_GAS_LIMIT_PER_OPERATION, max_storage=HARD_STORAGE_LIMIT_PER_OPERATION, max_size=MAX_OPERATION_DATA_LENGTH):
+    """Splits the pending redemptions into settle_redemptions batches, each as large as one operation holds
+
+    Args:
+        queue (RedemptionQueue): the queue
+        refunds (iterable, optional): ids of the redemptions to refund. Defaults to ().
+        estimator (tools.estimator.Estimator, optional): gas and storage models, with a settle_redemptions model. Defaults to DEFAULT_COSTS.
+        costs (dict, optional): overrides of DEFAULT_COSTS. Defaults to None.
+        max_batch (int, optional): largest number of redemptions per batch. Defaults to None, no limit.
+        max_gas (int, optional): gas limit of one operation. Defaults to HARD_GAS_LIMIT_PER_OPERATION.
+        max_storage (int, optional): storage limit of one operation. Defaults to HARD_STORAGE_LIMIT_PER_OPERATION.
+        max_size (int, optional): forged size limit of one operation. Defaults to MAX_OPERATION_DATA_LENGTH.
+
+    Raises:
+        ValueError: if a single redemption does not fit in an operation
+
+    Returns:
+        list: batches in settlement order, dicts of first_redemption_id, count, refunds, gas_limit, storage_limit and size
+    """
+    refunds = set(refunds)
+    overhead = _call_overhead(queue.contract)
+    batches = []
+    first, count, batch_refunds, size = queue.next_settlement_id, 0, [], overhead
+
+    def close():
+        gas_limit, storage_limit = settle_costs(count, len(batch_refunds), estimator, costs)
+        batches.append(dict(first_redemption_id=first, count=count, refunds=batch_refunds, gas_limit=gas_limit,
+                            storage_limit=storage_limit, size=size))
+
+    for redemption_id, _ in queue.head():
+        refund = redemption_id in refunds
+        item_size = len(binary({"int": str(redemption_id)})) if refund else 0
+        gas_limit, storage_limit = settle_costs(count + 1, len(batch_refunds) + refund, estimator, costs)
+        if count and (size + item_size > max_size or gas_limit > max_gas or storage_limit > max_storage or count == max_batch):
+            close()
+            first, count, batch_refunds, size = redemption_id, 0, [], overhead
+            gas_limit, storage_limit = settle_costs(1, int(refund), estimator, costs)
+        if overhead + item_size > max_size or gas_limit > max_gas or storage_limit > max_storage:
+            raise ValueError("redemption {} does not fit in one operation".format(redemption_id))
+        count += 1
+        size += item_size
+        if refund:
+            batch_refunds.append(redemption_id)
+    if count:
+        close()
+    return batches
+
+def load_state(path, contract, level):
+    """Reads the state file of the worker, or starts an empty queue after level when there is none"""
+    if not os.path.exists(path):
+        return dict(queue=RedemptionQueue(contract, level).to_json(), payouts={}, settlements=[])
+    with open(path) as state_file:
+        return json.load(state_file)
+
+def save_state(state, path):
+    """Writes the state atomically, a crash leaves either the previous or the new state"""
+    temporary = path + ".tmp"
+    with open(temporary, "w") as state_file:
+        json.dump(state, state_file, indent=2)
+        state_file.write("\n")
+    os.replace(temporary, path)
+
+async def sync(queue, rpc, confirmations=2):
+    """Reads the blocks with enough confirmations into the queue, from the level after queue.level
+
+    Returns:
+        int: the head level
+    """
+    head_level = (await rpc.get("/chains/main/blocks/head/header"))["level"]
+    while queue.level < head_level - confirmations + 1:
+        queue.apply_block(await rpc.get("/chains/main/blocks/{}".format(queue.level + 1)))
+    return head_level
+
+async def pay_pending(queue, state, path, pay):
+    """Pays every pending redemption that was not paid yet, in queue order, recording each payout in the state file
+
+    Args:
+        queue (RedemptionQueue): the queue
+        state (dict): worker state, its payouts are updated in place
+        path (str): state file
+        pay (callable): see settle
+
+    Raises:
+        RuntimeError: if a payout of a previous run was interrupted, its BTC may or may not have been sent
+    """
+    payouts = state["payouts"]
+    for redemption_id, redemption in queue.head():
+        key = str(redemption_id)
+        if payouts.get(key) == SENDING:
+            raise RuntimeError("the payout of redemption {} was interrupted, set its state to {} or {} in {}".format(redemption_id, PAID, REFUND, path))
+        if key in payouts:
+            continue
+        payouts[key] = SENDING
+        save_state(state, path)
+        paid = pay(redemption_id, redemption)
+        if inspect.isawaitable(paid):
+            paid = await paid
+        payouts[key] = PAID if paid else REFUND
+        save_state(state, path)
+
+async def settle(state, path, rpc, signing_keys, pay, confirmations=2, min_batch=1, max_wait=None, estimator=None, **options):
+    """Reads the new blocks, pays the new redemptions, then settles the batches of the queue that are ready, one operation per batch
+
+    Every batch names the head of the queue it settles, so a batch that was already applied fails instead of settling
+    redemptions that are not paid.
+
+    Args:
+        state (dict): worker state, updated in place
+        path (str): state file, rewritten after every payout and settlement
+        rpc (AsyncRpc): node connection pool
+        signing_keys (list): ed25519.SigningKey of administrators of the queued token ids
+        pay (callable): pay(redemption_id, redemption), True once paid, False to refund, may be a coroutine function
+        confirmations (int, optional): blocks before a request is read and a settlement is confirmed. Defaults to 2.
+        min_batch (int, optional): a batch that does not fill an operation waits for this many redemptions. Defaults to 1.
+        max_wait (int, optional): blocks after which the oldest redemption is settled whatever the batch size. Defaults to None, no limit.
+        estimator (tools.estimator.Estimator, optional): see plan_batches. Defaults to DEFAULT_COSTS.
+        **options: plan_batches limits and OperationsClient options
+
+    Raises:
+        tools.client.OperationError: if a settlement fails, the batches after it are not sent
+
+    Returns:
+        int: number of redemptions settled
+    """
+    limits = {name: options.pop(name) for name in ("costs", "max_batch", "max_gas", "max_storage", "max_size") if name in options}
+    queue = RedemptionQueue.from_json(state["queue"])
+    head_level = await sync(queue, rpc, confirmations)
+    state["payouts"] = {key: payout for key, payout in state["payouts"].items() if int(key) in queue.pending}
+    state["queue"] = queue.to_json()
+    save_state(state, path)
+    await pay_pending(queue, state, path, pay)
+
+    refunds = [int(key) for key, payout in state["payouts"].items() if payout == REFUND]
+    batches = plan_batches(queue, refunds, estimator, **limits)
+    if batches and batches[-1]["count"] < min_batch:
+        oldest = queue.pending[batches[-1]["first_redemption_id"]]["level"]
+        if max_wait is None or head_level - oldest < max_wait:
+            batches.pop()
+    settled = 0
+    options = dict(options, max_calls_per_group=1, confirmations=confirmations)
+    async with OperationsClient(rpc, queue.contract, signing_keys, **options) as client:
+        for batch in batches:
+            receipt = await client.settle_redemptions(batch["first_redemption_id"], batch["count"], batch["refunds"]).confirmed
+            # the settlement is confirmed, the queue moves past it before its event is read
+            for redemption_id in range(batch["first_redemption_id"], batch["first_redemption_id"] + batch["count"]):
+                del queue.pending[redemption_id]
+                del state["payouts"][str(redemption_id)]
+            queue.next_settlement_id = batch["first_redemption_id"] + batch["count"]
+            state["queue"] = queue.to_json()
+            state["settlements"].append(dict(first_redemption_id=batch["first_redemption_id"], count=batch["count"],
+                                             refunds=batch["refunds"], operation=receipt["operation"]))
+            save_state(state, path)
+            settled += batch["count"]
+    return settled
+
+def pay_command(command):
+    """Returns a payout callable running command with the redemption id, BTC address and amount, see the module documentation"""
+    def pay(redemption_id, redemption):
+        status = subprocess.call(command + [str(redemption_id), redemption["btc_address"], str(redemption["amount"])])
+        if status not in (0, PAY_COMMAND_REFUND):
+            raise RuntimeError("{} failed with status {} for redemption {}".format(" ".join(command), status, redemption_id))
+        return status == 0
+    return pay
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+    pending_parser = commands.add_parser("pending", help="print the batches of the redemptions pending at the end of a chain dump")
+    pending_parser.add_argument("dump")
+    pending_parser.add_argument("--contract", required=True)
+    pending_parser.add_argument("--estimator", help="tools.estimator models with a settle_redemptions model")
+    run_parser = commands.add_parser("run", help="pay and settle the queue, following a node")
+    run_parser.add_argument("state", help="path of the state file")
+    run_parser.add_argument("--rpc", required=True)
+    run_parser.add_argument("--contract", required=True)
+    run_parser.add_argument("--secret-key", action="append", required=True, help="edsk key of an administrator, repeat for more accounts")
+    run_parser.add_argument("--pay-command", required=True, help="payout command, called with the redemption id, BTC address and amount")
+    run_parser.add_argument("--from-level", type=int, default=None, help="level of the contract origination, on the first run")
+    run_parser.add_argument("--estimator", help="tools.estimator models with a settle_redemptions model")
+    run_parser.add_argument("--confirmations", type=int, default=2)
+    run_parser.add_argument("--min-batch", type=int, default=1)
+    run_parser.add_argument("--max-wait", type=int, default=None, help="blocks")
+    run_parser.add_argument("--poll-interval", type=float, default=None, help="seconds between two passes, a single pass without it")
+    arguments = parser.parse_args(argv)
+
+    estimator = None
+    if arguments.estimator:
+        from .estimator import Estimator
+        estimator = Estimator.load(arguments.estimator)
+
+    if arguments.command == "pending":
+        queue = RedemptionQueue(arguments.contract)
+        for block in read_blocks(arguments.dump):
+            queue.apply_block(block)
+        for batch in plan_batches(queue, estimator=estimator):
+            print(json.dumps(batch))
+        return 0
+
+    if arguments.from_level is None and not os.path.exists(arguments.state):
+        parser.error("--from-level is required on the first run")
+    state = load_state(arguments.state, arguments.contract, None if arguments.from_level is None else arguments.from_level - 1)
+    pay = pay_command(arguments.pay_command.split())
+
+    async def work():
+        rpc = AsyncRpc(arguments.rpc)
+        try:
+            while True:
+                settled = await settle(state, arguments.state, rpc, [ed25519.SigningKey(secret_key) for secret_key in arguments.secret_key], pay,
+                                       arguments.confirmations, arguments.min_batch, arguments.max_wait, estimator)
+                print(json.dumps(dict(level=state["queue"]["level"], settled=settled, pending=len(state["queue"]["pending"]))))
+                if arguments.poll_interval is None:
+                    return
+                await asyncio.sleep(arguments.poll_interval)
+        finally:
+            await rpc.close()
+
+    asyncio.run(work())
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
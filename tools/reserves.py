@@ -0,0 +1,308 @@
+"""Proof of reserves reconciliation of BTCtz ledger snapshots.
+
+A snapshot is the ledger of one token at one level, held as two parallel arrays: owner indices into an
+AddressTable shared by every snapshot, and balances. Snapshots are read from the current state of a tools/indexer.py
+store, or taken at chosen levels while a chain dump is replayed in memory. The ledger sum, the holder count, the
+top holders and the changes between consecutive snapshots are computed in whole array passes, with NumPy when it is
+installed and with plain Python loops, slower but giving the same results, otherwise.
+
+Every snapshot is checked against the total_supply of the token at the same level and, when reserve figures are
+supplied as a `level,amount` CSV file, against the last reserve figure published at or below its level:
+
+    python -m tools.reserves check btctz.sqlite --reserve 2100000000
+    python -m tools.reserves history chain.jsonl --big-map ledger=12 --big-map total_supply=14 --every 1000 --reserves reserves.csv
+
+Each snapshot is printed as a JSON line, and the exit status is 1 when a snapshot does not reconcile.
+"""
+import argparse
+import csv
+import heapq
+import json
+import sys
+
+from .indexer import LedgerIndex, iter_big_map_updates, parse_big_maps, read_blocks
+from .micheline import BIG_MAP_KEY_TYPES, BIG_MAP_VALUE_TYPES, decode
+
+try:
+    import numpy
+except ImportError:  # the pure Python passes below give the same results
+    numpy = None
+
+INT64_MAX = 2 ** 63 - 1
+
+class AddressTable:
+    """Interns addresses as consecutive integers, so snapshots hold integer arrays and compare owners by index"""
+
+    def __init__(self):
+        self.addresses = []
+        self.indices = {}
+
+    def index(self, address):
+        position = self.indices.get(address)
+        if position is None:
+            position = self.indices[address] = len(self.addresses)
+            self.addresses.append(address)
+        return position
+
+    def __len__(self):
+        return len(self.addresses)
+
+def _array(values, count):
+    """Array of the integers of a re-iterable collection, int64 when every value fits in it, Python integers otherwise"""
+    if numpy is None:
+        return list(values)
+    try:
+        return numpy.fromiter(values, dtype=numpy.int64, count=count)
+    except OverflowError:
+        return numpy.array(list(values), dtype=object)
+
+def _sum(values):
+    """Exact sum: an int64 sum is used only when it cannot overflow"""
+    if numpy is None:
+        return sum(values)
+    if len(values) and values.dtype == numpy.int64 and int(numpy.abs(values).max()) <= INT64_MAX // len(values):
+        return int(values.sum())
+    return sum(int(value) for value in values.tolist())
+
+def _count_positive(values):
+    if numpy is None:
+        return sum(1 for value in values if value > 0)
+    return int(numpy.count_nonzero(values > 0))
+
+class Snapshot:
+    """Ledger of one token at one level"""
+
+    def __init__(self, table, level, owners, balances, total_supply):
+        """
+        Args:
+            table (AddressTable): owner addresses
+            level (int): block level, None for an undated snapshot
+            owners (array): owner indices in table
+            balances (array): balances, parallel to owners
+            total_supply (int): total_supply of the token at the same level
+        """
+        self.table = table
+        self.level = level
+        self.owners = owners
+        self.balances = balances
+        self.total_supply = total_supply
+
+    @classmethod
+    def from_balances(cls, table, level, balances, total_supply):
+        """Builds a snapshot from a dict of balance by owner index"""
+        return cls(table, level, _array(balances.keys(), len(balances)), _array(balances.values(), len(balances)), total_supply)
+
+    @classmethod
+    def from_index(cls, table, index, token_id=0):
+        """Snapshot of the current state of a LedgerIndex store"""
+        balances = {table.index(owner): balance for owner, balance in index.holders(token_id)}
+        return cls.from_balances(table, index.checkpoint()[0], balances, index.total_supply(token_id))
+
+    def ledger_total(self):
+        return _sum(self.balances)
+
+    def holders(self):
+        """Number of owners with a positive balance"""
+        return _count_positive(self.balances)
+
+    def top(self, count=10):
+        """Returns the (address, balance) pairs of the count largest balances, largest first.
+        Equal balances are ordered by owner index, the owner first seen by the AddressTable comes first, so both passes
+        pick and order the same holders when a tie straddles the cut"""
+        count = min(count, len(self.balances))
+        if count <= 0:
+            return []
+        if numpy is None:
+            pairs = heapq.nsmallest(count, zip(self.balances, self.owners), key=lambda pair: (-pair[0], pair[1]))
+        else:
+            cut = self.balances[numpy.argpartition(self.balances, len(self.balances) - count)[len(self.balances) - count]]
+            ties = numpy.flatnonzero(self.balances == cut)
+            ties = ties[numpy.argsort(self.owners[ties], kind="stable")]
+            above = numpy.flatnonzero(self.balances > cut)
+            positions = numpy.concatenate((above, ties[:count - len(above)]))
+            pairs = sorted(zip(self.balances[positions].tolist(), self.owners[positions].tolist()), key=lambda pair: (-pair[0], pair[1]))
+        return [(self.table.addresses[owner], int(balance)) for balance, owner in pairs]
+
+class Delta:
+    """Balances that changed between two snapshots"""
+
+    def __init__(self, table, owners, before, after):
+        self.table = table
+        self.owners = owners
+        self.before = before
+        self.after = after
+
+    def summary(self):
+        """Returns the number of changed balances, the net change of the ledger and the holders gained and lost"""
+        if numpy is None:
+            gained = sum(1 for old, new in zip(self.before, self.after) if old <= 0 < new)
+            lost = sum(1 for old, new in zip(self.before, self.after) if new <= 0 < old)
+        else:
+            gained = int(numpy.count_nonzero((self.before <= 0) & (self.after > 0)))
+            lost = int(numpy.count_nonzero((self.before > 0) & (self.after <= 0)))
+        return dict(changed=len(self.owners), net=_sum(self.after) - _sum(self.before), gained_holders=gained, lost_holders=lost)
+
+    def changes(self):
+        """Yields (address, before, after) for every changed balance"""
+        for owner, old, new in zip(self.owners, self.before, self.after):
+            yield self.table.addresses[int(owner)], int(old), int(new)
+
+def delta(old, new):
+    """Compares two snapshots of the same AddressTable
+
+    Args:
+        old (Snapshot): earlier snapshot
+        new (Snapshot): later snapshot
+
+    Returns:
+        Delta: the owners whose balance differs, an absent owner counting as a zero balance
+    """
+    if numpy is None:
+        before = dict(zip(old.owners, old.balances))
+        after = dict(zip(new.owners, new.balances))
+        owners = sorted(owner for owner in set(before) | set(after) if before.get(owner, 0) != after.get(owner, 0))
+        return Delta(new.table, owners, [before.get(owner, 0) for owner in owners], [after.get(owner, 0) for owner in owners])
+    # owner indices are dense, so scattering both snapshots over the whole table aligns them without sorting
+    dtype = numpy.result_type(old.balances, new.balances)
+    before = numpy.zeros(len(new.table), dtype=dtype)
+    after = numpy.zeros(len(new.table), dtype=dtype)
+    before[old.owners] = old.balances
+    after[new.owners] = new.balances
+    owners = numpy.flatnonzero(before != after)
+    return Delta(new.table, owners, before[owners], after[owners])
+
+def replay_snapshots(blocks, big_maps, levels=(), every=None, token_id=0, table=None):
+    """Replays the ledger and total_supply diffs of a chain dump in memory, taking snapshots on the way
+
+    A snapshot of a level is the state once the block of that level is applied. The state after the last block is
+    always taken, the dump may end before some of the requested levels.
+
+    Args:
+        blocks (iterable): blocks in level order, see tools.indexer.read_blocks
+        big_maps (dict): big_map id of the ledger and total_supply storage fields
+        levels (iterable, optional): levels to take a snapshot at. Defaults to ().
+        every (int, optional): also take a snapshot at every multiple of this level. Defaults to None.
+        token_id (int, optional): token to reconcile. Defaults to 0.
+        table (AddressTable, optional): owner addresses. Defaults to a new table.
+
+    Yields:
+        Snapshot: snapshots in level order
+    """
+    table = table or AddressTable()
+    levels = set(levels)
+    names = {big_map_id: name for name, big_map_id in big_maps.items() if name in ("ledger", "total_supply")}
+    balances, total_supply, level, taken = {}, 0, None, None
+    for block in blocks:
+        level = block["header"]["level"]
+        for big_map_id, update in iter_big_map_updates(block):
+            name = names.get(big_map_id)
+            if name is None:
+                continue
+            key = decode(BIG_MAP_KEY_TYPES[name], update["key"])
+            value = None if update.get("value") is None else decode(BIG_MAP_VALUE_TYPES[name], update["value"])
+            if name == "total_supply":
+                if key == token_id:
+                    total_supply = value or 0
+            elif key["token_id"] == token_id:
+                owner = table.index(key["owner"])
+                if value is None:
+                    balances.pop(owner, None)
+                else:
+                    balances[owner] = value
+        if level in levels or (every and level % every == 0):
+            taken = level
+            yield Snapshot.from_balances(table, level, balances, total_supply)
+    if level is not None and taken != level:
+        yield Snapshot.from_balances(table, level, balances, total_supply)
+
+def read_reserves(path):
+    """Reads level,amount lines of published reserve figures
+
+    Returns:
+        list: (level, amount) pairs in level order
+    """
+    with open(path, newline="") as reserves_file:
+        return sorted((int(row[0]), int(row[1])) for row in csv.reader(reserves_file) if row and not row[0].startswith("#"))
+
+def reserve_at(reserves, level):
+    """Returns the last reserve figure published at or below level, None if there is none"""
+    amount = None
+    for reserve_level, reserve_amount in reserves:
+        if level is not None and reserve_level > level:
+            break
+        amount = reserve_amount
+    return amount
+
+def reconcile(snapshots, reserves=(), top=10, tolerance=0):
+    """Reconciles snapshots with their total_supply and with the reserve figures
+
+    Args:
+        snapshots (iterable): Snapshots in level order
+        reserves (list, optional): (level, amount) reserve figures in level order. Defaults to ().
+        top (int, optional): number of largest holders reported. Defaults to 10.
+        tolerance (int, optional): largest accepted difference between the reserve and the total supply. Defaults to 0.
+
+    Yields:
+        dict: report of each snapshot, with level, holders, ledger_total, total_supply, reserve, top, the changes
+            since the previous snapshot, and mismatches, empty when the snapshot reconciles
+    """
+    previous = None
+    for snapshot in snapshots:
+        ledger_total = snapshot.ledger_total()
+        reserve = reserve_at(reserves, snapshot.level) if reserves else None
+        mismatches = []
+        if ledger_total != snapshot.total_supply:
+            mismatches.append(dict(check="total_supply", expected=snapshot.total_supply, found=ledger_total))
+        if reserve is not None and abs(reserve - snapshot.total_supply) > tolerance:
+            mismatches.append(dict(check="reserve", expected=reserve, found=snapshot.total_supply))
+        yield dict(
+            level=snapshot.level,
+            holders=snapshot.holders(),
+            ledger_total=ledger_total,
+            total_supply=snapshot.total_supply,
+            reserve=reserve,
+            top=snapshot.top(top),
+            changes=delta(previous, snapshot).summary() if previous is not None else None,
+            mismatches=mismatches,
+        )
+        previous = snapshot
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+    check_parser = commands.add_parser("check", help="reconcile the current state of an indexer store")
+    check_parser.add_argument("database")
+    check_parser.add_argument("--reserve", type=int, help="custody reserve, in the smallest unit of the token")
+    history_parser = commands.add_parser("history", help="reconcile snapshots taken while replaying a chain dump")
+    history_parser.add_argument("blocks", help="JSONL file or directory of <level>.json files")
+    history_parser.add_argument("--big-map", action="append", default=[], help="name=id of ledger and total_supply, e.g. ledger=12")
+    history_parser.add_argument("--level", type=int, action="append", default=[], help="level to take a snapshot at, repeat for more levels")
+    history_parser.add_argument("--every", type=int, help="take a snapshot at every multiple of this level")
+    history_parser.add_argument("--reserves", help="CSV file of level,amount reserve figures")
+    for command_parser in (check_parser, history_parser):
+        command_parser.add_argument("--token-id", type=int, default=0)
+        command_parser.add_argument("--top", type=int, default=10, help="number of largest holders reported")
+        command_parser.add_argument("--tolerance", type=int, default=0, help="accepted difference between reserve and supply")
+    arguments = parser.parse_args(argv)
+
+    if arguments.command == "check":
+        index = LedgerIndex(arguments.database)
+        snapshots = [Snapshot.from_index(AddressTable(), index, arguments.token_id)]
+        index.close()
+        reserves = [(0, arguments.reserve)] if arguments.reserve is not None else ()
+    else:
+        big_maps = parse_big_maps(arguments.big_map)
+        if "ledger" not in big_maps:
+            parser.error("history needs --big-map ledger=<id>")
+        snapshots = replay_snapshots(read_blocks(arguments.blocks), big_maps, arguments.level, arguments.every, arguments.token_id)
+        reserves = read_reserves(arguments.reserves) if arguments.reserves else ()
+
+    reconciled = True
+    for report in reconcile(snapshots, reserves, arguments.top, arguments.tolerance):
+        print(json.dumps(report))
+        reconciled = reconciled and not report["mismatches"]
+    return 0 if reconciled else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
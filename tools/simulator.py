@@ -0,0 +1,652 @@
+"""Pure-Python reference model of AdministrableFA2, for replaying large operation streams without the SmartPy interpreter.
+
+Every entrypoint follows the contract in contracts/btctz.py check for check and fails with the same FA2ErrorMessage
+codes. A failing call leaves the storage untouched, as a failing operation would. The shared test vectors in
+contracts/fa2_test_vectors.json are run both by the `FA2 Shared Test Vectors` SmartPy test and by check_vectors:
+
+    python -m tools.simulator check contracts/fa2_test_vectors.json
+    python -m tools.simulator replay operations.jsonl
+"""
+import argparse
+import bisect
+import json
+import sys
+import time
+
+from . import ed25519
+from .permits import params_hash, signed_bytes, signer_address
+
+class FA2ErrorMessage:
+    """Mirror of FA2ErrorMessage in contracts/btctz.py"""
+    PREFIX = "FA2_"
+    TOKEN_UNDEFINED = "{}TOKEN_UNDEFINED".format(PREFIX)
+    INSUFFICIENT_BALANCE = "{}INSUFFICIENT_BALANCE".format(PREFIX)
+    NOT_OWNER = "{}NOT_OWNER".format(PREFIX)
+    NOT_OPERATOR = "{}NOT_OPERATOR".format(PREFIX)
+    NOT_ADMIN = "{}NOT_ADMIN".format(PREFIX)
+    TOKEN_PAUSED = "{}TOKEN_PAUSED".format(PREFIX)
+    TOKEN_NOT_PAUSABLE = "{}TOKEN_NOT_PAUSABLE".format(PREFIX)
+    REDEMPTION_UNDEFINED = "{}REDEMPTION_UNDEFINED".format(PREFIX)
+    INVALID_AMOUNT = "{}INVALID_AMOUNT".format(PREFIX)
+    ESCROW_BALANCE = "{}ESCROW_BALANCE".format(PREFIX)
+    MISSIGNED = "MISSIGNED"
+    EXPIRED_PERMIT = "EXPIRED_PERMIT"
+    COMPACT_CODES = {NOT_ADMIN: 1, TOKEN_PAUSED: 2, TOKEN_NOT_PAUSABLE: 3, REDEMPTION_UNDEFINED: 4, INVALID_AMOUNT: 5, ESCROW_BALANCE: 6}
+
+class FA2Error(Exception):
+    """Failure of an entrypoint call
+
+    Attributes:
+        code (str): the FA2ErrorMessage code, None where the contract fails without message (sp.as_nat on a negative value, missing big_map key)
+    """
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+_intern = sys.intern
+
+PAUSABLE_TOKEN_IDS = 256
+"""Mirror of AdministrableFA2.PAUSABLE_TOKEN_IDS, token ids with a bit in the pause bitset"""
+
+class FA2Simulator:
+    """Storage and entrypoints of AdministrableFA2
+
+    ledger, total_supply, pause, token_metadata and redemptions are dicts, operators, all_tokens_operators and administrators are
+    sets. Addresses are interned so that the (owner, token_id), (owner, operator, token_id) and (owner, operator) tuple
+    keys hash and compare cheaply.
+    now, chain_id and address stand for sp.now, sp.chain_id and sp.self_address, they are only read by permits.
+    level stands for sp.level, it is only read by the checkpoints of a model built with checkpoints, which holds the (level, balance)
+    checkpoints of every ledger key as a list in level order, or None otherwise.
+    events holds the (tag, payload) contract events emitted by the last call, see Event in contracts/btctz.py.
+    """
+    __slots__ = ("ledger", "operators", "all_tokens_operators", "total_supply", "token_metadata", "pause", "administrators", "metadata",
+                 "permits", "permit_nonces", "redemptions", "next_redemption_id", "next_settlement_id", "checkpoints", "now", "level",
+                 "chain_id", "address", "events", "entrypoints", "views")
+
+    def __init__(self, administrators=(), metadata=None, chain_id="NetXdQprcVkpaWU", address="KT1RJ6PbjHpwc3M5rw5s2Nbmefwbuwbdxton",
+                 checkpoints=False):
+        """Creates the initial storage
+
+        Args:
+            administrators (iterable, optional): (address, token_id) pairs of the initial administrators. Defaults to ().
+            metadata (dict, optional): contract metadata big_map. Defaults to {}.
+            chain_id (str, optional): chain id signed by permits. Defaults to the mainnet chain id.
+            address (str, optional): contract address signed by permits. Defaults to the first address originated in the mockup.
+            checkpoints (bool, optional): model a contract built with checkpoints, with the balance_at view. Defaults to False.
+        """
+        self.ledger = {}
+        self.operators = set()
+        self.all_tokens_operators = set()
+        self.total_supply = {}
+        self.token_metadata = {}
+        self.pause = {}
+        self.administrators = {(_intern(address), token_id) for address, token_id in administrators}
+        self.metadata = dict(metadata or {})
+        self.permits = {}
+        self.permit_nonces = {}
+        self.redemptions = {}
+        self.next_redemption_id = 0
+        self.next_settlement_id = 0
+        self.checkpoints = {} if checkpoints else None
+        self.now = 0
+        self.level = 0
+        self.chain_id = chain_id
+        self.address = address
+        self.events = []
+        self.entrypoints = {
+            "transfer": self.transfer,
+            "update_operators": self.update_operators,
+            "update_operators_bulk": self.update_operators_bulk,
+            "balance_of": self.balance_of,
+            "set_administrator": self.set_administrator,
+            "remove_administrator": self.remove_administrator,
+            "execute": self.execute,
+            "set_token_metadata": self.set_token_metadata,
+            "mint": self.mint,
+            "burn": self.burn,
+            "mint_batch": self.mint_batch,
+            "burn_batch": self.burn_batch,
+            "import_balances": self.import_balances,
+            "pause_token": self.pause_token,
+            "pause_tokens": self.pause_tokens,
+            "request_redemption": self.request_redemption,
+            "settle_redemptions": self.settle_redemptions,
+            "permit": self.permit,
+        }
+        self.views = {
+            "get_balance": self.get_balance,
+            "get_balances": self.get_balances,
+            "total_supply": self.get_total_supply,
+            "is_operator": self.is_operator,
+            "is_paused": self.is_paused,
+            "all_tokens": self.all_tokens,
+        }
+        if checkpoints:
+            self.views["balance_at"] = self.balance_at
+
+    def apply(self, sender, entrypoint, params):
+        """Calls an entrypoint by name
+
+        Args:
+            sender (str): sp.sender of the call
+            entrypoint (str): entrypoint name
+            params: entrypoint parameter, with the field names of the SmartPy records
+
+        Raises:
+            FA2Error: if the call fails
+
+        Returns:
+            the entrypoint result, only balance_of and execute return something
+        """
+        self.events = []
+        return self.entrypoints[entrypoint](_intern(sender), params)
+
+    def view(self, name, params):
+        """Calls an on-chain view by name
+
+        Args:
+            name (str): view name
+            params: view parameter, with the field names of the SmartPy records
+
+        Raises:
+            FA2Error: if the view fails
+
+        Returns:
+            the view result
+        """
+        return self.views[name](params)
+
+    def get_balance(self, ledger_key):
+        if ledger_key["token_id"] not in self.token_metadata:
+            raise FA2Error(FA2ErrorMessage.TOKEN_UNDEFINED)
+        return self.ledger.get((_intern(ledger_key["owner"]), ledger_key["token_id"]), 0)
+
+    def get_balances(self, requests):
+        """Returns the balances as list of (request, balance), in the order of the requests"""
+        return [(request, self.get_balance(request)) for request in requests]
+
+    def get_total_supply(self, token_id):
+        if token_id not in self.token_metadata:
+            raise FA2Error(FA2ErrorMessage.TOKEN_UNDEFINED)
+        return self.total_supply[token_id]
+
+    def is_operator(self, operator_key):
+        owner, operator = _intern(operator_key["owner"]), _intern(operator_key["operator"])
+        return (owner, operator, operator_key["token_id"]) in self.operators or (owner, operator) in self.all_tokens_operators
+
+    def is_paused(self, token_id):
+        return self.pause.get(token_id, False)
+
+    def balance_at(self, request):
+        """Returns the balance at the end of a level, the last checkpoint at or before it"""
+        if request["token_id"] not in self.token_metadata:
+            raise FA2Error(FA2ErrorMessage.TOKEN_UNDEFINED)
+        checkpoints = self.checkpoints.get((_intern(request["owner"]), request["token_id"]), [])
+        index = bisect.bisect_right(checkpoints, (request["level"], float("inf")))
+        return checkpoints[index - 1][1] if index else 0
+
+    def all_tokens(self, params=None):
+        """Off-chain view without parameter, params is ignored"""
+        return sorted(self.token_metadata)
+
+    def verify_is_admin(self, sender, token_id):
+        if (sender, token_id) not in self.administrators:
+            raise FA2Error(FA2ErrorMessage.NOT_ADMIN)
+
+    def flush_balances(self, balances):
+        """Writes the call-local balance cache to the ledger, see flush_balances in the contract"""
+        ledger = self.ledger
+        for ledger_key, (initial, balance) in balances.items():
+            if balance != initial:
+                if balance == 0:
+                    ledger.pop(ledger_key, None)
+                else:
+                    ledger[ledger_key] = balance
+                if self.checkpoints is not None:
+                    self.write_checkpoint(ledger_key, balance)
+
+    def write_checkpoint(self, ledger_key, balance):
+        """Records the balance of a ledger key at the current level, a checkpoint already at this level is overwritten"""
+        checkpoints = self.checkpoints.setdefault(ledger_key, [])
+        if checkpoints and checkpoints[-1][0] == self.level:
+            checkpoints[-1] = (self.level, balance)
+        else:
+            checkpoints.append((self.level, balance))
+
+    def transfer(self, sender, transfers):
+        ledger_get = self.ledger.get
+        operators = self.operators
+        all_tokens_operators = self.all_tokens_operators
+        authorized = set()
+        authorized_owners = set()
+        balances = {}
+        consumed_permits = set()
+        for transfer in transfers:
+            from_ = _intern(transfer["from_"])
+            permitted = False
+            for tx in transfer["txs"]:
+                token_id = tx["token_id"]
+                amount = tx["amount"]
+                from_key = (from_, token_id)
+                is_authorized = from_key in authorized
+
+                if not is_authorized and self.pause.get(token_id, False):
+                    raise FA2Error(FA2ErrorMessage.TOKEN_PAUSED)
+
+                if amount > 0:
+                    from_balance = balances.get(from_key)
+                    if from_balance is None:
+                        ledger_balance = ledger_get(from_key, 0)
+                        from_balance = balances[from_key] = [ledger_balance, ledger_balance]
+                    if from_balance[1] < amount:
+                        raise FA2Error(FA2ErrorMessage.INSUFFICIENT_BALANCE)
+
+                if not is_authorized:
+                    if sender == from_ or from_ in authorized_owners:
+                        authorized.add(from_key)
+                    elif (from_, sender) in all_tokens_operators:
+                        authorized_owners.add(from_)
+                        authorized.add(from_key)
+                    elif (from_, sender, token_id) in operators:
+                        authorized.add(from_key)
+                    elif not permitted:
+                        permit_key = (from_, params_hash(transfer))
+                        if permit_key not in self.permits or permit_key in consumed_permits:
+                            raise FA2Error(FA2ErrorMessage.NOT_OWNER)
+                        if self.now > self.permits[permit_key]:
+                            raise FA2Error(FA2ErrorMessage.EXPIRED_PERMIT)
+                        consumed_permits.add(permit_key)
+                        permitted = True
+
+                if amount > 0:
+                    from_balance[1] -= amount
+                    to_key = (_intern(tx["to_"]), token_id)
+                    to_balance = balances.get(to_key)
+                    if to_balance is None:
+                        ledger_balance = ledger_get(to_key, 0)
+                        to_balance = balances[to_key] = [ledger_balance, ledger_balance]
+                    to_balance[1] += amount
+        self.flush_balances(balances)
+        for permit_key in consumed_permits:
+            del self.permits[permit_key]
+        self.events.append(("transfer", transfers))
+
+    def update_operators(self, sender, update_operators):
+        updates = []
+        for update_operator in update_operators:
+            (kind, update), = update_operator.items()
+            if update["owner"] != sender:
+                raise FA2Error(FA2ErrorMessage.NOT_OWNER)
+            if self.is_paused(update["token_id"]):
+                raise FA2Error(FA2ErrorMessage.TOKEN_PAUSED)
+            updates.append((kind == "add_operator", (sender, _intern(update["operator"]), update["token_id"])))
+        for add, operator_key in updates:
+            if add:
+                self.operators.add(operator_key)
+            else:
+                self.operators.discard(operator_key)
+
+    def update_operators_bulk(self, sender, owner_updates):
+        """Grants without token_id (None) are all tokens operators"""
+        updates = []
+        for owner_update in owner_updates:
+            if owner_update["owner"] != sender:
+                raise FA2Error(FA2ErrorMessage.NOT_OWNER)
+            for update in owner_update["updates"]:
+                (kind, grant), = update.items()
+                operator = _intern(grant["operator"])
+                if grant["token_id"] is None:
+                    updates.append((kind == "add_operator", self.all_tokens_operators, (sender, operator)))
+                else:
+                    if self.is_paused(grant["token_id"]):
+                        raise FA2Error(FA2ErrorMessage.TOKEN_PAUSED)
+                    updates.append((kind == "add_operator", self.operators, (sender, operator, grant["token_id"])))
+        for add, operators, operator_key in updates:
+            if add:
+                operators.add(operator_key)
+            else:
+                operators.discard(operator_key)
+
+    def balance_of(self, sender, balance_of_request):
+        """Returns the responses that the contract sends to the callback, as list of ((owner, token_id), balance)"""
+        responses = []
+        for request in balance_of_request["requests"]:
+            if request["token_id"] not in self.token_metadata:
+                raise FA2Error(FA2ErrorMessage.TOKEN_UNDEFINED)
+            ledger_key = (_intern(request["owner"]), request["token_id"])
+            responses.append((ledger_key, self.ledger.get(ledger_key, 0)))
+        responses.reverse()
+        return responses
+
+    def set_administrator(self, sender, params):
+        self.verify_is_admin(sender, params["token_id"])
+        self.administrators.add((_intern(params["administrator_to_set"]), params["token_id"]))
+
+    def remove_administrator(self, sender, params):
+        self.verify_is_admin(sender, params["token_id"])
+        self.administrators.discard((_intern(params["administrator_to_remove"]), params["token_id"]))
+
+    def execute(self, sender, execution_payload):
+        """Lambdas cannot be run by the model, execution_payload is a python callable returning the emitted operations"""
+        self.verify_is_admin(sender, 0)
+        return list(execution_payload())
+
+    def set_token_metadata(self, sender, token_metadata):
+        self.verify_is_admin(sender, 0)
+        token_id = token_metadata["token_id"]
+        if token_id not in self.token_metadata:
+            self.token_metadata[token_id] = token_metadata
+            self.administrators.add((sender, token_id))
+            self.total_supply[token_id] = 0
+
+    def mint(self, sender, recipient_token_amount):
+        token_id = recipient_token_amount["token_id"]
+        if token_id not in self.token_metadata:
+            raise FA2Error(FA2ErrorMessage.TOKEN_UNDEFINED)
+        self.verify_is_admin(sender, token_id)
+        ledger_key = (_intern(recipient_token_amount["owner"]), token_id)
+        self.ledger[ledger_key] = self.ledger.get(ledger_key, 0) + recipient_token_amount["token_amount"]
+        if self.checkpoints is not None:
+            self.write_checkpoint(ledger_key, self.ledger[ledger_key])
+        self.total_supply[token_id] += recipient_token_amount["token_amount"]
+        self.events.append(("mint", [recipient_token_amount]))
+
+    def burn(self, sender, recipient_token_amount):
+        token_id = recipient_token_amount["token_id"]
+        self.verify_is_admin(sender, token_id)
+        ledger_key = (_intern(recipient_token_amount["owner"]), token_id)
+        balance = self.ledger.get(ledger_key, 0) - recipient_token_amount["token_amount"]
+        if balance < 0 or token_id not in self.total_supply:
+            raise FA2Error(None)
+        supply = self.total_supply[token_id] - recipient_token_amount["token_amount"]
+        if supply < 0:
+            raise FA2Error(None)
+        self.total_supply[token_id] = supply
+        if balance == 0:
+            self.ledger.pop(ledger_key, None)
+        else:
+            self.ledger[ledger_key] = balance
+        if self.checkpoints is not None:
+            self.write_checkpoint(ledger_key, balance)
+        self.events.append(("burn", [recipient_token_amount]))
+
+    def mint_batch(self, sender, recipient_token_amounts):
+        supply_deltas = {}
+        balances = {}
+        for recipient_token_amount in recipient_token_amounts:
+            token_id = recipient_token_amount["token_id"]
+            if token_id not in supply_deltas:
+                if token_id not in self.token_metadata:
+                    raise FA2Error(FA2ErrorMessage.TOKEN_UNDEFINED)
+                self.verify_is_admin(sender, token_id)
+                supply_deltas[token_id] = 0
+            ledger_key = (_intern(recipient_token_amount["owner"]), token_id)
+            if ledger_key not in balances:
+                ledger_balance = self.ledger.get(ledger_key, 0)
+                balances[ledger_key] = [ledger_balance, ledger_balance]
+            balances[ledger_key][1] += recipient_token_amount["token_amount"]
+            supply_deltas[token_id] += recipient_token_amount["token_amount"]
+        self.flush_balances(balances)
+        for token_id, delta in supply_deltas.items():
+            self.total_supply[token_id] += delta
+        self.events.append(("mint", recipient_token_amounts))
+
+    def burn_batch(self, sender, recipient_token_amounts):
+        supply_deltas = {}
+        balances = {}
+        for recipient_token_amount in recipient_token_amounts:
+            token_id = recipient_token_amount["token_id"]
+            if token_id not in supply_deltas:
+                self.verify_is_admin(sender, token_id)
+                supply_deltas[token_id] = 0
+            ledger_key = (_intern(recipient_token_amount["owner"]), token_id)
+            if ledger_key not in balances:
+                ledger_balance = self.ledger.get(ledger_key, 0)
+                balances[ledger_key] = [ledger_balance, ledger_balance]
+            if balances[ledger_key][1] < recipient_token_amount["token_amount"]:
+                raise FA2Error(None)
+            balances[ledger_key][1] -= recipient_token_amount["token_amount"]
+            supply_deltas[token_id] += recipient_token_amount["token_amount"]
+        for token_id, delta in supply_deltas.items():
+            if token_id not in self.total_supply or self.total_supply[token_id] < delta:
+                raise FA2Error(None)
+        self.flush_balances(balances)
+        for token_id, delta in supply_deltas.items():
+            self.total_supply[token_id] -= delta
+        self.events.append(("burn", recipient_token_amounts))
+
+    def permit(self, sender, permits):
+        """Only Ed25519 permits can be checked, other keys raise ValueError"""
+        nonces = {}
+        stored = []
+        for permit in permits:
+            if self.now > permit["expiry"]:
+                raise FA2Error(FA2ErrorMessage.EXPIRED_PERMIT)
+            signer = _intern(signer_address(permit["public_key"]))
+            nonce = nonces.get(signer, self.permit_nonces.get(signer, 0))
+            permit_params_hash = bytes(permit["params_hash"])
+            message = signed_bytes(self.chain_id, self.address, nonce, permit["expiry"], permit_params_hash)
+            if not ed25519.verify_encoded(permit["public_key"], message, permit["signature"]):
+                raise FA2Error(FA2ErrorMessage.MISSIGNED)
+            nonces[signer] = nonce + 1
+            stored.append(((signer, permit_params_hash), permit["expiry"]))
+        self.permit_nonces.update(nonces)
+        self.permits.update(stored)
+
+    def import_balances(self, sender, params):
+        token_id = params["token_id"]
+        if token_id not in self.token_metadata:
+            raise FA2Error(FA2ErrorMessage.TOKEN_UNDEFINED)
+        self.verify_is_admin(sender, token_id)
+        if any(holder_balance["owner"] == self.address for holder_balance in params["balances"]):
+            raise FA2Error(FA2ErrorMessage.ESCROW_BALANCE)
+        ledger = self.ledger
+        imported = replaced = 0
+        for holder_balance in params["balances"]:
+            ledger_key = (_intern(holder_balance["owner"]), token_id)
+            replaced += ledger.get(ledger_key, 0)
+            if holder_balance["balance"]:
+                ledger[ledger_key] = holder_balance["balance"]
+            else:
+                ledger.pop(ledger_key, None)
+            if self.checkpoints is not None:
+                self.write_checkpoint(ledger_key, holder_balance["balance"])
+            imported += holder_balance["balance"]
+        self.total_supply[token_id] += imported - replaced
+        self.events.append(("import_balances", params))
+
+    def request_redemption(self, sender, params):
+        token_id = params["token_id"]
+        if token_id not in self.token_metadata:
+            raise FA2Error(FA2ErrorMessage.TOKEN_UNDEFINED)
+        if self.is_paused(token_id):
+            raise FA2Error(FA2ErrorMessage.TOKEN_PAUSED)
+        if not params["amount"]:
+            raise FA2Error(FA2ErrorMessage.INVALID_AMOUNT)
+        owner_balance = self.ledger.get((sender, token_id), 0)
+        if owner_balance < params["amount"]:
+            raise FA2Error(FA2ErrorMessage.INSUFFICIENT_BALANCE)
+        escrow_ledger_key = (_intern(self.address), token_id)
+        escrow_balance = self.ledger.get(escrow_ledger_key, 0)
+        self.flush_balances({(sender, token_id): [owner_balance, owner_balance - params["amount"]],
+                             escrow_ledger_key: [escrow_balance, escrow_balance + params["amount"]]})
+        redemption = dict(owner=sender, token_id=token_id, amount=params["amount"], btc_address=params["btc_address"])
+        self.redemptions[self.next_redemption_id] = redemption
+        self.events.append(("redemption", dict(redemption_id=self.next_redemption_id, redemption=redemption)))
+        self.next_redemption_id += 1
+
+    def settle_redemptions(self, sender, params):
+        first, end = params["first_redemption_id"], params["first_redemption_id"] + params["count"]
+        if first != self.next_settlement_id or not params["count"] or end > self.next_redemption_id:
+            raise FA2Error(FA2ErrorMessage.REDEMPTION_UNDEFINED)
+        refunds = set(params["refunds"])
+        if any(refund < first or refund >= end for refund in refunds):
+            raise FA2Error(FA2ErrorMessage.REDEMPTION_UNDEFINED)
+        supply_deltas = {}
+        balances = {}
+
+        def load(ledger_key):
+            if ledger_key not in balances:
+                ledger_balance = self.ledger.get(ledger_key, 0)
+                balances[ledger_key] = [ledger_balance, ledger_balance]
+            return balances[ledger_key]
+
+        for redemption_id in range(first, end):
+            redemption = self.redemptions[redemption_id]
+            token_id = redemption["token_id"]
+            if token_id not in supply_deltas:
+                self.verify_is_admin(sender, token_id)
+                supply_deltas[token_id] = 0
+            escrow = load((_intern(self.address), token_id))
+            if escrow[1] < redemption["amount"]:
+                raise FA2Error(None)
+            escrow[1] -= redemption["amount"]
+            if redemption_id in refunds:
+                load((redemption["owner"], token_id))[1] += redemption["amount"]
+            else:
+                supply_deltas[token_id] += redemption["amount"]
+        for token_id, delta in supply_deltas.items():
+            if self.total_supply[token_id] < delta:
+                raise FA2Error(None)
+        self.flush_balances(balances)
+        for token_id, delta in supply_deltas.items():
+            self.total_supply[token_id] -= delta
+        for redemption_id in range(first, end):
+            del self.redemptions[redemption_id]
+        self.next_settlement_id = end
+        self.events.append(("settle_redemptions", dict(first_redemption_id=first, count=params["count"], refunds=sorted(refunds))))
+
+    def verify_is_pausable(self, sender, token_id):
+        if token_id not in self.token_metadata:
+            raise FA2Error(FA2ErrorMessage.TOKEN_UNDEFINED)
+        self.verify_is_admin(sender, token_id)
+        if token_id >= PAUSABLE_TOKEN_IDS:
+            raise FA2Error(FA2ErrorMessage.TOKEN_NOT_PAUSABLE)
+
+    def pause_token(self, sender, params):
+        self.verify_is_pausable(sender, params["token_id"])
+        self.pause[params["token_id"]] = params["pause"]
+        self.events.append(("pause", [params]))
+
+    def pause_tokens(self, sender, params):
+        checked = set()
+        for token_pause in params:
+            if token_pause["token_id"] not in checked:
+                self.verify_is_pausable(sender, token_pause["token_id"])
+                checked.add(token_pause["token_id"])
+        for token_pause in params:
+            self.pause[token_pause["token_id"]] = token_pause["pause"]
+        self.events.append(("pause", params))
+
+def replay(simulator, operations):
+    """Applies a stream of operations, failed operations leave the storage untouched and are counted per error code.
+    As after apply, simulator.events only holds the events of the last operation
+
+    Args:
+        simulator (FA2Simulator): the model to apply the operations to
+        operations (iterable): dicts with sender, entrypoint and params
+
+    Returns:
+        dict: applied (int), failed (int) and errors (dict of error code to count)
+    """
+    entrypoints = simulator.entrypoints
+    events = simulator.events = []
+    applied = 0
+    errors = {}
+    for operation in operations:
+        events.clear()
+        try:
+            entrypoints[operation["entrypoint"]](_intern(operation["sender"]), operation["params"])
+            applied += 1
+        except FA2Error as error:
+            errors[error.code] = errors.get(error.code, 0) + 1
+    return dict(applied=applied, failed=sum(errors.values()), errors=errors)
+
+def load_vectors(path):
+    with open(path) as vectors_file:
+        return json.load(vectors_file)
+
+def check_vectors(vectors, checkpoints=False):
+    """Runs the shared test vectors, the same steps and expectations as the `FA2 Shared Test Vectors` SmartPy test
+
+    Args:
+        vectors (dict): content of contracts/fa2_test_vectors.json
+        checkpoints (bool, optional): run them against a model built with checkpoints. Defaults to False.
+
+    Returns:
+        list: mismatch descriptions, empty if the model agrees with every expectation
+    """
+    simulator = FA2Simulator([(address, token_id) for address, token_id in vectors["administrators"]], checkpoints=checkpoints)
+    mismatches = []
+    for index, step in enumerate(vectors["steps"]):
+        error = None
+        try:
+            simulator.apply(step["sender"], step["entrypoint"], step["params"])
+        except FA2Error as failure:
+            error = failure
+        if step.get("valid", True):
+            if error is not None:
+                mismatches.append("step {} ({}): unexpected failure {}".format(index, step["description"], error.code))
+        elif error is None:
+            mismatches.append("step {} ({}): expected failure {}".format(index, step["description"], step.get("exception")))
+        elif "exception" in step and error.code != step["exception"]:
+            mismatches.append("step {} ({}): failed with {} instead of {}".format(index, step["description"], error.code, step["exception"]))
+
+    expected = vectors["expected"]
+    expected_ledger = {(owner, token_id): amount for owner, token_id, amount in expected["ledger"]}
+    if simulator.ledger != expected_ledger:
+        mismatches.append("ledger {} != {}".format(simulator.ledger, expected_ledger))
+    expected_supply = {int(token_id): amount for token_id, amount in expected["total_supply"].items()}
+    if simulator.total_supply != expected_supply:
+        mismatches.append("total_supply {} != {}".format(simulator.total_supply, expected_supply))
+    expected_operators = {tuple(operator_key) for operator_key in expected["operators"]}
+    if simulator.operators != expected_operators:
+        mismatches.append("operators {} != {}".format(simulator.operators, expected_operators))
+    expected_all_tokens_operators = {tuple(owner_operator) for owner_operator in expected.get("all_tokens_operators", [])}
+    if simulator.all_tokens_operators != expected_all_tokens_operators:
+        mismatches.append("all_tokens_operators {} != {}".format(simulator.all_tokens_operators, expected_all_tokens_operators))
+    for expected_view in expected.get("views", []):
+        result = simulator.view(expected_view["view"], expected_view["params"])
+        if expected_view["view"] == "get_balances":
+            result = [[request, balance] for request, balance in result]
+        if result != expected_view["result"]:
+            mismatches.append("view {}({}) {} != {}".format(expected_view["view"], expected_view["params"], result, expected_view["result"]))
+    return mismatches
+
+def read_operations(path):
+    """Reads an operation stream, one JSON object with sender, entrypoint and params per line"""
+    with open(path) as operations_file:
+        for line in operations_file:
+            if line.strip():
+                yield json.loads(line)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command")
+    commands.required = True
+    check_parser = commands.add_parser("check", help="run the shared test vectors")
+    check_parser.add_argument("vectors")
+    check_parser.add_argument("--checkpoints", action="store_true", help="run them against a model built with checkpoints")
+    replay_parser = commands.add_parser("replay", help="replay a recorded operation stream")
+    replay_parser.add_argument("operations")
+    replay_parser.add_argument("--administrator", action="append", default=[], help="address:token_id of an initial administrator")
+    arguments = parser.parse_args(argv)
+
+    if arguments.command == "check":
+        mismatches = check_vectors(load_vectors(arguments.vectors), arguments.checkpoints)
+        for mismatch in mismatches:
+            print(mismatch)
+        return 1 if mismatches else 0
+
+    administrators = [(address, int(token_id)) for address, token_id in (item.rsplit(":", 1) for item in arguments.administrator)]
+    simulator = FA2Simulator(administrators)
+    started = time.perf_counter()
+    result = replay(simulator, read_operations(arguments.operations))
+    elapsed = time.perf_counter() - started
+    result["seconds"] = round(elapsed, 3)
+    result["ops_per_second"] = int((result["applied"] + result["failed"]) / elapsed) if elapsed else None
+    print(json.dumps(result))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())